@@ -42,6 +42,7 @@ import networkx as nx
 import gfapy
 import pyfastg
 from .input_node_utils import gc_content, negate_node_id
+from .file_utils import open_text_input, strip_gzip_suffix
 
 
 def is_not_pos_int(number_string):
@@ -77,7 +78,7 @@ def is_not_pos_int(number_string):
         return True
 
 
-def validate_lastgraph_file(graph_file):
+def validate_lastgraph_file(graph_file, digraph=None):
     """Attempts to verify that this LastGraph file seems "valid."
 
     Parameters
@@ -85,15 +86,22 @@ def validate_lastgraph_file(graph_file):
     graph_file: io.TextIOBase
         A "text stream." In normal usage of this function, this should just
         be the output of running open(). However, this can also totally be
-        an io.StringIO object or something -- this function is agnostic to
-        the type of the file object.
+        an io.StringIO object, sys.stdin, a gzip.open() stream, or something
+        -- this function is agnostic to the type of the file object, and only
+        reads through it once (so it never needs to seek() within it).
+
+    digraph: nx.DiGraph or None
+        If this is not None, each node and edge in the file is added to this
+        graph as soon as it has been validated. This lets parse_lastgraph()
+        validate and parse a file in a single pass. (If validation fails
+        partway through the file, this graph will only be partially
+        constructed -- so it should be thrown away in that case.)
 
     Discussion
     ----------
     This is by no means a *comprehensive* validation of this file, but it's
     close enough to give us some confidence that we can just parse this
-    graph using our simple, fragile-ish line-by-line parser contained in
-    parse_lastgraph().
+    graph using our simple, fragile-ish line-by-line parser.
 
     Raises
     ------
@@ -133,9 +141,14 @@ def validate_lastgraph_file(graph_file):
     curr_node_id = None
     curr_node_fwdseq = None
     curr_node_length = 0
+    curr_node_depth = 0
     line_num = 1
-    seen_nodes = []
-    seen_edges = []
+    # We use sets here (rather than lists) so that checking if we've already
+    # seen a node or edge takes constant time, rather than time linear in the
+    # number of nodes / edges seen so far -- the latter makes validation of
+    # large graphs take quadratic time.
+    seen_nodes = set()
+    seen_edges = set()
     for line in graph_file:
         if line_num == 1:
             header_num_nodes_str = line.split()[0]
@@ -176,6 +189,10 @@ def validate_lastgraph_file(graph_file):
             # This node declaration seems tentatively ok.
             curr_node_id = split_line[1]
             curr_node_length = int(split_line[2])
+            # NOTE: we define "depth" as just the node's O_COV_SHORT_1 value
+            # divided by the node's length (its COV_SHORT_1 value). This
+            # decision mirrors Bandage's behavior with LastGraph files.
+            curr_node_depth = float(split_line[3]) / curr_node_length
             in_node_block = True
             num_nodes += 1
 
@@ -217,8 +234,15 @@ def validate_lastgraph_file(graph_file):
                     "Line {}: Edge from {} to {} somehow declared multiple "
                     "times.".format(line_num, split_line[1], split_line[2])
                 )
-            seen_edges.append(fwd_ids)
-            seen_edges.append(rev_ids)
+            seen_edges.add(fwd_ids)
+            seen_edges.add(rev_ids)
+            if digraph is not None:
+                multiplicity = int(split_line[3])
+                digraph.add_edge(*fwd_ids, multiplicity=multiplicity)
+                # Only add implied edge if the edge does not imply itself
+                # (e.g. "ABC" -> "-ABC" or "-ABC" -> "ABC")
+                if rev_ids != fwd_ids:
+                    digraph.add_edge(*rev_ids, multiplicity=multiplicity)
         elif in_node_block:
             if curr_node_fwdseq is None:
                 curr_node_fwdseq = line.strip()
@@ -229,7 +253,8 @@ def validate_lastgraph_file(graph_file):
                     )
             else:
                 # The current line is the reverse sequence of this node.
-                if len(curr_node_fwdseq) != len(line.strip()):
+                curr_node_revseq = line.strip()
+                if len(curr_node_fwdseq) != len(curr_node_revseq):
                     raise ValueError(
                         "Line {}: Node sequences have unequal "
                         "lengths.".format(line_num)
@@ -237,13 +262,28 @@ def validate_lastgraph_file(graph_file):
                 # If we've made it here, we've seen all there is to see
                 # about the current node block. We can say that this node
                 # is tentatively valid (and we can add it to seen_nodes).
-                seen_nodes.append(curr_node_id)
-                seen_nodes.append(negate_node_id(curr_node_id))
+                seen_nodes.add(curr_node_id)
+                seen_nodes.add(negate_node_id(curr_node_id))
+                if digraph is not None:
+                    # The forward sequence (a.k.a. $ENDS_OF_KMERS_OF_NODE)
+                    # describes the "positive" node, and the reverse sequence
+                    # describes the "negative" node.
+                    for node_id, seq in (
+                        (curr_node_id, curr_node_fwdseq),
+                        (negate_node_id(curr_node_id), curr_node_revseq),
+                    ):
+                        digraph.add_node(
+                            node_id,
+                            length=curr_node_length,
+                            depth=curr_node_depth,
+                            gc_content=gc_content(seq)[0],
+                        )
 
                 # Reset various flag variables
                 in_node_block = False
                 curr_node_id = None
                 curr_node_length = 0
+                curr_node_depth = 0
                 curr_node_fwdseq = None
         line_num += 1
     # If we finished reading the file while we were *still* in a node
@@ -440,6 +480,11 @@ def parse_lastgraph(filename):
     "standard" (e.g. has empty lines between nodes), this will get messed
     up.
 
+    The file is validated and parsed in a single streaming pass (see
+    validate_lastgraph_file()), so filename can also refer to a
+    gzip-compressed file (ending in ".gz") or be "-" (to read from standard
+    input). It can also just be an already-opened text stream.
+
     Fun fact: this parser was the first part of MetagenomeScope I ever
     wrote! (I've updated the code since to be a bit less sloppy.)
 
@@ -454,85 +499,14 @@ def parse_lastgraph(filename):
         as $O_COV_SHORT_1 / $COV_SHORT_1) was primarily based on chucking
         LastGraph files into Bandage and seeing how it handled them.
     """
-    with open(filename, "r") as graph_file:
-        validate_lastgraph_file(graph_file)
-        # If validate_lastgraph_file() succeeded, we shouldn't have any
-        # problems parsing this assembly graph.
-
-        # Now, go back to the start of the file so we can actually *parse* it
-        # this time, instead of just checking it for correctness.
-        # CODELINK: https://stackoverflow.com/a/2106825/10730311
-        graph_file.seek(0)
-        digraph = nx.DiGraph()
-        parsing_node = False
-        parsed_fwdseq = False
-        curr_node_attrs = {
-            "id": "",
-            "length": -1,
-            "depth": -1,
-            "fwdseq": None,
-            "revseq": None,
-        }
-        for line in graph_file:
-            if line.startswith("NODE"):
-                parsing_node = True
-                line_contents = line.split()
-                curr_node_attrs["id"] = line_contents[1]
-                curr_node_attrs["length"] = int(line_contents[2])
-                # NOTE: we define "depth" as just the node's O_COV_SHORT_1
-                # value divided by the node's length (its COV_SHORT_1
-                # value). This decision mirrors Bandage's behavior with
-                # LastGraph files.
-                curr_node_attrs["depth"] = (
-                    float(line_contents[3]) / curr_node_attrs["length"]
-                )
-            elif line.startswith("ARC"):
-                line_contents = line.split()
-                id1, id2 = line_contents[1], line_contents[2]
-                nid1 = negate_node_id(line_contents[1])
-                nid2 = negate_node_id(line_contents[2])
-                multiplicity = int(line_contents[3])
-                digraph.add_edge(id1, id2, multiplicity=multiplicity)
-                # Only add implied edge if the edge does not imply itself
-                # (e.g. "ABC" -> "-ABC" or "-ABC" -> "ABC")
-                if not (id1 == nid2 and id2 == nid1):
-                    digraph.add_edge(nid2, nid1, multiplicity=multiplicity)
-            elif parsing_node:
-                if not parsed_fwdseq:
-                    curr_node_attrs["fwdseq"] = line.strip()
-                    # OK, now we've read in two lines: the first line of
-                    # this node (describing general information), and the
-                    # second line of this node (containing the forward
-                    # sequence, a.k.a. $ENDS_OF_KMERS_OF_NODE). We can
-                    # add a node for the "positive" node to the digraph.
-                    digraph.add_node(
-                        curr_node_attrs["id"],
-                        length=curr_node_attrs["length"],
-                        depth=curr_node_attrs["depth"],
-                        gc_content=gc_content(curr_node_attrs["fwdseq"])[0],
-                    )
-                    parsed_fwdseq = True
-                else:
-                    curr_node_attrs["revseq"] = line.strip()
-                    # Now we can add a node for the "negative" node.
-                    digraph.add_node(
-                        negate_node_id(curr_node_attrs["id"]),
-                        length=curr_node_attrs["length"],
-                        depth=curr_node_attrs["depth"],
-                        gc_content=gc_content(curr_node_attrs["revseq"])[0],
-                    )
-                    # At this point, we're done with parsing this node.
-                    # Clear our temporary variables for later use if
-                    # parsing other nodes.
-                    parsing_node = False
-                    parsed_fwdseq = False
-                    curr_node_attrs = {
-                        "id": "",
-                        "length": -1,
-                        "depth": -1,
-                        "fwdseq": None,
-                        "revseq": None,
-                    }
+    digraph = nx.DiGraph()
+    if hasattr(filename, "read"):
+        validate_lastgraph_file(filename, digraph)
+    else:
+        with open_text_input(filename) as graph_file:
+            validate_lastgraph_file(graph_file, digraph)
+    # If validate_lastgraph_file() succeeded, then digraph now contains all
+    # of the nodes and edges in this assembly graph.
     return digraph
 
 
@@ -544,21 +518,40 @@ SUPPORTED_FILETYPE_TO_PARSER = {
 }
 
 
+# Filetypes whose parsers can read gzip-compressed files directly. (NetworkX's
+# GML reader decompresses .gz files on its own.)
+GZIP_SUPPORTED_FILETYPES = ("lastgraph", "gml")
+
+
 def sniff_filetype(filename):
     """Attempts to determine the filetype of the file specified by a filename.
 
        Currently, this just returns the extension of the filename (after
-       converting the filename to lowercase). If the extension isn't one of
-       "lastgraph", "gfa", "fastg", or "gml", this throws a
+       converting the filename to lowercase, and ignoring a trailing ".gz"
+       for filetypes in GZIP_SUPPORTED_FILETYPES). If the extension isn't one
+       of "lastgraph", "gfa", "fastg", or "gml", this throws a
        NotImplementedError.
 
        It might be worth extending this in the future to try sniffing via a
        more sophisticated method, but this seems fine for the time being.
     """
     lowercase_fn = filename.lower()
+    uncompressed_fn = strip_gzip_suffix(lowercase_fn)
     for suffix in SUPPORTED_FILETYPE_TO_PARSER:
         if lowercase_fn.endswith(suffix):
             return suffix
+        if uncompressed_fn != lowercase_fn and uncompressed_fn.endswith(
+            suffix
+        ):
+            if suffix in GZIP_SUPPORTED_FILETYPES:
+                return suffix
+            raise NotImplementedError(
+                "The input filename ({}) indicates that it's a compressed "
+                "{} file, but only the following filetypes can be read from "
+                "compressed files: {}.".format(
+                    filename, suffix, GZIP_SUPPORTED_FILETYPES
+                )
+            )
     raise NotImplementedError(
         "The input filename ({}) doesn't end with one of the following "
         "supported filetypes: {}. Please provide an assembly graph that "
@@ -49,21 +49,47 @@ import numpy
 # For checking I/O errors
 import errno
 
-# For interfacing with SQLite
-import sqlite3
-
 # For benchmarking
 import time
 
+# For only writing a sequence store if -ss was passed, and for shutting down
+# layout worker processes if an error occurs
+from contextlib import ExitStack, nullcontext
+
 from . import graph_objects
 from . import config
-
-# NOTE: We really shouldn't need to use reverse_complement() at all, I think,
-# but in the future we can just use gfapy's rc() function (which is much more
-# robust).
-from .input_node_utils import gc_content, reverse_complement, negate_node_id
-from .file_utils import check_file_existence, safe_file_remove, save_aux_file
+from . import spqr_utils
+
+from .input_node_utils import gc_content, negate_node_id, validate_dna
+from .file_utils import (
+    check_file_existence,
+    safe_file_remove,
+    save_aux_file,
+    open_text_input,
+    strip_gzip_suffix,
+)
 from .msg_utils import operation_msg, conclude_msg
+from .component_utils import (
+    find_components,
+    find_core_components,
+    scale_contigs,
+    scale_core_contigs,
+    scale_core_edges,
+)
+from .db_utils import DBWriter, ShardedDBWriter, find_shard_files
+from .dot_utils import start_dot_lines, finish_dot_lines
+from .graph_core import GraphCore
+from .sequence_store import SequenceStoreWriter
+from .layout_utils import (
+    ParallelLayout,
+    TimedLayout,
+    LayoutCache,
+    ShapeLayoutCache,
+    layout_dot_string,
+    load_laid_out_graph,
+    LayoutResult,
+)
+from .update_utils import PreviousCollation
 
 # Define supported command-line arguments. (We don't actually run
 # parser.parse_args() until later on, in order to support use of this file
@@ -74,7 +100,19 @@ parser.add_argument(
     "--inputfile",
     required=True,
     help="""input assembly
-    graph filename (LastGraph, GFA, or MetaCarvel GML)""",
+    graph filename (LastGraph, GFA, or MetaCarvel GML; may be
+    gzip-compressed, with a .gz suffix); if this is "-", the graph will be
+    read from standard input, and -it must also be given""",
+)
+parser.add_argument(
+    "-it",
+    "--inputtype",
+    required=False,
+    default=None,
+    choices=config.INPUT_TYPES,
+    help="""type of the input
+    assembly graph; if this isn't passed, the type is determined from the
+    suffix of the input filename (ignoring any .gz suffix)""",
 )
 parser.add_argument(
     "-o",
@@ -129,6 +167,33 @@ parser.add_argument(
         config.MAXE_DEFAULT
     ),
 )
+parser.add_argument(
+    "-stl",
+    "--searchtoolarge",
+    required=False,
+    action="store_true",
+    default=False,
+    help="""store the ID, label, length, and component of every node in
+    connected components that are too large to lay out (see -maxn and -maxe,
+    as well as -lt) in a separate, indexed table in the .db file; the viewer
+    interface then uses this table to say which component a node is in when
+    you search for it, even though its component can't be drawn""",
+)
+parser.add_argument(
+    "-ss",
+    "--sequencestore",
+    required=False,
+    action="store_true",
+    default=False,
+    help="""write the DNA sequences of the nodes in the graph (for LastGraph,
+    GFA, and FASTG files) to a separate, compressed "sequence store" file
+    next to the .db file, named (output prefix){}; the viewer interface can
+    then show and export the sequences of selected nodes, for .db files
+    hosted on a server. The .db file itself never contains any
+    sequences""".format(
+        config.SEQUENCE_STORE_SUFFIX
+    ),
+)
 parser.add_argument(
     "-ub",
     "--userbubblefile",
@@ -177,9 +242,9 @@ parser.add_argument(
     action="store_true",
     default=False,
     help="""compute data for the SPQR
-    "decomposition modes" in MetagenomeScope; necessitates a few additional
-    system requirements (see MetagenomeScope's installation instructions
-    wiki page for details)""",
+    "decomposition modes" in MetagenomeScope; using the OGDF engine (see
+    -spqre) necessitates a few additional system requirements (see
+    MetagenomeScope's installation instructions wiki page for details)""",
 )
 parser.add_argument(
     "-b",
@@ -188,7 +253,17 @@ parser.add_argument(
     help="""file containing bicomponent information for the assembly graph
     (this argument is only used if -spqr is passed, and is not required even in
     that case; the needed files will be generated if -spqr is passed and this
-    option is not passed)""",
+    option is not passed; only used with -spqre ogdf)""",
+)
+parser.add_argument(
+    "-spqre",
+    "--spqrengine",
+    required=False,
+    choices=config.SPQR_ENGINES,
+    default=config.SPQR_ENGINE_DEFAULT,
+    help="""engine used to compute SPQR tree
+    decompositions when -spqr is passed: "python" computes them in-process,
+    while "ogdf" runs the compiled SPQR script (default: %(default)s)""",
 )
 parser.add_argument(
     "-sp",
@@ -241,6 +316,105 @@ parser.add_argument(
     doesn't actually impact the .db file -- it just provides a frame of
     reference for the impact clustering can have on dot's layouts""",
 )
+parser.add_argument(
+    "-j",
+    "--jobs",
+    required=False,
+    default=1,
+    type=int,
+    help="""number of processes to use when laying out connected components
+    (and the node groups within them) with GraphViz, and when computing the
+    SPQR trees of bicomponents with -spqr; the output .db file is the same
+    regardless of this value (default 1, must be at least 1)""",
+)
+parser.add_argument(
+    "-lt",
+    "--layouttimeout",
+    required=False,
+    default=None,
+    type=float,
+    help="""maximum number of seconds to spend laying out each connected
+    component with dot; if this runs out, we'll lay out the component with
+    sfdp instead (which is much faster, but produces less useful drawings of
+    assembly graphs). If sfdp also runs out of time, the component won't be
+    laid out, as if it exceeded -maxn or -maxe. The program used to lay out
+    each component is stored in the .db file. By default, there's no time
+    limit (must be positive if given)""",
+)
+parser.add_argument(
+    "-le",
+    "--layoutengine",
+    required=False,
+    default=config.LAYOUT_ENGINE_DEFAULT,
+    choices=config.LAYOUT_ENGINES,
+    help="""engine to use when laying out connected components: "dot" uses
+    GraphViz's dot; "layered" uses a layered layout engine written in NumPy,
+    which produces similar top-to-bottom drawings much faster than dot on very
+    large components (although these drawings are generally messier). If you
+    use "layered" to lay out huge components, you'll probably want to raise
+    -maxn and -maxe as well. With -lt, components laid out using "layered" are
+    never laid out using sfdp instead. Node groups are always laid out using
+    dot (default "dot")""",
+)
+parser.add_argument(
+    "-lc",
+    "--layoutcache",
+    required=False,
+    default=None,
+    help="""file in which to cache the layouts of connected components and
+    node groups between runs; components and node groups that are identical
+    to ones laid out in a previous run using this file are not laid out
+    again (the file is created if it doesn't exist)""",
+)
+parser.add_argument(
+    "-lcs",
+    "--layoutcachesize",
+    required=False,
+    default=config.LAYOUT_CACHE_MAX_SIZE // (1024 * 1024),
+    type=int,
+    help="""maximum size of the layout cache (see -lc), in megabytes; once
+    the cache is larger than this, the least recently used layouts are
+    removed from it (default %(default)s, must be at least 1)""",
+)
+parser.add_argument(
+    "-ni",
+    "--no-index",
+    dest="noindex",
+    required=False,
+    action="store_true",
+    default=False,
+    help="""don't create indexes on the tables of the .db file; this makes
+    the .db file slightly smaller, but makes drawing components in the viewer
+    interface slower""",
+)
+parser.add_argument(
+    "-sc",
+    "--shardcomponents",
+    required=False,
+    default=None,
+    type=int,
+    help="""instead of storing everything in one .db file, write a small
+    "manifest" .db file containing assembly-wide and component-level
+    information, along with "shard" .db files that each contain the nodes,
+    edges, and clusters of this many connected components (in order of size
+    rank); the viewer interface will then only load the shard containing the
+    component it's drawing. Sharded .db files have to be loaded from a server.
+    Can't be used with -spqr.""",
+)
+parser.add_argument(
+    "-u",
+    "--update",
+    required=False,
+    default=None,
+    help="""path to a .db file produced by an earlier run of this script on
+    a previous version of the input assembly graph (using the same
+    options); connected components whose nodes and edges haven't changed
+    since then will be copied forward from this .db file instead of being
+    scaled and laid out again. Auxiliary files
+    (e.g. from -pg or -px) aren't written for these components. This .db
+    file can be the same file as the output .db file, if -w is set. Can't be
+    used with -spqr.""",
+)
 # parser.add_argument("-au", "--assumeunoriented", required=False, default=False,
 #        action="store_true", help="assume that input GML-file graphs are" + \
 #            " unoriented (default for GML files is assuming they are" + \
@@ -251,47 +425,6 @@ parser.add_argument(
 #            " assuming they are unoriented); this option is unfinished")
 
 
-def dfs(n):
-    """Recursively runs depth-first search, starting at node n.
-       Returns a list of all nodes found that corresponds to a list of all
-       nodes within the entire connected component (ignoring edge
-       directionality) in which n resides.
-
-       This assumes that the connected component containing n has not had this
-       method run on it before (due to its reliance on the .seen_in_dfs Node
-       property).
-
-       (In identifying a connected component, the graph is treated as if
-       its edges are undirected, so the actual starting node within a
-       connected component should not make a difference on the connected
-       component node list returned.)
-
-       I modified this function to not use recursion since Python isn't
-       super great at that -- this allows us to avoid hitting the maximum
-       recursion depth, which would cause us to get a RuntimeError for
-       really large connected components.
-    """
-    nodes_to_check = [n]
-    nodes_in_ccomponent = []
-    # len() of a list in python is a constant-time operation, so this is okay--
-    while len(nodes_to_check) > 0:
-        # We rely on the invariant that all nodes in nodes_to_check have
-        # seen_in_dfs = False, and that no duplicate nodes exist within
-        # nodes_to_check
-        j = nodes_to_check.pop()
-        j.seen_in_dfs = True
-        nodes_in_ccomponent.append(j)
-        tentative_nodes = j.outgoing_nodes + j.incoming_nodes
-        # Only travel to unvisited and not already-marked-to-visit neighbor
-        # nodes of j
-        for m in tentative_nodes:
-            if not m.seen_in_dfs and not m.in_nodes_to_check:
-                # in_nodes_to_check prevents duplicate nodes in that list
-                m.in_nodes_to_check = True
-                nodes_to_check.append(m)
-    return nodes_in_ccomponent
-
-
 def assembly_gc(gc_ct, total_bp):
     """Returns the G/C content of an assembly, where total_bp is the number of
        base pairs (2 * the number of nucleotides) and gc_ct is the number of
@@ -359,29 +492,6 @@ def n50(node_lengths):
     return sorted_lengths[i - 1]
 
 
-def add_node_to_stdmode_mapping(nodeid2obj, n, rc=None):
-    """Adds a Node object n to nodeid2obj.
-
-       If rc is defined, also adds rc to nodeid2obj.
-
-       This checks to make sure n and rc's IDs are not already in nodeid2obj.
-       If either of their IDs are already in nodeid2obj before adding them, an
-       AttributeError is raised.
-
-       Returns the modified nodeid2obj.
-    """
-    # Check for duplicate IDs
-    if n.id_string in nodeid2obj:
-        raise AttributeError(config.DUPLICATE_ID_ERR + n.id_string)
-    # Actually add to nodeid2obj
-    nodeid2obj[n.id_string] = n
-    if rc is not None:
-        if rc.id_string in nodeid2obj:
-            raise AttributeError(config.DUPLICATE_ID_ERR + rc.id_string)
-        nodeid2obj[rc.id_string] = rc
-    return nodeid2obj
-
-
 def run_spqr_script(invocation):
     """Runs the SPQR script using check_output().
 
@@ -407,8 +517,75 @@ def run_spqr_script(invocation):
         raise
 
 
+def is_too_large(component, max_node_ct, max_edge_ct):
+    """Returns True if the given standard mode component exceeds -maxn or
+       -maxe (and thus won't be laid out), False otherwise.
+    """
+    return component.node_ct > max_node_ct or component.edge_ct > max_edge_ct
+
+
+def add_search_rows(db_writer, graph_core, node_indices, size_rank):
+    """Adds a row to the searchnodes table (see -stl) for each node in a
+       standard mode component, which should have the given size rank.
+
+       The component's nodes are given by their indices in graph_core, so
+       this works even if we haven't created Node objects for them.
+    """
+    for i, bp in zip(
+        node_indices.tolist(), graph_core.bps[node_indices].tolist()
+    ):
+        db_writer.add_row(
+            "searchnodes",
+            (graph_core.ids[i], graph_core.labels[i], bp, size_rank),
+        )
+
+
+def has_trivial_layout(component):
+    """Returns True if the given standard mode component is just a single
+       node with no edges, False otherwise.
+
+       We "fake" the layout of these components instead of calling GraphViz.
+    """
+    return (
+        len(component.node_list) == 1
+        and len(component.node_group_list) == 0
+        and len(component.node_list[0].outgoing_nodes) == 0
+    )
+
+
 def collate_graph(args):
+    """Runs the preprocessing script with the given parsed arguments.
+
+       The layout cache (if -lc was passed) is opened here, so that it's
+       always closed -- saving any layouts added to it -- even if an error
+       occurs partway through. Layouts are looked up in (and added to) the
+       layout cache through a ShapeLayoutCache, so that each distinct shape
+       of small component or node group is only laid out once per run.
+
+       Similarly, any pools of layout worker processes (see -j and -lt) are
+       registered with an ExitStack that's managed here, so that they're
+       shut down even if an error occurs while they're in use.
+    """
+    if args.layoutcachesize < 1:
+        raise ValueError("layout cache size must be at least 1")
+    layout_cache = None
+    if args.layoutcache is not None:
+        layout_cache = LayoutCache(
+            args.layoutcache, args.layoutcachesize * 1024 * 1024
+        )
+    try:
+        with ExitStack() as layout_workers:
+            collate_graph_with_cache(
+                args, ShapeLayoutCache(layout_cache), layout_workers
+            )
+    finally:
+        if layout_cache is not None:
+            layout_cache.close()
+
+
+def collate_graph_with_cache(args, layout_cache, layout_workers):
     asm_fn = args.inputfile
+    input_type = args.inputtype
     output_fn = args.outputprefix
     db_fn = output_fn + ".db"
     dir_fn = args.outputdirectory
@@ -425,6 +602,8 @@ def collate_graph(args):
     upatterns_labels = args.userpatternlabelsused
     make_no_backfilled_dot_files = args.nobackfilldotfiles
     make_no_patterned_dot_files = args.nopatterndotfiles
+    jobs = args.jobs
+    shard_size = args.shardcomponents
     # assume_unoriented = args.assumeunoriented
     # assume_oriented = args.assumeoriented
 
@@ -453,6 +632,19 @@ def collate_graph(args):
         raise ValueError("maximum node count must be at least 1")
     if max_edge_ct < 1:
         raise ValueError("maximum edge count must be at least 1")
+    if jobs < 1:
+        raise ValueError("number of jobs must be at least 1")
+    if args.layouttimeout is not None and args.layouttimeout <= 0:
+        raise ValueError("layout timeout must be positive")
+    if shard_size is not None:
+        if shard_size < 1:
+            raise ValueError("shard size must be at least 1")
+        if args.computespqrdata:
+            raise ValueError("-sc can't be used with -spqr")
+    if args.update is not None and args.computespqrdata:
+        raise ValueError("-u can't be used with -spqr")
+    if asm_fn == config.STDIN_FILENAME and input_type is None:
+        raise ValueError(config.STDIN_TYPE_ERR)
 
     # NOTE Used to test the "race condition" mentioned above in which the
     # directory is removed.
@@ -469,22 +661,56 @@ def collate_graph(args):
     # using SQLite. However, as is detailed below, that doesn't really matter
     # -- SQLite will handle that condition suitably.
     db_fullfn = os.path.join(dir_fn, db_fn)
-    if check_file_existence(db_fullfn, overwrite):
+    overwrite_db = check_file_existence(db_fullfn, overwrite)
+    # Similarly, check all of the shard files that -sc would write. We don't
+    # know how many shards there'll be yet, so we check every existing file
+    # named like a shard file for this .db file.
+    shard_fullfns_to_remove = []
+    if shard_size is not None:
+        for shard_fullfn in find_shard_files(db_fullfn):
+            if check_file_existence(shard_fullfn, overwrite):
+                shard_fullfns_to_remove.append(shard_fullfn)
+
+    # Similarly, check the sequence store file that -ss would write
+    seq_fn = output_fn + config.SEQUENCE_STORE_SUFFIX
+    seq_fullfn = os.path.join(dir_fn, seq_fn)
+    overwrite_seq = False
+    if args.sequencestore:
+        overwrite_seq = check_file_existence(seq_fullfn, overwrite)
+
+    # If -u was passed, read in the components of the earlier .db file now --
+    # before we (possibly) remove it, if it's also the output .db file
+    previous_collation = None
+    if args.update is not None:
+        operation_msg(config.UPDATE_READ_MSG + "%s..." % (args.update))
+        previous_collation = PreviousCollation(args.update)
+        conclude_msg()
+
+    if overwrite_db:
         # The user asked to overwrite this database via -w, so remove it
         safe_file_remove(db_fullfn)
+    for shard_fullfn in shard_fullfns_to_remove:
+        safe_file_remove(shard_fullfn)
+    if overwrite_seq:
+        safe_file_remove(seq_fullfn)
+
+    # The nodes and edges of the graph, stored in arrays (see graph_core.py)
+    # rather than as Node objects while we parse the graph
+    graph_core = GraphCore()
 
     # Maps Node ID (as int) to the Node object in question
     # This is nice, since it allows us to do things like
     # list(nodeid2obj.values()) to get a list of every Node object that's been
     # processed
-    # (And, more importantly, to reconcile edge data with prev.-seen node data)
+    # (We only create Node objects for the components of the graph that need
+    # them, once we've parsed the graph; see below)
     nodeid2obj = {}
 
     # Like nodeid2obj, but for preserving references to clusters (NodeGroups)
     clusterid2obj = {}
 
     # Like nodeid2obj but for "single" Nodes, to be used in the SPQR-integrated
-    # graph
+    # graph (we only create these if -spqr was passed)
     singlenodeid2obj = {}
     # List of 2-tuples, where each 2-tuple contains two node IDs
     # For GML files this will just contain all the normal connections in the graph
@@ -537,20 +763,38 @@ def collate_graph(args):
     # NOTE: in the future, this will be as simple as --
     # asm_graph = graph_objects.AssemblyGraph(asm_fn)
 
-    with open(asm_fn, "r") as assembly_file:
-        # We don't really care about case in file extensions
-        lowercase_asm_fn = asm_fn.lower()
-        parsing_LastGraph = lowercase_asm_fn.endswith(config.LASTGRAPH_SUFFIX)
-        parsing_GML = lowercase_asm_fn.endswith(config.GML_SUFFIX)
-        parsing_GFA = lowercase_asm_fn.endswith(config.GFA_SUFFIX)
-        parsing_FASTG = lowercase_asm_fn.endswith(config.FASTG_SUFFIX)
-
-        # Ensure that the -ubl/-upl options are only used when the input assembly
-        # graph is of a type that accepts labels.
-        if ububbles_labels or upatterns_labels:
-            if not parsing_GML:
-                raise ValueError(config.LABEL_EXISTENCE_ERR)
-            need_label_mapping = True
+    # We don't really care about case in file extensions (and we ignore the .gz
+    # suffix of compressed files, which open_text_input() decompresses on the
+    # fly). If -it was given, we just use that (it's one of the suffixes
+    # checked below).
+    if input_type is not None:
+        lowercase_asm_fn = input_type
+    else:
+        lowercase_asm_fn = strip_gzip_suffix(asm_fn).lower()
+    parsing_LastGraph = lowercase_asm_fn.endswith(config.LASTGRAPH_SUFFIX)
+    parsing_GML = lowercase_asm_fn.endswith(config.GML_SUFFIX)
+    parsing_GFA = lowercase_asm_fn.endswith(config.GFA_SUFFIX)
+    parsing_FASTG = lowercase_asm_fn.endswith(config.FASTG_SUFFIX)
+
+    # Ensure that the -ubl/-upl options are only used when the input assembly
+    # graph is of a type that accepts labels.
+    if ububbles_labels or upatterns_labels:
+        if not parsing_GML:
+            raise ValueError(config.LABEL_EXISTENCE_ERR)
+        need_label_mapping = True
+    # If -ss was passed, we write each node's sequence to the sequence store
+    # as soon as we've parsed it, rather than holding on to it. (If parsing
+    # fails, the sequence store's file is removed when we leave the with
+    # block below.)
+    if args.sequencestore and parsing_GML:
+        raise ValueError(config.SEQUENCE_STORE_GML_ERR)
+    make_seq_store = args.sequencestore and (
+        parsing_LastGraph or parsing_GFA or parsing_FASTG
+    )
+
+    with open_text_input(asm_fn) as assembly_file, (
+        SequenceStoreWriter(seq_fullfn) if make_seq_store else nullcontext()
+    ) as seq_writer:
         if parsing_LastGraph:
             graph_filetype = "LastGraph"
             dna_given = True
@@ -585,21 +829,18 @@ def collate_graph(args):
                     nid2 = negate_node_id(id2)
                     nid1 = negate_node_id(id1)
                     mult = int(a[3])
-                    nodeid2obj[id1].add_outgoing_edge(
-                        nodeid2obj[id2], multiplicity=mult
-                    )
-                    pid1 = id1[1:] if id1[0] == "-" else id1
-                    pid2 = id2[1:] if id2[0] == "-" else id2
-                    single_graph_edges.append((pid1, pid2))
-                    singlenodeid2obj[pid1].add_outgoing_edge(
-                        singlenodeid2obj[pid2]
-                    )
+                    graph_core.add_edge(id1, id2, multiplicity=mult)
+                    if args.computespqrdata:
+                        pid1 = id1[1:] if id1[0] == "-" else id1
+                        pid2 = id2[1:] if id2[0] == "-" else id2
+                        single_graph_edges.append((pid1, pid2))
+                        singlenodeid2obj[pid1].add_outgoing_edge(
+                            singlenodeid2obj[pid2]
+                        )
                     # Only add implied edge if the edge does not imply itself
                     # (see issue #105 on GitHub for context)
                     if not (id1 == nid2 and id2 == nid1):
-                        nodeid2obj[nid2].add_outgoing_edge(
-                            nodeid2obj[nid1], multiplicity=mult
-                        )
+                        graph_core.add_edge(nid2, nid1, multiplicity=mult)
                         # Use total_all_edge_count to keep track of self-implying
                         # edges' impact on the assembly; is used in viewer tool
                         total_all_edge_count += 1
@@ -617,38 +858,42 @@ def collate_graph(args):
                         curr_node_dnarev = line.strip()
                         curr_node_gcrev, gc_ct = gc_content(curr_node_dnarev)
                         total_gc_nt_count += gc_ct
+                        if seq_writer is not None:
+                            seq_writer.add(
+                                "-" + curr_node_id, curr_node_dnarev
+                            )
                         curr_node_dnarev = None
                         # In any case, now that we've parsed both the forward and
                         # reverse sequences for the node's DNA (or ignored the
                         # sequences, if the user passed the -nodna flag), we are
-                        # done getting data for this node -- so we can create new
-                        # Node objects to be added to the .db file and used in the
-                        # graph layout.
-                        n = graph_objects.Node(
+                        # done getting data for this node -- so we can add it
+                        # (and its reverse complement) to the graph.
+                        graph_core.add_node(
                             curr_node_id,
                             curr_node_bp,
                             False,
                             depth=curr_node_depth,
                             gc_content=curr_node_gcfwd,
                         )
-                        c = graph_objects.Node(
+                        graph_core.add_node(
                             "-" + curr_node_id,
                             curr_node_bp,
                             True,
                             depth=curr_node_depth,
                             gc_content=curr_node_gcrev,
                         )
-                        add_node_to_stdmode_mapping(nodeid2obj, n, c)
-                        # Create single Node object, for the SPQR-integrated graph
-                        sn = graph_objects.Node(
-                            curr_node_id,
-                            curr_node_bp,
-                            False,
-                            depth=curr_node_depth,
-                            gc_content=curr_node_gcfwd,
-                            is_single=True,
-                        )
-                        singlenodeid2obj[curr_node_id] = sn
+                        if args.computespqrdata:
+                            # Create single Node object, for the
+                            # SPQR-integrated graph
+                            sn = graph_objects.Node(
+                                curr_node_id,
+                                curr_node_bp,
+                                False,
+                                depth=curr_node_depth,
+                                gc_content=curr_node_gcfwd,
+                                is_single=True,
+                            )
+                            singlenodeid2obj[curr_node_id] = sn
                         # Record this node for graph statistics
                         # Note that recording these statistics here ensures that
                         # only "fully complete" node definitions are recorded.
@@ -673,6 +918,8 @@ def collate_graph(args):
                         curr_node_dnafwd = line.strip()
                         curr_node_gcfwd, gc_ct = gc_content(curr_node_dnafwd)
                         total_gc_nt_count += gc_ct
+                        if seq_writer is not None:
+                            seq_writer.add(curr_node_id, curr_node_dnafwd)
                         curr_node_dnafwd = None
         elif parsing_GML:
             graph_filetype = "GML"
@@ -735,26 +982,25 @@ def collate_graph(args):
                         # REPEAT_INFO_AVAILABLE var or something getting set to
                         # true, which should then be stored in the assembly table
                         # in the database. we'll use that in the viewer JS.
-                        n = graph_objects.Node(
+                        graph_core.add_node(
                             curr_node_id,
                             curr_node_bp,
                             (curr_node_orientation == '"REV"'),
                             label=curr_node_label,
                             is_repeat=curr_node_is_repeat,
                         )
-                        add_node_to_stdmode_mapping(nodeid2obj, n)
-                        if need_label_mapping:
-                            nodelabel2obj[curr_node_label] = n
-                        # Create single Node object, for the SPQR-integrated graph
-                        sn = graph_objects.Node(
-                            curr_node_id,
-                            curr_node_bp,
-                            False,
-                            label=curr_node_label,
-                            is_single=True,
-                            is_repeat=curr_node_is_repeat,
-                        )
-                        singlenodeid2obj[curr_node_id] = sn
+                        if args.computespqrdata:
+                            # Create single Node object, for the
+                            # SPQR-integrated graph
+                            sn = graph_objects.Node(
+                                curr_node_id,
+                                curr_node_bp,
+                                False,
+                                label=curr_node_label,
+                                is_single=True,
+                                is_repeat=curr_node_is_repeat,
+                            )
+                            singlenodeid2obj[curr_node_id] = sn
                         # Record this node for graph statistics
                         total_node_count += 1
                         total_length += curr_node_bp
@@ -787,8 +1033,9 @@ def collate_graph(args):
                         line_contents = line.split()
                         curr_edge_stdev = float(line_contents[1].strip('"'))
                     elif line.endswith("]\n"):
-                        nodeid2obj[curr_edge_src_id].add_outgoing_edge(
-                            nodeid2obj[curr_edge_tgt_id],
+                        graph_core.add_edge(
+                            curr_edge_src_id,
+                            curr_edge_tgt_id,
                             multiplicity=curr_edge_bundlesize,
                             orientation=curr_edge_orientation,
                             mean=curr_edge_mean,
@@ -796,9 +1043,11 @@ def collate_graph(args):
                         )
                         # single_graph_edges.append((curr_edge_src_id, \
                         #    curr_edge_tgt_id))
-                        singlenodeid2obj[curr_edge_src_id].add_outgoing_edge(
-                            singlenodeid2obj[curr_edge_tgt_id]
-                        )
+                        if args.computespqrdata:
+                            single_src = singlenodeid2obj[curr_edge_src_id]
+                            single_src.add_outgoing_edge(
+                                singlenodeid2obj[curr_edge_tgt_id]
+                            )
                         total_edge_count += 1
                         total_all_edge_count += 1
                         if curr_edge_bundlesize is None:
@@ -837,13 +1086,14 @@ def collate_graph(args):
             curr_node_bp = None
             curr_node_gc = None
             curr_node_dnafwd = None
-            curr_node_dnarev = None
             nodeid2outgoingnodeids = {}
             for line in assembly_file:
                 # Parsing a segment (node) line
                 if line.startswith("S"):
                     # For GFA files: given a + DNA seq, its - DNA seq is the
-                    # reverse complement of that DNA seq.
+                    # reverse complement of that DNA seq. (We don't need to
+                    # actually compute that reverse complement, though --
+                    # see below.)
                     line_contents = line.split()
                     curr_node_id = line_contents[1]
                     if curr_node_id.startswith("NODE_"):
@@ -855,15 +1105,21 @@ def collate_graph(args):
                     # line_contents[2].
                     curr_node_dnafwd = line_contents[2]
                     if curr_node_dnafwd != "*":
+                        # We never compute this sequence's reverse complement
+                        # (see below), but we still want to fail on
+                        # sequences that aren't DNA -- e.g. the length field
+                        # of a GFA2 S line, which we'd otherwise take for
+                        # this node's sequence.
+                        validate_dna(curr_node_dnafwd)
                         curr_node_bp = len(curr_node_dnafwd)
-                        curr_node_dnarev = reverse_complement(curr_node_dnafwd)
                         # The G/C content of a DNA sequence "m" will always equal
                         # the G/C content of the reverse complement of m, since
                         # a reverse complement just flips A <-> T and C <-> G --
                         # meaning that the total count of C + G occurrences does
                         # not change.
                         # Hence, we just need to calculate the G/C content here
-                        # once. This is not the case for LastGraph nodes, though.
+                        # once (and we never need the reverse complement itself).
+                        # This is not the case for LastGraph nodes, though.
                         curr_node_gc, gc_ct = gc_content(curr_node_dnafwd)
                         if dna_given:
                             # If DNA is not given for at least one contig seen thus
@@ -872,6 +1128,11 @@ def collate_graph(args):
                             # interface if DNA was given for all contigs, not just
                             # for some of them.)
                             total_gc_nt_count += 2 * gc_ct
+                        # We only store the + sequence; the sequence store
+                        # gives the reverse complement of this for the -
+                        # node
+                        if seq_writer is not None:
+                            seq_writer.add(curr_node_id, curr_node_dnafwd)
                     else:
                         # Allow user to not include DNA but indicate seq length via
                         # the LN property
@@ -889,33 +1150,33 @@ def collate_graph(args):
                             )
                             raise AttributeError(errmsg)
                     curr_node_dnafwd = None
-                    curr_node_dnarev = None
-                    nPos = graph_objects.Node(
+                    graph_core.add_node(
                         curr_node_id,
                         curr_node_bp,
                         False,
                         gc_content=curr_node_gc,
                     )
-                    nNeg = graph_objects.Node(
+                    graph_core.add_node(
                         "-" + curr_node_id,
                         curr_node_bp,
                         True,
                         gc_content=curr_node_gc,
                     )
-                    add_node_to_stdmode_mapping(nodeid2obj, nPos, nNeg)
                     if curr_node_id not in nodeid2outgoingnodeids:
                         nodeid2outgoingnodeids[curr_node_id] = []
                     if "-" + curr_node_id not in nodeid2outgoingnodeids:
                         nodeid2outgoingnodeids["-" + curr_node_id] = []
-                    # Create single Node object, for the SPQR-integrated graph
-                    sn = graph_objects.Node(
-                        curr_node_id,
-                        curr_node_bp,
-                        False,
-                        gc_content=curr_node_gc,
-                        is_single=True,
-                    )
-                    singlenodeid2obj[curr_node_id] = sn
+                    if args.computespqrdata:
+                        # Create single Node object, for the SPQR-integrated
+                        # graph
+                        sn = graph_objects.Node(
+                            curr_node_id,
+                            curr_node_bp,
+                            False,
+                            gc_content=curr_node_gc,
+                            is_single=True,
+                        )
+                        singlenodeid2obj[curr_node_id] = sn
                     # Update stats
                     total_node_count += 1
                     total_length += curr_node_bp
@@ -925,7 +1186,6 @@ def collate_graph(args):
                     curr_node_bp = None
                     curr_node_gc = None
                     curr_node_dnafwd = None
-                    curr_node_dnarev = None
                 # Parsing a link (edge) line from some id1 to id2
                 elif line.startswith("L"):
                     a = line.split()
@@ -949,21 +1209,22 @@ def collate_graph(args):
                     # edge implication stuff (checking if the edge implies itself,
                     # negating node ids, [NEW] adding the implied edge if desired
                     # to nodeid2outgoingnodeids) up to here.
-            for id1 in nodeid2obj:
+            for id1 in graph_core.ids:
                 for id2 in nodeid2outgoingnodeids[id1]:
                     nid2 = negate_node_id(id2)
                     nid1 = negate_node_id(id1)
-                    nodeid2obj[id1].add_outgoing_edge(nodeid2obj[id2])
-                    pid1 = id1 if id1[0] != "-" else nid1
-                    pid2 = id2 if id2[0] != "-" else nid2
-                    single_graph_edges.append((pid1, pid2))
-                    singlenodeid2obj[pid1].add_outgoing_edge(
-                        singlenodeid2obj[pid2]
-                    )
+                    graph_core.add_edge(id1, id2)
+                    if args.computespqrdata:
+                        pid1 = id1 if id1[0] != "-" else nid1
+                        pid2 = id2 if id2[0] != "-" else nid2
+                        single_graph_edges.append((pid1, pid2))
+                        singlenodeid2obj[pid1].add_outgoing_edge(
+                            singlenodeid2obj[pid2]
+                        )
                     # Only add implied edge if the edge does not imply itself
                     # (see issue #105 on GitHub for context)
                     if not (id1 == nid2 and id2 == nid1):
-                        nodeid2obj[nid2].add_outgoing_edge(nodeid2obj[nid1])
+                        graph_core.add_edge(nid2, nid1)
                         total_all_edge_count += 1
                     total_all_edge_count += 1
                     # Update stats
@@ -984,26 +1245,28 @@ def collate_graph(args):
                     if curr_node_id != "":
                         curr_node_gc, gc_ct = gc_content(curr_node_dna)
                         total_gc_nt_count += gc_ct
-                        n = graph_objects.Node(
+                        if seq_writer is not None:
+                            seq_writer.add(curr_node_id, curr_node_dna)
+                        graph_core.add_node(
                             curr_node_id,
                             curr_node_bp,
                             curr_node_is_rc,
                             depth=curr_node_depth,
                             gc_content=curr_node_gc,
                         )
-                        add_node_to_stdmode_mapping(nodeid2obj, n)
                         if not curr_node_is_rc:
                             total_node_count += 1
                             total_length += curr_node_bp
                             bp_length_list.append(curr_node_bp)
-                            sn = graph_objects.Node(
-                                curr_node_id,
-                                curr_node_bp,
-                                False,
-                                gc_content=curr_node_gc,
-                                is_single=True,
-                            )
-                            singlenodeid2obj[curr_node_id] = sn
+                            if args.computespqrdata:
+                                sn = graph_objects.Node(
+                                    curr_node_id,
+                                    curr_node_bp,
+                                    False,
+                                    gc_content=curr_node_gc,
+                                    is_single=True,
+                                )
+                                singlenodeid2obj[curr_node_id] = sn
 
                         curr_node_id = ""
                         curr_node_is_rc = False
@@ -1091,32 +1354,33 @@ def collate_graph(args):
             # code reuse. (TODO)
             curr_node_gc, gc_ct = gc_content(curr_node_dna)
             total_gc_nt_count += gc_ct
-            n = graph_objects.Node(
+            if seq_writer is not None:
+                seq_writer.add(curr_node_id, curr_node_dna)
+            graph_core.add_node(
                 curr_node_id,
                 curr_node_bp,
                 curr_node_is_rc,
                 depth=curr_node_depth,
                 gc_content=curr_node_gc,
             )
-            add_node_to_stdmode_mapping(nodeid2obj, n)
             if not curr_node_is_rc:
                 total_node_count += 1
                 total_length += curr_node_bp
                 bp_length_list.append(curr_node_bp)
-                sn = graph_objects.Node(
-                    curr_node_id,
-                    curr_node_bp,
-                    False,
-                    gc_content=curr_node_gc,
-                    is_single=True,
-                )
-                singlenodeid2obj[curr_node_id] = sn
-            # Iterate through nodeid2outgoingnodeids and actually create the edges
-            # between Node objects, since all Nodes have been initialized by this
-            # point.
-            for src_id in nodeid2obj:
+                if args.computespqrdata:
+                    sn = graph_objects.Node(
+                        curr_node_id,
+                        curr_node_bp,
+                        False,
+                        gc_content=curr_node_gc,
+                        is_single=True,
+                    )
+                    singlenodeid2obj[curr_node_id] = sn
+            # Iterate through nodeid2outgoingnodeids and actually add the edges
+            # to the graph, since all nodes have been added by this point.
+            for src_id in graph_core.ids:
                 for snk_id in nodeid2outgoingnodeids[src_id]:
-                    nodeid2obj[src_id].add_outgoing_edge(nodeid2obj[snk_id])
+                    graph_core.add_edge(src_id, snk_id)
                     # TODO figure out how to *actually* only update these once
                     # for each single-edge pair. Maybe a dict? Problem is that
                     # checking if (snk_id, src_id) is already in single_graph_edges
@@ -1124,15 +1388,16 @@ def collate_graph(args):
                     # sure of the best way to go about this at present.
                     # Also make sure this works with self-loops, e.g.:
                     # A -> A, B -> -B, -C -> C, -D -> -D
-                    a_src_id = abs(int(src_id))
-                    a_snk_id = abs(int(snk_id))
-                    if a_src_id <= a_snk_id:
-                        s_src_id = str(a_snk_id)
-                        s_snk_id = str(a_snk_id)
-                        single_graph_edges.append((s_src_id, s_snk_id))
-                        singlenodeid2obj[s_src_id].add_outgoing_edge(
-                            singlenodeid2obj[s_snk_id]
-                        )
+                    if args.computespqrdata:
+                        a_src_id = abs(int(src_id))
+                        a_snk_id = abs(int(snk_id))
+                        if a_src_id <= a_snk_id:
+                            s_src_id = str(a_snk_id)
+                            s_snk_id = str(a_snk_id)
+                            single_graph_edges.append((s_src_id, s_snk_id))
+                            singlenodeid2obj[s_src_id].add_outgoing_edge(
+                                singlenodeid2obj[s_snk_id]
+                            )
                     total_all_edge_count += 1
                     # Update stats
                     total_edge_count += 1
@@ -1156,10 +1421,58 @@ def collate_graph(args):
     # This means that graph_filetype, total_node_count, total_edge_count,
     # total_length, and bp_length_list are all finalized.
 
+    # Identify connected components in the normal ("double") graph, using the
+    # arrays of graph_core. NOTE that components include the nodes "inside"
+    # node groups -- and node groups never span multiple components -- so we
+    # can do this before identifying node groups.
+    graph_core.finish()
+    operation_msg(config.COMPONENT_MSG)
+    core_ccs = find_core_components(graph_core)
+    conclude_msg()
+
+    # We only create Node objects for the components that we might lay out:
+    # the ones that aren't too large (see -maxn and -maxe). The -ub, -up,
+    # -sp, and -spqr options need all of the graph's nodes, though, so if any
+    # of these options were given we create Node objects for every component.
+    if (
+        ububbles_fullfn is not None
+        or upatterns_fullfn is not None
+        or output_spatts
+        or args.computespqrdata
+    ):
+        viewed_ccs = numpy.ones(len(core_ccs), dtype=bool)
+    else:
+        viewed_ccs = (core_ccs.node_counts <= max_node_ct) & (
+            core_ccs.edge_counts <= max_edge_ct
+        )
+
+    # Scale contigs' log sizes relatively.
+    # Due to the initial logarithmic scaling, we don't bother using outlier
+    # detection (e.g. using Tukey fences, as is done with edge thicknesses).
+    # (Components being copied from the earlier .db file, if -u was passed,
+    # are scaled here too -- but this doesn't matter, since we don't use their
+    # nodes' or edges' sizes.)
+    operation_msg(config.CONTIG_SCALING_MSG)
+    scale_core_contigs(graph_core, core_ccs, viewed_ccs)
+    conclude_msg()
+
+    # Scale "non-outlier" edges relatively, using Tukey fences to identify
+    # outlier edge weights.
+    if edge_weights_available:
+        operation_msg(config.EDGE_SCALING_MSG)
+        scale_core_edges(graph_core, core_ccs, viewed_ccs)
+        conclude_msg()
+
+    nodeid2obj = graph_core.make_views(viewed_ccs[core_ccs.labels])
+    if need_label_mapping:
+        for n in nodeid2obj.values():
+            nodelabel2obj[n.label] = n
+
     # Try to collapse special "groups" of Nodes (Bubbles, Ropes, etc.)
-    # As we check nodes, we add either the individual node (if it can't be
-    # collapsed) or its collapsed "group" (if it could be collapsed) to a list
-    # of nodes to draw, which will later be processed and output to the .gv file.
+    # As we find node groups, we record them in clusterid2obj; each group's
+    # nodes refer to it via their .group attribute, which is how the groups
+    # are later assigned to components and output to the .gv file.
+    # (We only look for node groups among the Nodes we created above.)
 
     # We apply "precedence" here: identify all user-specified patterns, bubbles,
     # then frayed ropes, then cycles, then chains. A minor TODO is making that
@@ -1167,7 +1480,6 @@ def collate_graph(args):
     # of redundant stuff, maybe?)
 
     nodes_to_try_collapsing = list(nodeid2obj.values())
-    nodes_to_draw = []
 
     # Identify user-supplied bubbles in the graph.
     if ububbles_fullfn is not None:
@@ -1254,7 +1566,6 @@ def collate_graph(args):
                     # changing this in the future if people ask for it).
                     continue
                 new_bubble = graph_objects.Bubble(*curr_bubble_nodeobjs)
-                nodes_to_draw.append(new_bubble)
                 clusterid2obj[new_bubble.id_string] = new_bubble
                 bubble_line_ct += 1
         conclude_msg()
@@ -1325,7 +1636,6 @@ def collate_graph(args):
                     new_pattern = graph_objects.MiscPattern(
                         pattern_items[0], *curr_pattern_nodeobjs
                     )
-                nodes_to_draw.append(new_pattern)
                 clusterid2obj[new_pattern.id_string] = new_pattern
                 # TODO this will break when we use "continue." Add a test case
                 # to demonstrate the broken-ness of this, then fix this -- both
@@ -1343,21 +1653,22 @@ def collate_graph(args):
     # This ignores some types of bubbles that exhibit a more complex structure,
     # hence the option for user-defined bubbles to be passed in (and/or for
     # MetaCarvel's bubbles.txt output to be used).
-    for (
-        n
-    ) in nodes_to_try_collapsing:  # Test n as the "starting" node for a bubble
-        if n.used_in_collapsing or len(n.outgoing_nodes) <= 1:
-            # If n doesn't lead to multiple nodes, it couldn't be a bubble start
-            continue
-        bubble_validity, member_nodes = graph_objects.Bubble.is_valid_bubble(n)
-        if bubble_validity:
-            # Found a bubble!
-            new_bubble = graph_objects.Bubble(*member_nodes)
-            nodes_to_draw.append(new_bubble)
-            clusterid2obj[new_bubble.id_string] = new_bubble
+    # The PatternDetector compresses the graph's linear paths once, up front,
+    # and then uses these to find all of the types of patterns below.
+    pattern_detector = graph_objects.PatternDetector(nodes_to_try_collapsing)
+    for new_bubble in pattern_detector.find_bubbles():
+        clusterid2obj[new_bubble.id_string] = new_bubble
 
     conclude_msg()
-    if args.computespqrdata:
+    if args.computespqrdata and args.spqrengine == "python":
+        # Compute the SPQR trees in-process, without writing any auxiliary files
+        operation_msg(config.SPQR_MSG)
+        bicomponentid2obj = spqr_utils.compute_bicomponents(
+            singlenodeid2obj, jobs
+        )
+        total_bicomponent_count += len(bicomponentid2obj)
+        conclude_msg()
+    elif args.computespqrdata:
         # Run the SPQR script, use its output to create SPQR trees
         operation_msg(config.SPQR_MSG)
 
@@ -1539,139 +1850,42 @@ def collate_graph(args):
                     bicomponentid2fn[match.group(1)] = c_fullfn
 
         # Get info from the SPQR tree auxiliary files (component_*.info and
-        # spqr*.gml)
-        bicomponentid2obj = {}
-        metanode_id_regex = re.compile(r"^\d+$")
-        metanode_type_regex = re.compile(r"^[SPR]$")
-        edge_line_regex = re.compile(r"^v|r")
-        for cfn_id in bicomponentid2fn:
-            with open(bicomponentid2fn[cfn_id], "r") as component_info_file:
-                metanodeid2obj = {}
-                curr_id = ""
-                curr_type = ""
-                curr_nodes = []
-                curr_edges = []
-                for line in component_info_file:
-                    if edge_line_regex.match(line):
-                        curr_edges.append(line.split())
-                    elif metanode_id_regex.match(line):
-                        if curr_id != "":
-                            # save previous metanode info
-                            new_metanode = graph_objects.SPQRMetaNode(
-                                cfn_id,
-                                curr_id,
-                                curr_type,
-                                curr_nodes,
-                                curr_edges,
-                            )
-                            metanodeid2obj[curr_id] = new_metanode
-                        curr_id = line.strip()
-                        curr_type = ""
-                        curr_nodes = []
-                        curr_edges = []
-                    elif metanode_type_regex.match(line):
-                        curr_type = line.strip()
-                    else:
-                        # This line must describe a node within the metanode
-                        curr_nodes.append(singlenodeid2obj[line.split()[1]])
-                # Save the last metanode in the file (won't be "covered" in loop
-                # above)
-                new_metanode = graph_objects.SPQRMetaNode(
-                    cfn_id, curr_id, curr_type, curr_nodes, curr_edges
+        # spqr*.gml). The files for different bicomponents are parsed in
+        # parallel if -j is passed.
+        cfn_ids = list(bicomponentid2fn.keys())
+        parsed_spqr_trees = spqr_utils.map_over_bicomponents(
+            spqr_utils.parse_spqr_script_output,
+            [
+                (
+                    bicomponentid2fn[cfn_id],
+                    os.path.join(dir_fn, "spqr%s.gml" % (cfn_id)),
                 )
-                metanodeid2obj[curr_id] = new_metanode
-            # At this point, we have all nodes in the entire SPQR tree for a
-            # given biconnected component saved in metanodeid2obj.
-            # For now, let's just parse the structure of this tree and lay it out
-            # using GraphViz -- will implement in the web visualization tool soon.
-            tree_structure_fn = os.path.join(dir_fn, "spqr%s.gml" % (cfn_id))
-            # List of 2-tuples of SPQRMetaNode objects.
-            with open(tree_structure_fn, "r") as spqr_structure_file:
-                parsing_edge = False
-                source_metanode = None
-                target_metanode = None
-                for line in spqr_structure_file:
-                    if line.strip().startswith("edge ["):
-                        parsing_edge = True
-                    elif parsing_edge:
-                        if line.strip().startswith("]"):
-                            parsing_edge = False
-                            # save edge data
-                            source_metanode.add_outgoing_edge(target_metanode)
-                            source_metanode = None
-                            target_metanode = None
-                        else:
-                            id_line_parts = line.strip().split()
-                            if id_line_parts[0] == "source":
-                                source_metanode = metanodeid2obj[
-                                    id_line_parts[1]
-                                ]
-                            elif id_line_parts[0] == "target":
-                                target_metanode = metanodeid2obj[
-                                    id_line_parts[1]
-                                ]
-            # Determine root of the bicomponent and store it as part of the
-            # bicomponent
-            curr_metanode = list(metanodeid2obj.values())[0]
-            while len(curr_metanode.incoming_nodes) > 0:
-                # A metanode in the tree can have at most 1 parent (because that is
-                # how trees work), so it's ok to just move up in the tree like so
-                # (because the .incoming_node lists of SPQRMetaNode objects will
-                # always have length 1)
-                curr_metanode = curr_metanode.incoming_nodes[0]
-            # At this point, we've obtained the full contents of the tree: both the
-            # skeletons of its metanodes, and the edges between metanodes. (This
-            # data is stored as attributes of the SPQRMetaNode objects in
-            # question.)
-            metanode_list = list(metanodeid2obj.values())
-            bicomponentid2obj[cfn_id] = graph_objects.Bicomponent(
-                cfn_id, metanode_list, curr_metanode
+                for cfn_id in cfn_ids
+            ],
+            [os.path.getsize(bicomponentid2fn[cfn_id]) for cfn_id in cfn_ids],
+            jobs,
+        )
+        bicomponentid2obj = {}
+        for cfn_id, (metanodes, tree_edges) in zip(cfn_ids, parsed_spqr_trees):
+            bicomponentid2obj[cfn_id] = spqr_utils.build_bicomponent(
+                cfn_id, metanodes, tree_edges, singlenodeid2obj
             )
-            total_bicomponent_count += 1
+        total_bicomponent_count += len(bicomponentid2obj)
         conclude_msg()
 
     operation_msg(config.FRAYEDROPE_SEARCH_MSG)
-    for (
-        n
-    ) in nodes_to_try_collapsing:  # Test n as the "starting" node for a rope
-        if n.used_in_collapsing or len(n.outgoing_nodes) != 1:
-            # If n doesn't lead to a single node, it couldn't be a rope start
-            continue
-        rope_validity, member_nodes = graph_objects.Rope.is_valid_rope(n)
-        if rope_validity:
-            # Found a frayed rope!
-            new_rope = graph_objects.Rope(*member_nodes)
-            nodes_to_draw.append(new_rope)
-            clusterid2obj[new_rope.id_string] = new_rope
+    for new_rope in pattern_detector.find_ropes():
+        clusterid2obj[new_rope.id_string] = new_rope
 
     conclude_msg()
     operation_msg(config.CYCLE_SEARCH_MSG)
-    for (
-        n
-    ) in nodes_to_try_collapsing:  # Test n as the "starting" node for a cycle
-        if n.used_in_collapsing:
-            continue
-        cycle_validity, member_nodes = graph_objects.Cycle.is_valid_cycle(n)
-        if cycle_validity:
-            # Found a cycle!
-            new_cycle = graph_objects.Cycle(*member_nodes)
-            nodes_to_draw.append(new_cycle)
-            clusterid2obj[new_cycle.id_string] = new_cycle
+    for new_cycle in pattern_detector.find_cycles():
+        clusterid2obj[new_cycle.id_string] = new_cycle
 
     conclude_msg()
     operation_msg(config.CHAIN_SEARCH_MSG)
-    for (
-        n
-    ) in nodes_to_try_collapsing:  # Test n as the "starting" node for a chain
-        if n.used_in_collapsing or len(n.outgoing_nodes) != 1:
-            # If n doesn't lead to a single node, it couldn't be a chain start
-            continue
-        chain_validity, member_nodes = graph_objects.Chain.is_valid_chain(n)
-        if chain_validity:
-            # Found a chain!
-            new_chain = graph_objects.Chain(*member_nodes)
-            nodes_to_draw.append(new_chain)
-            clusterid2obj[new_chain.id_string] = new_chain
+    for new_chain in pattern_detector.find_chains():
+        clusterid2obj[new_chain.id_string] = new_chain
 
     conclude_msg()
 
@@ -1702,89 +1916,70 @@ def collate_graph(args):
                 overwrite,
             )
 
-    # Add individual (not used in collapsing) nodes to the nodes_to_draw list
-    # We could build this list up at the start and then gradually remove nodes as
-    # we use nodes in collapsing, but remove() is an O(n) operation so that'd make
-    # the above runtime O(4n^2) or something, so I figure just doing this here is
-    # generally faster.
-    for n in nodes_to_try_collapsing:
-        if not n.used_in_collapsing:
-            nodes_to_draw.append(n)
-
-    # Identify connected components in the "single" graph
-    # We'll need to actually run DFS if distinct_single_graph is True.
-    # However, if it's False, then we can just run DFS on the "double" graph to
-    # identify its connected components -- and then use those connected components'
-    # nodes' IDs to construct the single graph's connected components.
-    operation_msg(config.COMPONENT_MSG)
+    # Identify connected components in the "single" graph, if
+    # distinct_single_graph is True. If it's False, then we can just use the
+    # double graph's connected components' nodes' IDs to construct the single
+    # graph's connected components below.
+    # NOTE that components include the nodes "inside" node groups; each
+    # component's groups are then identified from these nodes, preserving the
+    # groups' existence while not treating them as nodes.
     if args.computespqrdata:
         single_connected_components = []
         if distinct_single_graph:
-            for n in singlenodeid2obj.values():
-                if not n.seen_in_ccomponent:
-                    # We've identified a node within an unseen connected component.
-                    # Run DFS to identify all nodes in its connected component.
-                    # (Also identify all bicomponents in the connected component)
-                    node_list = dfs(n)
-                    bicomponent_set = set()
-                    for m in node_list:
-                        m.seen_in_ccomponent = True
-                        bicomponent_set = bicomponent_set.union(
-                            m.parent_bicomponents
-                        )
-                    single_connected_components.append(
-                        graph_objects.Component(node_list, bicomponent_set)
+            operation_msg(config.COMPONENT_MSG)
+            single_ccs = find_components(list(singlenodeid2obj.values()))[0]
+            for i, node_list in enumerate(single_ccs.node_lists):
+                # Also identify all bicomponents in the connected component
+                bicomponent_set = set()
+                for m in node_list:
+                    bicomponent_set.update(m.parent_bicomponents)
+                single_connected_components.append(
+                    graph_objects.Component(
+                        node_list,
+                        bicomponent_set,
+                        edge_ct=int(single_ccs.edge_counts[i]),
+                        total_length=int(single_ccs.total_lengths[i]),
                     )
-                    total_single_component_count += 1
+                )
+                total_single_component_count += 1
+            conclude_msg()
 
-    # Identify connected components in the normal (non-"single") graph
-    # NOTE that nodes_to_draw only contains node groups and nodes that aren't in
-    # node groups. This allows us to run DFS on the nodes "inside" the node
-    # groups, preserving the groups' existence while not counting them in DFS.
+    # We go through the components in the order of their first nodes (so that
+    # components of the same size are ranked consistently). This only depends
+    # on the graph itself -- not on which components we created Node objects
+    # for, or on the node groups in them.
     connected_components = []
-    for n in nodes_to_draw:
-        if not n.seen_in_ccomponent and not n.is_subsumed:
-            # If n is actually a group of nodes: since we're representing
-            # groups here as clusters, without any adjacencies themselves, we
-            # have to run DFS on the nodes within the groups of nodes to
-            # discover them.
-            node_list = []
-            node_group_list = []
-            if issubclass(type(n), graph_objects.NodeGroup):
-                # n is a node group
-                if n.nodes[0].seen_in_ccomponent:
-                    continue
-                node_list = dfs(n.nodes[0])
-            else:
-                # It's just a normal Node, but it could certainly be connected
-                # to a group of nodes (not that it really matters)
-                node_list = dfs(n)
-
-            # Now that we've ran DFS to discover all the nodes in this
-            # connected component, we go through each node to identify their
-            # groups (if applicable) and add those to node_group_list if the
-            # group is not already on that list. (TODO, there's probably a
-            # more efficient way to do this using sets/etc.)
-            for m in node_list:
-                m.seen_in_ccomponent = True
-                if m.used_in_collapsing and m.group not in node_group_list:
-                    node_group_list.append(m.group)
-            connected_components.append(
-                graph_objects.Component(node_list, node_group_list)
-            )
-            total_component_count += 1
-    connected_components.sort(reverse=True, key=lambda c: len(c.node_list))
-
-    # Loop through connected_components. For each cc:
-    #   Set edge_weights = []
-    #   For all nodes in the cc:
-    #     For all outgoing edges of the node:
-    #       Append the edge's multiplicity to edge_weights
-    #   Get min_mult = min(edge_weights), max_mult = max(edge_weights)
-    #   For all nodes in the cc, again:
-    #     For all outgoing edges of the node:
-    #       Scale the edge's thickness relative to min/max mult (see xdot2cy.js)
-    # ... later we'll do IQR stuff (using numpy.percentile(), maybe?)
+    for i in range(len(core_ccs)):
+        if viewed_ccs[i]:
+            node_list = [
+                nodeid2obj[graph_core.ids[v]]
+                for v in core_ccs.node_indices(i).tolist()
+            ]
+        else:
+            node_list = None
+        # Identify the groups of the nodes in this connected component
+        # (without duplicates, in the order we first see them)
+        node_group_list = []
+        seen_groups = set()
+        for m in node_list or ():
+            if m.used_in_collapsing and m.group not in seen_groups:
+                seen_groups.add(m.group)
+                node_group_list.append(m.group)
+        component = graph_objects.Component(
+            node_list,
+            node_group_list,
+            edge_ct=int(core_ccs.edge_counts[i]),
+            total_length=int(core_ccs.total_lengths[i]),
+            node_ct=int(core_ccs.node_counts[i]),
+            core_index=i,
+        )
+        if previous_collation is not None and node_list is not None:
+            # If this component (including its patterns) hasn't changed
+            # since the earlier .db file, we'll copy it forward from there
+            component.previous_rank = previous_collation.match(node_list)
+        connected_components.append(component)
+        total_component_count += 1
+    connected_components.sort(reverse=True, key=lambda c: c.node_ct)
 
     if args.computespqrdata:
         if not distinct_single_graph:
@@ -1809,135 +2004,10 @@ def collate_graph(args):
         single_connected_components.sort(
             reverse=True, key=lambda c: len(c.node_list)
         )
-
-    conclude_msg()
-    # Scale contigs' log sizes relatively.
-    # Due to the initial logarithmic scaling, we don't bother using outlier
-    # detection (e.g. using Tukey fences, as is done with edge thicknesses).
-    operation_msg(config.CONTIG_SCALING_MSG)
-    if args.computespqrdata:
-        component_collections = (
-            connected_components,
-            single_connected_components,
-        )
-    else:
-        component_collections = (connected_components,)
-    for c_collection in component_collections:
-        for c in c_collection:
-            # bp_length_list does exist, but it's across all components. Probably
-            # easiest to just go through each component here, then -- shouldn't
-            # take a significant amount of time.
-            # TODO hold off on computing logs until we get past checking if
-            # len(c.node_list) >= 2? Not really a huge optimization, though.
-            contig_lengths = []
-            for n in c.node_list:
-                contig_lengths.append(n.logbp)
-            # Perform relative scaling for the log lengths of contigs in the
-            # component to determine 1) the area of the contig and 2) the
-            # long-side proportion for the contig.
-            # (This only happens if not all contigs in the component are of the
-            # same length; this precondition also excludes components containing
-            # just one contig.)
-            # If this condition isn't met, then the contig "relative length" for
-            # area scaling will remain at the default value of 0.5, and its
-            # long-side proportion will remain at the default value of
-            # config.MID_LONGSIDE_PROPORTION.
-            # (We can avoid having to compute the min_bp and max_bp figures if the
-            # component only contains one contig by just checking up front if the
-            # component has >= 2 contigs. Granted, len(), min(), and max() are all
-            # super quick for 1-length lists, so performance tweaks here are
-            # probably negligible except for extremely large assembly graphs.)
-            if len(c.node_list) >= 2:
-                min_bp = min(contig_lengths)
-                max_bp = max(contig_lengths)
-                if min_bp == max_bp:
-                    # All the contigs have the same length: we don't need to bother
-                    # with scaling them relatively, and attempting to do so would
-                    # just result in a division-by-zero error
-                    continue
-                bp_range = float(max_bp - min_bp)
-                q25, q75 = numpy.percentile(contig_lengths, [25, 75])
-                # NOTE: I don't know why I had the following line of code here,
-                # but I'm keeping it in as a comment just in case it ends up
-                # being important later.
-                # scaling_node_groups = False
-                for n in c.node_list:
-                    n.relative_length = (n.logbp - min_bp) / bp_range
-                    if n.logbp < q25:
-                        n.longside_proportion = config.LOW_LONGSIDE_PROPORTION
-                    elif n.logbp < q75:
-                        n.longside_proportion = config.MID_LONGSIDE_PROPORTION
-                    else:
-                        n.longside_proportion = config.HIGH_LONGSIDE_PROPORTION
-        # TODO: After going through all components in the first component
-        # collection, the only components left to perform scaling for are
-        # single components (used for the SPQR modes). Since "node groups"
-        # (effectively, Bicomponents) in these components don't need to have
-        # collapsed dimensions, we can set a flag variable to let us know to
-        # not bother doing that for those node groups.
-        # scaling_single_ccs = True
-    conclude_msg()
-
-    # Scale "non-outlier" edges relatively. We use "Tukey fences" to identify
-    # outlier edge weights (see issue #184 on GitHub for context on this).
-    # Note that the "fences" we use are the "inner" fences that Tukey describes in
-    # Exploratory Data Analysis (1977).
-    if edge_weights_available:
-        operation_msg(config.EDGE_SCALING_MSG)
-        for c in connected_components:
-            edge_weights = []
-            for n in c.node_list:
-                for e in n.outgoing_edge_objects.values():
-                    edge_weights.append(e.multiplicity)
-            # At this point, we have a list of every edge weight contained within
-            # this connected component.
-            non_outlier_edges = []
-            non_outlier_edge_weights = []
-            # (If there are < 4 edges in this connected component, don't bother
-            # with flagging outliers -- at that point, computing quartiles becomes
-            # a bit silly)
-            if len(edge_weights) >= 4:
-                # Now, calculate lower and upper Tukey fences.
-                # First, calculate lower and upper quartiles (aka the
-                # 25th and 75th percentiles)
-                lq, uq = numpy.percentile(edge_weights, [25, 75])
-                # Then, determine 1.5 * the interquartile range
-                # (we can use other values than 1.5 if desired -- not set in stone)
-                d = 1.5 * (uq - lq)
-                # Now we can calculate the actual Tukey fences:
-                lf = lq - d
-                uf = uq + d
-                # Now, iterate through every edge again and flag outliers.
-                # Non-outlier edges will be added to a list of edges that we will
-                # scale relatively
-                for n in c.node_list:
-                    for e in n.outgoing_edge_objects.values():
-                        if e.multiplicity > uf:
-                            e.is_outlier = 1
-                            e.thickness = 1
-                        elif e.multiplicity < lf:
-                            e.is_outlier = -1
-                            e.thickness = 0
-                        else:
-                            non_outlier_edges.append(e)
-                            non_outlier_edge_weights.append(e.multiplicity)
-            else:
-                for n in c.node_list:
-                    for e in n.outgoing_edge_objects.values():
-                        non_outlier_edges.append(e)
-                        non_outlier_edge_weights.append(e.multiplicity)
-            # Perform relative scaling for non_outlier_edges
-            # (Assuming, of course, that we have at least 2 non_outlier_edges)
-            if len(non_outlier_edges) >= 2:
-                min_ew = min(non_outlier_edge_weights)
-                max_ew = max(non_outlier_edge_weights)
-                if min_ew == max_ew:
-                    # All the outliers have the same value: we don't need to bother
-                    # with scaling the non-outliers
-                    continue
-                ew_range = float(max_ew - min_ew)
-                for e in non_outlier_edges:
-                    e.thickness = (e.multiplicity - min_ew) / ew_range
+        # The contigs in the double graph were scaled above, but we still
+        # need to scale the contigs in the single graph
+        operation_msg(config.CONTIG_SCALING_MSG)
+        scale_contigs(single_connected_components)
         conclude_msg()
 
     operation_msg(config.DB_INIT_MSG + "%s..." % (db_fn))
@@ -1953,123 +2023,35 @@ def collate_graph(args):
     # -Be repurposed as a database containing this data in addition to
     #  its original data (if the file is a SQLite database, but stores other
     #  data -- expected behavior for this case)
-    # -Cause the first cursor.execute() call to fail since the database already
+    # -Cause the creation of the nodes table to fail since the database already
     #  has a nodes table (if the file is a SQLite database this program has
     #  generated -- expected behavior for this case)
-    # -Cause the first cursor.execute() call to fail since the file is not a
+    # -Cause the creation of the nodes table to fail since the file is not a
     #  SQLite database (expected behavior for this case)
     # Essentially, we're okay here -- SQLite will handle the race condition
     # properly, should one arise. (I doubt that race conditions will happen
     # here, but I suppose you can't be too safe.)
-    connection = sqlite3.connect(db_fullfn)
-    cursor = connection.cursor()
-    # Define statements used for inserting a value into these tables
-    # The number of question marks has to match the number of table columns
-    NODE_INSERTION_STMT = (
-        "INSERT INTO nodes VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    EDGE_INSERTION_STMT = "INSERT INTO edges VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
-    CLUSTER_INSERTION_STMT = (
-        "INSERT INTO clusters VALUES (?,?,?,?,?,?,?,?,?,?)"
-    )
-    COMPONENT_INSERTION_STMT = "INSERT INTO components VALUES (?,?,?,?,?,?,?)"
-    ASSEMBLY_INSERTION_STMT = (
-        "INSERT INTO assembly VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    SINGLENODE_INSERTION_STMT = (
-        "INSERT INTO singlenodes VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    SINGLEEDGE_INSERTION_STMT = "INSERT INTO singleedges VALUES (?,?,?,?,?)"
-    BICOMPONENT_INSERTION_STMT = (
-        "INSERT INTO bicomponents VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    METANODE_INSERTION_STMT = (
-        "INSERT INTO metanodes VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    METANODEEDGE_INSERTION_STMT = (
-        "INSERT INTO metanodeedges VALUES (?,?,?,?,?,?)"
-    )
-    SINGLECOMPONENT_INSERTION_STMT = (
-        "INSERT INTO singlecomponents VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
-    )
-    cursor.execute(
-        """CREATE TABLE nodes
-            (id text, label text, length integer, gc_content real, depth real,
-            is_repeat integer, component_rank integer, x real, y real, w real,
-            h real, shape text, parent_cluster_id text)"""
-    )
-    cursor.execute(
-        """CREATE TABLE edges
-            (source_id text, target_id text, multiplicity integer, thickness real,
-            is_outlier integer, orientation text, mean real, stdev real,
-            component_rank integer, control_point_string text,
-            control_point_count integer, parent_cluster_id text)"""
-    )
-    cursor.execute(
-        """CREATE TABLE clusters (cluster_id text, length integer,
-            component_rank integer, left real, bottom real, right real, top real,
-            w real, h real, cluster_type text)"""
-    )
-    cursor.execute(
-        """CREATE TABLE components
-            (size_rank integer, node_count integer, edge_count integer,
-            total_length integer, boundingbox_x real, boundingbox_y real,
-            too_large integer)"""
-    )
-    cursor.execute(
-        """CREATE TABLE assembly
-            (filename text, filetype text, node_count integer,
-            edge_count integer, all_edge_count integer, component_count integer,
-            bicomponent_count integer, single_component_count integer,
-            total_length integer, n50 integer, gc_content real,
-            dna_given integer, repeats_given integer, spqr_given integer,
-            smallest_viewable_component_rank integer)"""
-    )
-    if args.computespqrdata:
-        # SPQR view tables
-        cursor.execute(
-            """CREATE TABLE singlenodes
-                (id text, label text, length integer, gc_content real, depth real,
-                is_repeat integer, scc_rank integer, x real, y real, i_x real,
-                i_y real, w real, h real, parent_metanode_id text,
-                parent_bicomponent_id text)"""
-        )
-        cursor.execute(
-            """CREATE TABLE singleedges
-                (source_id text, target_id text, scc_rank integer,
-                parent_metanode_id text, is_virtual integer)"""
-        )
-        cursor.execute(
-            """CREATE TABLE bicomponents
-                (id_num integer, root_metanode_id string, scc_rank integer,
-                node_count integer, left real, bottom real, right real, top real,
-                i_left real, i_bottom real, i_right real, i_top real)"""
-        )
-        cursor.execute(
-            """CREATE TABLE metanodes
-                (metanode_id text, scc_rank integer,
-                parent_bicomponent_id_num integer,
-                descendant_metanode_count integer, node_count integer,
-                total_length integer, left real, bottom real, right real,
-                top real, i_left real, i_bottom real, i_right real, i_top real)"""
+    if shard_size is None:
+        db_writer = DBWriter(
+            db_fullfn,
+            spqr=args.computespqrdata,
+            search=args.searchtoolarge,
+            sequences=args.sequencestore,
+            index=not args.noindex,
         )
-        cursor.execute(
-            """CREATE TABLE metanodeedges
-                (source_metanode_id text, target_metanode_id text,
-                scc_rank integer, control_point_string text,
-                control_point_count integer, parent_bicomponent_id_num integer)"""
+    else:
+        db_writer = ShardedDBWriter(
+            db_fullfn,
+            shard_size,
+            overwrite,
+            search=args.searchtoolarge,
+            sequences=args.sequencestore,
+            index=not args.noindex,
         )
-        cursor.execute(
-            """CREATE TABLE singlecomponents
-                (size_rank integer, ex_uncompressed_node_count integer,
-                ex_uncompressed_edge_count integer,
-                im_uncompressed_node_count integer,
-                im_uncompressed_edge_count integer, compressed_node_count integer,
-                compressed_edge_count integer, bicomponent_count integer,
-                boundingbox_x real, boundingbox_y real, i_boundingbox_x real,
-                i_boundingbox_y real)"""
+    if seq_writer is not None:
+        db_writer.add_row(
+            "sequencestore", (seq_fn, seq_writer.sequence_ct)
         )
-    connection.commit()
 
     conclude_msg()
 
@@ -2167,13 +2149,12 @@ def collate_graph(args):
                     mode[:2],
                     single_component_size_rank,
                 )
-                gv_input = ""
-                gv_input += "graph single_ccomp {\n"
-                if config.GRAPH_STYLE != "":
-                    gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-                gv_input += '\toverlap="false";\n'
-                if config.GLOBALNODE_STYLE != "":
-                    gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
+                gv_lines = start_dot_lines(
+                    "single_ccomp",
+                    graph_type="graph",
+                    graph_attrs=['overlap="false"'],
+                    edge_style=False,
+                )
                 # In the layout of this single connected component, include:
                 # -rectangle nodes representing each bicomponent (will be
                 #  backfilled)
@@ -2192,9 +2173,9 @@ def collate_graph(args):
                 sc_bicomponent_count = len(scc.node_group_list)
                 for bicomp in scc.node_group_list:
                     if mode == "implicit":
-                        gv_input += bicomp.implicit_backfill_node_info()
+                        gv_lines.append(bicomp.implicit_backfill_node_info())
                     else:
-                        gv_input += bicomp.node_info()
+                        gv_lines.append(bicomp.node_info())
                     sc_compressed_node_count += len(bicomp.root_metanode.nodes)
                     sc_compressed_edge_count += len(
                         bicomp.root_metanode.internal_edges
@@ -2203,7 +2184,7 @@ def collate_graph(args):
                     # Get node info for nodes not present in any bicomponents
                     # Also get edge info for edges "external" to bicomponents
                     if len(m.parent_bicomponents) == 0:
-                        gv_input += m.node_info()
+                        gv_lines.append(m.node_info())
                         sc_compressed_node_count += 1
                         # We know m is not in a bicomponent. Get its "outgoing"
                         # edge info.
@@ -2211,9 +2192,9 @@ def collate_graph(args):
                             if len(n.parent_bicomponents) == 0:
                                 # This edge is between two nodes, neither of which
                                 # is in a bicomponent. We can lay this edge out.
-                                gv_input += "\t%s -- %s;\n" % (
-                                    m.id_string,
-                                    n.id_string,
+                                gv_lines.append(
+                                    "\t%s -- %s;\n"
+                                    % (m.id_string, n.id_string)
                                 )
                                 sc_compressed_edge_count += 1
                             else:
@@ -2221,9 +2202,9 @@ def collate_graph(args):
                                 # edges between m and all of the parent
                                 # bicomponents of n.
                                 for b in n.parent_bicomponents:
-                                    gv_input += "\t%s -- cluster_%s;\n" % (
-                                        m.id_string,
-                                        b.id_string,
+                                    gv_lines.append(
+                                        "\t%s -- cluster_%s;\n"
+                                        % (m.id_string, b.id_string)
                                     )
                                     sc_compressed_edge_count += 1
                     else:
@@ -2237,9 +2218,9 @@ def collate_graph(args):
                                 # edges between n and all of the parent
                                 # bicomponents of m.
                                 for b in m.parent_bicomponents:
-                                    gv_input += "\tcluster_%s -- %s;\n" % (
-                                        b.id_string,
-                                        n.id_string,
+                                    gv_lines.append(
+                                        "\tcluster_%s -- %s;\n"
+                                        % (b.id_string, n.id_string)
                                     )
                                     sc_compressed_edge_count += 1
                             else:
@@ -2270,12 +2251,12 @@ def collate_graph(args):
                                     # and n.
                                     for b1 in m.parent_bicomponents:
                                         for b2 in n.parent_bicomponents:
-                                            gv_input += (
+                                            gv_lines.append(
                                                 "\tcluster_%s -- cluster_%s;\n"
                                                 % (b1.id_string, b2.id_string)
                                             )
                                             sc_compressed_edge_count += 1
-                gv_input += "}"
+                gv_input = finish_dot_lines(gv_lines)
                 if (
                     len(scc.node_group_list) == 0
                     and sc_compressed_edge_count == 0
@@ -2299,14 +2280,14 @@ def collate_graph(args):
                             single_component_size_rank
                         )
                         curr_node.xdot_shape = curr_node.get_shape()
-                        cursor.execute(
-                            SINGLENODE_INSERTION_STMT, curr_node.s_db_values()
+                        db_writer.add_row(
+                            "singlenodes", curr_node.s_db_values()
                         )
                         # we don't bother getting values from
                         # implicit_spqr_bounding_boxes/_node_counts/_edge_counts
                         # because we already know those values
-                        cursor.execute(
-                            SINGLECOMPONENT_INSERTION_STMT,
+                        db_writer.add_row(
+                            "singlecomponents",
                             (
                                 single_component_size_rank,
                                 1,
@@ -2404,9 +2385,8 @@ def collate_graph(args):
                             curr_node.set_component_rank(
                                 single_component_size_rank
                             )
-                            cursor.execute(
-                                SINGLENODE_INSERTION_STMT,
-                                curr_node.s_db_values(),
+                            db_writer.add_row(
+                                "singlenodes", curr_node.s_db_values()
                             )
                     except KeyError:
                         # This error would arise from us trying to find
@@ -2503,9 +2483,7 @@ def collate_graph(args):
                             mn.xdot_itop += curr_cluster.xdot_ibottom
                             mn.xdot_ibottom += curr_cluster.xdot_ibottom
                             mn.set_component_rank(single_component_size_rank)
-                            cursor.execute(
-                                METANODE_INSERTION_STMT, mn.db_values()
-                            )
+                            db_writer.add_row("metanodes", mn.db_values())
                             # Add nodes in this metanode (...in this bicomponent)
                             # to the .db file. I'm a bit miffed that "double
                             # backfilling" is the fanciest name I can come up with
@@ -2522,9 +2500,8 @@ def collate_graph(args):
                                 sn.set_component_rank(
                                     single_component_size_rank
                                 )
-                                cursor.execute(
-                                    SINGLENODE_INSERTION_STMT,
-                                    sn.s_db_values(mn),
+                                db_writer.add_row(
+                                    "singlenodes", sn.s_db_values(mn)
                                 )
                             # Add edges between nodes within this metanode's
                             # skeleton to the .db file. We just treat these edges
@@ -2539,8 +2516,8 @@ def collate_graph(args):
                                 se.component_size_rank = (
                                     single_component_size_rank
                                 )
-                                cursor.execute(
-                                    SINGLEEDGE_INSERTION_STMT, se.s_db_values()
+                                db_writer.add_row(
+                                    "singleedges", se.s_db_values()
                                 )
                         # Reconcile edges between metanodes in this bicomponent
                         for e in curr_cluster.edges:
@@ -2577,17 +2554,15 @@ def collate_graph(args):
                                 p += 2
                             # Save this edge in the .db
                             sc_edge_count += 1
-                            cursor.execute(
-                                METANODEEDGE_INSERTION_STMT,
-                                e.metanode_edge_db_values(),
+                            db_writer.add_row(
+                                "metanodeedges", e.metanode_edge_db_values()
                             )
                         # Save this bicomponent's information in the .db
                         curr_cluster.component_size_rank = (
                             single_component_size_rank
                         )
-                        cursor.execute(
-                            BICOMPONENT_INSERTION_STMT,
-                            curr_cluster.db_values(),
+                        db_writer.add_row(
+                            "bicomponents", curr_cluster.db_values()
                         )
                 # We don't need to get edge info or store anything in the .db just
                 # yet, so just move on to the next single connected component.
@@ -2662,7 +2637,7 @@ def collate_graph(args):
                         0,
                     )
                     sc_edge_count += 1
-                    cursor.execute(SINGLEEDGE_INSERTION_STMT, db_values)
+                    db_writer.add_row("singleedges", db_values)
 
                 if (
                     not no_print
@@ -2672,8 +2647,8 @@ def collate_graph(args):
                     conclude_msg()
 
                 # Output component information to the database
-                cursor.execute(
-                    SINGLECOMPONENT_INSERTION_STMT,
+                db_writer.add_row(
+                    "singlecomponents",
                     (
                         single_component_size_rank,
                         sc_node_count,
@@ -2721,12 +2696,87 @@ def collate_graph(args):
     # Should be the default value in the (standard mode) component selector in
     # the viewer interface. TODO: put this in the assembly table of the db file
     smallest_viewable_comp_rank = -1
+    # Number of components copied forward from the earlier .db file (see -u)
+    reused_component_ct = 0
+    # If we're using multiple processes (or limiting the time spent laying
+    # out each component, via -lt), we lay out everything that needs to
+    # be laid out by GraphViz up front, in a pool of worker processes. We
+    # still go through the components serially below in order of size rank,
+    # but instead of calling layout() on each component's graph there we
+    # just load its already-laid-out graph. This way, the .db file we produce
+    # is the same as it would be if we'd laid everything out serially.
+    # The programs used to lay out components, in order (see -lt): dot can
+    # fall back to sfdp, but we don't fall back from the layered engine --
+    # since it's already much faster than sfdp
+    layout_engine = args.layoutengine
+    if layout_engine == config.LAYOUT_PROGS[0]:
+        layout_progs = config.LAYOUT_PROGS
+    else:
+        layout_progs = (layout_engine,)
+    laid_out_components = None
+    parallel_layout = None
+    timed_layout = None
+    if jobs > 1 or args.layouttimeout is not None:
+        components_to_lay_out = [
+            c
+            for c in connected_components
+            if not is_too_large(c, max_node_ct, max_edge_ct)
+            and not has_trivial_layout(c)
+            and c.previous_rank is None
+        ]
+        # Node groups have to be laid out first, since their dimensions are
+        # used in the DOT strings of the components containing them.
+        node_groups = [
+            ng for c in components_to_lay_out for ng in c.node_group_list
+        ]
+        if jobs > 1:
+            parallel_layout = layout_workers.enter_context(
+                ParallelLayout(jobs)
+            )
+            ng_gv_inputs = [ng.isolated_dot_input() for ng in node_groups]
+            laid_out_node_groups = parallel_layout.imap(
+                ng_gv_inputs, cache=layout_cache
+            )
+            for ng, ng_gv_input, (laid_out_gv, _) in zip(
+                node_groups, ng_gv_inputs, laid_out_node_groups
+            ):
+                ng.read_isolated_layout(LayoutResult(laid_out_gv, ng_gv_input))
+        else:
+            for ng in node_groups:
+                ng.layout_isolated(layout_cache)
+        component_gv_inputs = [
+            c.produce_dot_file() for c in components_to_lay_out
+        ]
+        if args.layouttimeout is None:
+            laid_out_components = zip(
+                component_gv_inputs,
+                parallel_layout.imap(
+                    component_gv_inputs, prog=layout_engine, cache=layout_cache
+                ),
+            )
+        else:
+            # If -lt was passed, we lay out the components in processes
+            # that we can kill if they run out of time
+            if parallel_layout is not None:
+                parallel_layout.close()
+                parallel_layout = None
+            timed_layout = layout_workers.enter_context(
+                TimedLayout(jobs, args.layouttimeout, progs=layout_progs)
+            )
+            laid_out_components = zip(
+                component_gv_inputs,
+                timed_layout.imap(component_gv_inputs, cache=layout_cache),
+            )
+    # Numbers of components that ran out of time (see -lt) and were either
+    # laid out using a fallback program, or not laid out at all
+    fallback_component_ct = 0
+    timed_out_component_ct = 0
     for component in connected_components:
-        if component.node_ct > max_node_ct or component.edge_ct > max_edge_ct:
+        if is_too_large(component, max_node_ct, max_edge_ct):
             # Save the component in the db file, but with bounding box
             # dimensions of 0 and too_large set to 1 (for True).
-            cursor.execute(
-                COMPONENT_INSERTION_STMT,
+            db_writer.add_row(
+                "components",
                 (
                     component_size_rank,
                     component.node_ct,
@@ -2735,13 +2785,20 @@ def collate_graph(args):
                     0,
                     0,
                     1,
+                    None,
                 ),
             )
-            # TODO: insert all elements (nodes/edges/clusters) in this component
-            # with dummy coords, to enable global searching (#140 on the marbl
-            # github page)? Or not -- space issues will probably manifest
-            # inevitably. But I think that's a good idea eventually. Maybe make
-            # it configurable?
+            # Storing all of this component's nodes, edges, and clusters with
+            # dummy coordinates would take up a lot of space; with -stl, we
+            # just store enough information about its nodes to let the viewer
+            # search for them (#140 on the marbl github page)
+            if args.searchtoolarge:
+                add_search_rows(
+                    db_writer,
+                    graph_core,
+                    core_ccs.node_indices(component.core_index),
+                    component_size_rank,
+                )
             operation_msg(
                 config.LARGE_COMPONENT_MSG.format(
                     cr=component_size_rank,
@@ -2776,46 +2833,110 @@ def collate_graph(args):
                 # If only one small component is left, just treat it as a normal
                 # component: there's no point pointing it out as a small component
             if not no_print:
+                start_msg = config.START_LAYOUT_MSG
+                if component.previous_rank is not None:
+                    start_msg = config.START_UPDATE_COPY_MSG
                 operation_msg(
-                    config.START_LAYOUT_MSG
+                    start_msg
                     + "%d (%d nodes)..."
                     % (component_size_rank, component_node_ct)
                 )
 
-        if component_node_ct == 1 and len(component.node_group_list) == 0:
-            # If the current connected component has no edges (this is possible in
-            # this case if the individual node has a self-implied edge), then we
-            # can "fake" the layout and avoid having to call pygraphviz, which
-            # should save us some time.
-            if len(component.node_list[0].outgoing_nodes) == 0:
-                # fake layout based on component.node_list[0]'s dimensions,
-                # insert node info and cc info into the database, then continue
-                curr_node = component.node_list[0]
-                curr_node.set_dimensions()
-                wpts = curr_node.width * config.POINTS_PER_INCH
-                hpts = curr_node.height * config.POINTS_PER_INCH
-                curr_node.xdot_x = wpts / 2.0
-                curr_node.xdot_y = hpts / 2.0
-                curr_node.xdot_shape = curr_node.get_shape()
-                curr_node.set_component_rank(component_size_rank)
-                cursor.execute(NODE_INSERTION_STMT, curr_node.db_values())
-                cursor.execute(
-                    COMPONENT_INSERTION_STMT,
-                    (component_size_rank, 1, 0, curr_node.bp, wpts, hpts, 0),
+        if component.previous_rank is not None:
+            # This component hasn't changed since the earlier .db file given
+            # via -u, so we just copy its rows forward
+            for table, row in previous_collation.rows(
+                component.previous_rank, component_size_rank
+            ):
+                db_writer.add_row(table, row)
+            reused_component_ct += 1
+            if not no_print:
+                conclude_msg()
+            component_size_rank += 1
+            continue
+        if has_trivial_layout(component):
+            # If the current connected component is a single node with no edges
+            # (this is possible if the individual node has a self-implied
+            # edge), then we can "fake" the layout and avoid having to call
+            # pygraphviz, which should save us some time.
+            # fake layout based on component.node_list[0]'s dimensions,
+            # insert node info and cc info into the database, then continue
+            curr_node = component.node_list[0]
+            curr_node.set_dimensions()
+            wpts = curr_node.width * config.POINTS_PER_INCH
+            hpts = curr_node.height * config.POINTS_PER_INCH
+            curr_node.xdot_x = wpts / 2.0
+            curr_node.xdot_y = hpts / 2.0
+            curr_node.xdot_shape = curr_node.get_shape()
+            curr_node.set_component_rank(component_size_rank)
+            db_writer.add_row("nodes", curr_node.db_values())
+            db_writer.add_row(
+                "components",
+                (
+                    component_size_rank,
+                    1,
+                    0,
+                    curr_node.bp,
+                    wpts,
+                    hpts,
+                    0,
+                    None,
+                ),
+            )
+            component_size_rank += 1
+            continue
+        if laid_out_components is None:
+            # Lay out all clusters individually, to be backfilled
+            for ng in component.node_group_list:
+                ng.layout_isolated(layout_cache)
+            # OK, we're displaying this component.
+            # Get the node info (for both normal nodes and clusters), and the
+            # edge info (obtained by just getting the outgoing edge list for
+            # each normal node in the component). This is an obviously limited
+            # subset of the data we've ascertained from the file; once we
+            # parse the layout information (.xdot) generated by GraphViz,
+            # we'll reconcile that data with the previously-stored biological
+            # data.
+            gv_input = component.produce_dot_file()
+            laid_out_gv = None
+            layout_prog = layout_engine
+        else:
+            # The clusters in this component (and this component itself)
+            # have already been laid out in parallel, and results are given
+            # to us in the same order as we iterate through the components.
+            gv_input, (laid_out_gv, layout_prog) = next(laid_out_components)
+            if laid_out_gv is None:
+                # Every layout program ran out of time (see -lt), so treat
+                # this component like one that's too large to lay out
+                db_writer.add_row(
+                    "components",
+                    (
+                        component_size_rank,
+                        component.node_ct,
+                        component.edge_ct,
+                        component.total_length,
+                        0,
+                        0,
+                        1,
+                        None,
+                    ),
                 )
+                if args.searchtoolarge:
+                    add_search_rows(
+                        db_writer,
+                        graph_core,
+                        core_ccs.node_indices(component.core_index),
+                        component_size_rank,
+                    )
+                if not no_print:
+                    conclude_msg(config.LAYOUT_TIMEOUT_MSG)
+                if smallest_viewable_comp_rank == component_size_rank:
+                    smallest_viewable_comp_rank = -1
+                timed_out_component_ct += 1
                 component_size_rank += 1
                 continue
-        # Lay out all clusters individually, to be backfilled
-        for ng in component.node_group_list:
-            ng.layout_isolated()
-        # OK, we're displaying this component.
-        # Get the node info (for both normal nodes and clusters), and the edge
-        # info (obtained by just getting the outgoing edge list for each normal
-        # node in the component). This is an obviously limited subset of the
-        # data we've ascertained from the file; once we parse the layout
-        # information (.xdot) generated by GraphViz, we'll reconcile that data
-        # with the previously-stored biological data.
-        node_info, edge_info = component.node_and_edge_info()
+            if layout_prog in layout_progs[1:]:
+                fallback_component_ct += 1
         component_prefix = "%s_%d" % (output_fn, component_size_rank)
         # We've just printed a layout message (and haven't printed a \n yet) if:
         # -we're laying out a "not small" component (i.e. no_print is False), or
@@ -2850,23 +2971,6 @@ def collate_graph(args):
                 layout_msg_printed,
                 overwrite,
             )
-        # NOTE: Currently, we reduce each component of the asm. graph to a DOT
-        # string that we send to pygraphviz. However, we could also send
-        # nodes/edges procedurally, using add_edge(), add_node(), etc.
-        # That might be faster, and it might be worth doing;
-        # however, for now I think this approach should be fine (knock on wood).
-        gv_input = ""
-        gv_input += "digraph asm {\n"
-        if config.GRAPH_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-        if config.GLOBALNODE_STYLE != "":
-            gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
-        if config.GLOBALEDGE_STYLE != "":
-            gv_input += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
-        gv_input += node_info
-        gv_input += edge_info
-        gv_input += "}"
-        h = pygraphviz.AGraph(gv_input)
         # save the .gv file if the user requested .gv preservation
         if preserve_gv:
             if not r:
@@ -2884,7 +2988,15 @@ def collate_graph(args):
         # NOTE if dot is taking a really long time to lay stuff out, then other
         # Graphviz layout programs (e.g. sfdp) can be used instead -- however
         # they'll generally produce less useful drawings for directed graphs
-        h.layout(prog="dot")
+        # (We always lay out the graph via layout_dot_string() -- regardless of
+        # whether or not we're doing this in parallel -- so that the order in
+        # which we go through the laid-out nodes and edges, and thus the order
+        # of rows in the .db file, doesn't depend on the number of jobs used.)
+        if laid_out_gv is None:
+            laid_out_gv, layout_prog = layout_dot_string(
+                gv_input, layout_prog, cache=layout_cache
+            )
+        layout = LayoutResult(laid_out_gv, gv_input)
         # save the .xdot file if the user requested .xdot preservation
         if preserve_xdot:
             # AGraph.draw() doesn't perform graph positioning if layout()
@@ -2892,6 +3004,7 @@ def collate_graph(args):
             # specified -- so this should be relatively fast
             if not r:
                 layout_msg_printed = False
+            h = load_laid_out_graph(laid_out_gv)
             save_aux_file(
                 component_prefix + ".xdot",
                 h,
@@ -2899,6 +3012,8 @@ def collate_graph(args):
                 layout_msg_printed,
                 overwrite,
             )
+            h.clear()
+            h.close()
 
         # Record the layout information of the graph's nodes, edges, and clusters
 
@@ -2919,35 +3034,35 @@ def collate_graph(args):
         # iterative drawing is going to look weird if clusters aren't positioned
         # "frequently" throughout the graph. (See #28 for reference.)
         #
-        # We can't reliably access h.graph_attr due to a bug in pygraphviz.
-        # See https://github.com/pygraphviz/pygraphviz/issues/113 for context.
-        # If we could access the bounding box, here's how we'd do it --
-        # bb = h.graph_attr[u'bb'].split(',')[2:]
-        # bounding_box = [float(c) for c in bb]
-        #
-        # So, then, we obtain the bounding box "approximately," by finding the
-        # right-most and top-most coordinates within the graph from:
-        # -Cluster bounding boxes (which we can access fine, for some reason.)
+        # We start with the bounding box GraphViz gives for the graph, and
+        # then expand it (if needed) to include the right-most and top-most
+        # coordinates within the graph from:
+        # -Cluster bounding boxes
         # -Node boundaries (we use some math to determine the actual borders of
         #  nodes, since node position refers to the center of the node)
         # -Edge control points -- note that this may cause something of a loss in
         #  precision if we convert edge control points in Cytoscape.js in a way
         #  that changes the edge structure significantly
+        # (GraphViz's bounding box should already include all of these, except
+        # for the interior edges of node groups, which aren't in the laid-out
+        # graph -- but there's no harm in being careful.)
         bounding_box_right = 0
         bounding_box_top = 0
+        if layout.bb is not None:
+            bounding_box_right = layout.bb[2]
+            bounding_box_top = layout.bb[3]
 
         # Record layout info of nodes (incl. rectangular "empty" node groups)
-        for n in h.nodes():
+        for n, pos, shape in zip(
+            layout.node_names, layout.node_positions, layout.node_shapes
+        ):
             try:
-                curr_node = nodeid2obj[str(n)]
+                curr_node = nodeid2obj[n]
                 component_node_count += 1
                 component_total_length += curr_node.bp
                 if curr_node.group is not None:
                     continue
-                ep = n.attr[u"pos"].split(",")
-                curr_node.xdot_x, curr_node.xdot_y = tuple(
-                    float(c) for c in ep
-                )
+                curr_node.xdot_x, curr_node.xdot_y = pos
                 # Try to expand the component bounding box
                 right_side = curr_node.xdot_x + (
                     config.POINTS_PER_INCH * (curr_node.width / 2.0)
@@ -2960,19 +3075,17 @@ def collate_graph(args):
                 if top_side > bounding_box_top:
                     bounding_box_top = top_side
                 # Save this cluster in the .db
-                curr_node.xdot_shape = str(n.attr[u"shape"])
+                curr_node.xdot_shape = shape
                 curr_node.set_component_rank(component_size_rank)
-                cursor.execute(NODE_INSERTION_STMT, curr_node.db_values())
+                db_writer.add_row("nodes", curr_node.db_values())
             except KeyError:  # arising from nodeid2obj[a cluster id]
                 # We use [8:] to slice off the "cluster_" prefix on every rectangle
                 # node that is actually a node group that will be backfilled (#80)
-                curr_cluster = clusterid2obj[str(n)[8:]]
+                curr_cluster = clusterid2obj[n[8:]]
                 component_node_count += curr_cluster.node_count
                 component_edge_count += curr_cluster.edge_count
                 component_total_length += curr_cluster.bp
-                ep = n.attr[u"pos"].split(",")
-                curr_cluster.xdot_x = float(ep[0])
-                curr_cluster.xdot_y = float(ep[1])
+                curr_cluster.xdot_x, curr_cluster.xdot_y = pos
                 half_width_pts = config.POINTS_PER_INCH * (
                     curr_cluster.xdot_c_width / 2.0
                 )
@@ -2995,7 +3108,7 @@ def collate_graph(args):
                     n.xdot_x = curr_cluster.xdot_left + n.xdot_rel_x
                     n.xdot_y = curr_cluster.xdot_bottom + n.xdot_rel_y
                     n.set_component_rank(component_size_rank)
-                    cursor.execute(NODE_INSERTION_STMT, n.db_values())
+                    db_writer.add_row("nodes", n.db_values())
                 # Reconcile child edges -- add to .db
                 for e in curr_cluster.edges:
                     # Adjust the control points to be relative to the entire
@@ -3025,26 +3138,29 @@ def collate_graph(args):
                             bounding_box_top = yp
                         p += 2
                     # Save this edge in the .db
-                    cursor.execute(EDGE_INSERTION_STMT, e.db_values())
+                    db_writer.add_row("edges", e.db_values())
                 # Save the cluster in the .db
                 curr_cluster.component_size_rank = component_size_rank
-                cursor.execute(
-                    CLUSTER_INSERTION_STMT, curr_cluster.db_values()
-                )
+                db_writer.add_row("clusters", curr_cluster.db_values())
         # Record layout info of edges (that aren't inside node groups)
-        for e in h.edges():
+        for tail, head, comment, pos in zip(
+            layout.edge_tails,
+            layout.edge_heads,
+            layout.edge_comments,
+            layout.edge_positions,
+        ):
             # Since edges could point to/from node groups, we store their actual
             # source/target nodes in a comment attribute
-            source_id, target_id = e.attr[u"comment"].split(",")
+            source_id, target_id = comment.split(",")
             source = nodeid2obj[source_id]
             curr_edge = source.outgoing_edge_objects[target_id]
             component_edge_count += 1
             if curr_edge.group is not None:
                 continue
             curr_edge.xdot_ctrl_pt_str, coord_list, curr_edge.xdot_ctrl_pt_count = graph_objects.Edge.get_control_points(
-                e.attr[u"pos"]
+                pos
             )
-            if source_id != e[0]:
+            if source_id != tail:
                 # Adjust edge to point from interior node "source"'s tailport
                 pts_height = source.height * config.POINTS_PER_INCH
                 tail_y = source.xdot_y - (pts_height / 2.0)
@@ -3055,7 +3171,7 @@ def collate_graph(args):
                 xcps = xcps[xcps.index(" ") + 1 :]
                 xcps = xcps[xcps.index(" ") + 1 :]
                 curr_edge.xdot_ctrl_pt_str = new_points + xcps
-            if target_id != e[1]:
+            if target_id != head:
                 # Adjust edge to point to interior node "target"'s headport
                 target = nodeid2obj[target_id]
                 pts_height = target.height * config.POINTS_PER_INCH
@@ -3078,13 +3194,18 @@ def collate_graph(args):
                     bounding_box_top = y_coord
                 p += 2
             # Save this edge in the .db
-            cursor.execute(EDGE_INSERTION_STMT, curr_edge.db_values())
+            db_writer.add_row("edges", curr_edge.db_values())
 
         if not no_print:
-            conclude_msg()
+            if layout_prog in layout_progs[1:]:
+                conclude_msg(
+                    config.LAYOUT_FALLBACK_MSG.format(prog=layout_prog)
+                )
+            else:
+                conclude_msg()
         # Output component information to the database
-        cursor.execute(
-            COMPONENT_INSERTION_STMT,
+        db_writer.add_row(
+            "components",
             (
                 component_size_rank,
                 component_node_count,
@@ -3093,11 +3214,9 @@ def collate_graph(args):
                 bounding_box_right,
                 bounding_box_top,
                 0,
+                layout_prog,
             ),
         )
-
-        h.clear()
-        h.close()
         component_size_rank += 1
 
     # Insert general assembly information into the database
@@ -3125,7 +3244,11 @@ def collate_graph(args):
         spqr_given_val,
         smallest_viewable_comp_rank,
     )
-    cursor.execute(ASSEMBLY_INSERTION_STMT, graphVals)
+    db_writer.add_row("assembly", graphVals)
+    if parallel_layout is not None:
+        parallel_layout.close()
+    if timed_layout is not None:
+        timed_layout.close()
     # ...Ok, now we're finally done!
     t4 = time.time()
     difference = t4 - t3
@@ -3135,12 +3258,37 @@ def collate_graph(args):
     if args.computespqrdata:
         print("Standard view layout time: %g seconds" % (difference))
     print("Total layout time: %g seconds" % (total_layout_time))
+    layout_cache_stats_msg = layout_cache.stats_msg()
+    if len(layout_cache_stats_msg) > 0:
+        print(layout_cache_stats_msg)
+    if timed_layout is not None:
+        print(
+            config.LAYOUT_TIMEOUT_STATS_MSG.format(
+                fc=fallback_component_ct, tc=timed_out_component_ct
+            )
+        )
+    if seq_writer is not None:
+        print(
+            config.SEQUENCE_STORE_STATS_MSG.format(
+                sc=seq_writer.sequence_ct, nt=seq_writer.nt_ct, fn=seq_fn
+            )
+        )
+    if previous_collation is not None:
+        print(
+            config.UPDATE_STATS_MSG.format(
+                rc=reused_component_ct, tc=total_component_count
+            )
+        )
 
     operation_msg(config.DB_SAVE_MSG + "%s..." % (db_fn))
-    connection.commit()
+    row_count, rows_per_sec = db_writer.finish()
     conclude_msg()
-    # Close the database connection
-    connection.close()
+    if rows_per_sec is not None:
+        print(
+            config.DB_WRITE_STATS_MSG.format(
+                rc=row_count, rps="%g" % (rows_per_sec)
+            )
+        )
 
 
 def run_script(cmdline_args=sys.argv[1:]):
@@ -0,0 +1,491 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains find_components(), which identifies the (weakly)
+# connected components of assembly graphs using union-find over arrays of
+# edges, rather than by traversing the graphs node by node; and
+# scale_contigs() and scale_edges(), which scale contigs and edges relative to
+# the other contigs and edges in their components for all components at once.
+#
+# find_core_components(), scale_core_contigs(), and scale_core_edges() do the
+# same things for graphs stored in a GraphCore (see graph_core.py), without
+# needing any Node or Edge objects.
+
+import itertools
+import operator
+import numpy
+
+from . import config
+
+_get_outgoing_nodes = operator.attrgetter("outgoing_nodes")
+_get_outgoing_edge_objects = operator.attrgetter("outgoing_edge_objects")
+_get_bp = operator.attrgetter("bp")
+_get_logbp = operator.attrgetter("logbp")
+_get_multiplicity = operator.attrgetter("multiplicity")
+_get_thickness = operator.attrgetter("thickness")
+_get_is_outlier = operator.attrgetter("is_outlier")
+
+
+class ConnectedComponents(object):
+    """The connected components of a graph, as found by find_components().
+
+       Components are numbered from 0 in the order of their first nodes in
+       the sequence of nodes passed to find_components(). For component i:
+
+       -self.node_lists[i] is a list of its nodes, in the order in which
+        they were passed to find_components().
+
+       -self.node_counts[i], self.edge_counts[i], and self.total_lengths[i]
+        are its number of nodes, number of edges (counted as
+        Component.edge_ct counts them), and total length of its nodes.
+    """
+
+    def __init__(
+        self, node2index, labels, node_lists, node_counts, edge_counts, lengths
+    ):
+        self._node2index = node2index
+        self._labels = labels
+        self.node_lists = node_lists
+        self.node_counts = node_counts
+        self.edge_counts = edge_counts
+        self.total_lengths = lengths
+
+    def __len__(self):
+        return len(self.node_lists)
+
+    def component_index(self, node):
+        """Returns the index of the component containing the given node."""
+        return self._labels[self._node2index[node]]
+
+
+class CoreComponents(object):
+    """The connected components of a GraphCore, as found by
+       find_core_components().
+
+       Components are numbered from 0 in the order of their lowest-index
+       nodes. self.labels[v] is the index of the component containing node v,
+       and for component i:
+
+       -self.node_indices(i) is an array of the indices of its nodes, in
+        increasing order.
+
+       -self.node_counts[i], self.edge_counts[i], and self.total_lengths[i]
+        are its number of nodes, number of edges (counted as
+        Component.edge_ct counts them), and total length of its nodes.
+    """
+
+    def __init__(self, labels, node_counts, edge_counts, lengths):
+        self.labels = labels
+        self.node_counts = node_counts
+        self.edge_counts = edge_counts
+        self.total_lengths = lengths
+        # The indices of all nodes, sorted by component, and the position in
+        # this array at which each component's nodes start
+        self._node_order = numpy.argsort(labels, kind="stable")
+        self._starts = numpy.zeros(len(node_counts) + 1, dtype=numpy.int64)
+        numpy.cumsum(node_counts, out=self._starts[1:])
+
+    def __len__(self):
+        return len(self.node_counts)
+
+    def node_indices(self, i):
+        """Returns an array of the indices of the nodes in component i."""
+        return self._node_order[self._starts[i] : self._starts[i + 1]]
+
+    def sorted_node_indices(self, component_mask):
+        """Returns an array of the indices of the nodes in the components
+           selected by component_mask (a boolean array with an element for
+           each component), sorted by component.
+        """
+        return self._node_order[component_mask[self.labels[self._node_order]]]
+
+
+def _label_components(node_ct, sources, targets):
+    """Given the number of nodes in a graph and two arrays giving the
+       source and target node indices of each of its edges, returns an array
+       giving the index of the (weakly) connected component containing each
+       node. Components are numbered from 0 in the order of their
+       lowest-index nodes.
+
+       We use a vectorized union-find over the arrays of edges: we
+       repeatedly "hook" the root of the tree containing one end of an edge
+       onto the root of the tree containing the other end, and then shortcut
+       pointers until every node points to the root of its tree. Roots only
+       ever point to lower-index nodes, so each component's root ends up
+       being its lowest-index node.
+    """
+    roots = numpy.arange(node_ct)
+    while True:
+        src_roots = roots[sources]
+        tgt_roots = roots[targets]
+        unmerged = src_roots != tgt_roots
+        if not unmerged.any():
+            break
+        # Only edges whose ends are in different trees matter from now on
+        sources = sources[unmerged]
+        targets = targets[unmerged]
+        src_roots = src_roots[unmerged]
+        tgt_roots = tgt_roots[unmerged]
+        numpy.minimum.at(
+            roots,
+            numpy.maximum(src_roots, tgt_roots),
+            numpy.minimum(src_roots, tgt_roots),
+        )
+        while True:
+            grandparents = roots[roots]
+            if numpy.array_equal(grandparents, roots):
+                break
+            roots = grandparents
+
+    # Sorting the roots sorts components by their lowest-index nodes.
+    return numpy.unique(roots, return_inverse=True)[1].reshape(-1)
+
+
+def find_components(*node_collections):
+    """Finds the connected components of one or more graphs, ignoring the
+       directions of edges.
+
+       Each argument should be a sequence of all of the Node objects in a
+       graph (for example, the "double" and "single" graphs in SPQR mode);
+       edges are given by nodes' outgoing_nodes lists, and must be between
+       nodes in the same graph. The components of all of these graphs are
+       found at once, without modifying any of the nodes.
+
+       Returns a list containing a ConnectedComponents object for each
+       argument.
+    """
+    # (We use map() with built-in functions, rather than generator
+    # expressions, for the per-node and per-edge loops here -- this keeps
+    # these loops in C, which is a lot faster for large graphs.)
+    nodes = list(itertools.chain.from_iterable(node_collections))
+    node_ct = len(nodes)
+    node2index = dict(zip(nodes, range(node_ct)))
+    outgoing_node_lists = list(map(_get_outgoing_nodes, nodes))
+    out_degrees = numpy.fromiter(
+        map(len, outgoing_node_lists), dtype=numpy.int64, count=node_ct
+    )
+    sources = numpy.repeat(numpy.arange(node_ct), out_degrees)
+    targets = numpy.fromiter(
+        map(
+            node2index.__getitem__,
+            itertools.chain.from_iterable(outgoing_node_lists),
+        ),
+        dtype=numpy.int64,
+        count=len(sources),
+    )
+    del outgoing_node_lists
+
+    labels = _label_components(node_ct, sources, targets)
+    component_ct = labels.max() + 1 if node_ct > 0 else 0
+    node_counts = numpy.bincount(labels, minlength=component_ct)
+    edge_counts = numpy.bincount(
+        labels,
+        weights=numpy.fromiter(
+            map(len, map(_get_outgoing_edge_objects, nodes)),
+            dtype=numpy.int64,
+            count=node_ct,
+        ),
+        minlength=component_ct,
+    ).astype(numpy.int64)
+    lengths = numpy.bincount(
+        labels,
+        weights=numpy.fromiter(
+            map(_get_bp, nodes), dtype=numpy.int64, count=node_ct
+        ),
+        minlength=component_ct,
+    ).astype(numpy.int64)
+    # Group the nodes by component, preserving their order within each
+    # component
+    node_lists = [[] for i in range(component_ct)]
+    for n, label in zip(nodes, labels.tolist()):
+        node_lists[label].append(n)
+
+    # Split the components up by the collection they came from. Components
+    # are numbered by their lowest-index nodes, so the components of each
+    # collection are contiguous.
+    results = []
+    first_node = 0
+    first_cc = 0
+    for collection in node_collections:
+        last_node = first_node + len(collection)
+        if last_node > first_node:
+            last_cc = labels[first_node:last_node].max() + 1
+        else:
+            last_cc = first_cc
+        results.append(
+            ConnectedComponents(
+                node2index,
+                labels - first_cc,
+                node_lists[first_cc:last_cc],
+                node_counts[first_cc:last_cc],
+                edge_counts[first_cc:last_cc],
+                lengths[first_cc:last_cc],
+            )
+        )
+        first_node = last_node
+        first_cc = last_cc
+    return results
+
+
+def find_core_components(core):
+    """Finds the connected components of a GraphCore (see graph_core.py),
+       ignoring the directions of edges. Returns a CoreComponents object.
+
+       This works just like find_components(), but using the arrays of the
+       GraphCore: so we don't need a Node object for each node.
+    """
+    sources = numpy.repeat(numpy.arange(core.node_ct), core.out_degrees())
+    labels = _label_components(core.node_ct, sources, core.indices)
+    component_ct = labels.max() + 1 if core.node_ct > 0 else 0
+    node_counts = numpy.bincount(labels, minlength=component_ct)
+    edge_counts = numpy.bincount(
+        labels[core.sources[core.is_distinct]], minlength=component_ct
+    )
+    lengths = numpy.bincount(
+        labels, weights=core.bps, minlength=component_ct
+    ).astype(numpy.int64)
+    return CoreComponents(labels, node_counts, edge_counts, lengths)
+
+
+def _group_by_size(sizes):
+    """Given an array of the sizes of some segments of a flat array (where
+       the segments are contiguous and in order), yields a 2-tuple for each
+       distinct nonzero size: (the indices of the segments with this size, a
+       2-D array where row i lists the flat array indices of the i-th such
+       segment).
+
+       This lets us compute statistics for all segments of the same size in
+       a single NumPy call along axis 1 -- which gives exactly the same
+       results as computing them for each segment separately.
+    """
+    offsets = numpy.cumsum(sizes) - sizes
+    order = numpy.argsort(sizes, kind="stable")
+    sorted_sizes = sizes[order]
+    boundaries = numpy.flatnonzero(numpy.diff(sorted_sizes)) + 1
+    for group in numpy.split(order, boundaries):
+        size = sizes[group[0]]
+        if size > 0:
+            yield group, offsets[group][:, None] + numpy.arange(size)
+
+
+def _scale_log_lengths(logbps, sizes):
+    """Does the work of scale_contigs() and scale_core_contigs().
+
+       logbps should be an array of the log lengths of some contigs, ordered
+       by component, and sizes should be an array of the number of contigs
+       in each component.
+
+       Returns a 2-tuple of arrays of the contigs' relative lengths and
+       longside proportions. These contain NaN for contigs that shouldn't
+       be scaled.
+    """
+    relative_lengths = numpy.full(len(logbps), numpy.nan)
+    longside_proportions = numpy.full(len(logbps), numpy.nan)
+    for group, indices in _group_by_size(sizes):
+        if indices.shape[1] < 2:
+            continue
+        values = logbps[indices]
+        min_bps = values.min(axis=1)
+        max_bps = values.max(axis=1)
+        # If all contigs in a component have the same length, we don't scale
+        # them (this would just result in division by zero)
+        scaled = min_bps != max_bps
+        if not scaled.any():
+            continue
+        values = values[scaled]
+        indices = indices[scaled]
+        min_bps = min_bps[scaled][:, None]
+        bp_ranges = max_bps[scaled][:, None] - min_bps
+        q25s, q75s = numpy.percentile(values, [25, 75], axis=1)
+        relative_lengths[indices] = (values - min_bps) / bp_ranges
+        longside_proportions[indices] = numpy.where(
+            values < q25s[:, None],
+            config.LOW_LONGSIDE_PROPORTION,
+            numpy.where(
+                values < q75s[:, None],
+                config.MID_LONGSIDE_PROPORTION,
+                config.HIGH_LONGSIDE_PROPORTION,
+            ),
+        )
+    return relative_lengths, longside_proportions
+
+
+def scale_contigs(components):
+    """Scales the log lengths of the contigs in each Component relative to
+       the other contigs in the same component.
+
+       This sets each contig's relative_length (its log length, scaled to
+       [0, 1] across the component) and longside_proportion (based on which
+       quartile of the component its log length falls in). This is only done
+       for components containing contigs of different lengths; otherwise,
+       these stay at their default values.
+
+       All components are processed at once: components of the same size are
+       processed together using NumPy calls along axis 1, so the number of
+       calls is proportional to the number of distinct component sizes, not
+       the number of components.
+    """
+    nodes = [n for c in components for n in c.node_list]
+    if len(nodes) == 0:
+        return
+    sizes = numpy.array([len(c.node_list) for c in components])
+    logbps = numpy.fromiter(map(_get_logbp, nodes), dtype=float)
+    relative_lengths, longside_proportions = _scale_log_lengths(logbps, sizes)
+    scaled_indices = numpy.flatnonzero(~numpy.isnan(relative_lengths))
+    for i, rl, lp in zip(
+        scaled_indices.tolist(),
+        relative_lengths[scaled_indices].tolist(),
+        longside_proportions[scaled_indices].tolist(),
+    ):
+        n = nodes[i]
+        n.relative_length = rl
+        n.longside_proportion = lp
+
+
+def scale_core_contigs(core, components, component_mask):
+    """Like scale_contigs(), but for the contigs in a GraphCore.
+
+       components should be the CoreComponents of the GraphCore, and
+       component_mask a boolean array indicating which of these components
+       to scale. The results are stored in the GraphCore's
+       relative_lengths and longside_proportions arrays (and are copied to
+       the Nodes created by GraphCore.make_views()).
+    """
+    nodes = components.sorted_node_indices(component_mask)
+    if len(nodes) == 0:
+        return
+    relative_lengths, longside_proportions = _scale_log_lengths(
+        core.logbps[nodes], components.node_counts[component_mask]
+    )
+    core.relative_lengths[nodes] = relative_lengths
+    core.longside_proportions[nodes] = longside_proportions
+
+
+def _scale_weights(weights, sizes, thicknesses, is_outliers):
+    """Does the work of scale_edges() and scale_core_edges().
+
+       weights should be an array of the weights of some edges, ordered by
+       component, and sizes should be an array of the number of edges in
+       each component. The edges' thicknesses and is_outlier values are set
+       in the thicknesses and is_outliers arrays; these are left as is for
+       edges that aren't scaled or identified as outliers.
+    """
+    for group, indices in _group_by_size(sizes):
+        values = weights[indices]
+        non_outliers = numpy.ones(values.shape, dtype=bool)
+        if indices.shape[1] >= 4:
+            lqs, uqs = numpy.percentile(values, [25, 75], axis=1)
+            # (We can use other values than 1.5 if desired -- not set in
+            # stone)
+            ds = 1.5 * (uqs - lqs)
+            lfs = (lqs - ds)[:, None]
+            ufs = (uqs + ds)[:, None]
+            high = values > ufs
+            low = values < lfs
+            is_outliers[indices[high]] = 1
+            thicknesses[indices[high]] = 1
+            is_outliers[indices[low]] = -1
+            thicknesses[indices[low]] = 0
+            non_outliers = ~(high | low)
+        # Perform relative scaling for each component's non-outlier edges
+        min_ews = numpy.where(non_outliers, values, numpy.inf).min(axis=1)
+        max_ews = numpy.where(non_outliers, values, -numpy.inf).max(axis=1)
+        scaled = (non_outliers.sum(axis=1) >= 2) & (min_ews != max_ews)
+        if not scaled.any():
+            continue
+        non_outliers = non_outliers[scaled]
+        values = values[scaled]
+        indices = indices[scaled]
+        min_ews = min_ews[scaled][:, None]
+        ew_ranges = max_ews[scaled][:, None] - min_ews
+        thicknesses[indices[non_outliers]] = ((values - min_ews) / ew_ranges)[
+            non_outliers
+        ]
+
+
+def scale_edges(components):
+    """Scales the weights of the edges in each Component relative to the
+       other edges in the same component, setting each edge's thickness and
+       is_outlier attributes.
+
+       We use "Tukey fences" to identify outlier edge weights (see issue #184
+       on GitHub for context on this). Note that the "fences" we use are the
+       "inner" fences that Tukey describes in Exploratory Data Analysis
+       (1977). Outliers above the upper fence get a thickness of 1 and those
+       below the lower fence get a thickness of 0; the remaining edges'
+       thicknesses are scaled to [0, 1] using their weights. (Outliers are
+       only identified in components with at least 4 edges, and the
+       remaining edges are only scaled if there are at least 2 of them and
+       they don't all have the same weight.)
+
+       Like scale_contigs(), this processes all components at once.
+    """
+    edges = [
+        e
+        for c in components
+        for n in c.node_list
+        for e in n.outgoing_edge_objects.values()
+    ]
+    if len(edges) == 0:
+        return
+    sizes = numpy.array(
+        [
+            sum(len(n.outgoing_edge_objects) for n in c.node_list)
+            for c in components
+        ]
+    )
+    weights = numpy.fromiter(map(_get_multiplicity, edges), dtype=float)
+    thicknesses = numpy.fromiter(map(_get_thickness, edges), dtype=float)
+    is_outliers = numpy.fromiter(
+        map(_get_is_outlier, edges), dtype=numpy.int64
+    )
+    _scale_weights(weights, sizes, thicknesses, is_outliers)
+    for e, t, o in zip(edges, thicknesses.tolist(), is_outliers.tolist()):
+        e.thickness = t
+        e.is_outlier = o
+
+
+def scale_core_edges(core, components, component_mask):
+    """Like scale_edges(), but for the edges in a GraphCore.
+
+       The arguments are the same as those of scale_core_contigs(). Only
+       one of each set of parallel edges (see GraphCore.is_distinct) is
+       scaled. The results are stored in the GraphCore's thicknesses and
+       is_outliers arrays.
+    """
+    edges = numpy.flatnonzero(core.is_distinct)
+    edge_labels = components.labels[core.sources[edges]]
+    order = numpy.argsort(edge_labels, kind="stable")
+    edges = edges[order][component_mask[edge_labels[order]]]
+    if len(edges) == 0:
+        return
+    weights = numpy.fromiter(
+        map(core.multiplicities.__getitem__, edges.tolist()),
+        dtype=float,
+        count=len(edges),
+    )
+    thicknesses = core.thicknesses[edges]
+    is_outliers = core.is_outliers[edges]
+    _scale_weights(
+        weights,
+        components.edge_counts[component_mask],
+        thicknesses,
+        is_outliers,
+    )
+    core.thicknesses[edges] = thicknesses
+    core.is_outliers[edges] = is_outliers
@@ -169,10 +169,90 @@ PATTERN2COLOR = {
     "other_structural_patterns": "#000000",
 }
 
+# The number of rows of each table that we buffer in memory before inserting
+# them into the .db file all at once. Larger values make writing the .db file
+# faster, at the cost of some extra memory usage.
+DB_BATCH_SIZE = 10000
+
 # The default values for -maxn and -maxe in the collate script.
 MAXN_DEFAULT = 7999
 MAXE_DEFAULT = 7999
 
+# The default maximum size, in bytes, of the layout cache used by -lc. Once
+# the cache grows past this size, the least recently used layouts are evicted.
+# (Layouts are compressed before being stored, so this is only a rough bound
+# on the size of the cache file.)
+LAYOUT_CACHE_MAX_SIZE = 512 * 1024 * 1024
+# Included in the keys of the layout cache, so that changing this invalidates
+# layouts cached by older versions of MetagenomeScope
+LAYOUT_CACHE_VERSION = "1"
+# Changes to the layout cache are committed after this many changes, or after
+# this many seconds have passed since the last commit (whichever comes first)
+LAYOUT_CACHE_COMMIT_EVERY = 100
+LAYOUT_CACHE_COMMIT_INTERVAL = 30
+
+# Components and node groups whose DOT strings are at most this many
+# characters long are laid out only once per distinct shape (i.e. once for
+# every set of these graphs that only differ in their node IDs) in each run of
+# the preprocessing script
+LAYOUT_DEDUP_MAX_SIZE = 20000
+# The maximum total size, in characters, of the layouts of these shapes that
+# are kept in memory during a run. Once this is exceeded, the least recently
+# used layouts are dropped (so that graphs with many distinct small shapes,
+# most of which are never reused, don't fill up memory).
+LAYOUT_DEDUP_MAX_TOTAL_SIZE = 64 * 1024 * 1024
+
+# The suffix of the "sequence store" file written by -ss (see
+# sequence_store.py), which is stored next to the .db file
+SEQUENCE_STORE_SUFFIX = ".seq.db"
+# Sequences in the sequence store are packed into 2 bits per nucleotide, then
+# compressed in blocks of this many (packed) bytes. Smaller blocks make
+# reading a short sequence faster, at the cost of slightly worse compression.
+SEQUENCE_STORE_BLOCK_SIZE = 64 * 1024
+# The number of decompressed blocks kept in memory when reading sequences
+SEQUENCE_STORE_CACHED_BLOCKS = 8
+# Stored in the sequence store, so that we can tell if a sequence store was
+# written by a version of MetagenomeScope that used a different format
+SEQUENCE_STORE_VERSION = 1
+
+# The GraphViz programs used to lay out connected components when a time limit
+# is set via -lt, in order: if laying out a component using a program runs
+# out of time, we try again with the next program
+LAYOUT_PROGS = ("dot", "sfdp")
+
+# The engines that -le can use to lay out connected components. "dot" uses
+# GraphViz; "layered" uses our own layered layout engine (see
+# layered_layout.py), which is a lot faster than dot on very large components
+# but produces messier drawings.
+LAYERED_LAYOUT_PROG = "layered"
+LAYOUT_ENGINES = ("dot", LAYERED_LAYOUT_PROG)
+# The layout engine recorded for components with simple shapes (chains,
+# bubbles, and cycles) that were laid out by simple_layout.py rather than dot
+SIMPLE_LAYOUT_ENGINE = "simple"
+LAYOUT_ENGINE_DEFAULT = "dot"
+# Spacing used by the layered layout engine, in points: the minimum
+# horizontal distance between adjacent nodes in a layer, and the vertical
+# distance between layers. (These match GraphViz's defaults.)
+LAYERED_NODESEP = 0.25 * POINTS_PER_INCH
+LAYERED_RANKSEP = 0.5 * POINTS_PER_INCH
+# The number of crossing reduction and coordinate assignment iterations the
+# layered layout engine performs
+LAYERED_ITERATIONS = 16
+# The width (in points) reserved for each bend in an edge spanning multiple
+# layers, and the size (in points) of self-loops drawn by the engine
+LAYERED_DUMMY_WIDTH = 6.0
+LAYERED_LOOP_SIZE = 18.0
+# The dimensions (in inches) of nodes that don't have a width or height set
+# (GraphViz's defaults)
+LAYERED_DEFAULT_WIDTH = 0.75
+LAYERED_DEFAULT_HEIGHT = 0.5
+
+# The engines that -spqr can use to compute SPQR tree decompositions. "python"
+# computes them in-process (see spqr_utils.py); "ogdf" runs the compiled SPQR
+# script and parses the files it writes to the output directory.
+SPQR_ENGINES = ("python", "ogdf")
+SPQR_ENGINE_DEFAULT = "python"
+
 # Various status messages/message prefixes that are displayed to the user.
 # Displayed during command-line argument parsing
 COLLATE_DESCRIPTION = (
@@ -202,23 +282,45 @@ CONTIG_SCALING_MSG = (
     "Scaling contig areas/dimensions in each connected component..."
 )
 READ_FILE_MSG = "Reading and parsing input file "
+UPDATE_READ_MSG = "Reading earlier output file "
 DB_INIT_MSG = "Initializing output file "
 SAVE_AUX_FAIL_MSG = "Not saving "
 LAYOUT_MSG = "Laying out "
 SMALL_COMPONENTS_MSG = "small (containing < 5 nodes) remaining components..."
 SPQR_COMPONENTS_MSG = " SPQR-integrated component "
 START_LAYOUT_MSG = "Laying out connected component "
+START_UPDATE_COPY_MSG = "Copying forward connected component "
 LARGE_COMPONENT_MSG = (
     "Not laying out component {cr} ({nc} nodes, {ec} "
     + "edges): exceeds -maxn or -maxe."
 )
+LAYOUT_FALLBACK_MSG = "Done (using {prog}, since dot ran out of time)."
+LAYOUT_TIMEOUT_MSG = "Ran out of time; not laying out this component."
 DB_SAVE_MSG = "Saving information to "
+LAYOUT_CACHE_STATS_MSG = (
+    "Layout cache: {hits} hits, {misses} misses, {evictions} evictions."
+)
+LAYOUT_DEDUP_STATS_MSG = (
+    "Reused {rc} layouts of components and node groups with the same shape "
+    "as one laid out earlier (saving {rc} layout computations)."
+)
+LAYOUT_TIMEOUT_STATS_MSG = (
+    "Ran out of time (-lt) laying out components with dot: {fc} were laid "
+    "out using a faster program instead, and {tc} were not laid out."
+)
+UPDATE_STATS_MSG = (
+    "Copied {rc} of {tc} connected components forward from the earlier "
+    "output file."
+)
+SEQUENCE_STORE_STATS_MSG = "Stored {sc} sequences ({nt} nt) in {fn}."
+DB_WRITE_STATS_MSG = "Wrote {rc} rows to the .db file ({rps} rows/sec)."
 DONE_MSG = "Done."
 # Error messages (and occasional "helper" messages for constructing error msgs)
 SEQ_NOUN = "Sequence "
 NO_DNA_ERR = " does not contain a DNA sequence or length property"
 DUPLICATE_ID_ERR = "Duplicate node ID: "
 FILETYPE_ERR = "Invalid input filetype; see README for accepted file types"
+STDIN_TYPE_ERR = "The -it option must be given when reading from stdin (-i -)"
 EDGE_CTRL_PT_ERR = "Invalid GraphViz edge control points"
 NO_FN_ERR = "No filename provided for "
 ARG_ERR = "Invalid argument: "
@@ -226,6 +328,7 @@ NO_FN_PROVIDED_ERR = "No input and/or output file name provided"
 EXISTS_AS_NON_DIR_ERR = " already exists as a non-directory file"
 IS_DIR_ERR = " is a directory"
 EXISTS_ERR = " already exists and -w is not set"
+UPDATE_NO_DB_ERR = " (the earlier output file given via -u) does not exist"
 EMPTY_LIST_N50_ERR = "N50 of an empty list does not exist"
 N50_CALC_ERR = "N50 calculation error"
 UBUBBLE_NODE_ERR = "User-specified bubble file contains invalid node "
@@ -238,6 +341,10 @@ UPATTERN_NODE_ERR = "User-specified pattern file contains invalid node "
 UBUBBLE_ERR_PREFIX = 'User-specified bubble "'
 UPATTERN_ERR_PREFIX = 'User-specified pattern "'
 CONTIGUOUS_ERR = '" is not contiguous'
+SEQUENCE_STORE_GML_ERR = (
+    "Can't use -ss for GML files, since they don't contain DNA sequences"
+)
+SEQUENCE_STORE_VERSION_ERR = " is a sequence store of an unsupported version: "
 LABEL_EXISTENCE_ERR = (
     "Can't use -ubl or -upl options for a graph type with no node labels"
 )
@@ -257,3 +364,10 @@ LASTGRAPH_SUFFIX = "lastgraph"
 GML_SUFFIX = "gml"
 GFA_SUFFIX = "gfa"
 FASTG_SUFFIX = "fastg"
+# The accepted arguments to collate's -it option, which overrides the above.
+INPUT_TYPES = (LASTGRAPH_SUFFIX, GML_SUFFIX, GFA_SUFFIX, FASTG_SUFFIX)
+# Input files ending with this suffix are assumed to be gzip-compressed (the
+# rest of the filename is then used to determine the assembly file's type).
+GZIP_SUFFIX = ".gz"
+# Passing this as an input filename means "read from standard input."
+STDIN_FILENAME = "-"
@@ -0,0 +1,568 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file defines the schema of the .db files output by the preprocessing
+# script, and a DBWriter class that we use to efficiently write data to these
+# files.
+
+import glob
+import os
+import re
+import sqlite3
+import time
+
+from . import config
+from .file_utils import check_file_existence, safe_file_remove
+
+# Maps each table name to a list of the columns in that table. The order of
+# these columns matches the order of values in the tuples returned by the
+# various db_values() methods of the objects in graph_objects/.
+STD_TABLE2COLUMNS = {
+    "nodes": [
+        "id text",
+        "label text",
+        "length integer",
+        "gc_content real",
+        "depth real",
+        "is_repeat integer",
+        "component_rank integer",
+        "x real",
+        "y real",
+        "w real",
+        "h real",
+        "shape text",
+        "parent_cluster_id text",
+    ],
+    "edges": [
+        "source_id text",
+        "target_id text",
+        "multiplicity integer",
+        "thickness real",
+        "is_outlier integer",
+        "orientation text",
+        "mean real",
+        "stdev real",
+        "component_rank integer",
+        "control_point_string text",
+        "control_point_count integer",
+        "parent_cluster_id text",
+    ],
+    "clusters": [
+        "cluster_id text",
+        "length integer",
+        "component_rank integer",
+        "left real",
+        "bottom real",
+        "right real",
+        "top real",
+        "w real",
+        "h real",
+        "cluster_type text",
+    ],
+    "components": [
+        "size_rank integer",
+        "node_count integer",
+        "edge_count integer",
+        "total_length integer",
+        "boundingbox_x real",
+        "boundingbox_y real",
+        "too_large integer",
+        "layout_engine text",
+    ],
+    "assembly": [
+        "filename text",
+        "filetype text",
+        "node_count integer",
+        "edge_count integer",
+        "all_edge_count integer",
+        "component_count integer",
+        "bicomponent_count integer",
+        "single_component_count integer",
+        "total_length integer",
+        "n50 integer",
+        "gc_content real",
+        "dna_given integer",
+        "repeats_given integer",
+        "spqr_given integer",
+        "smallest_viewable_component_rank integer",
+    ],
+}
+
+# Tables that are only created if -spqr is passed.
+SPQR_TABLE2COLUMNS = {
+    "singlenodes": [
+        "id text",
+        "label text",
+        "length integer",
+        "gc_content real",
+        "depth real",
+        "is_repeat integer",
+        "scc_rank integer",
+        "x real",
+        "y real",
+        "i_x real",
+        "i_y real",
+        "w real",
+        "h real",
+        "parent_metanode_id text",
+        "parent_bicomponent_id text",
+    ],
+    "singleedges": [
+        "source_id text",
+        "target_id text",
+        "scc_rank integer",
+        "parent_metanode_id text",
+        "is_virtual integer",
+    ],
+    "bicomponents": [
+        "id_num integer",
+        "root_metanode_id string",
+        "scc_rank integer",
+        "node_count integer",
+        "left real",
+        "bottom real",
+        "right real",
+        "top real",
+        "i_left real",
+        "i_bottom real",
+        "i_right real",
+        "i_top real",
+    ],
+    "metanodes": [
+        "metanode_id text",
+        "scc_rank integer",
+        "parent_bicomponent_id_num integer",
+        "descendant_metanode_count integer",
+        "node_count integer",
+        "total_length integer",
+        "left real",
+        "bottom real",
+        "right real",
+        "top real",
+        "i_left real",
+        "i_bottom real",
+        "i_right real",
+        "i_top real",
+    ],
+    "metanodeedges": [
+        "source_metanode_id text",
+        "target_metanode_id text",
+        "scc_rank integer",
+        "control_point_string text",
+        "control_point_count integer",
+        "parent_bicomponent_id_num integer",
+    ],
+    "singlecomponents": [
+        "size_rank integer",
+        "ex_uncompressed_node_count integer",
+        "ex_uncompressed_edge_count integer",
+        "im_uncompressed_node_count integer",
+        "im_uncompressed_edge_count integer",
+        "compressed_node_count integer",
+        "compressed_edge_count integer",
+        "bicomponent_count integer",
+        "boundingbox_x real",
+        "boundingbox_y real",
+        "i_boundingbox_x real",
+        "i_boundingbox_y real",
+    ],
+}
+
+# Tables that are only created if -stl is passed. searchnodes contains the
+# nodes in connected components that are too large to lay out: we don't store
+# these nodes in the nodes table (since they don't have layout information),
+# but this lets the viewer interface tell the user which component a node is
+# in when they search for it.
+SEARCH_TABLE2COLUMNS = {
+    "searchnodes": [
+        "id text",
+        "label text",
+        "length integer",
+        "component_rank integer",
+    ]
+}
+
+# Tables that are only created if -ss is passed. sequencestore contains a
+# single row giving the filename of the sequence store (see sequence_store.py)
+# containing the DNA sequences of the graph's nodes, relative to the directory
+# containing the .db file.
+SEQUENCE_TABLE2COLUMNS = {
+    "sequencestore": ["filename text", "sequence_count integer"]
+}
+
+# Tables that are only created in the "manifest" .db file, if collate is
+# writing sharded output (see ShardedDBWriter).
+MANIFEST_TABLE2COLUMNS = {
+    "shards": [
+        "shard_index integer",
+        "first_rank integer",
+        "last_rank integer",
+        "filename text",
+    ]
+}
+
+ALL_TABLE2COLUMNS = {}
+ALL_TABLE2COLUMNS.update(STD_TABLE2COLUMNS)
+ALL_TABLE2COLUMNS.update(SPQR_TABLE2COLUMNS)
+ALL_TABLE2COLUMNS.update(SEARCH_TABLE2COLUMNS)
+ALL_TABLE2COLUMNS.update(SEQUENCE_TABLE2COLUMNS)
+ALL_TABLE2COLUMNS.update(MANIFEST_TABLE2COLUMNS)
+
+# When writing sharded output, rows from these tables are written to shard
+# files (based on their component_rank values); rows from all other tables are
+# written to the manifest file.
+SHARDED_TABLES = ("nodes", "edges", "clusters")
+
+# Maps each table name to a list of the indexes we create on it. Each index is
+# described as a tuple of the column(s) it covers. These correspond to the
+# queries the viewer interface makes when drawing a component (e.g.
+# "SELECT * FROM nodes WHERE component_rank = ?").
+#
+# Since we insert rows component-by-component, the rows for a given component
+# are already stored next to each other in each table -- so a plain index
+# (rather than a covering index containing every column, which would about
+# double the size of the .db file) is enough to make these queries fast.
+TABLE2INDEXES = {
+    "nodes": [("component_rank",)],
+    "edges": [("component_rank",)],
+    "clusters": [("component_rank",)],
+    "components": [("size_rank",)],
+    "singlenodes": [
+        ("scc_rank", "parent_metanode_id"),
+        ("parent_metanode_id",),
+    ],
+    "singleedges": [
+        ("scc_rank", "parent_metanode_id"),
+        ("parent_metanode_id",),
+    ],
+    "bicomponents": [("scc_rank",)],
+    "metanodes": [("scc_rank", "metanode_id"), ("metanode_id",)],
+    "metanodeedges": [("source_metanode_id",)],
+    "singlecomponents": [("size_rank",)],
+    "searchnodes": [("id",), ("label",)],
+}
+
+
+class DBWriter(object):
+    """Writes rows to a .db file in batches.
+
+       Rows passed to add_row() are buffered per-table, and are inserted
+       into the database using executemany() once a table's buffer contains
+       config.DB_BATCH_SIZE rows (or when flush() or finish() is called).
+
+       The entire .db file is built in a single transaction, with journaling
+       and synchronous writes disabled -- if collate fails partway through,
+       we'd have to regenerate the .db file from scratch anyway, so the
+       safety these settings normally provide isn't really useful for us.
+    """
+
+    def __init__(
+        self,
+        db_fullfn,
+        spqr=False,
+        search=False,
+        sequences=False,
+        tables=None,
+        index=True,
+        batch_size=config.DB_BATCH_SIZE,
+    ):
+        """Connects to the .db file located at db_fullfn and creates all of
+           the tables we'll write to.
+
+           By default, this creates all of the tables in STD_TABLE2COLUMNS
+           (and, if spqr is True, all of the tables in SPQR_TABLE2COLUMNS;
+           if search is True, all of the tables in SEARCH_TABLE2COLUMNS;
+           and, if sequences is True, all of the tables in
+           SEQUENCE_TABLE2COLUMNS).
+           If tables is not None, it's interpreted as a list of the names of
+           the tables to create instead.
+
+           If index is True, the indexes described in TABLE2INDEXES will be
+           created on these tables when finish() is called.
+        """
+        self.batch_size = batch_size
+        self.index = index
+        if tables is None:
+            tables = list(STD_TABLE2COLUMNS.keys())
+            if spqr:
+                tables += list(SPQR_TABLE2COLUMNS.keys())
+            if search:
+                tables += list(SEARCH_TABLE2COLUMNS.keys())
+            if sequences:
+                tables += list(SEQUENCE_TABLE2COLUMNS.keys())
+        self.table2columns = {}
+        for table in tables:
+            self.table2columns[table] = ALL_TABLE2COLUMNS[table]
+        # Setting isolation_level to None stops the sqlite3 module from
+        # implicitly opening (and committing) transactions on its own, so we
+        # can manage the single transaction ourselves
+        self.connection = sqlite3.connect(db_fullfn, isolation_level=None)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=OFF")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        self.cursor.execute("BEGIN")
+        self.table2insertion_stmt = {}
+        self.table2buffer = {}
+        for table, columns in self.table2columns.items():
+            self.cursor.execute(
+                "CREATE TABLE {} ({})".format(table, ", ".join(columns))
+            )
+            # The number of question marks has to match the number of table
+            # columns
+            stmt = "INSERT INTO {} VALUES ({})"
+            self.table2insertion_stmt[table] = stmt.format(
+                table, ",".join("?" * len(columns))
+            )
+            self.table2buffer[table] = []
+        self.row_count = 0
+        # Only counts time spent actually writing to the database, so that
+        # the rows/sec rate we report isn't skewed by the time spent on
+        # layout in between calls to add_row()
+        self.write_time = 0
+
+    def add_row(self, table, values):
+        """Adds a tuple of values to be inserted into a table.
+
+           The row might not be inserted into the database until later.
+        """
+        buf = self.table2buffer[table]
+        buf.append(values)
+        if len(buf) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        """Inserts all buffered rows for a table into the database.
+
+           If table is None, this does this for every table.
+        """
+        if table is None:
+            tables = self.table2buffer.keys()
+        else:
+            tables = [table]
+        t0 = time.time()
+        for t in tables:
+            buf = self.table2buffer[t]
+            if len(buf) > 0:
+                self.cursor.executemany(self.table2insertion_stmt[t], buf)
+                self.row_count += len(buf)
+                self.table2buffer[t] = []
+        self.write_time += time.time() - t0
+
+    def create_indexes(self):
+        """Creates the indexes described in TABLE2INDEXES on every table that
+           we've created.
+
+           It's faster to do this once after all rows have been inserted than
+           to create the indexes up front and update them with every insert.
+        """
+        for table in self.table2columns:
+            for columns in TABLE2INDEXES.get(table, []):
+                self.cursor.execute(
+                    "CREATE INDEX {}_{}_index ON {} ({})".format(
+                        table, "_".join(columns), table, ", ".join(columns)
+                    )
+                )
+
+    def finish(self):
+        """Flushes all remaining rows, creates indexes (if index was True),
+           commits the transaction, and closes the connection to the database.
+
+           Returns a 2-tuple of (number of rows written, rows written per
+           second); the latter is None if no time was spent writing rows.
+        """
+        self.flush()
+        t0 = time.time()
+        if self.index:
+            self.create_indexes()
+        self.cursor.execute("COMMIT")
+        self.connection.close()
+        self.write_time += time.time() - t0
+        rows_per_sec = None
+        if self.write_time > 0:
+            rows_per_sec = self.row_count / self.write_time
+        return self.row_count, rows_per_sec
+
+
+def get_shard_prefix(db_fn):
+    """Returns the prefix of the filenames of the shard files that a
+       ShardedDBWriter will create for the manifest file db_fn (i.e. db_fn
+       without its .db suffix).
+    """
+    if db_fn.endswith(".db"):
+        return db_fn[:-3]
+    return db_fn
+
+
+def find_shard_files(db_fullfn):
+    """Returns a list of the full paths of all files that already exist and
+       have the name of a shard file for the manifest file db_fullfn, sorted
+       by shard index.
+
+       This includes shard files beyond the number of shards that'll be
+       written this time (e.g. left over from an earlier run with a smaller
+       shard size), since these would otherwise look like part of the output.
+    """
+    dir_fn, db_fn = os.path.split(db_fullfn)
+    shard_prefix = get_shard_prefix(db_fn)
+    shard_fn_regex = re.compile(re.escape(shard_prefix) + r"_shard(\d+)\.db$")
+    index_and_fullfns = []
+    pattern = os.path.join(glob.escape(dir_fn), glob.escape(shard_prefix))
+    for shard_fullfn in glob.glob(pattern + "_shard*.db"):
+        match = shard_fn_regex.match(os.path.basename(shard_fullfn))
+        if match is not None:
+            index_and_fullfns.append((int(match.group(1)), shard_fullfn))
+    return [fullfn for index, fullfn in sorted(index_and_fullfns)]
+
+
+class ShardedDBWriter(object):
+    """Writes a "manifest" .db file, containing the assembly and components
+       tables (as well as a shards table listing all shard files), along with
+       a series of "shard" .db files, each containing the nodes, edges, and
+       clusters tables for a range of component size ranks.
+
+       This allows the viewer interface to only load the data for the
+       component it's currently drawing.
+
+       This supports the same add_row() and finish() interface as DBWriter.
+       Note that rows for the SHARDED_TABLES must be added in ascending order
+       of component rank, and that SPQR mode tables aren't supported here.
+       The SEARCH_TABLE2COLUMNS tables (if search is True) are stored in the
+       manifest, so that the viewer can search them without loading any
+       shards; so are the SEQUENCE_TABLE2COLUMNS tables (if sequences is
+       True).
+    """
+
+    def __init__(
+        self,
+        db_fullfn,
+        shard_size,
+        overwrite,
+        search=False,
+        sequences=False,
+        index=True,
+        batch_size=config.DB_BATCH_SIZE,
+    ):
+        """Creates the manifest file at db_fullfn. Shard files will be created
+           (in the same directory as db_fullfn) as needed, with each
+           containing shard_size connected components' worth of data.
+
+           If overwrite is False, an error will be raised if a shard file
+           already exists. (collate checks for existing shard files up front,
+           using find_shard_files(), so this should only happen if one is
+           created while collate is running.)
+        """
+        self.shard_size = shard_size
+        self.overwrite = overwrite
+        self.index = index
+        self.batch_size = batch_size
+        manifest_tables = list(STD_TABLE2COLUMNS.keys()) + list(
+            MANIFEST_TABLE2COLUMNS.keys()
+        )
+        if search:
+            manifest_tables += list(SEARCH_TABLE2COLUMNS.keys())
+        if sequences:
+            manifest_tables += list(SEQUENCE_TABLE2COLUMNS.keys())
+        self.manifest = DBWriter(
+            db_fullfn,
+            tables=manifest_tables,
+            index=index,
+            batch_size=batch_size,
+        )
+        # The manifest file itself still contains empty nodes/edges/clusters
+        # tables, so that "SELECT * FROM nodes" etc. still work on it. We just
+        # don't store any rows in these tables in the manifest.
+        self.dir_fn, db_fn = os.path.split(db_fullfn)
+        self.shard_prefix = get_shard_prefix(db_fn)
+        self.table2rank_index = {}
+        for table in SHARDED_TABLES:
+            self.table2rank_index[table] = STD_TABLE2COLUMNS[table].index(
+                "component_rank integer"
+            )
+        self.curr_shard = None
+        self.curr_shard_index = None
+        self.row_count = 0
+        self.write_time = 0
+
+    def shard_filename(self, shard_index):
+        """Returns the filename of the shard with the given index."""
+        return "{}_shard{}.db".format(self.shard_prefix, shard_index)
+
+    def _close_curr_shard(self):
+        if self.curr_shard is not None:
+            self.curr_shard.finish()
+            self.row_count += self.curr_shard.row_count
+            self.write_time += self.curr_shard.write_time
+            first_rank = (self.curr_shard_index * self.shard_size) + 1
+            self.manifest.add_row(
+                "shards",
+                (
+                    self.curr_shard_index,
+                    first_rank,
+                    first_rank + self.shard_size - 1,
+                    self.shard_filename(self.curr_shard_index),
+                ),
+            )
+            self.curr_shard = None
+
+    def add_row(self, table, values):
+        """Adds a tuple of values to be inserted into a table, either in the
+           appropriate shard file or in the manifest file.
+        """
+        if table not in SHARDED_TABLES:
+            self.manifest.add_row(table, values)
+            return
+        rank = values[self.table2rank_index[table]]
+        shard_index = (rank - 1) // self.shard_size
+        if shard_index != self.curr_shard_index:
+            if (
+                self.curr_shard_index is not None
+                and shard_index < self.curr_shard_index
+            ):
+                raise ValueError(
+                    "Rows must be added in ascending order of component rank"
+                )
+            self._close_curr_shard()
+            shard_fullfn = os.path.join(
+                self.dir_fn, self.shard_filename(shard_index)
+            )
+            if check_file_existence(shard_fullfn, self.overwrite):
+                safe_file_remove(shard_fullfn)
+            self.curr_shard = DBWriter(
+                shard_fullfn,
+                tables=SHARDED_TABLES,
+                index=self.index,
+                batch_size=self.batch_size,
+            )
+            self.curr_shard_index = shard_index
+        self.curr_shard.add_row(table, values)
+
+    def finish(self):
+        """Finishes writing the last shard file and the manifest file.
+
+           Returns a 2-tuple of (number of rows written across all files,
+           rows written per second); the latter is None if no time was spent
+           writing rows.
+        """
+        self._close_curr_shard()
+        self.manifest.finish()
+        self.row_count += self.manifest.row_count
+        self.write_time += self.manifest.write_time
+        rows_per_sec = None
+        if self.write_time > 0:
+            rows_per_sec = self.row_count / self.write_time
+        return self.row_count, rows_per_sec
@@ -0,0 +1,68 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains utilities for building the DOT strings we pass to
+# GraphViz.
+#
+# DOT strings are built up as lists of "chunks" of text, which are only
+# joined together once the entire string has been built. Building these
+# strings via repeated concatenation (i.e. dot_str += "...") instead can take
+# quadratic time for large components, since each concatenation might copy
+# the entire string built so far.
+
+from . import config
+
+
+def start_dot_lines(
+    name,
+    graph_type="digraph",
+    graph_attrs=(),
+    node_style=True,
+    edge_style=True,
+):
+    """Returns a list containing the opening lines of a DOT string for a
+       graph with the given name: the "digraph name {" (or "graph name {",
+       etc.) line, and lines setting the global graph, node, and edge styles
+       in config.
+
+       graph_attrs is an iterable of extra graph attribute settings (e.g.
+       'overlap="false"') to include after config.GRAPH_STYLE. If node_style
+       or edge_style are False, config.GLOBALNODE_STYLE or
+       config.GLOBALEDGE_STYLE (respectively) aren't included.
+
+       Lines of the graph's body can be appended to the returned list, and
+       then the finished DOT string can be obtained using finish_dot_lines().
+    """
+    lines = ["%s %s {\n" % (graph_type, name)]
+    if config.GRAPH_STYLE != "":
+        lines.append("\t%s;\n" % (config.GRAPH_STYLE))
+    for attr in graph_attrs:
+        lines.append("\t%s;\n" % (attr))
+    if node_style and config.GLOBALNODE_STYLE != "":
+        lines.append("\tnode [%s];\n" % (config.GLOBALNODE_STYLE))
+    if edge_style and config.GLOBALEDGE_STYLE != "":
+        lines.append("\tedge [%s];\n" % (config.GLOBALEDGE_STYLE))
+    return lines
+
+
+def finish_dot_lines(lines):
+    """Closes the graph started by start_dot_lines() and returns the entire
+       DOT string.
+    """
+    lines.append("}")
+    return "".join(lines)
@@ -1,5 +1,8 @@
 import os
 import errno
+import gzip
+import sys
+from contextlib import nullcontext
 from . import config
 from .msg_utils import operation_msg
 
@@ -138,3 +141,33 @@ def save_aux_file(
         else:
             operation_msg(msg, newline=True)
         return False
+
+
+def strip_gzip_suffix(filename):
+    """Returns filename without its trailing config.GZIP_SUFFIX (matched
+       case-insensitively), if present. Otherwise returns filename unchanged.
+
+       This is useful for figuring out the type of a compressed file: e.g.
+       "asm.LastGraph.gz" -> "asm.LastGraph".
+    """
+    if filename.lower().endswith(config.GZIP_SUFFIX):
+        return filename[: -len(config.GZIP_SUFFIX)]
+    return filename
+
+
+def open_text_input(filename):
+    """Opens an input file for reading as text, and returns a context manager
+       that yields a file object (so this can be used exactly like open() in a
+       with statement).
+
+       If filename is config.STDIN_FILENAME, this yields sys.stdin (which is
+       not closed upon leaving the with statement). If filename ends with
+       config.GZIP_SUFFIX, the file is decompressed on the fly. Either way,
+       the input is only read as a stream, so callers shouldn't try to seek()
+       within it.
+    """
+    if filename == config.STDIN_FILENAME:
+        return nullcontext(sys.stdin)
+    if filename.lower().endswith(config.GZIP_SUFFIX):
+        return gzip.open(filename, "rt")
+    return open(filename, "r")
@@ -0,0 +1,250 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file defines GraphCore, a compact "array-backed" representation of the
+# (double) assembly graph that collate builds while parsing an assembly graph
+# file. Rather than creating a Node object for every node and an Edge object
+# for every edge, we give each node an integer index (in the order in which
+# nodes are added) and store each attribute of the graph's nodes and edges in
+# a column indexed by these integers. The graph's adjacency is stored in NumPy
+# arrays in compressed sparse row (CSR) form.
+#
+# Connected components are found, and contigs and edges are scaled, using
+# these arrays (see component_utils). Node and Edge objects -- which pattern
+# detection and layout still work with -- are then only created for the
+# components that need them; see GraphCore.make_views().
+
+import array
+import itertools
+from math import log
+import numpy
+
+from . import config
+from .graph_objects import Node
+
+
+class GraphCore(object):
+    """An assembly graph stored in columns, rather than in Node objects.
+
+       Nodes and edges are added using add_node() and add_edge(); once all
+       of them have been added, finish() converts the columns to NumPy
+       arrays (where applicable) and builds the graph's CSR adjacency:
+
+       -self.indptr and self.indices give the targets of each node's
+        outgoing edges: those of node i are
+        self.indices[self.indptr[i]:self.indptr[i + 1]], in the order in
+        which the edges were added.
+
+       -self.sources and self.targets give the ends of edge e (numbered in
+        the order in which edges were added) as self.sources[e] and
+        self.targets[e].
+
+       -self.is_distinct[e] is True if e is the last edge added from
+        self.sources[e] to self.targets[e]. Like Node.outgoing_edge_objects,
+        we only count one edge (the last one) for each pair of nodes with
+        parallel edges between them.
+    """
+
+    def __init__(self):
+        # Maps each node's ID to its index
+        self.id2index = {}
+        # Node attribute columns
+        self.ids = []
+        self.bps = array.array("q")
+        self.is_complements = array.array("b")
+        self.depths = []
+        self.gc_contents = []
+        self.labels = []
+        self.is_repeats = []
+        # Edge attribute columns
+        self.sources = array.array("q")
+        self.targets = array.array("q")
+        self.multiplicities = []
+        self.orientations = []
+        self.means = []
+        self.stdevs = []
+        self.node_ct = 0
+        self.edge_ct = 0
+
+    def add_node(
+        self,
+        id_string,
+        bp,
+        is_complement,
+        depth=None,
+        gc_content=None,
+        label=None,
+        is_repeat=None,
+    ):
+        """Adds a node to the graph. The arguments here are the same as
+           those of the Node constructor.
+
+           Raises an AttributeError if a node with this ID has already been
+           added to the graph.
+        """
+        if id_string in self.id2index:
+            raise AttributeError(config.DUPLICATE_ID_ERR + id_string)
+        self.id2index[id_string] = self.node_ct
+        self.node_ct += 1
+        self.ids.append(id_string)
+        self.bps.append(bp)
+        self.is_complements.append(is_complement)
+        self.depths.append(depth)
+        self.gc_contents.append(gc_content)
+        self.labels.append(label)
+        self.is_repeats.append(is_repeat)
+
+    def add_edge(
+        self,
+        source_id,
+        target_id,
+        multiplicity=None,
+        orientation=None,
+        mean=None,
+        stdev=None,
+    ):
+        """Adds an edge from the node with ID source_id to the node with ID
+           target_id. The optional arguments here are the same as those of
+           Node.add_outgoing_edge().
+
+           Raises a KeyError if either of these nodes hasn't been added yet.
+        """
+        self.sources.append(self.id2index[source_id])
+        self.targets.append(self.id2index[target_id])
+        self.edge_ct += 1
+        self.multiplicities.append(multiplicity)
+        self.orientations.append(orientation)
+        self.means.append(mean)
+        self.stdevs.append(stdev)
+
+    def finish(self):
+        """Builds the graph's arrays, once all nodes and edges are added.
+
+           This also sets up the columns that component_utils'
+           scale_core_contigs() and scale_core_edges() fill in. These contain
+           NaN for nodes and edges that haven't been scaled, which keep
+           their default relative lengths, thicknesses, etc.
+        """
+        # We compute log lengths the same way Node does, so that they're
+        # exactly the same as the ones the Nodes we create later will have
+        log_bases = itertools.repeat(config.CONTIG_SCALING_LOG_BASE)
+        self.logbps = numpy.fromiter(
+            map(log, self.bps, log_bases),
+            dtype=float,
+            count=self.node_ct,
+        )
+        self.bps = numpy.array(self.bps, dtype=numpy.int64)
+        self.is_complements = numpy.array(self.is_complements, dtype=bool)
+        self.sources = numpy.array(self.sources, dtype=numpy.int64)
+        self.targets = numpy.array(self.targets, dtype=numpy.int64)
+
+        out_degrees = numpy.bincount(self.sources, minlength=self.node_ct)
+        self.indptr = numpy.zeros(self.node_ct + 1, dtype=numpy.int64)
+        numpy.cumsum(out_degrees, out=self.indptr[1:])
+        self.indices = self.targets[numpy.argsort(self.sources, kind="stable")]
+
+        # Sorting the edges by (source, target, edge index) puts parallel
+        # edges next to each other, with the last one added coming last
+        order = numpy.lexsort(
+            (numpy.arange(self.edge_ct), self.targets, self.sources)
+        )
+        sorted_sources = self.sources[order]
+        sorted_targets = self.targets[order]
+        is_last = numpy.ones(self.edge_ct, dtype=bool)
+        is_last[:-1] = (sorted_sources[1:] != sorted_sources[:-1]) | (
+            sorted_targets[1:] != sorted_targets[:-1]
+        )
+        self.is_distinct = numpy.zeros(self.edge_ct, dtype=bool)
+        self.is_distinct[order[is_last]] = True
+
+        self.relative_lengths = numpy.full(self.node_ct, numpy.nan)
+        self.longside_proportions = numpy.full(self.node_ct, numpy.nan)
+        self.thicknesses = numpy.full(self.edge_ct, numpy.nan)
+        self.is_outliers = numpy.zeros(self.edge_ct, dtype=numpy.int64)
+
+    def out_degrees(self):
+        """Returns an array of the number of outgoing edges of each node."""
+        return numpy.diff(self.indptr)
+
+    def make_views(self, node_mask):
+        """Creates Node objects (and the Edge objects of the edges between
+           them) for some of the nodes in the graph. This should only be
+           called after finish().
+
+           node_mask should be a boolean array with an element for each
+           node, indicating which nodes to create Node objects for. The
+           Nodes' edges are added in the order in which they were added to
+           the graph -- so these Nodes (and their outgoing_nodes,
+           incoming_nodes, etc.) are exactly the same as they would've been
+           if we'd created them while parsing the graph. Any scaling done by
+           component_utils is copied to the Nodes and Edges.
+
+           Returns a dict mapping the IDs of the selected nodes to their
+           Node objects, in order of the nodes' indices.
+        """
+        node_indices = numpy.flatnonzero(node_mask)
+        index2node = {}
+        for i, bp, is_complement, rl, lp in zip(
+            node_indices.tolist(),
+            self.bps[node_indices].tolist(),
+            self.is_complements[node_indices].tolist(),
+            self.relative_lengths[node_indices].tolist(),
+            self.longside_proportions[node_indices].tolist(),
+        ):
+            n = Node(
+                self.ids[i],
+                bp,
+                is_complement,
+                depth=self.depths[i],
+                gc_content=self.gc_contents[i],
+                label=self.labels[i],
+                is_repeat=self.is_repeats[i],
+            )
+            # (NaN is the only value that isn't equal to itself)
+            if rl == rl:
+                n.relative_length = rl
+                n.longside_proportion = lp
+            index2node[i] = n
+
+        edge_indices = numpy.flatnonzero(
+            node_mask[self.sources] & node_mask[self.targets]
+        )
+        for e, s, t, is_distinct, thickness, is_outlier in zip(
+            edge_indices.tolist(),
+            self.sources[edge_indices].tolist(),
+            self.targets[edge_indices].tolist(),
+            self.is_distinct[edge_indices].tolist(),
+            self.thicknesses[edge_indices].tolist(),
+            self.is_outliers[edge_indices].tolist(),
+        ):
+            source = index2node[s]
+            target = index2node[t]
+            source.add_outgoing_edge(
+                target,
+                multiplicity=self.multiplicities[e],
+                orientation=self.orientations[e],
+                mean=self.means[e],
+                stdev=self.stdevs[e],
+            )
+            # Only the last of a set of parallel edges is kept in
+            # outgoing_edge_objects, so that's the only one that was scaled
+            if is_distinct and thickness == thickness:
+                edge = source.outgoing_edge_objects[target.id_string]
+                edge.thickness = thickness
+                edge.is_outlier = is_outlier
+        return {n.id_string: n for n in index2node.values()}
@@ -1,6 +1,7 @@
 from .assembly_graph import AssemblyGraph
 from .component import Component
 from .patterns import Bubble, Rope, Chain, Cycle, MiscPattern
+from .pattern_detector import PatternDetector
 from .spqr_mode_objects import SPQRMetaNode, Bicomponent
 from .basic_objects import Edge, Node, NodeGroup
 
@@ -12,6 +13,7 @@ __all__ = [
     "Chain",
     "Cycle",
     "MiscPattern",
+    "PatternDetector",
     "SPQRMetaNode",
     "Bicomponent",
     "Edge",
@@ -22,9 +22,15 @@
 # performing layout.
 
 from math import log
-import pygraphviz
+from types import MappingProxyType
 
 from .. import config
+from ..dot_utils import start_dot_lines, finish_dot_lines
+from ..layout_utils import layout_dot_string, LayoutResult
+
+# Returned by Node.outgoing_edge_objects for nodes without any outgoing edges,
+# so that we don't need to create an empty dict for each of these nodes.
+_NO_EDGES = MappingProxyType({})
 
 
 class Edge(object):
@@ -33,6 +39,27 @@ class Edge(object):
        metadata (e.g. multiplicity).
     """
 
+    # Using __slots__ (rather than a per-instance __dict__) cuts the memory
+    # used by each Edge (and each Node, etc.) substantially -- which adds up
+    # for graphs with millions of edges. This does mean that every attribute
+    # of an Edge must be listed here.
+    __slots__ = (
+        "source_id",
+        "target_id",
+        "multiplicity",
+        "orientation",
+        "mean",
+        "stdev",
+        "thickness",
+        "is_outlier",
+        "group",
+        "component_size_rank",
+        "xdot_ctrl_pt_str",
+        "xdot_ctrl_pt_count",
+        "xdot_rel_ctrl_pt_str",
+        "is_virtual",
+    )
+
     def __init__(
         self,
         source_id,
@@ -190,6 +217,38 @@ class Node(object):
        and as the superclass for groups of nodes.
     """
 
+    __slots__ = (
+        "id_string",
+        "bp",
+        "logbp",
+        "depth",
+        "gc_content",
+        "label",
+        "is_repeat",
+        "is_complement",
+        "is_single",
+        "outgoing_nodes",
+        "incoming_nodes",
+        "_outgoing_edge_objects",
+        "used_in_collapsing",
+        "is_subsumed",
+        "group",
+        "_parent_spqrnode2relpos",
+        "_parent_bicomponents",
+        "component_size_rank",
+        "relative_length",
+        "longside_proportion",
+        "width",
+        "height",
+        "xdot_x",
+        "xdot_y",
+        "xdot_shape",
+        "xdot_rel_x",
+        "xdot_rel_y",
+        "xdot_ix",
+        "xdot_iy",
+    )
+
     def __init__(
         self,
         id_string,
@@ -223,19 +282,10 @@ class Node(object):
         self.outgoing_nodes = []
         # List of nodes from which this node has an incoming edge
         self.incoming_nodes = []
-        # Dict of Edge objects that have this node as a source -- used for
-        # storing/reading more detailed edge information, not used for graph
-        # traversal. Edge objects are stored as values, and their
-        # corresponding key is the sink (target) node ID of the edge.
-        # ...e.g. for 1->2, 1->3, 1->4, outgoing_edge_objects would look like
-        # {2: Edge(1, 2), 3: Edge(1, 3), 4: Edge(1, 4)}
-        self.outgoing_edge_objects = {}
-        # Flag variables we use to make DFS/finding connected components
-        # more efficient (maintaining a list or dict of this info is more
-        # expensive than just using attributes, like this)
-        self.seen_in_dfs = False
-        self.in_nodes_to_check = False
-        self.seen_in_ccomponent = False
+        # Dict of Edge objects that have this node as a source (see the
+        # outgoing_edge_objects property). This is only created once we add
+        # an outgoing edge to this node.
+        self._outgoing_edge_objects = None
         self.used_in_collapsing = False
         # If we decide to subsume a node group into another node group,
         # thus removing the initial node group, we use this flag to
@@ -244,13 +294,11 @@ class Node(object):
         # When we collapse nodes into a node group, we change this variable
         # to reference the NodeGroup object in question
         self.group = None
-        # Used in the case of nodes in an SPQR tree
-        # there should be m + 1 entries in this thing, where m = # of metanodes
-        # in the SPQR tree that this node is in. The + 1 is for the parent
-        # bicomponent of this node.
-        self.parent_spqrnode2relpos = {}
-        # Indicates the Bicomponent(s) in which this node is present
-        self.parent_bicomponents = set()
+        # SPQR-mode-only containers: these are only created if they're
+        # actually used (see the parent_spqrnode2relpos and
+        # parent_bicomponents properties).
+        self._parent_spqrnode2relpos = None
+        self._parent_bicomponents = None
         # Reference to the "size rank" (1 for largest, 2 for 2nd largest,
         # ...) of the connected component to which this node belongs.
         self.component_size_rank = -1
@@ -279,6 +327,41 @@ class Node(object):
         self.xdot_ix = None
         self.xdot_iy = None
 
+    @property
+    def outgoing_edge_objects(self):
+        """Dict of Edge objects that have this node as a source -- used for
+           storing/reading more detailed edge information, not used for graph
+           traversal. Edge objects are stored as values, and their
+           corresponding key is the sink (target) node ID of the edge.
+           ...e.g. for 1->2, 1->3, 1->4, outgoing_edge_objects would look like
+           {2: Edge(1, 2), 3: Edge(1, 3), 4: Edge(1, 4)}
+
+           If this node doesn't have any outgoing edges, this is a (shared)
+           empty read-only mapping. Use add_outgoing_edge() to add edges.
+        """
+        if self._outgoing_edge_objects is None:
+            return _NO_EDGES
+        return self._outgoing_edge_objects
+
+    @property
+    def parent_spqrnode2relpos(self):
+        """Used in the case of nodes in an SPQR tree.
+
+           There should be m + 1 entries in this thing, where m = # of
+           metanodes in the SPQR tree that this node is in. The + 1 is for the
+           parent bicomponent of this node.
+        """
+        if self._parent_spqrnode2relpos is None:
+            self._parent_spqrnode2relpos = {}
+        return self._parent_spqrnode2relpos
+
+    @property
+    def parent_bicomponents(self):
+        """Indicates the Bicomponent(s) in which this node is present."""
+        if self._parent_bicomponents is None:
+            self._parent_bicomponents = set()
+        return self._parent_bicomponents
+
     def set_dimensions(self):
         """Calculates the width and height of this node and assigns them to
            this node's self.width and self.height attributes, respectively.
@@ -322,14 +405,12 @@ class Node(object):
            file for input to GraphViz.
         """
         self.set_dimensions()
-        info = "\t%s [height=%g,width=%g,shape=" % (
+        return "\t%s [height=%g,width=%g,shape=%s];\n" % (
             self.id_string,
             self.height,
             self.width,
+            self.get_shape(),
         )
-        info += self.get_shape()
-        info += "];\n"
-        return info
 
     def add_outgoing_edge(
         self, node2, multiplicity=None, orientation=None, mean=None, stdev=None
@@ -342,7 +423,9 @@ class Node(object):
         """
         self.outgoing_nodes.append(node2)
         node2.incoming_nodes.append(self)
-        self.outgoing_edge_objects[node2.id_string] = Edge(
+        if self._outgoing_edge_objects is None:
+            self._outgoing_edge_objects = {}
+        self._outgoing_edge_objects[node2.id_string] = Edge(
             self.id_string,
             node2.id_string,
             multiplicity=multiplicity,
@@ -358,20 +441,24 @@ class Node(object):
            Useful for only printing edges relevant to the nodes we're
            interested in.
 
-           If constrained_nodes is not None, then it is interpreted as a list
-           of nodes to "constrain" the edges: that is, edges pointing to the
-           nodes within this list are the only edges whose info will be
-           included in the returned string.
+           If constrained_nodes is not None, then it is interpreted as a
+           collection of nodes to "constrain" the edges: that is, edges
+           pointing to the nodes within this collection are the only edges
+           whose info will be included in the returned string. (Passing a set
+           here is a lot faster than passing a list, since we check
+           membership in constrained_nodes once per outgoing edge.)
         """
-        o = ""
         # Since we only care about the target ID and not about any other
         # edge data it's most efficient to just traverse self.outgoing_nodes
-        for m in self.outgoing_nodes:
-            # Due to short-circuiting, (m in constrained_nodes) is only
-            # evaluated when constrained_nodes is not None.
-            if (constrained_nodes is None) or (m in constrained_nodes):
-                o += "\t%s -> %s\n" % (self.id_string, m.id_string)
-        return o
+        # (Due to short-circuiting, (m in constrained_nodes) is only
+        # evaluated when constrained_nodes is not None.)
+        return "".join(
+            [
+                "\t%s -> %s\n" % (self.id_string, m.id_string)
+                for m in self.outgoing_nodes
+                if (constrained_nodes is None) or (m in constrained_nodes)
+            ]
+        )
 
     def collapsed_edge_info(self):
         """Returns a GraphViz-compatible string (like in edge_info()) but:
@@ -388,7 +475,7 @@ class Node(object):
             not a node group) and b is the id_string of the original target
             node of the edge.
         """
-        o = ""
+        o = []
         if self.group is not None:
             source_id = "cluster_" + self.group.gv_id_string
         else:
@@ -400,14 +487,19 @@ class Node(object):
             # includes edges potentially between groups)
             if self.outgoing_edge_objects[m.id_string].group is None:
                 if m.group is None:
-                    o += "\t%s -> %s %s\n" % (source_id, m.id_string, comment)
+                    o.append(
+                        "\t%s -> %s %s\n" % (source_id, m.id_string, comment)
+                    )
                 else:
-                    o += "\t%s -> %s %s\n" % (
-                        source_id,
-                        "cluster_" + m.group.gv_id_string,
-                        comment,
+                    o.append(
+                        "\t%s -> %s %s\n"
+                        % (
+                            source_id,
+                            "cluster_" + m.group.gv_id_string,
+                            comment,
+                        )
                     )
-        return o
+        return "".join(o)
 
     def set_component_rank(self, component_size_rank):
         """Sets the component_size_rank property of this node and of all
@@ -530,6 +622,30 @@ class NodeGroup(Node):
     plural_name = "other_structural_patterns"
     type_name = "Other"
 
+    __slots__ = (
+        "node_count",
+        "edge_count",
+        "gv_id_string",
+        "cy_id_string",
+        "nodes",
+        "edges",
+        "childid2obj",
+        "xdot_c_width",
+        "xdot_c_height",
+        "xdot_left",
+        "xdot_bottom",
+        "xdot_right",
+        "xdot_top",
+        "xdot_ic_width",
+        "xdot_ic_height",
+        "xdot_ileft",
+        "xdot_ibottom",
+        "xdot_iright",
+        "xdot_itop",
+        "interior_edge_list",
+        "has_isolated_layout",
+    )
+
     def __init__(
         self, group_prefix, nodes, spqr_related=False, unique_id=None
     ):
@@ -599,40 +715,91 @@ class NodeGroup(Node):
         self.xdot_ibottom = None
         self.xdot_iright = None
         self.xdot_itop = None
+        # Computed (at most once) by interior_edges()
+        self.interior_edge_list = None
+        # Set to True once this node group's isolated layout has been read,
+        # so that we don't lay it out (or record its edges) more than once
+        self.has_isolated_layout = False
         if unique_id is not None:
             self.gv_id_string += unique_id
             self.cy_id_string = self.gv_id_string
         super(NodeGroup, self).__init__(self.gv_id_string, self.bp, False)
 
-    def layout_isolated(self):
+    def layout_isolated(self, cache=None):
         """Lays out this node group by itself. Stores layout information in
            the attributes of both this NodeGroup object and its child
            nodes/edges.
+
+           If cache (a layout_utils.LayoutCache or ShapeLayoutCache) is
+           given, the layout is taken from it if possible.
         """
-        # pipe .gv into pygraphviz to lay out this node group
-        gv_input = ""
-        gv_input += "digraph nodegroup {\n"
-        if config.GRAPH_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-        if config.GLOBALNODE_STYLE != "":
-            gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
-        if config.GLOBALEDGE_STYLE != "":
-            gv_input += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
-        gv_input += self.node_info(backfill=False)
-        for n in self.nodes:
-            # Ensure that only the edges that point to nodes that are within
-            # the node group are present; ensures layout is restricted to just
-            # the node group in question.
-            # This works because the edges we consider in the first place all
-            # originate from nodes within the node group, so we don't have to
-            # worry about edges originating from nodes outside the node group.
-            gv_input += n.edge_info(constrained_nodes=self.nodes)
-        gv_input += "}"
-        cg = pygraphviz.AGraph(gv_input)
-        cg.layout(prog="dot")
+        # pipe .gv into pygraphviz to lay out this node group. We go through
+        # layout_dot_string() (as is done when node groups are laid out in
+        # parallel), and read the layout in the order of the nodes and edges
+        # in gv_input, so that the order in which we see the laid-out nodes
+        # and edges doesn't depend on how many processes collate is using.
+        if self.has_isolated_layout:
+            return
+        gv_input = self.isolated_dot_input()
+        self.read_isolated_layout(
+            LayoutResult(
+                layout_dot_string(gv_input, cache=cache)[0], gv_input
+            )
+        )
+
+    def isolated_dot_input(self):
+        """Returns a DOT string describing just this node group (its child
+           nodes, and the edges between them) that can be laid out by
+           itself.
+
+           This is split out from layout_isolated() so that the layout can
+           be performed elsewhere (e.g. in another process, when collate is
+           run with --jobs), with the result then being passed to
+           read_isolated_layout().
+        """
+        gv_lines = start_dot_lines("nodegroup")
+        gv_lines.append(self.node_info(backfill=False))
+        for n, m in self.interior_edges():
+            gv_lines.append("\t%s -> %s\n" % (n.id_string, m.id_string))
+        return finish_dot_lines(gv_lines)
+
+    def interior_edges(self):
+        """Returns a list of (source Node, target Node) tuples describing the
+           edges between the child nodes of this node group.
+
+           Only edges that point to nodes within the node group are
+           included, so that laying out these edges restricts the layout to
+           just the node group in question. This works because the edges we
+           consider in the first place all originate from nodes within the
+           node group, so we don't have to worry about edges originating from
+           nodes outside the node group.
+
+           The list is computed the first time this is called, and reused
+           afterwards.
+        """
+        if self.interior_edge_list is None:
+            child_nodes = set(self.nodes)
+            self.interior_edge_list = [
+                (n, m)
+                for n in self.nodes
+                for m in n.outgoing_nodes
+                if m in child_nodes
+            ]
+        return self.interior_edge_list
+
+    def read_isolated_layout(self, layout):
+        """Given the layout_utils.LayoutResult of this node group's laid-out
+           isolated_dot_input(), stores layout information in the attributes
+           of both this NodeGroup object and its child nodes/edges.
+
+           If this node group's isolated layout has already been read, this
+           does nothing.
+        """
+        if self.has_isolated_layout:
+            return
+        self.has_isolated_layout = True
         # Obtain cluster width and height from the layout
-        bounding_box_text = cg.subgraphs()[0].graph_attr[u"bb"]
-        bounding_box_numeric = [float(y) for y in bounding_box_text.split(",")]
+        bounding_box_numeric = layout.subgraph_bbs[0][1]
         self.xdot_c_width = bounding_box_numeric[2] - bounding_box_numeric[0]
         self.xdot_c_height = bounding_box_numeric[3] - bounding_box_numeric[1]
         # convert width and height from points to inches
@@ -640,28 +807,31 @@ class NodeGroup(Node):
         self.xdot_c_height /= config.POINTS_PER_INCH
         # Obtain node layout info
         # NOTE: we could iterate over the subgraph's nodes or over the entire
-        # graph (cg)'s nodes -- same result, since the only nodes in the graph
+        # graph's nodes -- same result, since the only nodes in the graph
         # are in the subgraph.
-        for n in cg.nodes():
-            curr_node = self.childid2obj[str(n)]
+        for n, pos, shape in zip(
+            layout.node_names, layout.node_positions, layout.node_shapes
+        ):
+            curr_node = self.childid2obj[n]
             # Record the relative position (within the node group's bounding
             # box) of this child node.
-            ep = n.attr[u"pos"].split(",")
-            curr_node.xdot_rel_x = float(ep[0]) - bounding_box_numeric[0]
-            curr_node.xdot_rel_y = float(ep[1]) - bounding_box_numeric[1]
-            curr_node.xdot_shape = str(n.attr[u"shape"])
+            curr_node.xdot_rel_x = pos[0] - bounding_box_numeric[0]
+            curr_node.xdot_rel_y = pos[1] - bounding_box_numeric[1]
+            curr_node.xdot_shape = shape
         # Obtain edge layout info
-        for e in cg.edges():
+        for tail, head, pos in zip(
+            layout.edge_tails, layout.edge_heads, layout.edge_positions
+        ):
             self.edge_count += 1
-            source_node = self.childid2obj[str(e[0])]
+            source_node = self.childid2obj[tail]
             # NOTE the following line assumes that the standard-mode graph
             # contains no duplicate edges (which should really be the case,
             # but isn't a given right now; see issue #75 for context)
-            curr_edge = source_node.outgoing_edge_objects[str(e[1])]
+            curr_edge = source_node.outgoing_edge_objects[head]
             self.edges.append(curr_edge)
             # Get control points, then find them relative to cluster dimensions
             ctrl_pt_str, coord_list, curr_edge.xdot_ctrl_pt_count = Edge.get_control_points(
-                e.attr[u"pos"]
+                pos
             )
             curr_edge.xdot_rel_ctrl_pt_str = ""
             p = 0
@@ -690,33 +860,32 @@ class NodeGroup(Node):
            only utilized if backfill is True.)
         """
         if backfill:
-            output = "\t"
-            if incl_cluster_prefix:
-                output += "cluster_"
+            prefix = "cluster_" if incl_cluster_prefix else ""
             cs = ""
             if config.COLOR_PATTERNS:
                 cs = ',style=filled,fillcolor="%s"' % (
                     config.PATTERN2COLOR[self.plural_name]
                 )
-            output += "%s [height=%g,width=%g,shape=rectangle%s];\n" % (
+            return "\t%s%s [height=%g,width=%g,shape=rectangle%s];\n" % (
+                prefix,
                 self.gv_id_string,
                 self.xdot_c_height,
                 self.xdot_c_width,
                 cs,
             )
-            return output
         else:
-            info = "subgraph cluster_%s {\n" % (self.gv_id_string)
+            info = ["subgraph cluster_%s {\n" % (self.gv_id_string)]
             if config.GLOBALCLUSTER_STYLE != "":
-                info += "\t%s;\n" % (config.GLOBALCLUSTER_STYLE)
+                info.append("\t%s;\n" % (config.GLOBALCLUSTER_STYLE))
             if config.COLOR_PATTERNS:
-                info += '\tbgcolor="%s";\n' % (
-                    config.PATTERN2COLOR[self.plural_name]
+                info.append(
+                    '\tbgcolor="%s";\n'
+                    % (config.PATTERN2COLOR[self.plural_name])
                 )
             for n in self.nodes:
-                info += n.node_info()
-            info += "}\n"
-            return info
+                info.append(n.node_info())
+            info.append("}\n")
+            return "".join(info)
 
     def db_values(self):
         """Returns a tuple containing the values associated with this group.
@@ -1,4 +1,4 @@
-from .. import config
+from ..dot_utils import start_dot_lines, finish_dot_lines
 
 
 class Component(object):
@@ -7,36 +7,63 @@ class Component(object):
        component we're interested in.
     """
 
-    def __init__(self, node_list, node_group_list):
+    def __init__(
+        self,
+        node_list,
+        node_group_list,
+        edge_ct=None,
+        total_length=None,
+        node_ct=None,
+        core_index=None,
+    ):
         """Given a list of all nodes (i.e. not node groups) and a list of
            all node groups in the connected component, intializes the
            connected component.
+
+           If the component's edge count and total sequence length have
+           already been computed (e.g. by component_utils.find_components()),
+           they can be passed here; otherwise, they're computed from the
+           nodes.
+
+           If the component was found in a GraphCore (see graph_core.py),
+           core_index should be its index in the GraphCore's components. In
+           this case, node_list can be None if we haven't created Node
+           objects for this component (e.g. because it's too large to lay
+           out) -- so long as node_ct, edge_ct, and total_length are given.
         """
         self.node_list = node_list
         self.node_group_list = node_group_list
         self.node_group_ct = len(self.node_group_list)
+        self.core_index = core_index
         # Compute node/edge counts, and total sequence length
-        self.node_ct = len(self.node_list)
-        edge_ct = 0
-        total_length = 0
-        for n in self.node_list:
-            edge_ct += len(n.outgoing_edge_objects)
-            total_length += n.bp
+        if node_ct is None:
+            node_ct = len(self.node_list)
+        self.node_ct = node_ct
+        if edge_ct is None or total_length is None:
+            edge_ct = 0
+            total_length = 0
+            for n in self.node_list:
+                edge_ct += len(n.outgoing_edge_objects)
+                total_length += n.bp
         self.edge_ct = edge_ct
         self.total_length = total_length
+        # If collate was run with -u and this component is unchanged since
+        # the earlier .db file, this is the component's rank in that file
+        self.previous_rank = None
 
     def node_and_edge_info(self):
         """Returns the node and edge info for this connected component
-           as a 2-string tuple, where the first string is node info and the
-           second string is edge info (and both strings are DOT-compatible).
+           as a 2-tuple of lists of strings, where the first list contains
+           node info and the second list contains edge info (and all of these
+           strings are DOT-compatible).
         """
 
-        node_info = ""
-        edge_info = ""
+        node_info = []
+        edge_info = []
         # Get node info from groups (contains info about the group's child
         # nodes as well)
         for g in self.node_group_list:
-            node_info += g.node_info()
+            node_info.append(g.node_info())
 
         # Get node info from "standalone nodes" (not in node groups)
         # Simultaneously, we get edge info from all nodes, standalone or not
@@ -44,11 +71,34 @@ class Component(object):
         # declarations to specify where edges should be in the xdot file)
         for n in self.node_list:
             if not n.used_in_collapsing:
-                node_info += n.node_info()
-            edge_info += n.collapsed_edge_info()
+                node_info.append(n.node_info())
+            edge_info.append(n.collapsed_edge_info())
 
         return node_info, edge_info
 
+    def produce_dot_file(self):
+        """Returns a string defining the graph (in DOT format) for the current
+           component, with all node groups "backfilled" as rectangular nodes.
+
+           This is the string that we actually pass to GraphViz in order to
+           lay out this component. Note that all of this component's node
+           groups must have already been laid out (see
+           NodeGroup.layout_isolated()) before this is called, since their
+           dimensions are used here.
+        """
+        # NOTE: We reduce each component of the asm. graph to a DOT string
+        # that we send to pygraphviz, rather than building the graph
+        # procedurally using AGraph.add_node(), add_edge(), etc. -- the
+        # latter is a lot slower for large components (see
+        # tests/test_dot_utils.py), and we need the DOT string anyway to
+        # lay out the component in another process or look it up in the
+        # layout cache.
+        node_info, edge_info = self.node_and_edge_info()
+        lines = start_dot_lines("asm")
+        lines += node_info
+        lines += edge_info
+        return finish_dot_lines(lines)
+
     def produce_non_backfilled_dot_file(self, output_prefix):
         """Returns a string defining the graph (in DOT format) for the current
            component, but without cluster backfilling (i.e. all clusters are
@@ -56,23 +106,14 @@ class Component(object):
            going through them).
         """
 
-        fcontent = "digraph " + output_prefix + " {\n"
-        # TODO abstract graph header generation code to separate function
-        if config.GRAPH_STYLE != "":
-            fcontent += "\t%s;\n" % (config.GRAPH_STYLE)
-        if config.GLOBALNODE_STYLE != "":
-            fcontent += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
-        if config.GLOBALEDGE_STYLE != "":
-            fcontent += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
-
+        lines = start_dot_lines(output_prefix)
         for n in self.node_list:
             if not n.used_in_collapsing:
-                fcontent += n.node_info()
-            fcontent += n.edge_info()
+                lines.append(n.node_info())
+            lines.append(n.edge_info())
         for g in self.node_group_list:
-            fcontent += g.node_info(backfill=False)
-        fcontent += "}"
-        return fcontent
+            lines.append(g.node_info(backfill=False))
+        return finish_dot_lines(lines)
 
     def produce_non_patterned_dot_file(self, output_prefix):
         """Returns a string defining the graph (in DOT format) for the current
@@ -80,19 +121,11 @@ class Component(object):
            still in the graph, but they aren't encapsulated by any clusters).
         """
 
-        fcontent = "digraph " + output_prefix + " {\n"
-        if config.GRAPH_STYLE != "":
-            fcontent += "\t%s;\n" % (config.GRAPH_STYLE)
-        if config.GLOBALNODE_STYLE != "":
-            fcontent += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
-        if config.GLOBALEDGE_STYLE != "":
-            fcontent += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
-
+        lines = start_dot_lines(output_prefix)
         for n in self.node_list:
-            fcontent += n.node_info()
-            fcontent += n.edge_info()
-        fcontent += "}"
-        return fcontent
+            lines.append(n.node_info())
+            lines.append(n.edge_info())
+        return finish_dot_lines(lines)
 
     def __repr__(self):
         """Returns a (somewhat verbose) string representation of this
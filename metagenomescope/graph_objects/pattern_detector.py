@@ -0,0 +1,428 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Identifies simple structural patterns in a graph of Node objects.
+
+import bisect
+
+from .patterns import Bubble, Rope, Chain, Cycle
+
+
+class PatternDetector(object):
+    """Identifies bubbles, frayed ropes, cyclic chains, and chains in a graph.
+
+       The patterns found here are exactly those that would be found by
+       testing every node in the graph as the "start" of a pattern with the
+       is_valid_*() methods of the Bubble, Rope, Cycle, and Chain classes.
+       However, those methods re-walk the linear paths in the graph for
+       every start node they're given, which can take quadratic time for
+       graphs containing long paths.
+
+       Instead, we first make a single pass over the graph to "compress" it
+       into unitigs: maximal paths (or cycles) of nodes u -> v where u has
+       exactly one outgoing edge, and v has exactly one incoming edge. Every
+       chain is a contiguous run of nodes within a unitig, and the middle
+       paths of bubbles and frayed ropes are entire unitigs -- so each
+       pattern can then be classified by looking at the ends of unitigs,
+       rather than by walking through them.
+
+       Nodes that have been used in collapsing cut unitigs short. We keep
+       track of the positions of these nodes within each unitig in sorted
+       lists, so finding the next used node along a unitig just takes a
+       binary search.
+    """
+
+    def __init__(self, nodes):
+        """Initializes the PatternDetector.
+
+           nodes should be a list of every Node in the graph, in the order
+           in which these nodes should be tested as the "start" of patterns.
+           Any nodes that have already been used in collapsing (e.g. in
+           user-specified patterns) are not included in the patterns found
+           here.
+        """
+        self.nodes = list(nodes)
+        # Maps each Node to a 2-tuple of (unitig index, position in unitig)
+        self._node2unitig = {}
+        self._unitig_members = []
+        self._unitig_is_cyclic = []
+        # Sorted positions of the nodes in each unitig that have been used
+        # in collapsing
+        self._unitig_used_positions = []
+        # Maps nodes to sets of their incoming nodes, to avoid recomputing
+        # these sets when checking bubbles' ending nodes
+        self._node2incoming_set = {}
+        # Maps the first middle nodes of invalid frayed ropes to the number
+        # of patterns that had been created when we found that the frayed
+        # rope was invalid. Creating new patterns can make a previously
+        # invalid frayed rope valid, so we only trust this if no patterns
+        # have been created since.
+        self._invalid_rope_m1s = {}
+        self._pattern_ct = 0
+        self._compress_unitigs()
+
+    @staticmethod
+    def _linear_successor(n):
+        """Returns the node that n's unitig continues to after n, or None."""
+        if len(n.outgoing_nodes) == 1:
+            m = n.outgoing_nodes[0]
+            if m is not n and len(m.incoming_nodes) == 1:
+                return m
+        return None
+
+    @staticmethod
+    def _linear_predecessor(n):
+        """Returns the node that precedes n in n's unitig, or None."""
+        if len(n.incoming_nodes) == 1:
+            m = n.incoming_nodes[0]
+            if m is not n and len(m.outgoing_nodes) == 1:
+                return m
+        return None
+
+    def _add_unitig(self, members, is_cyclic):
+        uid = len(self._unitig_members)
+        used_positions = []
+        for pos, n in enumerate(members):
+            self._node2unitig[n] = (uid, pos)
+            if n.used_in_collapsing:
+                used_positions.append(pos)
+        self._unitig_members.append(members)
+        self._unitig_is_cyclic.append(is_cyclic)
+        self._unitig_used_positions.append(used_positions)
+
+    def _compress_unitigs(self):
+        """Partitions the graph's nodes into unitigs."""
+        # Unitigs that are paths start at nodes without a linear predecessor
+        for n in self.nodes:
+            if self._linear_predecessor(n) is None:
+                members = [n]
+                m = self._linear_successor(n)
+                while m is not None:
+                    members.append(m)
+                    m = self._linear_successor(m)
+                self._add_unitig(members, False)
+        # All remaining nodes are in unitigs that are cycles
+        for n in self.nodes:
+            if n not in self._node2unitig:
+                members = [n]
+                m = self._linear_successor(n)
+                while m is not n:
+                    members.append(m)
+                    m = self._linear_successor(m)
+                self._add_unitig(members, True)
+
+    def _unitig_node(self, uid, pos):
+        members = self._unitig_members[uid]
+        return members[pos % len(members)]
+
+    def _unitig_slice(self, uid, start, count):
+        """Returns a list of count nodes in a unitig, starting at start.
+
+           Wraps around the end of the unitig if the unitig is a cycle.
+        """
+        members = self._unitig_members[uid]
+        start %= len(members)
+        end = start + count
+        if end <= len(members):
+            return members[start:end]
+        return members[start:] + members[: end - len(members)]
+
+    def _path_length_after(self, uid, pos):
+        """Returns the number of nodes after pos in a unitig.
+
+           For cyclic unitigs, this doesn't count the node at pos again.
+        """
+        if self._unitig_is_cyclic[uid]:
+            return len(self._unitig_members[uid]) - 1
+        return len(self._unitig_members[uid]) - 1 - pos
+
+    def _next_used_offset(self, uid, pos):
+        """Returns how many nodes ahead of pos the next used node in a unitig
+           is, or None if there aren't any used nodes ahead of pos.
+        """
+        used = self._unitig_used_positions[uid]
+        i = bisect.bisect_right(used, pos)
+        if i < len(used):
+            return used[i] - pos
+        if self._unitig_is_cyclic[uid] and used and used[0] < pos:
+            return used[0] + len(self._unitig_members[uid]) - pos
+        return None
+
+    def _prev_used_offset(self, uid, pos):
+        """Returns how many nodes behind pos the previous used node in a
+           unitig is, or None if there aren't any used nodes behind pos.
+        """
+        used = self._unitig_used_positions[uid]
+        i = bisect.bisect_left(used, pos)
+        if i > 0:
+            return pos - used[i - 1]
+        if self._unitig_is_cyclic[uid] and used and used[-1] > pos:
+            return pos + len(self._unitig_members[uid]) - used[-1]
+        return None
+
+    def _incoming_set(self, n):
+        if n not in self._node2incoming_set:
+            self._node2incoming_set[n] = set(n.incoming_nodes)
+        return self._node2incoming_set[n]
+
+    def _forward_chain_length(self, s):
+        """Returns the number of nodes in the Chain that starts at s and
+           extends "forward" from s, or None if no such Chain exists.
+
+           This matches the first half of Chain.is_valid_chain(): the
+           returned Chain consists of the first that many nodes of s's
+           unitig, starting at s.
+        """
+        if len(s.outgoing_nodes) != 1 or s.outgoing_nodes[0] is s:
+            return None
+        uid, pos = self._node2unitig[s]
+        after_ct = self._path_length_after(uid, pos)
+        if after_ct == 0:
+            return None
+        used_offset = self._next_used_offset(uid, pos)
+        if used_offset is not None:
+            # The chain stops just before the used node. This is only a
+            # chain if it has at least 2 nodes.
+            return used_offset if used_offset >= 2 else None
+        # The chain goes all the way to the end of the unitig. If the last
+        # node points back to s, then this is a cycle, not a chain.
+        last = self._unitig_node(uid, pos + after_ct)
+        if len(last.outgoing_nodes) == 1:
+            if last.outgoing_nodes[0] is s:
+                return None
+        elif s in last.outgoing_nodes:
+            return None
+        return after_ct + 1
+
+    def _chain_nodes(self, s):
+        """Returns a list of the nodes in the longest Chain that starts at
+           or before s, or None if no Chain starts at s.
+
+           Matches Chain.is_valid_chain().
+        """
+        fwd_ct = self._forward_chain_length(s)
+        if fwd_ct is None:
+            return None
+        uid, pos = self._node2unitig[s]
+        bwd_ct = 0
+        if self._linear_predecessor(s) is not None:
+            # Extend the chain backwards until we reach either a used node
+            # or the start of the unitig. (If the unitig is cyclic, we know
+            # there's a used node in it -- otherwise this would be a cycle.)
+            used_offset = self._prev_used_offset(uid, pos)
+            if used_offset is not None:
+                bwd_ct = used_offset - 1
+            else:
+                bwd_ct = pos
+                first = self._unitig_members[uid][0]
+                if len(first.incoming_nodes) != 1:
+                    # The chain "begins" cyclically if the first node in the
+                    # unitig has an incoming edge from the forward chain.
+                    # We'll tag this as a cycle when detecting cycles.
+                    for m in first.incoming_nodes:
+                        m_uid, m_pos = self._node2unitig[m]
+                        if m_uid == uid and pos <= m_pos < pos + fwd_ct:
+                            return None
+        return self._unitig_slice(uid, pos - bwd_ct, bwd_ct + fwd_ct)
+
+    def _cycle_nodes(self, s):
+        """Returns a list of the nodes in the cyclic chain starting at s, or
+           None if no cyclic chain starts at s.
+
+           Matches Cycle.is_valid_cycle().
+        """
+        if len(s.incoming_nodes) == 0 or len(s.outgoing_nodes) == 0:
+            return None
+        if s in s.outgoing_nodes:
+            return [s]
+        elif len(s.outgoing_nodes) > 1:
+            return None
+        uid, pos = self._node2unitig[s]
+        after_ct = self._path_length_after(uid, pos)
+        if after_ct == 0 or self._next_used_offset(uid, pos) is not None:
+            return None
+        last = self._unitig_node(uid, pos + after_ct)
+        if len(last.outgoing_nodes) == 1:
+            if last.outgoing_nodes[0] is not s:
+                return None
+        elif s not in last.outgoing_nodes:
+            return None
+        return self._unitig_slice(uid, pos, after_ct + 1)
+
+    def _middle_path(self, m1):
+        """Returns a 2-tuple of (the unitig index and position of m1, the
+           number of nodes in the middle path of a bubble or frayed rope
+           starting at m1), or None if m1 can't start a middle path.
+
+           If a Chain starts at m1, then the middle path is the Chain;
+           otherwise, the middle path is just m1. (Since no Chains have
+           been created yet when we look for bubbles and frayed ropes, a
+           middle path can't include nodes that have been used in
+           collapsing.)
+        """
+        fwd_ct = self._forward_chain_length(m1)
+        if fwd_ct is None:
+            if m1.used_in_collapsing:
+                return None
+            fwd_ct = 1
+        return self._node2unitig[m1], fwd_ct
+
+    def _bubble_nodes(self, s):
+        """Returns a list of the nodes in the Bubble starting at s, or None
+           if no Bubble starts at s.
+
+           Matches Bubble.is_valid_bubble().
+        """
+        if len(s.outgoing_nodes) <= 1:
+            return None
+        e_node = None
+        paths = []
+        mn_nodes = []
+        for n in s.outgoing_nodes:
+            if len(n.incoming_nodes) != 1 or len(n.outgoing_nodes) != 1:
+                return None
+            middle_path = self._middle_path(n)
+            if middle_path is None:
+                return None
+            (uid, pos), ct = middle_path
+            path_end = self._unitig_node(uid, pos + ct - 1)
+            if len(path_end.outgoing_nodes) != 1:
+                return None
+            if e_node is None:
+                e_node = path_end.outgoing_nodes[0]
+            elif e_node is not path_end.outgoing_nodes[0]:
+                return None
+            paths.append((uid, pos, ct))
+            mn_nodes.append(path_end)
+
+        if e_node.used_in_collapsing:
+            return None
+        elif self._incoming_set(e_node) != set(mn_nodes):
+            return None
+        elif s in e_node.outgoing_nodes:
+            return None
+
+        composite = [s]
+        for uid, pos, ct in paths:
+            composite += self._unitig_slice(uid, pos, ct)
+        composite.append(e_node)
+        if len(set(composite)) != len(composite):
+            return None
+        return composite
+
+    def _rope_nodes(self, s):
+        """Returns a list of the nodes in the frayed rope starting at s, or
+           None if no frayed rope starts at s.
+
+           Matches Rope.is_valid_rope().
+        """
+        if len(s.outgoing_nodes) != 1:
+            return None
+        m1 = s.outgoing_nodes[0]
+        if len(m1.incoming_nodes) < 2:
+            return None
+        # The frayed rope only depends on m1 -- all of the nodes pointing to
+        # m1 are "start" nodes -- so if we've already tried this m1, we can
+        # skip it.
+        if self._invalid_rope_m1s.get(m1) == self._pattern_ct:
+            return None
+        rope_nodes = self._rope_nodes_from_m1(m1)
+        if rope_nodes is None:
+            self._invalid_rope_m1s[m1] = self._pattern_ct
+        return rope_nodes
+
+    def _rope_nodes_from_m1(self, m1):
+        s_nodes = m1.incoming_nodes
+        for n in s_nodes:
+            if len(n.outgoing_nodes) != 1 or n.used_in_collapsing:
+                return None
+        middle_path = self._middle_path(m1)
+        if middle_path is None:
+            return None
+        (uid, pos), ct = middle_path
+        e_nodes = self._unitig_node(uid, pos + ct - 1).outgoing_nodes
+        if len(e_nodes) < 2:
+            return None
+        s_node_set = set(s_nodes)
+        for n in e_nodes:
+            if len(n.incoming_nodes) != 1 or n.used_in_collapsing:
+                return None
+            for o in n.outgoing_nodes:
+                # Make sure that this frayed rope isn't cyclical
+                if o in s_node_set:
+                    return None
+
+        composite = s_nodes + self._unitig_slice(uid, pos, ct) + e_nodes
+        if len(set(composite)) != len(composite):
+            return None
+        return composite
+
+    def _create_pattern(self, pattern_type, member_nodes):
+        """Creates a pattern, and records its nodes as used in collapsing."""
+        newly_used = [n for n in member_nodes if not n.used_in_collapsing]
+        pattern = pattern_type(*member_nodes)
+        for n in newly_used:
+            uid, pos = self._node2unitig[n]
+            bisect.insort(self._unitig_used_positions[uid], pos)
+        self._pattern_ct += 1
+        return pattern
+
+    def _find_patterns(self, pattern_type, get_member_nodes):
+        """Tests every unused node as the start of a pattern, in order.
+
+           Returns a list of the patterns created.
+        """
+        patterns = []
+        for n in self.nodes:
+            if n.used_in_collapsing:
+                continue
+            member_nodes = get_member_nodes(n)
+            if member_nodes is not None:
+                patterns.append(
+                    self._create_pattern(pattern_type, member_nodes)
+                )
+        return patterns
+
+    def find_bubbles(self):
+        """Finds simple bubbles in the graph. Returns a list of Bubbles."""
+        return self._find_patterns(Bubble, self._bubble_nodes)
+
+    def find_ropes(self):
+        """Finds frayed ropes in the graph. Returns a list of Ropes."""
+        return self._find_patterns(Rope, self._rope_nodes)
+
+    def find_cycles(self):
+        """Finds cyclic chains in the graph. Returns a list of Cycles."""
+        return self._find_patterns(Cycle, self._cycle_nodes)
+
+    def find_chains(self):
+        """Finds chains in the graph. Returns a list of Chains."""
+        return self._find_patterns(Chain, self._chain_nodes)
+
+    def find_all(self):
+        """Finds all types of patterns, in order of precedence: bubbles,
+           frayed ropes, cyclic chains, and then chains.
+
+           Returns a list of the patterns created.
+        """
+        return (
+            self.find_bubbles()
+            + self.find_ropes()
+            + self.find_cycles()
+            + self.find_chains()
+        )
@@ -19,6 +19,8 @@ class Bubble(NodeGroup):
     plural_name = "bubbles"
     type_name = "Bubble"
 
+    __slots__ = ()
+
     def __init__(self, *nodes):
         """Initializes the Bubble, given a list of nodes comprising it."""
 
@@ -146,6 +148,9 @@ class MiscPattern(NodeGroup):
 
     plural_name = "misc_patterns"
 
+    # The type name of a MiscPattern is defined per-instance.
+    __slots__ = ("type_name",)
+
     def __init__(self, type_name="Misc", *nodes):
         """Initializes the Pattern, given a list of nodes comprising it."""
         self.type_name = type_name
@@ -158,6 +163,8 @@ class Rope(NodeGroup):
     plural_name = "frayed_ropes"
     type_name = "Frayed Rope"
 
+    __slots__ = ()
+
     def __init__(self, *nodes):
         """Initializes the Rope, given a list of nodes comprising it."""
         super(Rope, self).__init__("F", nodes)
@@ -258,6 +265,8 @@ class Chain(NodeGroup):
     plural_name = "chains"
     type_name = "Chain"
 
+    __slots__ = ()
+
     def __init__(self, *nodes):
         """Initializes the Chain, given all the nodes comprising the chain."""
         super(Chain, self).__init__("C", nodes)
@@ -394,6 +403,8 @@ class Cycle(NodeGroup):
     plural_name = "cyclic_chains"
     type_name = "Cyclic Chain"
 
+    __slots__ = ()
+
     def __init__(self, *nodes):
         """Initializes the Cycle, given all the nodes comprising it."""
         super(Cycle, self).__init__("Y", nodes)
@@ -1,4 +1,5 @@
 from .. import config
+from ..dot_utils import start_dot_lines, finish_dot_lines
 from .basic_objects import Edge, NodeGroup
 import uuid
 import pygraphviz
@@ -18,6 +19,15 @@ class SPQRMetaNode(NodeGroup):
        http://www.ogdf.net/doc-ogdf/classogdf_1_1_s_p_q_r_tree.html#details.
     """
 
+    __slots__ = (
+        "bicomponent_id",
+        "parent_bicomponent",
+        "spqr_id",
+        "metanode_type",
+        "internal_edges",
+        "nonlaidout_edges",
+    )
+
     def __init__(
         self, bicomponent_id, spqr_id, metanode_type, nodes, internal_edges
     ):
@@ -64,25 +74,23 @@ class SPQRMetaNode(NodeGroup):
            stuff.
         """
         # pipe .gv into pygraphviz to lay out this node group
-        gv_input = ""
-        gv_input += "graph metanode {\n"
-        if config.GRAPH_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-        gv_input += '\toverlap="scalexy";\n'
-        if config.GLOBALNODE_STYLE != "":
-            gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
         # We don't pass in edge style info (re: ports) because these edges are
         # undirected
-        gv_input += self.node_info(backfill=False)
+        gv_lines = start_dot_lines(
+            "metanode",
+            graph_type="graph",
+            graph_attrs=['overlap="scalexy"'],
+            edge_style=False,
+        )
+        gv_lines.append(self.node_info(backfill=False))
         for e in self.internal_edges:
             if e[0] == "v":
                 # Virtual edge
-                gv_input += "\t%s -- %s [style=dotted];\n" % (e[1], e[2])
+                gv_lines.append("\t%s -- %s [style=dotted];\n" % (e[1], e[2]))
             else:
                 # Real edge
-                gv_input += "\t%s -- %s;\n" % (e[1], e[2])
-        gv_input += "}"
-        cg = pygraphviz.AGraph(gv_input)
+                gv_lines.append("\t%s -- %s;\n" % (e[1], e[2]))
+        cg = pygraphviz.AGraph(finish_dot_lines(gv_lines))
         # sfdp works really well for some of these structures. (we can play
         # around with different layout options in the future, of course)
         cg.layout(prog="sfdp")
@@ -209,6 +217,15 @@ class Bicomponent(NodeGroup):
           the width/height determined from step 4)
     """
 
+    __slots__ = (
+        "bicomponent_id",
+        "metanode_list",
+        "root_metanode",
+        "singlenode_count",
+        "snid2obj",
+        "real_edges",
+    )
+
     def __init__(self, bicomponent_id, metanode_list, root_metanode):
         # a string representation of an integer that matches an ID in
         # one component_*.info and one spqr*.gml file
@@ -266,26 +283,28 @@ class Bicomponent(NodeGroup):
            After that, goes through each metanode to determine its coordinates
            in relation to the singlenodes contained here.
         """
-        gv_input = ""
-        gv_input += "graph bicomponent {\n"
-        if config.GRAPH_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-        gv_input += '\toverlap="scalexy";\n'
+        gv_lines = start_dot_lines(
+            "bicomponent",
+            graph_type="graph",
+            graph_attrs=['overlap="scalexy"'],
+            node_style=False,
+            edge_style=False,
+        )
         # enclosing these singlenodes/singleedges in a cluster is mostly taken
         # from the NodeGroup.node_info() function, seen above
-        gv_input += "subgraph cluster_%s {\n" % (self.gv_id_string)
+        gv_lines.append("subgraph cluster_%s {\n" % (self.gv_id_string))
         if config.GLOBALCLUSTER_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GLOBALCLUSTER_STYLE)
+            gv_lines.append("\t%s;\n" % (config.GLOBALCLUSTER_STYLE))
         if config.GLOBALNODE_STYLE != "":
-            gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
+            gv_lines.append("\tnode [%s];\n" % (config.GLOBALNODE_STYLE))
         # Explicitly provide node info first
         # This seems to help a bit with avoiding edge-node crossings
         for n in self.snid2obj.values():
-            gv_input += n.node_info()
+            gv_lines.append(n.node_info())
         for e in self.real_edges:
-            gv_input += "\t%s -- %s;\n" % (e[0], e[1])
-        gv_input += "}\n}"
-        cg = pygraphviz.AGraph(gv_input)
+            gv_lines.append("\t%s -- %s;\n" % (e[0], e[1]))
+        gv_lines.append("}\n")
+        cg = pygraphviz.AGraph(finish_dot_lines(gv_lines))
         cg.layout(prog="sfdp")
         # cg.draw("%s.png" % (self.gv_id_string))
         # Obtain cluster width and height from the layout
@@ -325,24 +344,18 @@ class Bicomponent(NodeGroup):
         # To anyone reading this -- sorry the code's a bit ugly. I might come
         # back and fix this in the future to just use the superclass
         # NodeGroup.layout_isolated() method, if time permits.
-        gv_input = ""
-        gv_input += "digraph spqrtree {\n"
-        if config.GRAPH_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GRAPH_STYLE)
-        if config.GLOBALNODE_STYLE != "":
-            gv_input += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
-        if config.GLOBALEDGE_STYLE != "":
-            gv_input += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
-        gv_input += "subgraph cluster_%s {\n" % (self.gv_id_string)
+        gv_lines = start_dot_lines("spqrtree")
+        gv_lines.append("subgraph cluster_%s {\n" % (self.gv_id_string))
         if config.GLOBALCLUSTER_STYLE != "":
-            gv_input += "\t%s;\n" % (config.GLOBALCLUSTER_STYLE)
+            gv_lines.append("\t%s;\n" % (config.GLOBALCLUSTER_STYLE))
         for mn in self.metanode_list:
-            gv_input += mn.node_info(backfill=True, incl_cluster_prefix=False)
-        gv_input += "}\n"
-        for n in self.metanode_list:
-            gv_input += n.edge_info(constrained_nodes=self.nodes)
-        gv_input += "}"
-        cg = pygraphviz.AGraph(gv_input)
+            gv_lines.append(
+                mn.node_info(backfill=True, incl_cluster_prefix=False)
+            )
+        gv_lines.append("}\n")
+        for n, m in self.interior_edges():
+            gv_lines.append("\t%s -> %s\n" % (n.id_string, m.id_string))
+        cg = pygraphviz.AGraph(finish_dot_lines(gv_lines))
         cg.layout(prog="dot")
         # cg.draw(self.gv_id_string + ".png")
         # Obtain cluster width and height from the layout
@@ -1,6 +1,35 @@
 from . import config
 
 
+# Translation table mapping each nucleotide (as a byte) to its complement, and
+# the set of all nucleotides we know how to complement. These let us do the
+# heavy lifting in reverse_complement() within bytes.translate(), rather than
+# looking up each character in a Python loop.
+_COMPLEMENT_TABLE = bytes.maketrans(
+    "".join(config.COMPLEMENT.keys()).encode("ascii"),
+    "".join(config.COMPLEMENT.values()).encode("ascii"),
+)
+_NUCLEOTIDES = "".join(config.COMPLEMENT.keys()).encode("ascii")
+
+
+def validate_dna(dna_string):
+    """Raises a KeyError if a string of DNA contains any characters that
+       aren't nucleotides (i.e. keys of config.COMPLEMENT).
+
+       The KeyError mentions the last such character in dna_string. This
+       matches the error reverse_complement() has always raised, since it
+       used to look up each character in config.COMPLEMENT from back to
+       front.
+    """
+    # Non-ASCII characters are replaced with "?", which isn't a nucleotide --
+    # so they're caught by this check.
+    if dna_string.encode("ascii", "replace").translate(None, _NUCLEOTIDES):
+        invalid_chars = (
+            nt for nt in reversed(dna_string) if nt not in config.COMPLEMENT
+        )
+        raise KeyError(next(invalid_chars))
+
+
 def reverse_complement(dna_string):
     """Returns the reverse complement of a string of DNA.
 
@@ -9,13 +38,11 @@ def reverse_complement(dna_string):
 
        Note that this will break on invalid DNA input (so inputs like RNA
        or protein sequences, or sequences that contain spaces, will cause
-       this to fail).
+       this to raise a KeyError -- see validate_dna()).
     """
-    rc = ""
-    dna_last_char_index = len(dna_string) - 1
-    for nt in range(dna_last_char_index, -1, -1):
-        rc += config.COMPLEMENT[dna_string[nt]]
-    return rc
+    validate_dna(dna_string)
+    dna_bytes = dna_string.encode("ascii")
+    return dna_bytes.translate(_COMPLEMENT_TABLE)[::-1].decode("ascii")
 
 
 def gc_content(dna_string):
@@ -34,10 +61,7 @@ def gc_content(dna_string):
     seq_len = len(dna_string)
     if seq_len == 0:
         raise ValueError("Can't compute the GC content of an empty sequence")
-    gc_ct = 0
-    for nt in dna_string:
-        if nt == "G" or nt == "C":
-            gc_ct += 1
+    gc_ct = dna_string.count("G") + dna_string.count("C")
     return (float(gc_ct) / seq_len), gc_ct
 
 
@@ -0,0 +1,408 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains a "layered" (Sugiyama-style) graph layout engine,
+# written using NumPy. It produces the same sort of top-to-bottom drawings
+# as GraphViz's dot, but takes a lot less time on very large components --
+# at the cost of producing somewhat messier drawings, since it uses simpler
+# heuristics than dot does. See -le in collate.py.
+#
+# The layout is done in the usual four steps:
+# 1. Remove cycles by reversing the "back edges" found by a depth-first
+#    search.
+# 2. Assign nodes to layers using longest-path layering, then move source
+#    nodes down to just above their successors. Edges spanning multiple
+#    layers are split up using "dummy" nodes (one for each layer crossed).
+# 3. Reduce crossings by repeatedly sorting each layer by the barycenters of
+#    its nodes' neighbors. To keep this vectorized, we update all layers at
+#    once (from the previous iteration's positions), rather than sweeping
+#    through the layers one at a time as is usually done.
+# 4. Assign x-coordinates by repeatedly moving nodes towards the average
+#    x-coordinate of their neighbors, and then resolving overlaps within
+#    each layer; and assign y-coordinates to each layer.
+
+import collections
+import numpy
+import pygraphviz
+
+from . import config
+
+
+def remove_cycles(node_ct, sources, targets):
+    """Returns a boolean array indicating which of the given edges have to
+       be reversed to make the graph acyclic, along with an array of the
+       order in which nodes were first visited by the depth-first search
+       used to find these edges.
+
+       Self-loops are never reversed (they should be excluded from the DAG
+       separately).
+    """
+    edge_order = numpy.argsort(sources, kind="stable")
+    starts = numpy.zeros(node_ct + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(sources, minlength=node_ct), out=starts[1:])
+    adj_targets = targets[edge_order].tolist()
+    adj_edges = edge_order.tolist()
+    starts = starts.tolist()
+    reverse = numpy.zeros(len(sources), dtype=bool)
+    # 0 = unvisited, 1 = on the DFS stack, 2 = finished
+    state = [0] * node_ct
+    visit_order = []
+    # Start from nodes without incoming edges, so that the graph's "natural"
+    # direction is preserved as much as possible
+    in_degrees = numpy.bincount(targets, minlength=node_ct)
+    roots = numpy.concatenate(
+        (numpy.flatnonzero(in_degrees == 0), numpy.arange(node_ct))
+    ).tolist()
+    for root in roots:
+        if state[root] != 0:
+            continue
+        state[root] = 1
+        visit_order.append(root)
+        # Each stack entry is [node, index of the next outgoing edge to try]
+        stack = [[root, starts[root]]]
+        while stack:
+            top = stack[-1]
+            n, i = top
+            if i == starts[n + 1]:
+                state[n] = 2
+                stack.pop()
+                continue
+            top[1] += 1
+            m = adj_targets[i]
+            if state[m] == 0:
+                state[m] = 1
+                visit_order.append(m)
+                stack.append([m, starts[m]])
+            elif state[m] == 1 and m != n:
+                reverse[adj_edges[i]] = True
+    return reverse, numpy.array(visit_order, dtype=numpy.int64)
+
+
+def assign_layers(node_ct, sources, targets):
+    """Assigns each node of a DAG to a layer, such that every edge points
+       from a lower layer to a higher one.
+
+       Returns an array of the layer of each node.
+    """
+    in_degrees = numpy.bincount(targets, minlength=node_ct).tolist()
+    edge_order = numpy.argsort(sources, kind="stable")
+    starts = numpy.zeros(node_ct + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(sources, minlength=node_ct), out=starts[1:])
+    adj_targets = targets[edge_order].tolist()
+    starts = starts.tolist()
+    # Longest-path layering, via Kahn's algorithm
+    layers = [0] * node_ct
+    to_visit = collections.deque(
+        n for n in range(node_ct) if in_degrees[n] == 0
+    )
+    while to_visit:
+        n = to_visit.popleft()
+        next_layer = layers[n] + 1
+        for m in adj_targets[starts[n] : starts[n + 1]]:
+            if layers[m] < next_layer:
+                layers[m] = next_layer
+            in_degrees[m] -= 1
+            if in_degrees[m] == 0:
+                to_visit.append(m)
+    layers = numpy.array(layers, dtype=numpy.int64)
+    # Longest-path layering puts all sources in the top layer, which can
+    # make their outgoing edges really long. Move sources down to the layer
+    # just above their closest successor.
+    if len(sources) > 0:
+        min_succ_layers = numpy.full(node_ct, layers.max() + 1)
+        numpy.minimum.at(min_succ_layers, sources, layers[targets])
+        is_source = numpy.bincount(targets, minlength=node_ct) == 0
+        has_succ = min_succ_layers <= layers.max()
+        movable = is_source & has_succ
+        layers[movable] = min_succ_layers[movable] - 1
+    # Remove any empty layers
+    return numpy.unique(layers, return_inverse=True)[1].reshape(-1)
+
+
+def _segment_running_max(values, layers):
+    """Computes the running maximum of values within each run of equal
+       values in layers, which should be sorted in ascending order.
+    """
+    if len(values) == 0:
+        return values
+    # Adding a large enough offset to each layer makes every value in a
+    # layer larger than every value in the previous layers, so a single
+    # running maximum doesn't carry over from one layer to the next
+    offset = (values.max() - values.min() + 1) * layers
+    return numpy.maximum.accumulate(values + offset) - offset
+
+
+def layered_layout(
+    widths,
+    heights,
+    sources,
+    targets,
+    nodesep=config.LAYERED_NODESEP,
+    ranksep=config.LAYERED_RANKSEP,
+    iterations=config.LAYERED_ITERATIONS,
+):
+    """Lays out a directed graph from top to bottom.
+
+       widths and heights are arrays of the dimensions of each node, and
+       sources and targets are arrays of the (integer) source and target
+       nodes of each edge. All dimensions are in points.
+
+       Returns a 3-tuple of (x-coordinates of node centers, y-coordinates of
+       node centers, list of edge control point arrays). Each edge's control
+       points are given as an (3k + 1, 2) array of the points of a piecewise
+       cubic Bezier curve, from the edge's source to its target. As in
+       GraphViz's output, the y-axis points up (so the first layer is at the
+       top of the drawing).
+    """
+    widths = numpy.asarray(widths, dtype=float)
+    heights = numpy.asarray(heights, dtype=float)
+    sources = numpy.asarray(sources, dtype=numpy.int64)
+    targets = numpy.asarray(targets, dtype=numpy.int64)
+    node_ct = len(widths)
+    if node_ct == 0:
+        return numpy.zeros(0), numpy.zeros(0), []
+    is_loop = sources == targets
+
+    # 1. Remove cycles.
+    reverse, visit_order = remove_cycles(node_ct, sources, targets)
+    dag_sources = numpy.where(reverse, targets, sources)[~is_loop]
+    dag_targets = numpy.where(reverse, sources, targets)[~is_loop]
+
+    # 2. Assign layers, and add dummy nodes to long edges.
+    node_layers = assign_layers(node_ct, dag_sources, dag_targets)
+    spans = node_layers[dag_targets] - node_layers[dag_sources]
+    dummy_cts = spans - 1
+    dummy_ct = int(dummy_cts.sum())
+    total_ct = node_ct + dummy_ct
+    # Each DAG edge becomes a "path" of nodes: its source, its dummy nodes
+    # (in order), and its target. We store these paths in one big array.
+    path_lengths = spans + 1
+    path_starts = numpy.cumsum(path_lengths) - path_lengths
+    paths = numpy.empty(int(path_lengths.sum()), dtype=numpy.int64)
+    is_end = numpy.zeros(len(paths), dtype=bool)
+    is_end[path_starts] = True
+    is_end[path_starts + spans] = True
+    paths[path_starts] = dag_sources
+    paths[path_starts + spans] = dag_targets
+    paths[~is_end] = numpy.arange(node_ct, total_ct)
+    dummy_path_index = numpy.flatnonzero(~is_end)
+    dummy_edges = numpy.repeat(numpy.arange(len(spans)), dummy_cts)
+    layers = numpy.concatenate(
+        (
+            node_layers,
+            node_layers[dag_sources][dummy_edges]
+            + dummy_path_index
+            - path_starts[dummy_edges],
+        )
+    )
+    all_widths = numpy.concatenate(
+        (widths, numpy.full(dummy_ct, config.LAYERED_DUMMY_WIDTH))
+    )
+    # The "segments" between consecutive nodes in each path: these are the
+    # edges of the layered graph, each of which spans exactly one layer
+    is_segment = numpy.ones(max(len(paths) - 1, 0), dtype=bool)
+    is_segment[path_starts[1:] - 1] = False
+    seg_sources = paths[:-1][is_segment]
+    seg_targets = paths[1:][is_segment]
+
+    # 3. Order the nodes within each layer. We start with the order in
+    # which the nodes were visited in the DFS above, since that tends to put
+    # adjacent nodes near each other. (Dummy nodes start next to the source
+    # of their edge.)
+    first_visit = numpy.empty(node_ct, dtype=float)
+    first_visit[visit_order] = numpy.arange(node_ct)
+    keys = numpy.concatenate(
+        (first_visit, first_visit[dag_sources][dummy_edges] + 0.5)
+    )
+    layer_sizes = numpy.bincount(layers, minlength=1)
+    layer_starts = numpy.cumsum(layer_sizes) - layer_sizes
+
+    def positions_from_keys(keys, tiebreakers):
+        order = numpy.lexsort((tiebreakers, keys, layers))
+        positions = numpy.empty(total_ct, dtype=float)
+        positions[order] = numpy.arange(total_ct) - layer_starts[layers[order]]
+        return positions
+
+    positions = positions_from_keys(keys, numpy.zeros(total_ct))
+    up_counts = numpy.bincount(seg_targets, minlength=total_ct)
+    down_counts = numpy.bincount(seg_sources, minlength=total_ct)
+    for i in range(iterations):
+        # Alternate between using nodes' predecessors and successors
+        if i % 2 == 0:
+            sums = numpy.bincount(
+                seg_targets, weights=positions[seg_sources], minlength=total_ct
+            )
+            counts = up_counts
+        else:
+            sums = numpy.bincount(
+                seg_sources, weights=positions[seg_targets], minlength=total_ct
+            )
+            counts = down_counts
+        barycenters = numpy.where(
+            counts > 0, sums / numpy.maximum(counts, 1), positions
+        )
+        positions = positions_from_keys(barycenters, positions)
+
+    # 4. Assign coordinates. First, find the minimum distance between each
+    # node and the first node in its layer.
+    order = numpy.lexsort((positions, layers))
+    sorted_layers = layers[order]
+    sorted_widths = all_widths[order]
+    gaps = numpy.zeros(total_ct)
+    gaps[1:] = (sorted_widths[1:] + sorted_widths[:-1]) / 2 + nodesep
+    gaps[layer_starts] = 0
+    offsets = numpy.cumsum(gaps)
+    offsets -= offsets[layer_starts][sorted_layers]
+    # Start with each layer packed as tightly as possible, and centered
+    layer_widths = offsets[layer_starts + layer_sizes - 1]
+    x = numpy.empty(total_ct)
+    x[order] = offsets - layer_widths[sorted_layers] / 2
+    reversed_layers = (sorted_layers[-1] - sorted_layers)[::-1]
+    neighbor_counts = up_counts + down_counts
+    for _ in range(iterations):
+        sums = numpy.bincount(
+            seg_targets, weights=x[seg_sources], minlength=total_ct
+        ) + numpy.bincount(
+            seg_sources, weights=x[seg_targets], minlength=total_ct
+        )
+        desired = numpy.where(
+            neighbor_counts > 0, sums / numpy.maximum(neighbor_counts, 1), x
+        )[order]
+        # Find the closest positions to the desired positions that don't
+        # cause any overlaps, by either only moving nodes right (going left
+        # to right through each layer) or only moving nodes left (going right
+        # to left). The average of these is also free of overlaps.
+        right_x = offsets + _segment_running_max(
+            desired - offsets, sorted_layers
+        )
+        left_x = (
+            offsets
+            - _segment_running_max((offsets - desired)[::-1], reversed_layers)[
+                ::-1
+            ]
+        )
+        x[order] = (right_x + left_x) / 2
+    x -= (x - all_widths / 2).min()
+
+    all_heights = numpy.concatenate((heights, numpy.zeros(dummy_ct)))
+    layer_heights = numpy.zeros(len(layer_sizes))
+    numpy.maximum.at(layer_heights, layers, all_heights)
+    layer_bottoms = numpy.cumsum(layer_heights + ranksep) - ranksep
+    total_height = layer_bottoms[-1]
+    layer_y = total_height - (layer_bottoms - layer_heights / 2)
+    y = layer_y[layers]
+
+    # Get the control points of each edge. Edges leave the bottom of their
+    # source node and enter the top of their target node (or vice versa,
+    # for edges that had to be reversed), and pass through their dummy
+    # nodes' positions.
+    path_points = numpy.column_stack((x[paths], y[paths]))
+    half_heights = numpy.concatenate((heights, numpy.zeros(dummy_ct))) / 2
+    path_points[path_starts, 1] -= half_heights[dag_sources]
+    path_points[path_starts + spans, 1] += half_heights[dag_targets]
+    # Each straight segment of a path is drawn as a cubic Bezier curve
+    # with its control points spread evenly along the segment
+    seg_starts = path_points[:-1][is_segment]
+    seg_deltas = path_points[1:][is_segment] - seg_starts
+    bezier_points = numpy.stack(
+        (
+            seg_starts,
+            seg_starts + seg_deltas / 3,
+            seg_starts + seg_deltas * 2 / 3,
+        ),
+        axis=1,
+    ).reshape(-1, 2)
+    # Segment i of path j is at index i + path_starts[j] - j in the list of
+    # segments, so path j's Bezier points start at 3 * (path_starts[j] - j)
+    bezier_starts = 3 * (path_starts - numpy.arange(len(spans)))
+    path_ends = path_points[path_starts + spans]
+
+    non_loop_edges = numpy.flatnonzero(~is_loop)
+    reverse = reverse[non_loop_edges]
+    edge_points = [None] * len(sources)
+    for j, e in enumerate(non_loop_edges.tolist()):
+        points = numpy.vstack(
+            (
+                bezier_points[
+                    bezier_starts[j] : bezier_starts[j] + 3 * spans[j]
+                ],
+                path_ends[j],
+            )
+        )
+        if reverse[j]:
+            points = points[::-1]
+        edge_points[e] = points
+    # Self-loops are drawn as a loop on the right side of their node
+    for e in numpy.flatnonzero(is_loop).tolist():
+        n = sources[e]
+        right = x[n] + widths[n] / 2
+        edge_points[e] = numpy.array(
+            [
+                (right, y[n] + heights[n] / 6),
+                (right + config.LAYERED_LOOP_SIZE, y[n] + heights[n] / 2),
+                (right + config.LAYERED_LOOP_SIZE, y[n] - heights[n] / 2),
+                (right, y[n] - heights[n] / 6),
+            ]
+        )
+    return x[:node_ct], y[:node_ct], edge_points
+
+
+def layout_dot_string(gv_input):
+    """Lays out a DOT string using layered_layout(), and returns the laid-out
+       graph as a DOT string -- with the same pos attributes that GraphViz
+       would set on its nodes and edges, so that it can be used in place of
+       the output of layout_utils.layout_dot_string().
+    """
+    g = pygraphviz.AGraph(gv_input)
+    nodes = list(g.nodes_iter())
+    node2index = {}
+    widths = []
+    heights = []
+    for i, n in enumerate(nodes):
+        node2index[n] = i
+        widths.append(float(n.attr["width"] or config.LAYERED_DEFAULT_WIDTH))
+        heights.append(
+            float(n.attr["height"] or config.LAYERED_DEFAULT_HEIGHT)
+        )
+    edges = list(g.edges_iter())
+    sources = [node2index[e[0]] for e in edges]
+    targets = [node2index[e[1]] for e in edges]
+    x, y, edge_points = layered_layout(
+        numpy.array(widths) * config.POINTS_PER_INCH,
+        numpy.array(heights) * config.POINTS_PER_INCH,
+        numpy.array(sources, dtype=numpy.int64),
+        numpy.array(targets, dtype=numpy.int64),
+    )
+    for n, nx, ny in zip(nodes, x.tolist(), y.tolist()):
+        n.attr["pos"] = "%.2f,%.2f" % (nx, ny)
+    for e, points in zip(edges, edge_points):
+        e.attr["pos"] = " ".join(["%.2f,%.2f"] * len(points)) % tuple(
+            points.ravel().tolist()
+        )
+    if len(nodes) > 0:
+        right = (x + numpy.array(widths) * config.POINTS_PER_INCH / 2).max()
+        top = (y + numpy.array(heights) * config.POINTS_PER_INCH / 2).max()
+        for points in edge_points:
+            right = max(right, points[:, 0].max())
+            top = max(top, points[:, 1].max())
+        g.graph_attr["bb"] = "0,0,%.2f,%.2f" % (right, top)
+    laid_out_gv = g.string()
+    # (Calling g.clear() first, as we do after laying out graphs with
+    # GraphViz, is unnecessary -- and takes a while on huge graphs.)
+    g.close()
+    return laid_out_gv
@@ -0,0 +1,1136 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains utilities for laying out DOT strings with GraphViz,
+# either in the current process or across a pool of worker processes (with
+# an optional time limit on each layout), and for caching these layouts on
+# disk between runs of the preprocessing script. Graphs with very simple
+# shapes (chains, bubbles, and cycles) skip GraphViz entirely: see
+# simple_layout.py.
+
+import collections
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import re
+import sqlite3
+import time
+import zlib
+import pygraphviz
+
+from . import config, layered_layout
+from .simple_layout import simple_layout
+
+
+def layout_dot_string(gv_input, prog="dot", cache=None):
+    """Lays out a DOT string using the given GraphViz program.
+
+       Returns a 2-tuple of (the laid-out graph as a DOT string, in which
+       every node, edge, and cluster has had its layout attributes -- pos,
+       bb, etc. -- set; the layout engine actually used). The engine is prog,
+       unless the graph was laid out by simple_layout_dot_string() -- in
+       which case it's config.SIMPLE_LAYOUT_ENGINE.
+
+       If prog is config.LAYERED_LAYOUT_PROG, the graph is laid out using
+       our own layered layout engine (see layered_layout.py) instead of
+       GraphViz.
+
+       If cache (a LayoutCache) is given, the layout is taken from the cache
+       if possible; otherwise, it's computed and then added to the cache.
+       (Graphs laid out by simple_layout_dot_string() aren't cached, since
+       their layouts are quicker to compute than to look up.)
+
+       This is a module-level function so that it can be pickled and sent to
+       worker processes in a multiprocessing.Pool.
+    """
+    if prog == "dot":
+        laid_out_gv = simple_layout_dot_string(gv_input)
+        if laid_out_gv is not None:
+            return laid_out_gv, config.SIMPLE_LAYOUT_ENGINE
+    if cache is not None:
+        laid_out_gv = cache.get(gv_input, prog)
+        if laid_out_gv is None:
+            laid_out_gv = layout_dot_string(gv_input, prog)[0]
+            cache.put(gv_input, prog, laid_out_gv)
+        return laid_out_gv, prog
+    if prog == config.LAYERED_LAYOUT_PROG:
+        return layered_layout.layout_dot_string(gv_input), prog
+    g = pygraphviz.AGraph(gv_input)
+    g.layout(prog=prog)
+    laid_out_gv = g.string()
+    g.clear()
+    g.close()
+    return laid_out_gv, prog
+
+
+def load_laid_out_graph(laid_out_gv):
+    """Given a DOT string output by layout_dot_string(), returns a
+       pygraphviz.AGraph of that string that can be treated as if layout()
+       had just been called on it.
+    """
+    g = pygraphviz.AGraph(laid_out_gv)
+    # This makes AGraph.draw() reuse the layout information in the graph
+    # (instead of raising an error or laying it out again), which is what
+    # we rely on when saving .xdot files for -px.
+    g.has_layout = True
+    return g
+
+
+# Regular expressions used by LayoutResult to read the DOT strings written by
+# GraphViz. An ID is either a double-quoted string (which can contain escaped
+# quotes) or a run of characters that can't start or end a DOT statement.
+_ID = r'"(?:[^"\\]|\\.)*"|[^\s\[\];:,={}"]+'
+_PORT = r"(?::(?:{id}))*".format(id=_ID)
+_DOT_STATEMENT_RE = re.compile(
+    r"^[ \t]*(?:"
+    # The start of a subgraph (or of the graph itself)
+    r"(?:strict[ \t]+)?(?:sub|di)?graph(?:[ \t]+(?P<name>{id}))?" r"[ \t]*\{{"
+    # The end of a subgraph (or of the graph itself)
+    r"|(?P<end>\}})"
+    # A node statement, an edge statement, or a "graph", "node", or "edge"
+    # attribute statement (attribute lists can span multiple lines, and can
+    # contain "]" characters within quoted values). We assume that there's
+    # only one of these per line, which is true of both the DOT strings
+    # GraphViz writes and the ones we write (which don't always end
+    # statements with semicolons).
+    r"|(?P<tail>{id}){port}"
+    r"(?:[ \t]+(?:->|--)[ \t]+(?P<head>{id}){port})?"
+    r'[ \t]*(?:\[(?P<attrs>(?:"(?:[^"\\]|\\.)*"|[^\]"])*)\])?[ \t]*;?[ \t]*$'
+    r")".format(id=_ID, port=_PORT),
+    re.MULTILINE,
+)
+_DOT_ATTR_RE = re.compile(r"({id})\s*=\s*({id})".format(id=_ID))
+
+
+def _unquote(dot_id):
+    """Returns the value of an ID matched by _ID."""
+    if dot_id.startswith('"'):
+        return dot_id[1:-1].replace('\\"', '"')
+    return dot_id
+
+
+def _parse_attrs(attrs):
+    """Returns a dict of the attributes in an attribute list matched by
+       _DOT_STATEMENT_RE (or an empty dict, if attrs is None).
+    """
+    if attrs is None:
+        return {}
+    return {_unquote(k): _unquote(v) for k, v in _DOT_ATTR_RE.findall(attrs)}
+
+
+def _node_creation_order(gv):
+    """Returns a list of the names of the nodes in a DOT string, in the
+       order in which GraphViz creates them when reading the string (i.e.
+       the order in which they're first mentioned).
+    """
+    names = []
+    seen = set()
+    for m in _DOT_STATEMENT_RE.finditer(gv.replace("\\\n", "")):
+        tail = m.group("tail")
+        if tail is None:
+            continue
+        head = m.group("head")
+        if head is None:
+            if tail in ("graph", "node", "edge"):
+                continue
+            ends = (tail,)
+        else:
+            ends = (tail, head)
+        for n in ends:
+            n = _unquote(n)
+            if n not in seen:
+                seen.add(n)
+                names.append(n)
+    return names
+
+
+def _parse_bb(bb):
+    """Converts a "bb" attribute value to a 4-tuple of floats, or returns
+       None if bb is None.
+    """
+    if bb is None:
+        return None
+    return tuple(float(c) for c in bb.split(","))
+
+
+def simple_layout_dot_string(gv_input):
+    """Lays out a DOT string using simple_layout.simple_layout(), and returns
+       the laid-out graph as a DOT string -- with the same bb and pos
+       attributes that GraphViz's dot would set, so that it can be used in
+       place of the output of layout_dot_string().
+
+       Returns None if the graph doesn't have one of the simple shapes that
+       simple_layout() can lay out, or if it contains subgraphs that we
+       can't give a bounding box to (we only handle the single cluster in a
+       NodeGroup's isolated_dot_input()).
+
+       This doesn't call GraphViz at all: we read the DOT string in the same
+       way as LayoutResult does.
+    """
+    # Maps each node's name to its index in the lists below
+    node2index = {}
+    node_ids = []
+    node_attrs = []
+    sources = []
+    targets = []
+    # The node attribute defaults of the (sub)graph we're in, followed by
+    # those of each of the (sub)graphs it's contained in
+    scopes = [{}]
+    subgraph_ct = 0
+    outside_subgraph_ct = 0
+    for m in _DOT_STATEMENT_RE.finditer(gv_input):
+        tail = m.group("tail")
+        if tail is None:
+            if m.group("end") is not None:
+                scopes.pop()
+            else:
+                if len(scopes) > 1:
+                    subgraph_ct += 1
+                scopes.append(dict(scopes[-1]))
+            continue
+        head = m.group("head")
+        if head is None and tail in ("graph", "edge"):
+            continue
+        attrs = _parse_attrs(m.group("attrs"))
+        if tail == "node" and head is None:
+            scopes[-1].update(attrs)
+            continue
+        ends = (tail,) if head is None else (tail, head)
+        for n in ends:
+            name = _unquote(n)
+            if name not in node2index:
+                node2index[name] = len(node_ids)
+                node_ids.append(n)
+                node_attrs.append(dict(scopes[-1]))
+                if len(scopes) == 2:
+                    outside_subgraph_ct += 1
+        if head is None:
+            node_attrs[node2index[_unquote(tail)]].update(attrs)
+        else:
+            sources.append(node2index[_unquote(tail)])
+            targets.append(node2index[_unquote(head)])
+    if subgraph_ct > 1 or (subgraph_ct == 1 and outside_subgraph_ct > 0):
+        return None
+    layout = simple_layout(
+        [
+            float(a.get("width") or config.LAYERED_DEFAULT_WIDTH)
+            * config.POINTS_PER_INCH
+            for a in node_attrs
+        ],
+        [
+            float(a.get("height") or config.LAYERED_DEFAULT_HEIGHT)
+            * config.POINTS_PER_INCH
+            for a in node_attrs
+        ],
+        sources,
+        targets,
+    )
+    if layout is None:
+        return None
+    x, y, edge_points, (right, top) = layout
+    bb_attr = '\n\tgraph [bb="0,0,%.2f,%.2f"];' % (right, top)
+    edge_pos_attrs = iter(
+        [
+            'pos="%s"' % " ".join(["%.2f,%.2f" % p for p in points])
+            for points in edge_points
+        ]
+    )
+    # Nodes that are never given a node statement get one at the end of
+    # the graph, so that every node has a position
+    unpositioned = set(node2index)
+    depth = [0]
+
+    def add_layout(m):
+        tail = m.group("tail")
+        if tail is None:
+            if m.group("end") is None:
+                depth[0] += 1
+                return m.group(0) + bb_attr
+            depth[0] -= 1
+            if depth[0] > 0:
+                return m.group(0)
+            return "".join(
+                [
+                    '\t%s [pos="%.2f,%.2f"];\n' % (node_ids[i], x[i], y[i])
+                    for i in sorted(node2index[n] for n in unpositioned)
+                ]
+                + [m.group(0)]
+            )
+        head = m.group("head")
+        if head is None:
+            if tail in ("graph", "node", "edge"):
+                return m.group(0)
+            i = node2index[_unquote(tail)]
+            unpositioned.discard(_unquote(tail))
+            statement = tail
+            pos_attr = 'pos="%.2f,%.2f"' % (x[i], y[i])
+        else:
+            statement = "%s -> %s" % (tail, head)
+            pos_attr = next(edge_pos_attrs)
+        attrs = m.group("attrs")
+        if attrs:
+            pos_attr = attrs + "," + pos_attr
+        return "\t%s [%s];" % (statement, pos_attr)
+
+    return _DOT_STATEMENT_RE.sub(add_layout, gv_input)
+
+
+class LayoutResult(object):
+    """The layout information in a DOT string output by layout_dot_string().
+
+       Rather than loading the DOT string into a pygraphviz.AGraph and then
+       reading the attributes of each node and edge one at a time (each of
+       which is a call into the GraphViz C library), we read all of the
+       information we need from the DOT string in a single pass. (Rendering
+       the graph to GraphViz's json0 or plain formats and reading that instead
+       is slower than either approach, since the rendering itself takes a
+       while for large graphs.)
+
+       Nodes are listed in the order in which they're given by
+       pygraphviz.AGraph.nodes(), and edges are listed in the order in which
+       they're given by pygraphviz.AGraph.edges(), for a pygraphviz.AGraph of
+       the same DOT string. If gv_input (the DOT string that was laid out to
+       produce laid_out_gv) is given, then nodes and edges are instead
+       listed in the order that pygraphviz gives for an AGraph of gv_input
+       that was laid out in this process -- which is how collate used to
+       read layouts. This way, the order of rows in the .db file doesn't
+       depend on how (or where) we lay out graphs.
+
+       Attributes:
+
+       bb: The bounding box of the graph, as a 4-tuple of floats (left,
+           bottom, right, top), or None if the graph doesn't have one.
+
+       subgraph_bbs: A list of (subgraph name, bounding box) tuples for each
+           subgraph in the graph with a bounding box (e.g. clusters).
+
+       node_names, node_positions, node_shapes: Lists of the name, (x, y)
+           position, and shape of each node.
+
+       edge_tails, edge_heads, edge_comments, edge_positions: Lists of the
+           names of the tail and head node, the comment, and the "pos"
+           attribute (the spline control points, which can be read using
+           graph_objects.Edge.get_control_points()) of each edge.
+
+       As with pygraphviz, attributes that aren't set are given as "".
+    """
+
+    def __init__(self, laid_out_gv, gv_input=None):
+        self.bb = None
+        self.subgraph_bbs = []
+        self.node_names = []
+        self.node_shapes = []
+        self.edge_tails = []
+        self.edge_heads = []
+        self.edge_comments = []
+        self.edge_positions = []
+        node_attrs = {}
+        edge_attrs = []
+        # The node and edge attribute defaults of the (sub)graph we're in,
+        # followed by those of each of the (sub)graphs it's contained in
+        scopes = [({}, {})]
+        subgraph_names = []
+        # GraphViz splits long lines (within quoted strings) using escaped
+        # newlines
+        laid_out_gv = laid_out_gv.replace("\\\n", "")
+        for m in _DOT_STATEMENT_RE.finditer(laid_out_gv):
+            tail = m.group("tail")
+            if tail is None:
+                if m.group("end") is not None:
+                    scopes.pop()
+                    subgraph_names.pop()
+                else:
+                    node_defaults, edge_defaults = scopes[-1]
+                    scopes.append((dict(node_defaults), dict(edge_defaults)))
+                    name = m.group("name")
+                    if name is not None:
+                        name = _unquote(name)
+                    subgraph_names.append(name)
+                continue
+            attrs = _parse_attrs(m.group("attrs"))
+            head = m.group("head")
+            if head is not None:
+                ends = (_unquote(tail), _unquote(head))
+                for n in ends:
+                    if n not in node_attrs:
+                        node_attrs[n] = dict(scopes[-1][0])
+                        self.node_names.append(n)
+                this_edge_attrs = dict(scopes[-1][1])
+                this_edge_attrs.update(attrs)
+                edge_attrs.append((ends, this_edge_attrs))
+            elif tail == "graph":
+                bb = attrs.get("bb")
+                if bb is not None:
+                    if len(scopes) == 2:
+                        self.bb = _parse_bb(bb)
+                    else:
+                        self.subgraph_bbs.append(
+                            (subgraph_names[-1], _parse_bb(bb))
+                        )
+            elif tail == "node":
+                scopes[-1][0].update(attrs)
+            elif tail == "edge":
+                scopes[-1][1].update(attrs)
+            else:
+                n = _unquote(tail)
+                if n not in node_attrs:
+                    node_attrs[n] = dict(scopes[-1][0])
+                    self.node_names.append(n)
+                node_attrs[n].update(attrs)
+        if gv_input is None:
+            node2index = {n: i for i, n in enumerate(self.node_names)}
+        else:
+            node2index = {
+                n: i for i, n in enumerate(_node_creation_order(gv_input))
+            }
+            self.node_names.sort(key=node2index.__getitem__)
+        # Parse all of the node positions at once
+        node_pos_strs = []
+        for n in self.node_names:
+            attrs = node_attrs[n]
+            node_pos_strs.append(attrs["pos"])
+            self.node_shapes.append(attrs.get("shape", ""))
+        coords = [float(c) for c in ",".join(node_pos_strs).split(",")]
+        self.node_positions = list(zip(coords[0::2], coords[1::2]))
+        # pygraphviz goes through each node's outgoing edges in turn, in the
+        # order in which the nodes were created. GraphViz orders a node's
+        # outgoing edges by when their head node was created, and then by
+        # when the edges were created -- so we do the same. (sort() is
+        # stable, and GraphViz writes out edges between the same pair of
+        # nodes in the order they were created.)
+        edge_attrs.sort(
+            key=lambda e: (node2index[e[0][0]], node2index[e[0][1]])
+        )
+        for (tail, head), attrs in edge_attrs:
+            self.edge_tails.append(tail)
+            self.edge_heads.append(head)
+            self.edge_comments.append(attrs.get("comment", ""))
+            self.edge_positions.append(attrs.get("pos", ""))
+
+
+class ParallelLayout(object):
+    """Lays out DOT strings across a pool of worker processes.
+
+       Results are always returned in the same order as their corresponding
+       inputs, so callers can consume them in exactly the same order as they
+       would've laid out these graphs serially.
+
+       This can be used as a context manager: leaving the with block calls
+       close(), or terminate() if an exception was raised.
+    """
+
+    def __init__(self, jobs):
+        """Starts a pool of jobs worker processes."""
+        self.jobs = jobs
+        self.pool = multiprocessing.Pool(jobs)
+
+    def imap(self, gv_inputs, prog="dot", cache=None):
+        """Yields a 2-tuple of (laid-out DOT string, layout engine used) --
+           see layout_dot_string() -- for each of the given DOT strings, in
+           order.
+
+           Layout of later graphs proceeds in the background while earlier
+           results are being consumed. Graphs with simple shapes (see
+           simple_layout_dot_string()) are laid out in this process, rather
+           than being sent to the workers. If cache (a LayoutCache or
+           ShapeLayoutCache) is given, graphs with a cached layout aren't
+           sent to the workers either; the other layouts are added to the
+           cache as they're consumed.
+        """
+        gv_inputs = list(gv_inputs)
+        known_layouts = []
+        unknown_inputs = []
+        # Only one of each set of graphs with the same cache key (e.g. with
+        # the same shape, for a ShapeLayoutCache) is sent to the workers:
+        # the rest reuse its layout from the cache once it's been added
+        unknown_keys = set()
+        for g in gv_inputs:
+            layout = _known_layout(g, prog, cache)
+            if layout is None and cache is not None:
+                key = cache.get_key(g, prog)
+                if key in unknown_keys:
+                    layout = _DUPLICATE
+                unknown_keys.add(key)
+            if layout is None:
+                unknown_inputs.append(g)
+            known_layouts.append(layout)
+        # Graphs are generally given to us in descending order of size, so
+        # we use a fairly small chunk size -- otherwise the first worker
+        # would get stuck with all of the largest graphs. Larger chunks for
+        # many-graph inputs do help to cut down on IPC overhead, though.
+        chunksize = max(1, len(unknown_inputs) // (self.jobs * 32))
+        unknown_layouts = self.pool.imap(
+            _layout_with_prog, [(g, prog) for g in unknown_inputs], chunksize
+        )
+        return _merge_known_layouts(
+            gv_inputs, known_layouts, unknown_layouts, prog, cache
+        )
+
+    def close(self):
+        """Shuts down the pool of worker processes, after they've finished
+           any layouts they're working on. Does nothing if the pool has
+           already been shut down.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def terminate(self):
+        """Stops the pool of worker processes immediately."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+def _layout_with_prog(gv_input_and_prog):
+    return layout_dot_string(*gv_input_and_prog)
+
+
+# Used by ParallelLayout.imap() in place of the layout of a graph that has
+# the same cache key as an earlier graph that's being laid out
+_DUPLICATE = object()
+
+
+def _known_layout(gv_input, prog, cache):
+    """Returns the layout of a DOT string if we can get it without running
+       a layout program (i.e. if the graph has a simple shape and prog is
+       dot, or if its layout is in the cache), or None otherwise.
+
+       Layouts are returned as 2-tuples, as in layout_dot_string().
+    """
+    if prog == "dot":
+        laid_out_gv = simple_layout_dot_string(gv_input)
+        if laid_out_gv is not None:
+            return laid_out_gv, config.SIMPLE_LAYOUT_ENGINE
+    if cache is not None:
+        laid_out_gv = cache.get(gv_input, prog)
+        if laid_out_gv is not None:
+            return laid_out_gv, prog
+    return None
+
+
+def _duplicate_layout(gv_input, prog, cache):
+    """Returns the layout of a DOT string with the same cache key as one
+       that was just laid out (and added to the cache).
+    """
+    layout = _known_layout(gv_input, prog, cache)
+    if layout is None:
+        # The other layout has already been evicted from the cache (e.g.
+        # because many other layouts were added to it since then)
+        layout = layout_dot_string(gv_input, prog)
+    return layout
+
+
+def _merge_known_layouts(
+    gv_inputs, known_layouts, unknown_layouts, prog, cache
+):
+    for gv_input, layout in zip(gv_inputs, known_layouts):
+        if layout is _DUPLICATE:
+            layout = _duplicate_layout(gv_input, prog, cache)
+        elif layout is None:
+            layout = next(unknown_layouts)
+            if cache is not None:
+                cache.put(gv_input, prog, layout[0])
+        yield layout
+
+
+class TimedLayout(object):
+    """Lays out DOT strings across worker processes, giving up on any layout
+       that takes longer than a time limit.
+
+       GraphViz doesn't provide a way to interrupt a layout once it's
+       started, so each worker is a separate process that we can just
+       terminate (and replace) if it runs out of time. When a layout runs out
+       of time, we retry it using the next program in the list of programs
+       we were given -- these should be progressively faster (if less
+       useful) layout programs, e.g. sfdp after dot.
+
+       Like ParallelLayout, results are returned in the same order as their
+       corresponding inputs, and this can be used as a context manager.
+    """
+
+    def __init__(self, jobs, timeout, progs=config.LAYOUT_PROGS):
+        """Starts jobs worker processes. timeout is the number of seconds
+           each layout is allowed to take.
+        """
+        self.timeout = timeout
+        self.progs = progs
+        # Number of layouts that ran out of time
+        self.timeout_ct = 0
+        # See imap()
+        self.duplicates = {}
+        self.workers = [_TimedLayoutWorker() for _ in range(jobs)]
+
+    def imap(self, gv_inputs, cache=None):
+        """Yields a 2-tuple of (laid-out DOT string, layout engine used) --
+           see layout_dot_string() -- for each of the given DOT strings, in
+           order. If every program ran out of time, yields (None, None) for
+           that DOT string.
+
+           Graphs with simple shapes (see simple_layout_dot_string()) are
+           laid out in this process, without a time limit. If cache (a
+           LayoutCache or ShapeLayoutCache) is given, cached layouts are used
+           where possible, new layouts are added to the cache, and only one
+           of each set of graphs with the same cache key is laid out.
+        """
+        gv_inputs = list(gv_inputs)
+        # Maps input index to result, for results that we've computed but
+        # haven't yielded yet
+        results = {}
+        # Maps the index of each graph that we'll lay out to the indices of
+        # the later graphs with the same cache key, which reuse its layout
+        # (see ParallelLayout.imap())
+        self.duplicates = {}
+        key2index = {}
+        for i, gv_input in enumerate(gv_inputs):
+            if cache is not None:
+                key = cache.get_key(gv_input, self.progs[0])
+                if key in key2index:
+                    self.duplicates[key2index[key]].append(i)
+                    continue
+                key2index[key] = i
+            self.duplicates[i] = []
+        # Each task is a 2-tuple of (input index, index in self.progs)
+        tasks = collections.deque()
+        for i in list(self.duplicates):
+            self._add_task(i, 0, gv_inputs, tasks, results, cache)
+        for i in range(len(gv_inputs)):
+            while i not in results:
+                self._run_tasks(gv_inputs, tasks, results, cache)
+            yield results.pop(i)
+
+    def _add_task(self, i, prog_index, gv_inputs, tasks, results, cache):
+        if prog_index == len(self.progs):
+            self._set_result(i, (None, None), None, gv_inputs, results, cache)
+            return
+        prog = self.progs[prog_index]
+        layout = _known_layout(gv_inputs[i], prog, cache)
+        if layout is not None:
+            self._set_result(i, layout, prog, gv_inputs, results, cache)
+            return
+        if prog_index == 0:
+            tasks.append((i, prog_index))
+        else:
+            # Retries go to the front of the queue, since we'll probably be
+            # waiting on them before we get to any other tasks
+            tasks.appendleft((i, prog_index))
+
+    def _set_result(self, i, layout, prog, gv_inputs, results, cache):
+        """Records the layout of the i-th graph (a 2-tuple, as in
+           layout_dot_string(), computed by trying prog), and of the graphs
+           with the same cache key as it.
+        """
+        results[i] = layout
+        for j in self.duplicates.pop(i):
+            if layout[0] is None:
+                results[j] = (None, None)
+            else:
+                results[j] = _duplicate_layout(gv_inputs[j], prog, cache)
+
+    def _run_tasks(self, gv_inputs, tasks, results, cache):
+        """Starts tasks on idle workers, then waits until at least one task
+           has finished or run out of time.
+        """
+        for worker in self.workers:
+            if worker.task is None and tasks:
+                i, prog_index = tasks.popleft()
+                worker.start_task(
+                    (i, prog_index), gv_inputs[i], self.progs[prog_index]
+                )
+        busy_workers = [w for w in self.workers if w.task is not None]
+        deadline = min(w.start_time for w in busy_workers) + self.timeout
+        ready_conns = multiprocessing.connection.wait(
+            [w.conn for w in busy_workers],
+            max(0, deadline - time.monotonic()),
+        )
+        now = time.monotonic()
+        for worker in busy_workers:
+            i, prog_index = worker.task
+            if worker.conn in ready_conns:
+                layout = worker.finish_task()
+                prog = self.progs[prog_index]
+                if cache is not None:
+                    cache.put(gv_inputs[i], prog, layout[0])
+                self._set_result(i, layout, prog, gv_inputs, results, cache)
+            elif now - worker.start_time >= self.timeout:
+                worker.restart()
+                self.timeout_ct += 1
+                self._add_task(
+                    i, prog_index + 1, gv_inputs, tasks, results, cache
+                )
+
+    def close(self):
+        """Shuts down the worker processes, after they've finished any
+           layouts they're working on. Does nothing if they've already been
+           shut down.
+        """
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def terminate(self):
+        """Kills the worker processes immediately."""
+        for worker in self.workers:
+            worker.terminate()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+class _TimedLayoutWorker(object):
+    """A worker process used by TimedLayout, along with the task (if any)
+       it's currently working on.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.start_time = None
+        self._start_process()
+
+    def _start_process(self):
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_run_layout_worker, args=(worker_conn,), daemon=True
+        )
+        self.process.start()
+        worker_conn.close()
+
+    def start_task(self, task, gv_input, prog):
+        self.task = task
+        self.start_time = time.monotonic()
+        self.conn.send((gv_input, prog))
+
+    def finish_task(self):
+        self.task = None
+        result = self.conn.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def restart(self):
+        """Kills this worker's process (and the layout it's working on), and
+           starts a new process in its place.
+        """
+        self.terminate()
+        self._start_process()
+
+    def terminate(self):
+        """Kills this worker's process (and the layout it's working on)."""
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.task = None
+
+    def stop(self):
+        self.conn.send(None)
+        self.process.join()
+        self.conn.close()
+
+
+def _run_layout_worker(conn):
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        # Send errors back to the main process, so that they can be raised
+        # there (like how multiprocessing.Pool does things)
+        try:
+            result = layout_dot_string(*task)
+        except Exception as e:
+            result = e
+        conn.send(result)
+    conn.close()
+
+
+class LayoutCache(object):
+    """A persistent cache of GraphViz layouts, stored in a SQLite database.
+
+       Layouts are keyed by a hash of the DOT string given to GraphViz (and
+       the GraphViz program used), so identical components and node groups
+       are only laid out once across runs of the preprocessing script --
+       even if the rest of the graph has changed.
+
+       The cache is bounded in size: once the total (compressed) size of the
+       stored layouts exceeds max_size bytes, the least recently used
+       layouts are evicted.
+
+       Changes to the cache are committed every commit_every changes (added
+       layouts or updates to when a layout was last used), or once
+       commit_interval seconds have passed since the last commit, whichever
+       comes first -- so layouts aren't lost if the preprocessing script
+       crashes or is killed before close() is called.
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_size=config.LAYOUT_CACHE_MAX_SIZE,
+        commit_every=config.LAYOUT_CACHE_COMMIT_EVERY,
+        commit_interval=config.LAYOUT_CACHE_COMMIT_INTERVAL,
+    ):
+        self.max_size = max_size
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.commits = 0
+        self.uncommitted_change_ct = 0
+        self.last_commit_time = time.time()
+        self.connection = sqlite3.connect(filename)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(
+            "CREATE TABLE IF NOT EXISTS layouts (key text PRIMARY KEY, "
+            "layout blob, size integer, last_used integer)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS layouts_last_used ON layouts "
+            "(last_used)"
+        )
+        size, last_used = self.cursor.execute(
+            "SELECT SUM(size), MAX(last_used) FROM layouts"
+        ).fetchone()
+        self.total_size = size or 0
+        # Incremented whenever a layout is used, so that we can tell which
+        # layouts were used least recently
+        self.clock = last_used or 0
+
+    @staticmethod
+    def get_key(gv_input, prog):
+        """Returns the cache key of a DOT string laid out by prog."""
+        h = hashlib.sha256()
+        h.update(config.LAYOUT_CACHE_VERSION.encode())
+        h.update(b"\0" + prog.encode() + b"\0")
+        h.update(gv_input.encode())
+        return h.hexdigest()
+
+    def get(self, gv_input, prog="dot"):
+        """Returns the cached layout of a DOT string, or None if it isn't
+           in the cache.
+        """
+        key = self.get_key(gv_input, prog)
+        row = self.cursor.execute(
+            "SELECT layout FROM layouts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        self.cursor.execute(
+            "UPDATE layouts SET last_used = ? WHERE key = ?", (self.clock, key)
+        )
+        self._note_change()
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, gv_input, prog, laid_out_gv):
+        """Adds the layout of a DOT string to the cache, evicting the least
+           recently used layouts if the cache is now too large.
+        """
+        key = self.get_key(gv_input, prog)
+        layout = zlib.compress(laid_out_gv.encode())
+        self.clock += 1
+        old_row = self.cursor.execute(
+            "SELECT size FROM layouts WHERE key = ?", (key,)
+        ).fetchone()
+        if old_row is not None:
+            self.total_size -= old_row[0]
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?)",
+            (key, layout, len(layout), self.clock),
+        )
+        self.total_size += len(layout)
+        while self.total_size > self.max_size:
+            key, size = self.cursor.execute(
+                "SELECT key, size FROM layouts ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            self.cursor.execute("DELETE FROM layouts WHERE key = ?", (key,))
+            self.total_size -= size
+            self.evictions += 1
+        self._note_change()
+
+    def _note_change(self):
+        """Records that the cache was changed, and commits the uncommitted
+           changes if there are enough of them or if enough time has passed.
+        """
+        self.uncommitted_change_ct += 1
+        if (
+            self.uncommitted_change_ct >= self.commit_every
+            or time.time() - self.last_commit_time >= self.commit_interval
+        ):
+            self.commit()
+
+    def commit(self):
+        """Saves all changes made to the cache so far."""
+        self.connection.commit()
+        self.commits += 1
+        self.uncommitted_change_ct = 0
+        self.last_commit_time = time.time()
+
+    def stats_msg(self):
+        """Returns a message describing how useful the cache has been."""
+        return config.LAYOUT_CACHE_STATS_MSG.format(
+            hits=self.hits, misses=self.misses, evictions=self.evictions
+        )
+
+    def close(self):
+        """Saves changes to the cache and closes it."""
+        self.commit()
+        self.connection.close()
+
+
+def _rename_dot_ids(gv, rename):
+    """Returns a copy of a DOT string in which the IDs of nodes and
+       subgraphs, and the values of edges' comment attributes, have been
+       replaced.
+
+       rename(kind, dot_id) is called with kind set to "node", "subgraph",
+       or "comment" for each of these IDs (or values) in the DOT string, and
+       should return the ID (or value) to replace it with. Nodes' and
+       subgraphs' IDs are given as they appear in the DOT string (possibly
+       quoted); comments are given unquoted, and quoted when replaced.
+    """
+    gv = gv.replace("\\\n", "")
+    chunks = []
+    last_end = 0
+    for m in _DOT_STATEMENT_RE.finditer(gv):
+        tail = m.group("tail")
+        head = m.group("head")
+        if tail is None:
+            groups = () if m.group("name") is None else (("name", "subgraph"),)
+        elif head is None and tail in ("graph", "node", "edge"):
+            continue
+        else:
+            groups = (("tail", "node"), ("head", "node"), ("attrs", None))
+        for group, kind in groups:
+            if m.group(group) is None:
+                continue
+            start, end = m.span(group)
+            chunks.append(gv[last_end:start])
+            if kind is None:
+                chunks.append(
+                    _DOT_ATTR_RE.sub(
+                        lambda a: _rename_comment_attr(a, rename),
+                        m.group(group),
+                    )
+                )
+            else:
+                chunks.append(rename(kind, m.group(group)))
+            last_end = end
+    chunks.append(gv[last_end:])
+    return "".join(chunks)
+
+
+def _rename_comment_attr(attr_match, rename):
+    if _unquote(attr_match.group(1)) != "comment":
+        return attr_match.group(0)
+    value = rename("comment", _unquote(attr_match.group(2)))
+    return '%s="%s"' % (attr_match.group(1), value.replace('"', '\\"'))
+
+
+def canonicalize_dot_string(gv_input):
+    """Returns a 3-tuple of (canonical DOT string, dict, dict) for a DOT
+       string.
+
+       In the canonical DOT string, the ID of each node is replaced with "n"
+       followed by the order in which it was created (i.e. "n0", "n1", ...),
+       and likewise for the IDs of clusters ("cluster_0", ...) and the
+       values of edges' comment attributes ("e0", ...). Graphs that only
+       differ in these IDs -- e.g. two components with the same shape and
+       node dimensions, but different nodes -- have the same canonical DOT
+       string, and (since GraphViz doesn't care about node IDs, just about
+       the order in which nodes and edges are created) the same layout.
+
+       The first dict maps (kind, ID) tuples (where kind is "node",
+       "subgraph", or "comment"; see _rename_dot_ids()) of the original IDs
+       to their canonical IDs, and the second dict maps the canonical IDs
+       back to the original IDs. These can be used to rename the IDs in a
+       laid-out DOT string (see ShapeLayoutCache).
+    """
+    to_canonical = {}
+    from_canonical = {}
+    counts = {"node": 0, "subgraph": 0, "comment": 0}
+    prefixes = {"node": "n", "subgraph": "cluster_", "comment": "e"}
+
+    def rename(kind, dot_id):
+        key = (kind, _unquote(dot_id))
+        if key not in to_canonical:
+            if kind == "subgraph" and not key[1].startswith("cluster"):
+                # Only cluster names matter to GraphViz, and we leave the
+                # name of the graph itself alone
+                return dot_id
+            canonical_id = "%s%d" % (prefixes[kind], counts[kind])
+            counts[kind] += 1
+            to_canonical[key] = canonical_id
+            from_canonical[(kind, canonical_id)] = dot_id
+        return to_canonical[key]
+
+    canonical_gv = _rename_dot_ids(gv_input, rename)
+    return canonical_gv, to_canonical, from_canonical
+
+
+def _renamer(id_map):
+    """Returns a function that can be passed to _rename_dot_ids() to rename
+       IDs using a dict returned by canonicalize_dot_string().
+    """
+
+    def rename(kind, dot_id):
+        return id_map.get((kind, _unquote(dot_id)), dot_id)
+
+    return rename
+
+
+class ShapeLayoutCache(object):
+    """An in-memory cache of the layouts computed during one run of the
+       preprocessing script, keyed by canonical DOT string (see
+       canonicalize_dot_string()).
+
+       Assembly graphs often contain thousands of small components (and
+       node groups) with the same shape, which only differ in the IDs of
+       their nodes -- so we only lay out each of these shapes once, and then
+       just rename the nodes (and edges) in its layout for each other
+       component with this shape.
+
+       Only DOT strings with at most max_size characters are canonicalized;
+       larger graphs are unlikely to have the same shape as any other graph.
+       The layouts kept in memory are bounded in total size: once they add
+       up to more than max_total_size characters, the least recently used
+       layouts are evicted.
+
+       If persistent_cache (a LayoutCache) is given, layouts that aren't in
+       this cache are looked up in (and added to) persistent_cache. Small
+       graphs are stored in persistent_cache using their canonical DOT
+       strings, so that layouts are shared between runs, too.
+
+       This has the same interface as LayoutCache, so either can be given as
+       the cache used by layout_dot_string(), ParallelLayout, etc.
+    """
+
+    def __init__(
+        self,
+        persistent_cache=None,
+        max_size=config.LAYOUT_DEDUP_MAX_SIZE,
+        max_total_size=config.LAYOUT_DEDUP_MAX_TOTAL_SIZE,
+    ):
+        self.persistent_cache = persistent_cache
+        self.max_size = max_size
+        self.max_total_size = max_total_size
+        # Maps the key of each canonical DOT string and prog (see
+        # LayoutCache.get_key()) to its canonical laid-out DOT string, in
+        # order from least to most recently used. (We use these keys rather
+        # than the canonical DOT strings themselves, so that we don't keep
+        # those in memory, too.)
+        self.layouts = collections.OrderedDict()
+        # Total length of the laid-out DOT strings in self.layouts
+        self.total_size = 0
+        self.evictions = 0
+        # Number of layouts reused (i.e. the number of layout computations
+        # saved)
+        self.reuse_ct = 0
+
+    def get_key(self, gv_input, prog):
+        """Returns the cache key of a DOT string laid out by prog."""
+        if len(gv_input) <= self.max_size:
+            gv_input = canonicalize_dot_string(gv_input)[0]
+        return LayoutCache.get_key(gv_input, prog)
+
+    def get(self, gv_input, prog="dot"):
+        """Returns the cached layout of a DOT string, or None if it isn't
+           in the cache.
+        """
+        if len(gv_input) > self.max_size:
+            if self.persistent_cache is None:
+                return None
+            return self.persistent_cache.get(gv_input, prog)
+        canonical_gv, to_canonical, from_canonical = canonicalize_dot_string(
+            gv_input
+        )
+        key = LayoutCache.get_key(canonical_gv, prog)
+        laid_out_gv = self.layouts.get(key)
+        if laid_out_gv is not None:
+            self.layouts.move_to_end(key)
+            self.reuse_ct += 1
+        else:
+            if self.persistent_cache is None:
+                return None
+            laid_out_gv = self.persistent_cache.get(canonical_gv, prog)
+            if laid_out_gv is None:
+                return None
+            self._add(key, laid_out_gv)
+        return _rename_dot_ids(laid_out_gv, _renamer(from_canonical))
+
+    def put(self, gv_input, prog, laid_out_gv):
+        """Adds the layout of a DOT string to the cache."""
+        if len(gv_input) > self.max_size:
+            if self.persistent_cache is not None:
+                self.persistent_cache.put(gv_input, prog, laid_out_gv)
+            return
+        canonical_gv, to_canonical, from_canonical = canonicalize_dot_string(
+            gv_input
+        )
+        laid_out_gv = _rename_dot_ids(laid_out_gv, _renamer(to_canonical))
+        self._add(LayoutCache.get_key(canonical_gv, prog), laid_out_gv)
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(canonical_gv, prog, laid_out_gv)
+
+    def _add(self, key, laid_out_gv):
+        """Keeps a canonical layout in memory, evicting the least recently
+           used layouts if the layouts in memory are now too large.
+        """
+        old_laid_out_gv = self.layouts.pop(key, None)
+        if old_laid_out_gv is not None:
+            self.total_size -= len(old_laid_out_gv)
+        self.layouts[key] = laid_out_gv
+        self.total_size += len(laid_out_gv)
+        while self.total_size > self.max_total_size:
+            evicted_gv = self.layouts.popitem(last=False)[1]
+            self.total_size -= len(evicted_gv)
+            self.evictions += 1
+
+    def stats_msg(self):
+        """Returns a message describing how useful the cache has been (and,
+           if applicable, how useful persistent_cache has been).
+
+           We only mention reused layouts if there were any, so this returns
+           an empty string if no layouts were reused and there isn't a
+           persistent_cache.
+        """
+        msgs = []
+        if self.reuse_ct > 0:
+            msgs.append(config.LAYOUT_DEDUP_STATS_MSG.format(rc=self.reuse_ct))
+        if self.persistent_cache is not None:
+            msgs.append(self.persistent_cache.stats_msg())
+        return "\n".join(msgs)
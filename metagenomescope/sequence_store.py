@@ -0,0 +1,338 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file defines the "sequence store" written by collate's -ss option: a
+# SQLite file, stored next to the .db file, containing the DNA sequences of
+# the nodes in an assembly graph. The .db file itself doesn't contain any
+# sequences (they'd make it far larger than the rest of the data the viewer
+# interface needs), but the viewer can load the sequence store when the user
+# wants to see or export the sequences of some nodes.
+#
+# Sequences are packed into 2 bits per nucleotide (A = 0, C = 1, G = 2,
+# T = 3; four nucleotides per byte, with the first in the highest bits) and
+# concatenated, with each sequence starting at a byte boundary. This stream of
+# packed bytes is split into blocks of SEQUENCE_STORE_BLOCK_SIZE bytes, each
+# of which is compressed with zlib and stored in the seqblocks table. The
+# sequences table maps each node ID to the position of its sequence in the
+# packed stream, so getting (part of) a sequence only means decompressing the
+# one or two blocks it's stored in.
+#
+# Characters other than A, C, G, and T (e.g. N) are stored as "exceptions":
+# runs of the same character, given by a JSON list of [start, length,
+# character] lists in the sequence's row. Lowercase nucleotides are stored as
+# uppercase ones.
+
+import collections
+import json
+import re
+import sqlite3
+import zlib
+
+import numpy
+
+from . import config
+from .file_utils import safe_file_remove
+from .input_node_utils import negate_node_id, _COMPLEMENT_TABLE
+
+# Maps each nucleotide (as a byte) to its 2-bit code. All other bytes map to
+# 0; these are stored as exceptions.
+_CODE_TABLE = bytearray(256)
+for _code, _nt in enumerate("ACGT"):
+    _CODE_TABLE[ord(_nt)] = _code
+    _CODE_TABLE[ord(_nt.lower())] = _code
+_CODE_TABLE = bytes(_CODE_TABLE)
+_NUCLEOTIDES = b"ACGTacgt"
+# Matches runs of the same non-nucleotide character
+_EXCEPTION_RE = re.compile(rb"([^ACGTacgt])\1*")
+# Maps each 2-bit code (as an index) back to its nucleotide
+_CODE_NUCLEOTIDES = numpy.frombuffer(b"ACGT", dtype=numpy.uint8)
+# The shifts to get the codes of the nucleotides in a packed byte, in order
+_CODE_SHIFTS = numpy.array([6, 4, 2, 0], dtype=numpy.uint8)
+
+SEQUENCE_STORE_TABLES = (
+    "CREATE TABLE seqinfo (version integer, block_size integer)",
+    "CREATE TABLE seqblocks (block_index integer PRIMARY KEY, data blob)",
+    "CREATE TABLE sequences (id text PRIMARY KEY, start integer, "
+    "length integer, exceptions text)",
+)
+
+
+def pack_sequence(dna_string):
+    """Packs a string of DNA into 2 bits per nucleotide.
+
+       Returns a 2-tuple of (packed bytes, exceptions). exceptions is None if
+       dna_string only contains nucleotides; otherwise, it's a JSON string
+       describing the runs of other characters in dna_string.
+    """
+    dna_bytes = dna_string.encode("ascii", "replace")
+    exceptions = None
+    if dna_bytes.translate(None, _NUCLEOTIDES):
+        exceptions = json.dumps(
+            [
+                [m.start(), m.end() - m.start(), chr(m.group()[0])]
+                for m in _EXCEPTION_RE.finditer(dna_bytes.upper())
+            ],
+            separators=(",", ":"),
+        )
+    codes = numpy.frombuffer(dna_bytes.translate(_CODE_TABLE), numpy.uint8)
+    padding = -len(codes) % 4
+    if padding > 0:
+        codes = numpy.concatenate((codes, numpy.zeros(padding, numpy.uint8)))
+    codes = codes.reshape(-1, 4)
+    packed = (
+        (codes[:, 0] << 6)
+        | (codes[:, 1] << 4)
+        | (codes[:, 2] << 2)
+        | codes[:, 3]
+    )
+    return packed.tobytes(), exceptions
+
+
+def unpack_sequence(packed, start, end, exceptions=None):
+    """Returns nucleotides [start, end) of a sequence, given the packed bytes
+       of (at least) this part of it: packed should start with the byte
+       containing nucleotide start // 4 * 4 of the sequence.
+
+       exceptions is the JSON string returned by pack_sequence() for the
+       entire sequence (or None, if there weren't any exceptions).
+    """
+    first = start - (start % 4)
+    packed = numpy.frombuffer(packed, numpy.uint8)
+    codes = ((packed[:, numpy.newaxis] >> _CODE_SHIFTS) & 3).ravel()
+    dna_bytes = bytearray(
+        _CODE_NUCLEOTIDES[codes[start - first : end - first]].tobytes()
+    )
+    if exceptions is not None:
+        for ex_start, ex_length, char in json.loads(exceptions):
+            lo = max(ex_start, start)
+            hi = min(ex_start + ex_length, end)
+            if lo < hi:
+                dna_bytes[lo - start : hi - start] = (
+                    char.encode("ascii", "replace") * (hi - lo)
+                )
+    return dna_bytes.decode("ascii")
+
+
+class SequenceStoreWriter(object):
+    """Writes DNA sequences to a sequence store file, one at a time.
+
+       Only the current (not-yet-full) block of packed sequences and a batch
+       of rows for the sequences table are held in memory, so the memory used
+       by this doesn't grow with the total length of the sequences written.
+
+       As with DBWriter, the whole file is written in a single transaction,
+       with journaling and synchronous writes disabled.
+
+       This can be used as a context manager: leaving the with block calls
+       finish(), or abort() if an exception was raised (so a failed run
+       doesn't leave a partially-written sequence store behind).
+    """
+
+    def __init__(
+        self,
+        filename,
+        block_size=config.SEQUENCE_STORE_BLOCK_SIZE,
+        batch_size=config.DB_BATCH_SIZE,
+    ):
+        self.filename = filename
+        self.block_size = block_size
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("PRAGMA journal_mode=OFF")
+        self.cursor.execute("PRAGMA synchronous=OFF")
+        self.cursor.execute("BEGIN")
+        for stmt in SEQUENCE_STORE_TABLES:
+            self.cursor.execute(stmt)
+        self.cursor.execute(
+            "INSERT INTO seqinfo VALUES (?,?)",
+            (config.SEQUENCE_STORE_VERSION, block_size),
+        )
+        # Packed bytes that haven't been written to a block yet
+        self.pending = bytearray()
+        self.block_ct = 0
+        self.rows = []
+        self.sequence_ct = 0
+        self.nt_ct = 0
+
+    def add(self, node_id, dna_string):
+        """Adds the DNA sequence of a node to the sequence store."""
+        packed, exceptions = pack_sequence(dna_string)
+        start = (self.block_ct * self.block_size) + len(self.pending)
+        self.rows.append((node_id, start, len(dna_string), exceptions))
+        self.sequence_ct += 1
+        self.nt_ct += len(dna_string)
+        self.pending += packed
+        # Write out all full blocks (a very long sequence might fill up more
+        # than one)
+        i = 0
+        while len(self.pending) - i >= self.block_size:
+            self._write_block(self.pending[i : i + self.block_size])
+            i += self.block_size
+        if i > 0:
+            del self.pending[:i]
+        if len(self.rows) >= self.batch_size:
+            self._flush_rows()
+
+    def _write_block(self, data):
+        self.cursor.execute(
+            "INSERT INTO seqblocks VALUES (?,?)",
+            (self.block_ct, zlib.compress(bytes(data))),
+        )
+        self.block_ct += 1
+
+    def _flush_rows(self):
+        self.cursor.executemany(
+            "INSERT INTO sequences VALUES (?,?,?,?)", self.rows
+        )
+        self.rows = []
+
+    def finish(self):
+        """Writes the last (partial) block and any remaining rows, commits
+           the transaction, and closes the file.
+
+           Returns a 2-tuple of (number of sequences written, total number of
+           nucleotides in these sequences).
+        """
+        if len(self.pending) > 0:
+            self._write_block(self.pending)
+            self.pending = bytearray()
+        self._flush_rows()
+        self.cursor.execute("COMMIT")
+        self.connection.close()
+        return self.sequence_ct, self.nt_ct
+
+    def abort(self):
+        """Closes the file without committing anything, and removes it."""
+        self.connection.close()
+        safe_file_remove(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+
+
+class SequenceStore(object):
+    """Reads DNA sequences from a sequence store file.
+
+       The most recently used decompressed blocks are kept in memory, so
+       reading many short sequences stored near each other (e.g. the
+       sequences of the nodes in a component) only decompresses each block
+       once.
+    """
+
+    def __init__(
+        self, filename, cached_block_ct=config.SEQUENCE_STORE_CACHED_BLOCKS
+    ):
+        self.connection = sqlite3.connect(filename)
+        self.cursor = self.connection.cursor()
+        version, self.block_size = self.cursor.execute(
+            "SELECT version, block_size FROM seqinfo"
+        ).fetchone()
+        if version != config.SEQUENCE_STORE_VERSION:
+            raise ValueError(
+                filename
+                + config.SEQUENCE_STORE_VERSION_ERR
+                + "{}".format(version)
+            )
+        self.cached_block_ct = cached_block_ct
+        self.blocks = collections.OrderedDict()
+
+    def _get_row(self, node_id):
+        return self.cursor.execute(
+            "SELECT start, length, exceptions FROM sequences WHERE id = ?",
+            (node_id,),
+        ).fetchone()
+
+    def __contains__(self, node_id):
+        return self._get_row(node_id) is not None
+
+    def __len__(self):
+        row = self.cursor.execute("SELECT COUNT(*) FROM sequences").fetchone()
+        return row[0]
+
+    def _get_block(self, block_index):
+        if block_index in self.blocks:
+            self.blocks.move_to_end(block_index)
+            return self.blocks[block_index]
+        data = zlib.decompress(
+            self.cursor.execute(
+                "SELECT data FROM seqblocks WHERE block_index = ?",
+                (block_index,),
+            ).fetchone()[0]
+        )
+        self.blocks[block_index] = data
+        if len(self.blocks) > self.cached_block_ct:
+            self.blocks.popitem(last=False)
+        return data
+
+    def _read_packed(self, start, end):
+        """Returns bytes [start, end) of the stream of packed sequences."""
+        chunks = []
+        first_block = start // self.block_size
+        last_block = (end - 1) // self.block_size
+        for b in range(first_block, last_block + 1):
+            block_start = b * self.block_size
+            data = self._get_block(b)
+            chunks.append(
+                data[max(start - block_start, 0) : end - block_start]
+            )
+        return b"".join(chunks)
+
+    def get(self, node_id, start=0, end=None):
+        """Returns nucleotides [start, end) of the sequence of a node (or the
+           entire sequence, if start and end aren't given).
+
+           If the sequence of node_id isn't stored, but the sequence of its
+           reverse complement (e.g. "5" for "-5") is, we return the reverse
+           complement of that sequence (this is the case for GFA files, which
+           only give the sequences of positive nodes).
+
+           Raises a KeyError if neither of these sequences are stored.
+        """
+        row = self._get_row(node_id)
+        if row is None:
+            row = self._get_row(negate_node_id(node_id))
+            if row is None:
+                raise KeyError(node_id)
+            length = row[1]
+            end = length if end is None else min(end, length)
+            rc_start = length - end
+            rc_end = length - min(start, end)
+            return (
+                self.get(negate_node_id(node_id), rc_start, rc_end)
+                .encode("ascii")
+                .translate(_COMPLEMENT_TABLE)[::-1]
+                .decode("ascii")
+            )
+        seq_start, length, exceptions = row
+        end = length if end is None else min(end, length)
+        if start >= end:
+            return ""
+        packed = self._read_packed(
+            seq_start + (start // 4), seq_start + ((end + 3) // 4)
+        )
+        return unpack_sequence(packed, start, end, exceptions)
+
+    def close(self):
+        self.connection.close()
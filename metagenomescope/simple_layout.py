@@ -0,0 +1,273 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains "analytic" layouts for graphs with very simple shapes,
+# which make up most of the components (and node groups) in a typical
+# assembly graph:
+#
+# -A single node, without any edges (e.g. a component that's just one
+#  collapsed node group)
+# -A chain of nodes (a -> b -> c -> ...)
+# -A bubble: one source node with k >= 2 parallel paths to one sink node
+#  (some of which might be empty, i.e. an edge from the source to the sink)
+# -A simple cycle (a -> b -> ... -> a), including a single node with a loop
+#
+# Laying these out using GraphViz means paying for an AGraph and a dot run
+# each time, even though we know exactly what dot's drawing will look like:
+# nodes are stacked from top to bottom, edges leave the bottom of their
+# source and enter the top of their target (tailport=s, headport=n), and
+# the bottom left corner of the drawing is at (0, 0). So we just compute
+# these drawings directly.
+
+from . import config
+
+
+def _find_shape(node_ct, sources, targets):
+    """Figures out if a graph has one of the simple shapes we can lay out.
+
+       Returns a 2-tuple of (shape name, list of paths), or None if the
+       graph doesn't have a simple shape. Chains and cycles are described by
+       a single path of all of their nodes (in order). For bubbles, the first
+       path is just the source node, the last path is just the sink node,
+       and the paths in between are the parallel paths between them (in the
+       order of the source node's outgoing edges; an edge from the source to
+       the sink is an empty path).
+    """
+    edge_ct = len(sources)
+    if len(set(zip(sources, targets))) < edge_ct:
+        return None
+    in_degrees = [0] * node_ct
+    out_edges = [[] for _ in range(node_ct)]
+    for s, t in zip(sources, targets):
+        in_degrees[t] += 1
+        out_edges[s].append(t)
+    max_out_degree = max(len(o) for o in out_edges)
+    roots = [n for n in range(node_ct) if in_degrees[n] == 0]
+    if edge_ct == node_ct - 1:
+        # A chain (or, if node_ct is 1, a single node)
+        if len(roots) != 1 or max_out_degree > 1:
+            return None
+        chain = _follow(roots[0], out_edges, None)
+        if len(chain) != node_ct:
+            return None
+        return "chain", [chain]
+    if edge_ct == node_ct and len(roots) == 0 and max_out_degree == 1:
+        # A cycle (since every node has exactly one incoming and one
+        # outgoing edge, we just need to check that there's only one cycle)
+        cycle = _follow(0, out_edges, 0)
+        if len(cycle) != node_ct:
+            return None
+        return "cycle", [cycle]
+    # A bubble
+    sinks = [n for n in range(node_ct) if len(out_edges[n]) == 0]
+    if len(roots) != 1 or len(sinks) != 1:
+        return None
+    root = roots[0]
+    sink = sinks[0]
+    if len(out_edges[root]) < 2 or in_degrees[sink] != len(out_edges[root]):
+        return None
+    paths = [[root]]
+    path_node_ct = 0
+    for n in out_edges[root]:
+        path = []
+        if n != sink:
+            path = _follow(n, out_edges, sink)
+            if path[-1] != sink:
+                return None
+            path.pop()
+            for m in path:
+                if in_degrees[m] != 1 or len(out_edges[m]) != 1:
+                    return None
+        paths.append(path)
+        path_node_ct += len(path)
+    if path_node_ct != node_ct - 2:
+        return None
+    paths.append([sink])
+    return "bubble", paths
+
+
+def _follow(start, out_edges, stop):
+    """Returns the list of nodes visited by following the outgoing edge of
+       each node in turn, starting at start, until reaching stop (which is
+       included in the list, unless it's start) or a node that doesn't have
+       exactly one outgoing edge. Gives up after visiting as many nodes as
+       there are in the graph.
+    """
+    path = [start]
+    n = start
+    while len(out_edges[n]) == 1 and len(path) <= len(out_edges):
+        n = out_edges[n][0]
+        if n == stop and n == start:
+            break
+        path.append(n)
+        if n == stop:
+            break
+    return path
+
+
+def _polyline_points(polyline):
+    """Converts a list of (x, y) points describing a polyline to the points
+       of a piecewise cubic Bezier curve that follows the polyline exactly
+       (as in layered_layout.layered_layout()).
+    """
+    points = []
+    for (x1, y1), (x2, y2) in zip(polyline[:-1], polyline[1:]):
+        dx = x2 - x1
+        dy = y2 - y1
+        points.append((x1, y1))
+        points.append((x1 + dx / 3, y1 + dy / 3))
+        points.append((x1 + dx * 2 / 3, y1 + dy * 2 / 3))
+    points.append(polyline[-1])
+    return points
+
+
+def simple_layout(
+    widths,
+    heights,
+    sources,
+    targets,
+    nodesep=config.LAYERED_NODESEP,
+    ranksep=config.LAYERED_RANKSEP,
+):
+    """Lays out a directed graph with a simple shape from top to bottom.
+
+       widths and heights are lists of the dimensions of each node, and
+       sources and targets are lists of the (integer) source and target
+       nodes of each edge. All dimensions are in points.
+
+       Returns a 4-tuple of (x-coordinates of node centers, y-coordinates of
+       node centers, list of edge control point lists, (right, top) corner
+       of the bounding box). Each edge's control points are a list of (x, y)
+       tuples, given in the same way as in layered_layout.layered_layout();
+       the bottom left corner of the bounding box is at (0, 0).
+
+       Returns None if the graph doesn't have one of the shapes described at
+       the top of this file.
+    """
+    node_ct = len(widths)
+    if node_ct == 0:
+        return None
+    shape = _find_shape(node_ct, sources, targets)
+    if shape is None:
+        return None
+    shape_name, paths = shape
+    # Assign each node to a rank (its layer, from top to bottom). The
+    # y-axis points up, so ranks go down from y = 0 (we shift everything
+    # into place at the end).
+    ranks = [0] * node_ct
+    if shape_name == "bubble":
+        for path in paths[1:-1]:
+            for r, n in enumerate(path, 1):
+                ranks[n] = r
+        ranks[paths[-1][0]] = max(len(p) for p in paths[1:-1]) + 1
+    else:
+        for r, n in enumerate(paths[0]):
+            ranks[n] = r
+    rank_heights = [0] * (max(ranks) + 1)
+    for n in range(node_ct):
+        rank_heights[ranks[n]] = max(rank_heights[ranks[n]], heights[n])
+    rank_tops = []
+    rank_bottoms = []
+    y = 0
+    for h in rank_heights:
+        rank_tops.append(y)
+        rank_bottoms.append(y - h)
+        y -= h + ranksep
+    ys = [
+        rank_tops[ranks[n]] - rank_heights[ranks[n]] / 2
+        for n in range(node_ct)
+    ]
+    # Each of a bubble's parallel paths gets its own column, with the source
+    # and sink centered above and below these. Everything else is in a
+    # single column.
+    xs = [0] * node_ct
+    column_xs = []
+    if shape_name == "bubble":
+        x = 0
+        for path in paths[1:-1]:
+            w = max(
+                [widths[n] for n in path] + [config.LAYERED_DUMMY_WIDTH]
+            )
+            column_xs.append(x + w / 2)
+            for n in path:
+                xs[n] = x + w / 2
+            x += w + nodesep
+        xs[paths[0][0]] = xs[paths[-1][0]] = (x - nodesep) / 2
+
+    def bottom(n):
+        return (xs[n], ys[n] - heights[n] / 2)
+
+    def top(n):
+        return (xs[n], ys[n] + heights[n] / 2)
+
+    edge_points = []
+    for s, t in zip(sources, targets):
+        if ranks[t] <= ranks[s]:
+            # The edge closing a cycle: go around the right side of the
+            # drawing, from below s to above t
+            below = bottom(s)[1] - ranksep / 2
+            above = top(t)[1] + ranksep / 2
+            right = (
+                max(xs[n] + widths[n] / 2 for n in range(node_ct))
+                + config.LAYERED_LOOP_SIZE
+            )
+            polyline = [
+                bottom(s),
+                (xs[s], below),
+                (right, below),
+                (right, above),
+                (xs[t], above),
+                top(t),
+            ]
+        elif shape_name == "bubble" and ranks[t] - ranks[s] == len(
+            rank_heights
+        ) - 1:
+            # The empty path of a bubble: go straight down its column
+            c = [len(p) for p in paths[1:-1]].index(0)
+            polyline = [
+                bottom(s),
+                (column_xs[c], rank_tops[1]),
+                (column_xs[c], rank_bottoms[-2]),
+                top(t),
+            ]
+        elif ranks[t] - ranks[s] > 1:
+            # The end of a bubble's path that's shorter than the others: go
+            # straight down to the rank above the sink, then turn towards it
+            polyline = [bottom(s), (xs[s], rank_bottoms[-2]), top(t)]
+        else:
+            polyline = [bottom(s), top(t)]
+        edge_points.append(_polyline_points(polyline))
+    # Move the bottom left corner of the drawing to (0, 0)
+    all_xs = [
+        xs[n] + d * widths[n] / 2 for n in range(node_ct) for d in (-1, 1)
+    ]
+    all_ys = [
+        ys[n] + d * heights[n] / 2 for n in range(node_ct) for d in (-1, 1)
+    ]
+    for points in edge_points:
+        for px, py in points:
+            all_xs.append(px)
+            all_ys.append(py)
+    dx = -min(all_xs)
+    dy = -min(all_ys)
+    xs = [x + dx for x in xs]
+    ys = [y + dy for y in ys]
+    edge_points = [
+        [(px + dx, py + dy) for px, py in points] for points in edge_points
+    ]
+    return xs, ys, edge_points, (max(all_xs) + dx, max(all_ys) + dy)
@@ -0,0 +1,799 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains an in-process implementation of the biconnected
+# component and SPQR tree decompositions computed by the "SPQR script"
+# (spqr.cpp), which lets collate.py compute SPQR data without writing edge
+# lists to disk, running an external binary, and then parsing its output.
+# It also contains utilities for parsing the SPQR script's output and for
+# processing many bicomponents in parallel.
+
+import collections
+import multiprocessing
+import re
+from . import graph_objects
+
+# Regular expressions used to parse the component_*.info files output by the
+# SPQR script
+_METANODE_ID_REGEX = re.compile(r"^\d+$")
+_METANODE_TYPE_REGEX = re.compile(r"^[SPR]$")
+_EDGE_LINE_REGEX = re.compile(r"^v|r")
+
+
+def biconnected_components(edges):
+    """Finds the biconnected components of an undirected multigraph.
+
+       edges should be a list of 2-tuples of node IDs. Edge directions are
+       ignored, and self-loops aren't included in any biconnected component
+       (matching the behavior of OGDF's BCTree).
+
+       Returns a list of lists, where each list contains the indices (in
+       edges) of the edges in a biconnected component.
+    """
+    adj = {}
+    for i, (u, v) in enumerate(edges):
+        if u != v:
+            adj.setdefault(u, []).append((v, i))
+            adj.setdefault(v, []).append((u, i))
+    disc = {}
+    low = {}
+    edge_stack = []
+    components = []
+    for root in adj:
+        if root in disc:
+            continue
+        disc[root] = low[root] = len(disc)
+        # Each entry is (node, index of the edge used to reach this node,
+        # iterator over this node's incident edges)
+        stack = [(root, None, iter(adj[root]))]
+        while stack:
+            u, parent_edge, incident_edges = stack[-1]
+            descended = False
+            for w, i in incident_edges:
+                if i == parent_edge:
+                    continue
+                if w not in disc:
+                    disc[w] = low[w] = len(disc)
+                    edge_stack.append(i)
+                    stack.append((w, i, iter(adj[w])))
+                    descended = True
+                    break
+                elif disc[w] < disc[u]:
+                    # Back edge (or an edge parallel to the parent edge)
+                    low[u] = min(low[u], disc[w])
+                    edge_stack.append(i)
+            if descended:
+                continue
+            stack.pop()
+            if stack:
+                p = stack[-1][0]
+                low[p] = min(low[p], low[u])
+                if low[u] >= disc[p]:
+                    # p separates u's subtree from the rest of the graph
+                    component = []
+                    while True:
+                        i = edge_stack.pop()
+                        component.append(i)
+                        if i == parent_edge:
+                            break
+                    components.append(component)
+    return components
+
+
+# Types of edges in the palm tree built by _TriconnectedComponentFinder
+_UNSEEN = 0
+_TREE = 1
+_FROND = 2
+_REMOVED = 3
+
+
+class _TriconnectedComponentFinder(object):
+    """Splits a biconnected multigraph into its split components in linear
+       time, using the algorithm of Hopcroft and Tarjan (1973) as corrected
+       by Gutwenger and Mutzel (2001). (This is the same algorithm that the
+       SPQR script uses, through OGDF.)
+
+       Nodes are referred to by their indices in nodes, and edges by their
+       indices in src/tgt; edges with IDs of at least the number of input
+       edges are virtual edges. After construction, components is a list of
+       lists of edge IDs, each describing a bond, polygon, or triconnected
+       graph.
+
+       The recursive parts of the algorithm are written as generators that
+       yield the node to recurse on, so that large graphs don't hit Python's
+       recursion limit.
+    """
+
+    def __init__(self, edges):
+        self.nodes = list(dict.fromkeys(n for e in edges for n in e))
+        node2idx = {n: i for i, n in enumerate(self.nodes)}
+        self.src = [node2idx[u] for u, v in edges]
+        self.tgt = [node2idx[v] for u, v in edges]
+        self.real_edge_ct = len(edges)
+        self.etype = [_UNSEEN] * len(edges)
+        self.start = [False] * len(edges)
+        # Position (node index, list index) of each edge in the adjacency
+        # lists, and the entry of each frond in its target's highpt list
+        self.in_adj = [None] * len(edges)
+        self.in_high = [None] * len(edges)
+        self.components = []
+        if len(self.nodes) == 2:
+            self.components.append(list(range(len(edges))))
+            return
+        self._split_multi_edges()
+        self._dfs1()
+        self._build_acceptable_adj_struct()
+        self._dfs2()
+        self.tstack_a = [-1]
+        self.tstack_b = [-1]
+        self.tstack_h = [-1]
+        self.estack = []
+        _run_generators(self._path_search, 0)
+        self.components.append(self.estack)
+
+    def _new_edge(self, u, v, etype=_UNSEEN):
+        self.src.append(u)
+        self.tgt.append(v)
+        self.etype.append(etype)
+        self.start.append(False)
+        self.in_adj.append(None)
+        self.in_high.append(None)
+        return len(self.src) - 1
+
+    def _split_multi_edges(self):
+        pair2edges = {}
+        for e, (u, v) in enumerate(zip(self.src, self.tgt)):
+            pair2edges.setdefault((min(u, v), max(u, v)), []).append(e)
+        for (u, v), pair_edges in pair2edges.items():
+            if len(pair_edges) > 1:
+                for e in pair_edges:
+                    self.etype[e] = _REMOVED
+                self.components.append(pair_edges + [self._new_edge(u, v)])
+
+    def _dfs1(self):
+        """Builds a palm tree of the graph: orients each edge as either a
+           tree arc (from parent to child) or a frond (from descendant to
+           ancestor), and computes the DFS number, lowpt1, lowpt2, and number
+           of descendants (including itself) of each node.
+        """
+        node_ct = len(self.nodes)
+        incident_edges = [[] for n in range(node_ct)]
+        for e in range(len(self.src)):
+            if self.etype[e] != _REMOVED:
+                incident_edges[self.src[e]].append(e)
+                incident_edges[self.tgt[e]].append(e)
+        self.degree = [len(es) for es in incident_edges]
+        self.number = number = [0] * node_ct
+        self.lowpt1 = lowpt1 = [0] * node_ct
+        self.lowpt2 = lowpt2 = [0] * node_ct
+        self.nd = nd = [1] * node_ct
+        self.father = [None] * node_ct
+        self.tree_arc = [None] * node_ct
+        dfs_count = 1
+        number[0] = lowpt1[0] = lowpt2[0] = 1
+        stack = [(0, iter(incident_edges[0]))]
+        while stack:
+            v, v_edges = stack[-1]
+            for e in v_edges:
+                if self.etype[e] != _UNSEEN:
+                    continue
+                w = self.tgt[e] if self.src[e] == v else self.src[e]
+                self.src[e] = v
+                self.tgt[e] = w
+                if number[w] == 0:
+                    self.etype[e] = _TREE
+                    self.tree_arc[w] = e
+                    self.father[w] = v
+                    dfs_count += 1
+                    number[w] = lowpt1[w] = lowpt2[w] = dfs_count
+                    stack.append((w, iter(incident_edges[w])))
+                    break
+                self.etype[e] = _FROND
+                if number[w] < lowpt1[v]:
+                    lowpt2[v] = lowpt1[v]
+                    lowpt1[v] = number[w]
+                elif number[w] > lowpt1[v]:
+                    lowpt2[v] = min(lowpt2[v], number[w])
+            else:
+                stack.pop()
+                if stack:
+                    p = stack[-1][0]
+                    if lowpt1[v] < lowpt1[p]:
+                        lowpt2[p] = min(lowpt1[p], lowpt2[v])
+                        lowpt1[p] = lowpt1[v]
+                    elif lowpt1[v] == lowpt1[p]:
+                        lowpt2[p] = min(lowpt2[p], lowpt2[v])
+                    else:
+                        lowpt2[p] = min(lowpt2[p], lowpt1[v])
+                    nd[p] += nd[v]
+
+    def _build_acceptable_adj_struct(self):
+        """Sorts the outgoing edges of each node by their phi values, using
+           a bucket sort.
+        """
+        buckets = [[] for i in range(3 * len(self.nodes) + 3)]
+        for e, etype in enumerate(self.etype):
+            if etype == _REMOVED:
+                continue
+            w = self.tgt[e]
+            if etype == _FROND:
+                phi = 3 * self.number[w] + 1
+            elif self.lowpt2[w] < self.number[self.src[e]]:
+                phi = 3 * self.lowpt1[w]
+            else:
+                phi = 3 * self.lowpt1[w] + 2
+            buckets[phi].append(e)
+        self.adj = [[] for n in self.nodes]
+        for bucket in buckets:
+            for e in bucket:
+                v = self.src[e]
+                self.in_adj[e] = (v, len(self.adj[v]))
+                self.adj[v].append(e)
+
+    def _dfs2(self):
+        """Renumbers the nodes in the order used by the path search, marks
+           the first edge of each path, and builds the highpt lists.
+        """
+        node_ct = len(self.nodes)
+        self.newnum = [0] * node_ct
+        # Each entry of a highpt list is a list of [newnum, is not deleted]
+        self.highpt = [collections.deque() for n in self.nodes]
+        self._dfs_count = node_ct
+        self._new_path = True
+        _run_generators(self._path_finder, 0)
+        old2new = [0] * (node_ct + 1)
+        for v in range(node_ct):
+            old2new[self.number[v]] = self.newnum[v]
+        self.nodeat = [None] * (node_ct + 1)
+        for v in range(node_ct):
+            self.nodeat[self.newnum[v]] = v
+            self.lowpt1[v] = old2new[self.lowpt1[v]]
+            self.lowpt2[v] = old2new[self.lowpt2[v]]
+
+    def _path_finder(self, v):
+        self.newnum[v] = self._dfs_count - self.nd[v] + 1
+        for e in self.adj[v]:
+            w = self.tgt[e]
+            if self._new_path:
+                self._new_path = False
+                self.start[e] = True
+            if self.etype[e] == _TREE:
+                yield w
+                self._dfs_count -= 1
+            else:
+                entry = [self.newnum[v], True]
+                self.highpt[w].append(entry)
+                self.in_high[e] = entry
+                self._new_path = True
+
+    def _high(self, v):
+        highpt = self.highpt[v]
+        while highpt and not highpt[0][1]:
+            highpt.popleft()
+        return highpt[0][0] if highpt else 0
+
+    def _del_high(self, e):
+        if self.in_high[e] is not None:
+            self.in_high[e][1] = False
+            self.in_high[e] = None
+
+    def _del_adj(self, e):
+        v, i = self.in_adj[e]
+        self.adj[v][i] = None
+        self.in_adj[e] = None
+
+    def _first_child(self, v):
+        return next(self.tgt[e] for e in self.adj[v] if e is not None)
+
+    def _tstack_push(self, h, a, b):
+        self.tstack_h.append(h)
+        self.tstack_a.append(a)
+        self.tstack_b.append(b)
+
+    def _tstack_pop(self):
+        self.tstack_a.pop()
+        self.tstack_b.pop()
+        return self.tstack_h.pop()
+
+    def _path_search(self, v):
+        """Finds the separation pairs of the graph, splitting off a split
+           component at each one.
+        """
+        newnum = self.newnum
+        lowpt1 = self.lowpt1
+        degree = self.degree
+        nodeat = self.nodeat
+        estack = self.estack
+        tstack_a = self.tstack_a
+        tstack_b = self.tstack_b
+        tstack_h = self.tstack_h
+        vnum = newnum[v]
+        adj = self.adj[v]
+        outv = sum(e is not None for e in adj)
+        for i in range(len(adj)):
+            e = adj[i]
+            if e is None:
+                continue
+            w = self.tgt[e]
+            wnum = newnum[w]
+            if self.etype[e] == _TREE:
+                if self.start[e]:
+                    if tstack_a[-1] > lowpt1[w]:
+                        y = 0
+                        while tstack_a[-1] > lowpt1[w]:
+                            b = tstack_b[-1]
+                            y = max(y, self._tstack_pop())
+                        self._tstack_push(y, lowpt1[w], b)
+                    else:
+                        self._tstack_push(
+                            wnum + self.nd[w] - 1, lowpt1[w], vnum
+                        )
+                    # End-of-stack marker
+                    self._tstack_push(-1, -1, -1)
+
+                yield w
+
+                estack.append(self.tree_arc[w])
+                # Check for type-2 separation pairs
+                while vnum != 1 and (
+                    tstack_a[-1] == vnum
+                    or (degree[w] == 2 and newnum[self._first_child(w)] > wnum)
+                ):
+                    a = tstack_a[-1]
+                    b = tstack_b[-1]
+                    if a == vnum and self.father[nodeat[b]] == nodeat[a]:
+                        self._tstack_pop()
+                        continue
+                    e_ab = None
+                    if degree[w] == 2 and newnum[self._first_child(w)] > wnum:
+                        e1 = estack.pop()
+                        e2 = estack.pop()
+                        self._del_adj(e2)
+                        x = self.tgt[e2]
+                        e_virt = self._new_edge(v, x)
+                        degree[x] -= 1
+                        degree[v] -= 1
+                        self.components.append([e1, e2, e_virt])
+                        if estack:
+                            e1 = estack[-1]
+                            if self.src[e1] == x and self.tgt[e1] == v:
+                                e_ab = estack.pop()
+                                self._del_adj(e_ab)
+                                self._del_high(e_ab)
+                    else:
+                        h = self._tstack_pop()
+                        component = []
+                        while estack:
+                            xy = estack[-1]
+                            xnum = newnum[self.src[xy]]
+                            ynum = newnum[self.tgt[xy]]
+                            if not (a <= xnum <= h and a <= ynum <= h):
+                                break
+                            estack.pop()
+                            if (xnum == a and ynum == b) or (
+                                ynum == a and xnum == b
+                            ):
+                                e_ab = xy
+                                self._del_adj(e_ab)
+                                self._del_high(e_ab)
+                            else:
+                                if self.in_adj[xy] != (v, i):
+                                    self._del_adj(xy)
+                                    self._del_high(xy)
+                                component.append(xy)
+                                degree[nodeat[xnum]] -= 1
+                                degree[nodeat[ynum]] -= 1
+                        x = nodeat[b]
+                        e_virt = self._new_edge(v, x)
+                        component.append(e_virt)
+                        self.components.append(component)
+                    if e_ab is not None:
+                        bond = [e_ab, e_virt]
+                        e_virt = self._new_edge(v, x)
+                        bond.append(e_virt)
+                        self.components.append(bond)
+                        degree[x] -= 1
+                        degree[v] -= 1
+                    estack.append(e_virt)
+                    adj[i] = e_virt
+                    self.in_adj[e_virt] = (v, i)
+                    degree[x] += 1
+                    degree[v] += 1
+                    self.father[x] = v
+                    self.tree_arc[x] = e_virt
+                    self.etype[e_virt] = _TREE
+                    w = x
+                    wnum = newnum[w]
+
+                # Check for a type-1 separation pair
+                if (
+                    self.lowpt2[w] >= vnum
+                    and lowpt1[w] < vnum
+                    and (self.father[v] != 0 or outv >= 2)
+                ):
+                    component = []
+                    xnum = ynum = None
+                    while estack:
+                        xy = estack[-1]
+                        xnum = newnum[self.src[xy]]
+                        ynum = newnum[self.tgt[xy]]
+                        if not (
+                            wnum <= xnum < wnum + self.nd[w]
+                            or wnum <= ynum < wnum + self.nd[w]
+                        ):
+                            break
+                        component.append(estack.pop())
+                        self._del_high(xy)
+                        degree[nodeat[xnum]] -= 1
+                        degree[nodeat[ynum]] -= 1
+                    lw = nodeat[lowpt1[w]]
+                    e_virt = self._new_edge(v, lw)
+                    component.append(e_virt)
+                    self.components.append(component)
+                    if (xnum == vnum and ynum == lowpt1[w]) or (
+                        ynum == vnum and xnum == lowpt1[w]
+                    ):
+                        eh = estack.pop()
+                        if self.in_adj[eh] != (v, i):
+                            self._del_adj(eh)
+                        bond = [eh, e_virt]
+                        e_virt = self._new_edge(v, lw)
+                        bond.append(e_virt)
+                        self.components.append(bond)
+                        self.in_high[e_virt] = self.in_high[eh]
+                        self.in_high[eh] = None
+                        degree[v] -= 1
+                        degree[lw] -= 1
+                    if lw != self.father[v]:
+                        estack.append(e_virt)
+                        adj[i] = e_virt
+                        self.in_adj[e_virt] = (v, i)
+                        self.etype[e_virt] = _FROND
+                        if (
+                            self.in_high[e_virt] is None
+                            and self._high(lw) < vnum
+                        ):
+                            entry = [vnum, True]
+                            self.highpt[lw].appendleft(entry)
+                            self.in_high[e_virt] = entry
+                        degree[v] += 1
+                        degree[lw] += 1
+                    else:
+                        adj[i] = None
+                        bond = [e_virt]
+                        e_virt = self._new_edge(lw, v, _TREE)
+                        bond.append(e_virt)
+                        eh = self.tree_arc[v]
+                        bond.append(eh)
+                        self.components.append(bond)
+                        self.tree_arc[v] = e_virt
+                        p, j = self.in_adj[eh]
+                        self.adj[p][j] = e_virt
+                        self.in_adj[e_virt] = (p, j)
+                        self.in_adj[eh] = None
+
+                if self.start[e]:
+                    while tstack_a[-1] != -1:
+                        self._tstack_pop()
+                    self._tstack_pop()
+                while (
+                    tstack_a[-1] != -1
+                    and tstack_b[-1] != vnum
+                    and self._high(v) > tstack_h[-1]
+                ):
+                    self._tstack_pop()
+                outv -= 1
+
+            else:
+                if self.start[e]:
+                    if tstack_a[-1] > wnum:
+                        y = 0
+                        while tstack_a[-1] > wnum:
+                            b = tstack_b[-1]
+                            y = max(y, self._tstack_pop())
+                        self._tstack_push(y, wnum, b)
+                    else:
+                        self._tstack_push(vnum, wnum, vnum)
+                estack.append(e)
+
+
+def _run_generators(func, arg):
+    """Runs func(arg), where func is a recursive algorithm written as a
+       generator that yields the argument of each recursive call it makes.
+    """
+    stack = [func(arg)]
+    while stack:
+        try:
+            stack.append(func(next(stack[-1])))
+        except StopIteration:
+            stack.pop()
+
+
+def _component_type(ends, component_edges):
+    """Returns "P", "S", or "R" for a bond, polygon, or triconnected split
+       component.
+    """
+    component_nodes = set(n for e in component_edges for n in ends[e])
+    if len(component_nodes) == 2:
+        return "P"
+    elif len(component_nodes) == len(component_edges):
+        return "S"
+    return "R"
+
+
+def spqr_decomposition(edges):
+    """Computes the SPQR tree of a biconnected multigraph.
+
+       edges should be a list of 2-tuples of node IDs, containing at least 3
+       edges and no self-loops. Edge directions are ignored.
+
+       Returns a 2-tuple of (metanodes, tree edges). Each metanode is a
+       2-tuple of (type, skeleton edges), where type is "S", "P", or "R"
+       and each skeleton edge is a 3-tuple of ("r" or "v" -- for real or
+       virtual edges -- and the IDs of the edge's two nodes). Each tree edge
+       is a 2-tuple of the indices of two metanodes that share a virtual
+       edge. (This matches the format of the component_*.info and spqr*.gml
+       files output by the SPQR script.)
+    """
+    finder = _TriconnectedComponentFinder(edges)
+    ends = [
+        (finder.nodes[u], finder.nodes[v])
+        for u, v in zip(finder.src, finder.tgt)
+    ]
+    components = [
+        (_component_type(ends, component_edges), component_edges)
+        for component_edges in finder.components
+    ]
+
+    # The triconnected components are obtained by merging adjacent split
+    # components that are both bonds or both polygons.
+    virtual_edge2components = {}
+    for ci, (ctype, component_edges) in enumerate(components):
+        for e in component_edges:
+            if e >= finder.real_edge_ct:
+                virtual_edge2components.setdefault(e, []).append(ci)
+    parent = list(range(len(components)))
+
+    def find(ci):
+        while parent[ci] != ci:
+            parent[ci] = parent[parent[ci]]
+            ci = parent[ci]
+        return ci
+
+    merged_edges = set()
+    for e, (ci, cj) in virtual_edge2components.items():
+        if components[ci][0] == components[cj][0] != "R":
+            parent[find(ci)] = find(cj)
+            merged_edges.add(e)
+
+    root2metanode = {}
+    metanode_edge_lists = []
+    metanode_types = []
+    for ci, (ctype, component_edges) in enumerate(components):
+        root = find(ci)
+        if root not in root2metanode:
+            root2metanode[root] = len(metanode_types)
+            metanode_types.append(ctype)
+            metanode_edge_lists.append([])
+        metanode_edge_lists[root2metanode[root]].extend(
+            e for e in component_edges if e not in merged_edges
+        )
+
+    metanodes = []
+    for ctype, component_edges in zip(metanode_types, metanode_edge_lists):
+        skeleton_edges = []
+        for e in sorted(set(component_edges)):
+            edge_type = "v" if e >= finder.real_edge_ct else "r"
+            skeleton_edges.append((edge_type,) + ends[e])
+        metanodes.append((ctype, skeleton_edges))
+    tree_edges = [
+        (root2metanode[find(ci)], root2metanode[find(cj)])
+        for e, (ci, cj) in virtual_edge2components.items()
+        if e not in merged_edges
+    ]
+    return metanodes, tree_edges
+
+
+def skeleton_nodes(skeleton_edges):
+    """Returns a list of the node IDs in a metanode's skeleton, in the order
+       in which they first appear in its edges.
+    """
+    return list(dict.fromkeys(n for e in skeleton_edges for n in e[1:]))
+
+
+def spqr_tree(edges):
+    """Computes the rooted SPQR tree of a biconnected multigraph.
+
+       Like the SPQR script, this roots the tree at the metanode with the
+       greatest number of skeleton nodes and edges.
+
+       Returns a 2-tuple of (metanodes, tree edges). Each metanode is a
+       4-tuple of (metanode ID, type, list of skeleton node IDs, list of
+       skeleton edges), and each tree edge is a 2-tuple of the indices of a
+       parent and child metanode. This is the format used by
+       build_bicomponent(), and only contains builtin types so that it can
+       be sent between processes quickly.
+    """
+    metanodes, tree_edges = spqr_decomposition(edges)
+    metanodes = [
+        (str(i), metanode_type, skeleton_nodes(skeleton_edges), skeleton_edges)
+        for i, (metanode_type, skeleton_edges) in enumerate(metanodes)
+    ]
+    root_index = max(
+        range(len(metanodes)),
+        key=lambda i: (len(metanodes[i][2]) + len(metanodes[i][3]), -i),
+    )
+    # Orient the tree edges away from the root
+    neighbors = [[] for m in metanodes]
+    for i, j in tree_edges:
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+    oriented_tree_edges = []
+    seen = {root_index}
+    to_visit = [root_index]
+    while to_visit:
+        i = to_visit.pop()
+        for j in neighbors[i]:
+            if j not in seen:
+                seen.add(j)
+                oriented_tree_edges.append((i, j))
+                to_visit.append(j)
+    return metanodes, oriented_tree_edges
+
+
+def parse_spqr_script_output(component_info_fn, tree_structure_fn):
+    """Parses the component_*.info and spqr*.gml files that the SPQR script
+       outputs for a bicomponent.
+
+       Returns a 2-tuple of (metanodes, tree edges) in the same format as
+       spqr_tree().
+    """
+    metanodes = []
+    metanodeid2index = {}
+    with open(component_info_fn, "r") as component_info_file:
+        for line in component_info_file:
+            if _EDGE_LINE_REGEX.match(line):
+                metanodes[-1][3].append(line.split())
+            elif _METANODE_ID_REGEX.match(line):
+                metanodeid2index[line.strip()] = len(metanodes)
+                metanodes.append([line.strip(), "", [], []])
+            elif _METANODE_TYPE_REGEX.match(line):
+                metanodes[-1][1] = line.strip()
+            else:
+                # This line must describe a node within the metanode
+                metanodes[-1][2].append(line.split()[1])
+    tree_edges = []
+    with open(tree_structure_fn, "r") as spqr_structure_file:
+        parsing_edge = False
+        source = None
+        target = None
+        for line in spqr_structure_file:
+            if line.strip().startswith("edge ["):
+                parsing_edge = True
+            elif parsing_edge:
+                if line.strip().startswith("]"):
+                    parsing_edge = False
+                    tree_edges.append((source, target))
+                    source = None
+                    target = None
+                else:
+                    id_line_parts = line.strip().split()
+                    if id_line_parts[0] == "source":
+                        source = metanodeid2index[id_line_parts[1]]
+                    elif id_line_parts[0] == "target":
+                        target = metanodeid2index[id_line_parts[1]]
+    return [tuple(m) for m in metanodes], tree_edges
+
+
+def build_bicomponent(bicomponent_id, metanodes, tree_edges, singlenodeid2obj):
+    """Creates a Bicomponent (and its SPQRMetaNodes) from the output of
+       spqr_tree() or parse_spqr_script_output().
+    """
+    metanode_objs = [
+        graph_objects.SPQRMetaNode(
+            bicomponent_id,
+            metanode_id,
+            metanode_type,
+            [singlenodeid2obj[n] for n in node_ids],
+            [list(e) for e in skeleton_edges],
+        )
+        for metanode_id, metanode_type, node_ids, skeleton_edges in metanodes
+    ]
+    for i, j in tree_edges:
+        metanode_objs[i].add_outgoing_edge(metanode_objs[j])
+    # A metanode in the tree can have at most 1 parent, so we can find the
+    # root by just moving up in the tree
+    root = metanode_objs[0]
+    while len(root.incoming_nodes) > 0:
+        root = root.incoming_nodes[0]
+    return graph_objects.Bicomponent(bicomponent_id, metanode_objs, root)
+
+
+def map_over_bicomponents(func, args_list, sizes, jobs=1):
+    """Returns [func(*args) for args in args_list], using a pool of jobs
+       worker processes if jobs > 1.
+
+       sizes should give a rough estimate of the work needed for each
+       element of args_list: the largest inputs are sent to the workers
+       first, so that one worker doesn't end up stuck with a huge
+       bicomponent at the end.
+    """
+    if jobs <= 1 or len(args_list) <= 1:
+        return [func(*args) for args in args_list]
+    order = sorted(range(len(args_list)), key=lambda i: -sizes[i])
+    # As in layout_utils.ParallelLayout, use a fairly small chunk size
+    chunksize = max(1, len(args_list) // (jobs * 32))
+    results = [None] * len(args_list)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for i, result in zip(
+            order,
+            pool.imap(
+                _call_with_args,
+                [(func, args_list[i]) for i in order],
+                chunksize,
+            ),
+        ):
+            results[i] = result
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def _call_with_args(func_and_args):
+    return func_and_args[0](*func_and_args[1])
+
+
+def compute_bicomponents(singlenodeid2obj, jobs=1):
+    """Computes the SPQR tree of every biconnected component in the single
+       graph, in-process.
+
+       If jobs > 1, the SPQR trees of different bicomponents are computed in
+       parallel across a pool of jobs worker processes. The output is the
+       same regardless of the number of jobs used.
+
+       Returns a dict mapping bicomponent IDs (strings, starting at "1") to
+       Bicomponent objects, like the dict that collate.py constructs from
+       the SPQR script's output files.
+
+       As with the SPQR script, biconnected components with fewer than 3
+       edges are ignored.
+    """
+    edges = [
+        (n.id_string, m.id_string)
+        for n in singlenodeid2obj.values()
+        for m in n.outgoing_nodes
+    ]
+    bicomponent_edge_lists = [
+        ([edges[i] for i in sorted(component)],)
+        for component in biconnected_components(edges)
+        if len(component) > 2
+    ]
+    spqr_trees = map_over_bicomponents(
+        spqr_tree,
+        bicomponent_edge_lists,
+        [len(args[0]) for args in bicomponent_edge_lists],
+        jobs,
+    )
+    bicomponentid2obj = {}
+    for i, (metanodes, tree_edges) in enumerate(spqr_trees, 1):
+        bicomponentid2obj[str(i)] = build_bicomponent(
+            str(i), metanodes, tree_edges, singlenodeid2obj
+        )
+    return bicomponentid2obj
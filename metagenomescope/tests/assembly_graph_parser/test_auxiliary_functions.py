@@ -76,8 +76,20 @@ def test_sniff_filetype():
     assert sniff_filetype("aSdF.FaStG") == "fastg"
     assert sniff_filetype("LastGraphfastg") == "fastg"
 
+    assert sniff_filetype("asdf.LastGraph.gz") == "lastgraph"
+    assert sniff_filetype("asdf_LastGraph.GZ") == "lastgraph"
+    assert sniff_filetype("asdf.gml.gz") == "gml"
+
     with pytest.raises(NotImplementedError):
         sniff_filetype("asdf.asdf")
+    with pytest.raises(NotImplementedError):
+        sniff_filetype("asdf.gz")
+    # pyfastg and gfapy can't read compressed files
+    with pytest.raises(NotImplementedError) as ei:
+        sniff_filetype("asdf.gfa.gz")
+    assert "compressed gfa file" in str(ei.value)
+    with pytest.raises(NotImplementedError):
+        sniff_filetype("asdf.fastg.gz")
     with pytest.raises(NotImplementedError):
         sniff_filetype("asdf")
 
@@ -1,5 +1,11 @@
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
 from .utils import run_tempfile_test
-from metagenomescope.assembly_graph_parser import parse_lastgraph
+from metagenomescope.assembly_graph_parser import parse_lastgraph, parse
 from metagenomescope.tests.assembly_graph_parser.test_validate_lastgraph import (
     reset_glines,
 )
@@ -51,6 +57,57 @@ def test_parse_lastgraph_good():
         assert digraph.edges[edge_id]["multiplicity"] == 9
 
 
+def assert_same_graph(g1, g2):
+    assert list(g1.nodes(data=True)) == list(g2.nodes(data=True))
+    assert list(g1.edges(data=True)) == list(g2.edges(data=True))
+
+
+class UnseekableStream(io.StringIO):
+    """Mimics a pipe: this can only be read through once."""
+
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+
+
+def test_parse_lastgraph_streams():
+    # Parsing a stream (that can't be rewound) should give the same results
+    # as parsing a file on disk
+    lg_fn = "metagenomescope/tests/input/longtest_LastGraph"
+    exp_digraph = parse_lastgraph(lg_fn)
+    with open(lg_fn, "r") as lg:
+        lg_contents = lg.read()
+    assert_same_graph(
+        parse_lastgraph(UnseekableStream(lg_contents)), exp_digraph
+    )
+
+
+def test_parse_lastgraph_stdin(monkeypatch):
+    lg_fn = "metagenomescope/tests/input/cycletest_LastGraph"
+    exp_digraph = parse_lastgraph(lg_fn)
+    with open(lg_fn, "r") as lg:
+        monkeypatch.setattr(sys, "stdin", UnseekableStream(lg.read()))
+    assert_same_graph(parse_lastgraph("-"), exp_digraph)
+    # We shouldn't have closed stdin
+    assert not sys.stdin.closed
+
+
+def test_parse_lastgraph_gzip():
+    lg_fn = "metagenomescope/tests/input/longtest_LastGraph"
+    exp_digraph = parse_lastgraph(lg_fn)
+    filehandle, gz_fn = tempfile.mkstemp(suffix="_LastGraph.gz")
+    try:
+        with open(lg_fn, "rb") as lg, gzip.open(gz_fn, "wb") as gz:
+            shutil.copyfileobj(lg, gz)
+        assert_same_graph(parse_lastgraph(gz_fn), exp_digraph)
+        assert_same_graph(parse(gz_fn), exp_digraph)
+    finally:
+        os.close(filehandle)
+        os.unlink(gz_fn)
+
+
 # The remaining functions in this file test a few expected-to-fail LastGraph
 # files. These should all be caught by validate_lastgraph_file(), which we've
 # already thoroughly unit-tested using these same exact inputs, so this isn't
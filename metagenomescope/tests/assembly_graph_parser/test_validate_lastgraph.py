@@ -1,4 +1,5 @@
 import pytest
+import time
 from io import StringIO
 from metagenomescope.assembly_graph_parser import validate_lastgraph_file
 
@@ -267,3 +268,41 @@ def test_validate_lastgraph_node_count_mismatch():
         "indicated that there were 1 node(s), but we identified 2 node(s)"
         in get_validate_err(glines)
     )
+
+
+def get_cycle_glines(num_nodes):
+    # Produces the lines of a valid LastGraph file describing a big cycle of
+    # num_nodes nodes (plus some extra arcs that skip over nodes, so that
+    # there are about twice as many arcs as nodes).
+    glines = ["{}\t{}\t1\t1".format(num_nodes, num_nodes * 2)]
+    for n in range(1, num_nodes + 1):
+        glines.append("NODE\t{}\t2\t5\t5\t0\t0".format(n))
+        glines.append("GA")
+        glines.append("TC")
+    for n in range(1, num_nodes + 1):
+        glines.append("ARC\t{}\t{}\t1".format(n, (n % num_nodes) + 1))
+        glines.append("ARC\t{}\t-{}\t1".format(n, ((n + 1) % num_nodes) + 1))
+    return glines
+
+
+def time_validation(glines, repeats=3):
+    # Returns the minimum time (in seconds) taken to validate glines over a
+    # few runs, to reduce the impact of noise on the measurement
+    contents = "\n".join(glines)
+    times = []
+    for r in range(repeats):
+        lg = StringIO(contents)
+        start = time.perf_counter()
+        validate_lastgraph_file(lg)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def test_validate_lastgraph_scales_linearly():
+    # Validating a file 8x as large should take about 8x as long. If the node
+    # and edge membership checks took linear time (making validation as a
+    # whole quadratic), this would instead be about 64x as long. We use a
+    # very generous bound to avoid this test being flaky on busy machines.
+    small_time = time_validation(get_cycle_glines(2000))
+    large_time = time_validation(get_cycle_glines(16000))
+    assert large_time / small_time < 24
@@ -0,0 +1,392 @@
+graph [
+  node [
+   id 1
+   label "contig_0_1"
+   orientation "FOW"
+   length "100"
+  ]
+  node [
+   id 2
+   label "contig_0_2"
+   orientation "FOW"
+   length "200"
+  ]
+  node [
+   id 3
+   label "contig_0_3"
+   orientation "FOW"
+   length "300"
+  ]
+  node [
+   id 4
+   label "contig_0_4"
+   orientation "FOW"
+   length "400"
+  ]
+  node [
+   id 5
+   label "contig_0_5"
+   orientation "FOW"
+   length "500"
+  ]
+  node [
+   id 6
+   label "contig_0_6"
+   orientation "FOW"
+   length "600"
+  ]
+  edge [
+   source 5
+   target 1
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 6
+   target 1
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 1
+   target 2
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 1
+   target 3
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 2
+   target 4
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 3
+   target 4
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  node [
+   id 11
+   label "contig_1_1"
+   orientation "FOW"
+   length "100"
+  ]
+  node [
+   id 12
+   label "contig_1_2"
+   orientation "FOW"
+   length "200"
+  ]
+  node [
+   id 13
+   label "contig_1_3"
+   orientation "FOW"
+   length "300"
+  ]
+  node [
+   id 14
+   label "contig_1_4"
+   orientation "FOW"
+   length "400"
+  ]
+  node [
+   id 15
+   label "contig_1_5"
+   orientation "FOW"
+   length "500"
+  ]
+  node [
+   id 16
+   label "contig_1_6"
+   orientation "FOW"
+   length "600"
+  ]
+  edge [
+   source 15
+   target 11
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 16
+   target 11
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 11
+   target 12
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 11
+   target 13
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 12
+   target 14
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 13
+   target 14
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  node [
+   id 21
+   label "contig_2_1"
+   orientation "FOW"
+   length "100"
+  ]
+  node [
+   id 22
+   label "contig_2_2"
+   orientation "FOW"
+   length "200"
+  ]
+  node [
+   id 23
+   label "contig_2_3"
+   orientation "FOW"
+   length "300"
+  ]
+  node [
+   id 24
+   label "contig_2_4"
+   orientation "FOW"
+   length "400"
+  ]
+  node [
+   id 25
+   label "contig_2_5"
+   orientation "FOW"
+   length "500"
+  ]
+  node [
+   id 26
+   label "contig_2_6"
+   orientation "FOW"
+   length "600"
+  ]
+  edge [
+   source 25
+   target 21
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 26
+   target 21
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 21
+   target 22
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 21
+   target 23
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 22
+   target 24
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 23
+   target 24
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  node [
+   id 31
+   label "contig_3_1"
+   orientation "FOW"
+   length "100"
+  ]
+  node [
+   id 32
+   label "contig_3_2"
+   orientation "FOW"
+   length "200"
+  ]
+  node [
+   id 33
+   label "contig_3_3"
+   orientation "FOW"
+   length "300"
+  ]
+  node [
+   id 34
+   label "contig_3_4"
+   orientation "FOW"
+   length "400"
+  ]
+  node [
+   id 35
+   label "contig_3_5"
+   orientation "FOW"
+   length "500"
+  ]
+  node [
+   id 36
+   label "contig_3_6"
+   orientation "FOW"
+   length "600"
+  ]
+  edge [
+   source 35
+   target 31
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 36
+   target 31
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 31
+   target 32
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 31
+   target 33
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 32
+   target 34
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 33
+   target 34
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  node [
+   id 41
+   label "contig_4_1"
+   orientation "FOW"
+   length "600"
+  ]
+  node [
+   id 42
+   label "contig_4_2"
+   orientation "FOW"
+   length "500"
+  ]
+  node [
+   id 43
+   label "contig_4_3"
+   orientation "FOW"
+   length "400"
+  ]
+  node [
+   id 44
+   label "contig_4_4"
+   orientation "FOW"
+   length "300"
+  ]
+  node [
+   id 45
+   label "contig_4_5"
+   orientation "FOW"
+   length "200"
+  ]
+  node [
+   id 46
+   label "contig_4_6"
+   orientation "FOW"
+   length "100"
+  ]
+  edge [
+   source 45
+   target 41
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 46
+   target 41
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 41
+   target 42
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 41
+   target 43
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 42
+   target 44
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+  edge [
+   source 43
+   target 44
+   orientation EB
+   mean "-100"
+   stdev 50
+  ]
+]
@@ -0,0 +1,227 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests finding connected components using component_utils.find_components().
+
+import random
+import numpy
+import networkx
+from metagenomescope import config
+from metagenomescope.component_utils import (
+    find_components,
+    scale_contigs,
+    scale_edges,
+)
+from metagenomescope.graph_objects import Component, Node
+
+
+def make_random_graph(node_ct, edge_ct, id_prefix=""):
+    """Returns a list of node_ct Nodes with edge_ct random edges between
+       them (including self-loops), and a NetworkX DiGraph of the same graph.
+    """
+    nodes = [
+        Node(id_prefix + str(i), random.randint(1, 1000), False)
+        for i in range(node_ct)
+    ]
+    digraph = networkx.DiGraph()
+    digraph.add_nodes_from(range(node_ct))
+    for e in range(edge_ct):
+        src = random.randrange(node_ct)
+        tgt = random.randrange(node_ct)
+        if not digraph.has_edge(src, tgt):
+            nodes[src].add_outgoing_edge(nodes[tgt])
+            digraph.add_edge(src, tgt)
+    return nodes, digraph
+
+
+def check_components(nodes, digraph, ccs):
+    # Components are given in the order of their first nodes, and each
+    # component's nodes are in the order they were given in
+    expected_node_lists = [
+        [nodes[i] for i in sorted(cc)]
+        for cc in networkx.weakly_connected_components(digraph)
+    ]
+    expected_node_lists.sort(key=lambda nl: nodes.index(nl[0]))
+    assert ccs.node_lists == expected_node_lists
+    assert len(ccs) == len(expected_node_lists)
+    for i, node_list in enumerate(ccs.node_lists):
+        # The counts match those computed by Component
+        component = Component(node_list, [])
+        assert ccs.node_counts[i] == component.node_ct
+        assert ccs.edge_counts[i] == component.edge_ct
+        assert ccs.total_lengths[i] == component.total_length
+        for n in node_list:
+            assert ccs.component_index(n) == i
+
+
+def test_find_components_matches_networkx():
+    random.seed(333)
+    for node_ct, edge_ct in ((1, 0), (1, 1), (10, 5), (200, 150), (500, 30)):
+        nodes, digraph = make_random_graph(node_ct, edge_ct)
+        check_components(nodes, digraph, find_components(nodes)[0])
+
+
+def test_find_components_of_multiple_graphs():
+    random.seed(333)
+    double_nodes, double_digraph = make_random_graph(300, 200)
+    single_nodes, single_digraph = make_random_graph(100, 80, "s")
+    double_ccs, empty_ccs, single_ccs = find_components(
+        double_nodes, [], single_nodes
+    )
+    check_components(double_nodes, double_digraph, double_ccs)
+    check_components(single_nodes, single_digraph, single_ccs)
+    assert len(empty_ccs) == 0
+
+
+def test_find_components_of_long_chain():
+    # The union-find stops once every edge connects two nodes in the same
+    # tree, and a chain given in reverse order is the worst case for hooking
+    # roots onto each other -- make sure this still finds just 1 component
+    nodes = [Node(str(i), 10, False) for i in range(10000)]
+    for i in range(len(nodes) - 1, 0, -1):
+        nodes[i].add_outgoing_edge(nodes[i - 1])
+    ccs = find_components(nodes)[0]
+    assert len(ccs) == 1
+    assert ccs.node_lists[0] == nodes
+    assert ccs.edge_counts[0] == 9999
+    assert ccs.total_lengths[0] == 100000
+
+
+def scale_contigs_per_component(components):
+    """Scales contigs one component at a time, as collate.py used to."""
+    for c in components:
+        contig_lengths = [n.logbp for n in c.node_list]
+        if len(c.node_list) >= 2:
+            min_bp = min(contig_lengths)
+            max_bp = max(contig_lengths)
+            if min_bp == max_bp:
+                continue
+            bp_range = float(max_bp - min_bp)
+            q25, q75 = numpy.percentile(contig_lengths, [25, 75])
+            for n in c.node_list:
+                n.relative_length = (n.logbp - min_bp) / bp_range
+                if n.logbp < q25:
+                    n.longside_proportion = config.LOW_LONGSIDE_PROPORTION
+                elif n.logbp < q75:
+                    n.longside_proportion = config.MID_LONGSIDE_PROPORTION
+                else:
+                    n.longside_proportion = config.HIGH_LONGSIDE_PROPORTION
+
+
+def scale_edges_per_component(components):
+    """Scales edges one component at a time, as collate.py used to."""
+    for c in components:
+        edges = [
+            e for n in c.node_list for e in n.outgoing_edge_objects.values()
+        ]
+        edge_weights = [e.multiplicity for e in edges]
+        non_outlier_edges = []
+        if len(edge_weights) >= 4:
+            lq, uq = numpy.percentile(edge_weights, [25, 75])
+            d = 1.5 * (uq - lq)
+            lf = lq - d
+            uf = uq + d
+            for e in edges:
+                if e.multiplicity > uf:
+                    e.is_outlier = 1
+                    e.thickness = 1
+                elif e.multiplicity < lf:
+                    e.is_outlier = -1
+                    e.thickness = 0
+                else:
+                    non_outlier_edges.append(e)
+        else:
+            non_outlier_edges = edges
+        if len(non_outlier_edges) >= 2:
+            min_ew = min(e.multiplicity for e in non_outlier_edges)
+            max_ew = max(e.multiplicity for e in non_outlier_edges)
+            if min_ew == max_ew:
+                continue
+            ew_range = float(max_ew - min_ew)
+            for e in non_outlier_edges:
+                e.thickness = (e.multiplicity - min_ew) / ew_range
+
+
+def make_random_components():
+    """Returns a list of Components of various sizes and shapes, with random
+       contig lengths and edge weights (including some components whose
+       contigs all have the same length, and some with outlier edge weights).
+    """
+    components = []
+    for i in range(300):
+        node_ct = random.choice([1, 2, 2, 3, 4, 5, 8, 13, 40])
+        if random.random() < 0.1:
+            lengths = [random.randint(1, 10000)] * node_ct
+        else:
+            lengths = [random.randint(1, 10000) for n in range(node_ct)]
+        nodes = [
+            Node("{}_{}".format(i, n), lengths[n], False)
+            for n in range(node_ct)
+        ]
+        for e in range(random.randint(node_ct - 1, 3 * node_ct)):
+            src = random.choice(nodes)
+            tgt = random.choice(nodes)
+            if tgt.id_string not in src.outgoing_edge_objects:
+                weight = random.choice([1, 5, 5, 6, 7, 7, 8, 1000])
+                src.add_outgoing_edge(tgt, multiplicity=weight)
+        components.append(Component(nodes, []))
+    return components
+
+
+def get_scaled_values(components):
+    node_values = []
+    edge_values = []
+    for c in components:
+        for n in c.node_list:
+            n.set_dimensions()
+            node_values.append(
+                (n.relative_length, n.longside_proportion, n.width, n.height,)
+            )
+            for e in n.outgoing_edge_objects.values():
+                edge_values.append((e.thickness, e.is_outlier))
+    return node_values, edge_values
+
+
+def test_scaling_matches_per_component_scaling():
+    random.seed(333)
+    components = make_random_components()
+    scale_contigs(components)
+    scale_edges(components)
+    random.seed(333)
+    expected_components = make_random_components()
+    scale_contigs_per_component(expected_components)
+    scale_edges_per_component(expected_components)
+    # The values should be exactly the same, not just approximately
+    node_values, edge_values = get_scaled_values(components)
+    expected_values = get_scaled_values(expected_components)
+    assert node_values == expected_values[0]
+    assert edge_values == expected_values[1]
+    # Make sure that this test is actually testing something
+    assert set(v[1] for v in node_values) == set(
+        (
+            config.LOW_LONGSIDE_PROPORTION,
+            config.MID_LONGSIDE_PROPORTION,
+            config.HIGH_LONGSIDE_PROPORTION,
+        )
+    )
+    assert set(v[1] for v in edge_values) == set((-1, 0, 1))
+
+
+def test_scaling_no_components():
+    scale_contigs([])
+    scale_edges([])
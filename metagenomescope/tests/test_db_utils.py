@@ -0,0 +1,238 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the DBWriter class in db_utils.py.
+
+import os
+import sqlite3
+import contextlib
+import pytest
+from metagenomescope.db_utils import (
+    DBWriter,
+    ShardedDBWriter,
+    SHARDED_TABLES,
+    STD_TABLE2COLUMNS,
+    SPQR_TABLE2COLUMNS,
+    TABLE2INDEXES,
+    find_shard_files,
+)
+from metagenomescope import collate
+from metagenomescope.file_utils import safe_file_remove
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import OUTDIR
+
+
+def get_db_fullfn(name):
+    # OUTDIR isn't tracked in git, so it may not exist yet
+    if not os.path.isdir(OUTDIR):
+        os.makedirs(OUTDIR)
+    db_fullfn = os.path.join(OUTDIR, name)
+    safe_file_remove(db_fullfn)
+    return db_fullfn
+
+
+def get_table_names(db_fullfn):
+    connection = sqlite3.connect(db_fullfn)
+    with contextlib.closing(connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        return set(row[0] for row in cursor.fetchall())
+
+
+def get_index_names(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    return set(row[0] for row in cursor.fetchall())
+
+
+def test_tables_created():
+    db_fullfn = get_db_fullfn("test_db_utils_tables.db")
+    DBWriter(db_fullfn).finish()
+    assert get_table_names(db_fullfn) == set(STD_TABLE2COLUMNS.keys())
+
+    db_fullfn = get_db_fullfn("test_db_utils_spqr_tables.db")
+    DBWriter(db_fullfn, spqr=True).finish()
+    assert get_table_names(db_fullfn) == set(STD_TABLE2COLUMNS.keys()) | set(
+        SPQR_TABLE2COLUMNS.keys()
+    )
+
+
+def test_pragmas():
+    db_fullfn = get_db_fullfn("test_db_utils_pragmas.db")
+    writer = DBWriter(db_fullfn)
+    writer.cursor.execute("PRAGMA journal_mode")
+    assert writer.cursor.fetchone()[0] == "off"
+    writer.cursor.execute("PRAGMA synchronous")
+    assert writer.cursor.fetchone()[0] == 0
+    writer.finish()
+
+
+def test_batched_writes():
+    db_fullfn = get_db_fullfn("test_db_utils_batches.db")
+    writer = DBWriter(db_fullfn, batch_size=3)
+    rows = [(r, 1, 0, 100, 5.0, 5.0, 0, "dot") for r in range(1, 9)]
+    for i, row in enumerate(rows, 1):
+        writer.add_row("components", row)
+        # Rows should be flushed in batches of 3
+        assert writer.row_count == 3 * (i // 3)
+        assert len(writer.table2buffer["components"]) == i % 3
+    row_count, rows_per_sec = writer.finish()
+    assert row_count == 8
+    assert rows_per_sec is None or rows_per_sec > 0
+
+    connection = sqlite3.connect(db_fullfn)
+    with contextlib.closing(connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT * FROM components")
+        # Rows should be stored in the order in which they were added
+        assert cursor.fetchall() == rows
+
+
+def test_create_indexes():
+    db_fullfn = get_db_fullfn("test_db_utils_indexes.db")
+    writer = DBWriter(db_fullfn, spqr=True, search=True)
+    writer.add_row("nodes", ("1", None, 5, None, None, 0, 1) + (0,) * 6)
+    # Indexes should be created when we finish writing
+    writer.finish()
+    connection = sqlite3.connect(db_fullfn)
+    with contextlib.closing(connection):
+        cursor = connection.cursor()
+        expected_ct = sum(len(i) for i in TABLE2INDEXES.values())
+        assert len(get_index_names(cursor)) == expected_ct
+        # Check that the viewer's main query actually uses an index
+        cursor.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM nodes WHERE component_rank = ?",
+            (1,),
+        )
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        assert "USING INDEX nodes_component_rank_index" in plan
+
+
+def test_collate_indexes():
+    connection, cursor = utils.create_and_open_db("longtest_LastGraph")
+    with contextlib.closing(connection):
+        assert get_index_names(cursor) == set(
+            [
+                "nodes_component_rank_index",
+                "edges_component_rank_index",
+                "clusters_component_rank_index",
+                "components_size_rank_index",
+            ]
+        )
+    connection, cursor = utils.create_and_open_db(
+        "longtest_LastGraph", ["--no-index"]
+    )
+    with contextlib.closing(connection):
+        assert len(get_index_names(cursor)) == 0
+
+
+def test_collate_sharded_output():
+    # Get the rows in the normal (unsharded) output for comparison
+    connection, cursor = utils.create_and_open_db("longtest_LastGraph")
+    with contextlib.closing(connection):
+        table2rows = {}
+        for table in ("nodes", "edges", "clusters", "components"):
+            cursor.execute("SELECT * FROM {}".format(table))
+            table2rows[table] = cursor.fetchall()
+    connection, cursor = utils.create_and_open_db(
+        "longtest_LastGraph", ["-sc", "2"]
+    )
+    with contextlib.closing(connection):
+        # The manifest should contain all component information, but no
+        # nodes/edges/clusters
+        cursor.execute("SELECT * FROM components")
+        assert cursor.fetchall() == table2rows["components"]
+        for table in SHARDED_TABLES:
+            cursor.execute("SELECT COUNT(*) FROM {}".format(table))
+            assert cursor.fetchone()[0] == 0
+        cursor.execute("SELECT * FROM shards ORDER BY shard_index")
+        shards = cursor.fetchall()
+    # longtest_LastGraph contains 8 components, so we should have 4 shards
+    assert shards == [
+        (
+            i,
+            (2 * i) + 1,
+            (2 * i) + 2,
+            "longtest_LastGraph_shard{}.db".format(i),
+        )
+        for i in range(4)
+    ]
+    sharded_table2rows = {"nodes": [], "edges": [], "clusters": []}
+    for shard in shards:
+        connection = sqlite3.connect(os.path.join(OUTDIR, shard[3]))
+        with contextlib.closing(connection):
+            cursor = connection.cursor()
+            for table in SHARDED_TABLES:
+                cursor.execute(
+                    "SELECT MIN(component_rank), MAX(component_rank) "
+                    "FROM {}".format(table)
+                )
+                min_rank, max_rank = cursor.fetchone()
+                if min_rank is not None:
+                    assert shard[1] <= min_rank <= max_rank <= shard[2]
+                cursor.execute("SELECT * FROM {}".format(table))
+                sharded_table2rows[table] += cursor.fetchall()
+    for table in SHARDED_TABLES:
+        assert sharded_table2rows[table] == table2rows[table]
+
+
+def test_collate_checks_shard_files_up_front():
+    prefix = "test_db_utils_existing_shards"
+    db_fullfn = get_db_fullfn(prefix + ".db")
+    for shard_fullfn in find_shard_files(db_fullfn):
+        safe_file_remove(shard_fullfn)
+    # A shard file left over from an earlier run with more shards, and a file
+    # that isn't a shard file
+    stale_shard_fullfn = os.path.join(OUTDIR, prefix + "_shard3.db")
+    other_fullfn = os.path.join(OUTDIR, prefix + "_shard3.db.bak")
+    for fullfn in (stale_shard_fullfn, other_fullfn):
+        with open(fullfn, "w"):
+            pass
+    assert find_shard_files(db_fullfn) == [stale_shard_fullfn]
+    args = [
+        "-i",
+        os.path.join(utils.INDIR, "longtest_LastGraph"),
+        "-o",
+        prefix,
+        "-d",
+        OUTDIR,
+        "-sc",
+        "4",
+    ]
+    # Without -w, this fails before anything is written (not once the shard
+    # file would be created, after laying out the graph)
+    with pytest.raises(IOError) as exc_info:
+        collate.run_script(args)
+    assert str(exc_info.value).startswith(stale_shard_fullfn)
+    assert not os.path.exists(db_fullfn)
+    # With -w, the stale shard file is removed, since it isn't part of this
+    # output (longtest_LastGraph contains 8 components, so there are 2 shards)
+    collate.run_script(args + ["-w"])
+    assert find_shard_files(db_fullfn) == [
+        os.path.join(OUTDIR, prefix + "_shard{}.db".format(i)) for i in (0, 1)
+    ]
+    assert os.path.exists(other_fullfn)
+    safe_file_remove(other_fullfn)
+
+
+def test_sharded_output_requires_ascending_ranks():
+    db_fullfn = get_db_fullfn("test_db_utils_shards.db")
+    writer = ShardedDBWriter(db_fullfn, 1, True)
+    writer.add_row("clusters", ("B1", 5, 2) + (0,) * 6 + ("Bubble",))
+    with pytest.raises(ValueError):
+        writer.add_row("clusters", ("B2", 5, 1) + (0,) * 6 + ("Bubble",))
+    writer.finish()
@@ -0,0 +1,158 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the DOT string utilities in dot_utils.py, and benchmarks a few ways of
+# building the DOT string for a large component.
+
+import time
+import pygraphviz
+from metagenomescope import config
+from metagenomescope.dot_utils import start_dot_lines, finish_dot_lines
+from metagenomescope.graph_objects import Node, Component
+
+
+def make_component(node_ct, edges_per_node):
+    """Returns a generated Component with node_ct nodes, each of which has
+       edges_per_node outgoing edges.
+    """
+    nodes = [Node(str(i), 100, False) for i in range(node_ct)]
+    for i, n in enumerate(nodes):
+        n.relative_length = 0.5
+        n.longside_proportion = 0.6
+        for offset in range(1, edges_per_node + 1):
+            n.add_outgoing_edge(nodes[(i + offset) % node_ct])
+    return Component(nodes, [])
+
+
+def concatenated_dot_file(component):
+    """Builds the same DOT string as Component.produce_dot_file() (for a
+       component without node groups) using repeated string concatenation,
+       the way MetagenomeScope used to.
+    """
+    node_info = ""
+    edge_info = ""
+    for n in component.node_list:
+        node_info += n.node_info()
+        for m in n.outgoing_nodes:
+            edge_info += '\t%s -> %s [comment="%s,%s"]\n' % (
+                n.id_string,
+                m.id_string,
+                n.id_string,
+                m.id_string,
+            )
+    fcontent = "digraph asm {\n"
+    if config.GRAPH_STYLE != "":
+        fcontent += "\t%s;\n" % (config.GRAPH_STYLE)
+    if config.GLOBALNODE_STYLE != "":
+        fcontent += "\tnode [%s];\n" % (config.GLOBALNODE_STYLE)
+    if config.GLOBALEDGE_STYLE != "":
+        fcontent += "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE)
+    fcontent += node_info
+    fcontent += edge_info
+    fcontent += "}"
+    return fcontent
+
+
+def procedural_agraph(component):
+    """Builds a pygraphviz.AGraph of the same graph as
+       Component.produce_dot_file() (for a component without node groups)
+       using AGraph.add_node() and add_edge(), and returns its DOT string.
+    """
+    g = pygraphviz.AGraph(name="asm", directed=True, strict=False)
+    g.node_attr["label"] = ""
+    g.edge_attr["headport"] = "n"
+    g.edge_attr["tailport"] = "s"
+    for n in component.node_list:
+        n.set_dimensions()
+        g.add_node(
+            n.id_string,
+            height="%g" % (n.height),
+            width="%g" % (n.width),
+            shape=n.get_shape(),
+        )
+    for n in component.node_list:
+        for m in n.outgoing_nodes:
+            g.add_edge(
+                n.id_string,
+                m.id_string,
+                comment="%s,%s" % (n.id_string, m.id_string),
+            )
+    gv = g.string()
+    g.close()
+    return gv
+
+
+def benchmark_dot_emission(node_ct=25000, edges_per_node=2):
+    """Builds the DOT string of a generated component using each approach,
+       and returns a 2-tuple of (dict mapping each approach's name to the
+       number of seconds it took, dict mapping each approach's name to the
+       DOT string it produced).
+    """
+    component = make_component(node_ct, edges_per_node)
+    approaches = {
+        "list-join": lambda: component.produce_dot_file(),
+        "concatenation": lambda: concatenated_dot_file(component),
+        "AGraph": lambda: procedural_agraph(component),
+    }
+    times = {}
+    outputs = {}
+    for name, build in approaches.items():
+        t0 = time.time()
+        outputs[name] = build()
+        times[name] = time.time() - t0
+    return times, outputs
+
+
+def test_start_and_finish_dot_lines():
+    lines = start_dot_lines(
+        "g", graph_type="graph", graph_attrs=['overlap="false"']
+    )
+    assert lines[0] == "graph g {\n"
+    assert lines[2] == '\toverlap="false";\n'
+    assert "\tedge [%s];\n" % (config.GLOBALEDGE_STYLE) in lines
+    lines.append("\ta;\n")
+    gv = finish_dot_lines(lines)
+    assert gv.startswith("graph g {\n\t")
+    assert gv.endswith("\ta;\n}")
+    no_style_lines = start_dot_lines("g", node_style=False, edge_style=False)
+    assert no_style_lines == ["digraph g {\n", "\t%s;\n" % config.GRAPH_STYLE]
+
+
+def test_dot_emission_benchmark():
+    # 25,000 nodes with 2 outgoing edges each = a 50,000-edge component
+    times, outputs = benchmark_dot_emission()
+    # Shown when running pytest with -s
+    print(
+        "\n"
+        + "; ".join(
+            "{}: {:.3f} s".format(name, t) for name, t in times.items()
+        )
+    )
+    assert outputs["list-join"] == outputs["concatenation"]
+    assert outputs["list-join"].count(" -> ") == 50000
+    # The procedurally-built graph is the same graph, written slightly
+    # differently by GraphViz
+    assert outputs["AGraph"].count(" -> ") == 50000
+    # Building the graph procedurally is a lot slower than building the DOT
+    # string (about 25x at the time of writing), since every call to
+    # add_node() or add_edge() goes through pygraphviz's wrapper of the
+    # GraphViz C library. We don't compare the times of the list-join and
+    # concatenation approaches: CPython can often concatenate a string
+    # in-place when nothing else refers to it, so these are usually close --
+    # but that's an implementation detail we shouldn't rely on.
+    assert times["list-join"] < times["AGraph"]
@@ -0,0 +1,206 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests GraphCore, and finding components in / scaling a GraphCore using
+# component_utils.
+
+import random
+import numpy
+import pytest
+from metagenomescope import config
+from metagenomescope.component_utils import (
+    find_components,
+    find_core_components,
+    scale_contigs,
+    scale_core_contigs,
+    scale_core_edges,
+    scale_edges,
+)
+from metagenomescope.graph_core import GraphCore
+from metagenomescope.graph_objects import Component, Node
+from metagenomescope.tests.utils import get_all_rows
+
+
+def make_random_graphs(node_ct, edge_ct):
+    """Returns a GraphCore and a list of Nodes representing the same random
+       graph (including self-loops and parallel edges).
+    """
+    core = GraphCore()
+    nodes = []
+    for i in range(node_ct):
+        bp = random.choice([random.randint(1, 10000), 500])
+        core.add_node(str(i), bp, False)
+        nodes.append(Node(str(i), bp, False))
+    for e in range(edge_ct):
+        src = random.randrange(node_ct)
+        tgt = random.randrange(node_ct)
+        weight = random.choice([1, 5, 5, 6, 7, 7, 8, 1000])
+        core.add_edge(str(src), str(tgt), multiplicity=weight)
+        nodes[src].add_outgoing_edge(nodes[tgt], multiplicity=weight)
+    core.finish()
+    return core, nodes
+
+
+def test_adjacency():
+    core = GraphCore()
+    for i in range(4):
+        core.add_node(str(i), 10 * (i + 1), i % 2 == 1)
+    # 0 -> 1 twice (the second edge is the one that's kept), and a self-loop
+    core.add_edge("2", "3", multiplicity=1)
+    core.add_edge("0", "1", multiplicity=2)
+    core.add_edge("0", "2", multiplicity=3)
+    core.add_edge("0", "1", multiplicity=4)
+    core.add_edge("3", "3", multiplicity=5)
+    core.finish()
+    assert core.node_ct == 4
+    assert core.edge_ct == 5
+    assert core.indptr.tolist() == [0, 3, 3, 4, 5]
+    assert core.indices.tolist() == [1, 2, 1, 3, 3]
+    assert core.out_degrees().tolist() == [3, 0, 1, 1]
+    assert core.is_distinct.tolist() == [True, False, True, True, True]
+    assert core.bps.tolist() == [10, 20, 30, 40]
+    assert core.is_complements.tolist() == [False, True, False, True]
+
+
+def test_duplicate_node_id():
+    core = GraphCore()
+    core.add_node("1", 10, False)
+    with pytest.raises(AttributeError) as exc_info:
+        core.add_node("1", 20, False)
+    assert str(exc_info.value) == config.DUPLICATE_ID_ERR + "1"
+
+
+def test_unknown_edge_node():
+    core = GraphCore()
+    core.add_node("1", 10, False)
+    with pytest.raises(KeyError):
+        core.add_edge("1", "2")
+
+
+def test_find_core_components_matches_find_components():
+    random.seed(333)
+    for node_ct, edge_ct in ((1, 0), (1, 1), (10, 5), (200, 150), (500, 30)):
+        core, nodes = make_random_graphs(node_ct, edge_ct)
+        core_ccs = find_core_components(core)
+        ccs = find_components(nodes)[0]
+        assert len(core_ccs) == len(ccs)
+        assert core_ccs.node_counts.tolist() == ccs.node_counts.tolist()
+        assert core_ccs.edge_counts.tolist() == ccs.edge_counts.tolist()
+        assert core_ccs.total_lengths.tolist() == ccs.total_lengths.tolist()
+        for i, node_list in enumerate(ccs.node_lists):
+            assert [
+                core.ids[v] for v in core_ccs.node_indices(i).tolist()
+            ] == [n.id_string for n in node_list]
+            for n in node_list:
+                assert core_ccs.labels[core.id2index[n.id_string]] == i
+
+
+def get_node_values(nodes):
+    node_values = []
+    edge_values = []
+    for n in nodes:
+        node_values.append(
+            (n.id_string, n.relative_length, n.longside_proportion)
+        )
+        edge_values.append(
+            [
+                (e.target_id, e.multiplicity, e.thickness, e.is_outlier)
+                for e in n.outgoing_edge_objects.values()
+            ]
+        )
+        edge_values.append([m.id_string for m in n.outgoing_nodes])
+        edge_values.append([m.id_string for m in n.incoming_nodes])
+    return node_values, edge_values
+
+
+def test_views_match_nodes():
+    random.seed(333)
+    core, nodes = make_random_graphs(1000, 900)
+    core_ccs = find_core_components(core)
+    ccs = find_components(nodes)[0]
+    # Only create views for some of the components
+    cc_mask = numpy.array([i % 3 != 0 for i in range(len(core_ccs))])
+    scale_core_contigs(core, core_ccs, cc_mask)
+    scale_core_edges(core, core_ccs, cc_mask)
+    nodeid2obj = core.make_views(cc_mask[core_ccs.labels])
+
+    components = [
+        Component(node_list, [])
+        for i, node_list in enumerate(ccs.node_lists)
+        if cc_mask[i]
+    ]
+    scale_contigs(components)
+    scale_edges(components)
+    expected_nodes = [n for c in components for n in c.node_list]
+    expected_nodes.sort(key=lambda n: core.id2index[n.id_string])
+
+    assert list(nodeid2obj.keys()) == [n.id_string for n in expected_nodes]
+    # The values should be exactly the same, not just approximately
+    node_values, edge_values = get_node_values(nodeid2obj.values())
+    expected_values = get_node_values(expected_nodes)
+    assert node_values == expected_values[0]
+    assert edge_values == expected_values[1]
+    # Make sure that this test is actually testing something
+    assert set(v[2] for v in node_values) == set(
+        (
+            config.LOW_LONGSIDE_PROPORTION,
+            config.MID_LONGSIDE_PROPORTION,
+            config.HIGH_LONGSIDE_PROPORTION,
+        )
+    )
+    assert set(
+        e[3] for edge_list in edge_values[::3] for e in edge_list
+    ) == set((-1, 0, 1))
+
+
+def test_scaling_no_nodes():
+    core = GraphCore()
+    core.finish()
+    core_ccs = find_core_components(core)
+    assert len(core_ccs) == 0
+    scale_core_contigs(core, core_ccs, numpy.ones(0, dtype=bool))
+    scale_core_edges(core, core_ccs, numpy.ones(0, dtype=bool))
+    assert core.make_views(numpy.ones(0, dtype=bool)) == {}
+
+
+def test_views_only_made_for_laid_out_components(monkeypatch):
+    # Lay out everything: -sp makes us create Node objects for all components
+    all_node_rows = get_all_rows("longtest_LastGraph", ["-sp"])["nodes"]
+
+    node_masks = []
+    make_views = GraphCore.make_views
+
+    def recording_make_views(self, node_mask):
+        node_masks.append(node_mask)
+        return make_views(self, node_mask)
+
+    monkeypatch.setattr(GraphCore, "make_views", recording_make_views)
+    table2rows = get_all_rows("longtest_LastGraph", ["-maxn", "8"])
+    assert len(node_masks) == 1
+    node_mask = node_masks[0]
+    assert 0 < node_mask.sum() < len(node_mask)
+
+    # The nodes in laid-out components are exactly the ones we created Node
+    # objects for, and their rows are the same as when all of the graph's
+    # components have Node objects
+    node_rows = table2rows["nodes"]
+    assert len(node_rows) == node_mask.sum()
+    laid_out_ranks = set(r[6] for r in node_rows)
+    assert sorted(node_rows) == sorted(
+        r for r in all_node_rows if r[6] in laid_out_ranks
+    )
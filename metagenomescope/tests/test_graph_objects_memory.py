@@ -0,0 +1,154 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Benchmarks the memory used by the Node and Edge objects in graph_objects/.
+
+import gc
+import tracemalloc
+from metagenomescope.graph_objects import (
+    Node,
+    Edge,
+    NodeGroup,
+    Bubble,
+    MiscPattern,
+    SPQRMetaNode,
+    Bicomponent,
+)
+
+
+class DictEdge(object):
+    """An Edge with the same attributes, but stored in a per-instance
+       __dict__ (as Edge did before it used __slots__).
+    """
+
+    def __init__(self, *args, **kwargs):
+        edge = Edge(*args, **kwargs)
+        for name in Edge.__slots__:
+            setattr(self, name, getattr(edge, name))
+
+
+class DictNode(object):
+    """A Node with the same attributes, but stored in a per-instance
+       __dict__ -- and with all of its containers created up front (as Node
+       did before it used __slots__ and created these lazily).
+    """
+
+    def __init__(self, *args, **kwargs):
+        node = Node(*args, **kwargs)
+        for name in Node.__slots__:
+            setattr(self, name.lstrip("_"), getattr(node, name))
+        self.outgoing_edge_objects = {}
+        self.parent_spqrnode2relpos = {}
+        self.parent_bicomponents = set()
+
+    def add_outgoing_edge(self, node2, **kwargs):
+        self.outgoing_nodes.append(node2)
+        node2.incoming_nodes.append(self)
+        self.outgoing_edge_objects[node2.id_string] = DictEdge(
+            self.id_string, node2.id_string, **kwargs
+        )
+
+
+def measure_bytes_per_node_and_edge(
+    node_class=Node, node_ct=20000, edges_per_node=2
+):
+    """Creates a generated graph of node_class objects, and returns a
+       2-tuple of (bytes used per node, bytes used per edge) as measured by
+       tracemalloc.
+
+       The node IDs are created beforehand, so they don't count towards the
+       bytes used per node.
+    """
+    ids = [str(i) for i in range(node_ct)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        nodes = [node_class(i, 100, False) for i in ids]
+        after_nodes = tracemalloc.get_traced_memory()[0]
+        for i in range(node_ct):
+            for offset in range(1, edges_per_node + 1):
+                nodes[i].add_outgoing_edge(
+                    nodes[(i + offset) % node_ct], multiplicity=1
+                )
+        after_edges = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (
+        (after_nodes - start) / node_ct,
+        (after_edges - after_nodes) / (node_ct * edges_per_node),
+    )
+
+
+def test_memory_per_node_and_edge():
+    dict_node_bytes, dict_edge_bytes = measure_bytes_per_node_and_edge(
+        DictNode
+    )
+    node_bytes, edge_bytes = measure_bytes_per_node_and_edge(Node)
+    # Shown when running pytest with -s
+    print(
+        "\nWith __dict__ and eager containers -- node: {:.0f} bytes; edge: "
+        "{:.0f} bytes".format(dict_node_bytes, dict_edge_bytes)
+    )
+    print(
+        "With __slots__ and lazy containers -- node: {:.0f} bytes; edge: "
+        "{:.0f} bytes".format(node_bytes, edge_bytes)
+    )
+    # On CPython 3.11 these are around 810 and 290 bytes with a __dict__,
+    # and 410 and 270 bytes with __slots__. (The savings for edges are
+    # smaller, since much of the memory used by an edge is in the lists and
+    # dict that refer to it.) The bounds here are generous, to account for
+    # differences across Python versions.
+    assert node_bytes < 0.75 * dict_node_bytes
+    assert node_bytes < 1000
+    assert edge_bytes < 400
+
+
+def test_no_instance_dicts():
+    n = Node("1", 100, False)
+    m = Node("2", 100, False)
+    n.add_outgoing_edge(m)
+    objects = [n, n.outgoing_edge_objects["2"], NodeGroup("X", [n, m])]
+    objects.append(Bubble(Node("3", 5, False), Node("4", 5, False)))
+    objects.append(MiscPattern("Thing", Node("5", 5, False)))
+    mn = SPQRMetaNode("1", "1", "S", [Node("6", 5, True)], [])
+    objects.append(mn)
+    objects.append(Bicomponent("1", [mn], mn))
+    for obj in objects:
+        assert not hasattr(obj, "__dict__")
+    assert objects[4].type_name == "Thing"
+    assert isinstance(objects[1], Edge)
+
+
+def test_lazy_containers():
+    n = Node("1", 100, False)
+    m = Node("2", 100, False)
+    # Nodes without outgoing edges all share an empty, read-only mapping
+    assert len(n.outgoing_edge_objects) == 0
+    assert n.outgoing_edge_objects is m.outgoing_edge_objects
+    n.add_outgoing_edge(m)
+    assert list(n.outgoing_edge_objects.keys()) == ["2"]
+    assert len(m.outgoing_edge_objects) == 0
+    # SPQR-mode containers aren't created until they're used
+    assert n._parent_spqrnode2relpos is None
+    assert n._parent_bicomponents is None
+    n.parent_bicomponents.add("B")
+    n.parent_spqrnode2relpos["B"] = (1, 2)
+    assert n.parent_bicomponents == {"B"}
+    assert n.parent_spqrnode2relpos == {"B": (1, 2)}
+    assert m._parent_bicomponents is None
@@ -45,6 +45,30 @@ def test_reverse_complement():
             assert config.COMPLEMENT[seq[b]] == seq_rc[len(seq_rc) - b - 1]
 
 
+def test_reverse_complement_invalid():
+    # Non-nucleotide characters (including lowercase nucleotides, and
+    # non-ASCII characters) should cause a KeyError that mentions the last
+    # such character
+    for seq, bad_char in (
+        ("ACGN", "N"),
+        ("ACGU", "U"),
+        ("acgt", "t"),
+        ("AC GT", " "),
+        ("ACG8T", "8"),
+        ("ACG\u00e9T", "\u00e9"),
+        ("ACGT?N", "N"),
+        ("N?TGCA", "?"),
+    ):
+        with pytest.raises(KeyError) as ei:
+            input_node_utils.reverse_complement(seq)
+        assert ei.value.args == (bad_char,)
+        with pytest.raises(KeyError) as ei:
+            input_node_utils.validate_dna(seq)
+        assert ei.value.args == (bad_char,)
+    input_node_utils.validate_dna("")
+    input_node_utils.validate_dna("GATTACA")
+
+
 def test_gc_content():
     with pytest.raises(ValueError) as ei:
         input_node_utils.gc_content("")
@@ -56,6 +80,8 @@ def test_gc_content():
     assert input_node_utils.gc_content("ACGT") == (0.5, 2)
     assert input_node_utils.gc_content("GCATTCAC") == (0.5, 4)
     assert input_node_utils.gc_content("CCTAC") == (0.6, 3)
+    # Only uppercase Gs and Cs count
+    assert input_node_utils.gc_content("gcGC") == (0.5, 2)
     for i in range(500):
         seq = utils.gen_random_sequence(range(1, 501))
         gc_content_output = input_node_utils.gc_content(seq)
@@ -82,3 +108,13 @@ def test_negate_node_id():
     assert input_node_utils.negate_node_id("-contig_id_123") == "contig_id_123"
     assert input_node_utils.negate_node_id("abcdef") == "-abcdef"
     assert input_node_utils.negate_node_id("-abcdef") == "abcdef"
+
+
+@pytest.mark.parametrize("extra_args", [[], ["-ss"]])
+def test_gfa_invalid_sequence(extra_args):
+    # sample2.gfa is a GFA2 file, so the third field of each S line is the
+    # segment's length rather than its sequence. collate doesn't compute the
+    # reverse complements of GFA sequences, but it should still reject these.
+    with pytest.raises(KeyError) as ei:
+        utils.create_and_open_db("sample2.gfa", extra_args)
+    assert ei.value.args == ("8",)
@@ -0,0 +1,74 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests specifying the type of collate's input graph using -it, which is
+# needed when reading the graph from standard input.
+
+import os
+import shutil
+import sys
+import pytest
+from metagenomescope import collate, config
+from metagenomescope.tests import utils
+
+# The assembly table includes the input filename, so we don't compare it
+TABLES = ("nodes", "edges", "clusters", "components")
+
+
+def run_collate(input_fn, output_prefix, extra_args=[]):
+    collate.run_script(
+        ["-i", input_fn, "-o", output_prefix, "-d", utils.OUTDIR, "-w"]
+        + extra_args
+    )
+    return utils.get_db_rows(
+        os.path.join(utils.OUTDIR, output_prefix + ".db"), TABLES
+    )
+
+
+def test_stdin_input(monkeypatch):
+    graph_fullfn = os.path.join(utils.INDIR, "sample1.gfa")
+    expected_rows = run_collate(graph_fullfn, "test_input_type_file")
+    with open(graph_fullfn, "r") as graph_file:
+        monkeypatch.setattr(sys, "stdin", graph_file)
+        stdin_rows = run_collate(
+            config.STDIN_FILENAME, "test_input_type_stdin", ["-it", "gfa"]
+        )
+    assert stdin_rows == expected_rows
+
+
+def test_stdin_input_requires_input_type():
+    with pytest.raises(ValueError) as exc_info:
+        run_collate(config.STDIN_FILENAME, "test_input_type_no_type")
+    assert str(exc_info.value) == config.STDIN_TYPE_ERR
+
+
+def test_input_type_overrides_suffix(tmp_path):
+    expected_rows = run_collate(
+        os.path.join(utils.INDIR, "cycletest_LastGraph"),
+        "test_input_type_suffix",
+    )
+    renamed_fullfn = str(tmp_path / "cycletest.txt")
+    shutil.copyfile(
+        os.path.join(utils.INDIR, "cycletest_LastGraph"), renamed_fullfn
+    )
+    with pytest.raises(IOError):
+        run_collate(renamed_fullfn, "test_input_type_renamed")
+    renamed_rows = run_collate(
+        renamed_fullfn, "test_input_type_renamed", ["-it", "lastgraph"]
+    )
+    assert renamed_rows == expected_rows
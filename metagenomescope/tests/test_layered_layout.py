@@ -0,0 +1,180 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the layered layout engine used by -le layered.
+
+import numpy
+import pygraphviz
+import pytest
+from metagenomescope import config
+from metagenomescope.layered_layout import layered_layout
+from metagenomescope.layout_utils import layout_dot_string
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+
+def random_graph(node_ct, edge_ct, seed):
+    """Returns the node widths, node heights, edge sources, and edge targets
+       of a random graph that looks sort of like an assembly graph (mostly
+       "local" edges, with a few random ones thrown in to create cycles).
+    """
+    rng = numpy.random.default_rng(seed)
+    sources = rng.integers(0, node_ct, edge_ct)
+    targets = numpy.clip(
+        sources + rng.integers(-3, 10, edge_ct), 0, node_ct - 1
+    )
+    is_random = rng.random(edge_ct) < 0.05
+    targets[is_random] = rng.integers(0, node_ct, is_random.sum())
+    widths = rng.uniform(20, 100, node_ct)
+    heights = rng.uniform(20, 100, node_ct)
+    return widths, heights, sources, targets
+
+
+def check_layout(widths, heights, sources, targets):
+    x, y, edge_points = layered_layout(widths, heights, sources, targets)
+    # Nodes in the same layer don't overlap
+    for layer_y in numpy.unique(y):
+        in_layer = numpy.flatnonzero(y == layer_y)
+        in_layer = in_layer[numpy.argsort(x[in_layer])]
+        lefts = x[in_layer] - widths[in_layer] / 2
+        rights = x[in_layer] + widths[in_layer] / 2
+        assert numpy.all(
+            lefts[1:] - rights[:-1] >= config.LAYERED_NODESEP - 1e-6
+        )
+    # Nodes in different layers don't overlap
+    layer_ys = numpy.unique(y)
+    tops = numpy.array([(y + heights / 2)[y == ly].max() for ly in layer_ys])
+    bottoms = numpy.array(
+        [(y - heights / 2)[y == ly].min() for ly in layer_ys]
+    )
+    assert numpy.all(bottoms[1:] - tops[:-1] >= config.LAYERED_RANKSEP - 1e-6)
+    # (Bends in edges might be further to the left than every node)
+    assert (x - widths / 2).min() >= -1e-6
+    assert (y - heights / 2).min() == pytest.approx(0)
+    # Edges are cubic Bezier curves from their source to their target
+    assert len(edge_points) == len(sources)
+    for s, t, points in zip(sources, targets, edge_points):
+        assert len(points) % 3 == 1 and len(points) >= 4
+        if s != t:
+            assert points[0][0] == pytest.approx(x[s])
+            assert abs(points[0][1] - y[s]) == pytest.approx(heights[s] / 2)
+            assert points[-1][0] == pytest.approx(x[t])
+            assert abs(points[-1][1] - y[t]) == pytest.approx(heights[t] / 2)
+    return x, y, edge_points
+
+
+def test_layout_of_dag_points_down():
+    # A bubble: 0 -> {1, 2} -> 3
+    widths = numpy.full(4, 54.0)
+    heights = numpy.full(4, 36.0)
+    x, y, edge_points = check_layout(
+        widths, heights, numpy.array([0, 0, 1, 2]), numpy.array([1, 2, 3, 3])
+    )
+    assert y[0] > y[1] == y[2] > y[3]
+    assert x[0] == pytest.approx(x[3])
+    assert x[0] == pytest.approx((x[1] + x[2]) / 2)
+    for points in edge_points:
+        # Edges leave the bottom of their source and enter the top of their
+        # target
+        assert points[0][1] > points[-1][1]
+
+
+def test_layout_of_cycles_and_loops():
+    # A cycle (0 -> 1 -> 2 -> 0), a long edge (0 -> 2), and a self-loop
+    widths = numpy.full(3, 54.0)
+    heights = numpy.full(3, 36.0)
+    x, y, edge_points = check_layout(
+        widths,
+        heights,
+        numpy.array([0, 1, 2, 0, 1]),
+        numpy.array([1, 2, 0, 2, 1]),
+    )
+    assert y[0] > y[1] > y[2]
+    # The back edge 2 -> 0 goes up
+    assert edge_points[2][0][1] < edge_points[2][-1][1]
+    # The long edge 0 -> 2 bends through a dummy node in the middle layer
+    assert len(edge_points[3]) == 7
+    assert edge_points[3][3][1] == pytest.approx(y[1])
+    # The self-loop is drawn to the right of its node
+    assert edge_points[4][:, 0].min() == pytest.approx(x[1] + 27)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_layout_of_random_graphs(seed):
+    check_layout(*random_graph(300, 400, seed))
+
+
+def test_layout_of_large_graph():
+    widths, heights, sources, targets = random_graph(50000, 60000, 3)
+    x, y, edge_points = layered_layout(widths, heights, sources, targets)
+    assert len(x) == len(y) == 50000
+    assert len(edge_points) == 60000
+
+
+def test_layout_of_empty_graph():
+    x, y, edge_points = layered_layout([], [], [], [])
+    assert len(x) == len(y) == len(edge_points) == 0
+
+
+def test_layout_dot_string():
+    gv_input = (
+        'digraph g {\n\tnode [label=""];\n\tedge [headport=n,tailport=s];\n'
+        "\ta [width=1,height=2];\n\ta -> b;\n\tb -> c;\n\tc -> a;\n}"
+    )
+    laid_out_gv, engine = layout_dot_string(gv_input, "layered")
+    assert engine == "layered"
+    g = pygraphviz.AGraph(laid_out_gv)
+    for n in g.nodes():
+        assert len(n.attr["pos"].split(",")) == 2
+    for e in g.edges():
+        assert len(e.attr["pos"].split()) % 3 == 1
+    # The back edge from c to a spans two layers
+    assert len(g.get_edge("c", "a").attr["pos"].split()) == 7
+    a = g.get_node("a")
+    b = g.get_node("b")
+    a_y = float(a.attr["pos"].split(",")[1])
+    b_y = float(b.attr["pos"].split(",")[1])
+    # a is 2 inches tall; b has the default height of 0.5 inches
+    assert a_y - b_y == pytest.approx(
+        config.POINTS_PER_INCH * (1 + 0.25) + config.LAYERED_RANKSEP
+    )
+    g.clear()
+    g.close()
+
+
+@pytest.mark.parametrize(
+    "graph_filename", ["longtest_LastGraph", "sample1.gfa", "loop.gfa"]
+)
+def test_collate_with_layered_engine(graph_filename):
+    rows = get_all_rows(graph_filename, ["-le", "layered"])
+    for r in rows["components"]:
+        if r[7] is not None:
+            assert r[7] == "layered"
+    assert "layered" in set(r[7] for r in rows["components"])
+    # Parallel and timed layouts give the same results as serial layout
+    for extra_args in (["-j", "2"], ["-lt", "600"]):
+        other_rows = get_all_rows(
+            graph_filename, ["-le", "layered"] + extra_args
+        )
+        for table in STD_TABLES:
+            assert other_rows[table] == rows[table]
+
+
+def test_invalid_layout_engine():
+    with pytest.raises(SystemExit):
+        utils.create_and_open_db("loop.gfa", ["-le", "neato"])
@@ -0,0 +1,140 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the layout cache used by -lc.
+
+import sqlite3
+import contextlib
+import pytest
+from metagenomescope import collate
+from metagenomescope.layout_utils import LayoutCache, layout_dot_string
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+# (This isn't one of the simple shapes that are laid out without GraphViz,
+# and thus without the cache; see simple_layout.py)
+GV_INPUT = "digraph g {\n\ta -> c;\n\tb -> c;\n\tc -> d;\n}"
+
+
+def test_cache_hits_and_misses(tmp_path):
+    cache_fn = str(tmp_path / "layouts.db")
+    cache = LayoutCache(cache_fn)
+    laid_out_gv, engine = layout_dot_string(GV_INPUT, cache=cache)
+    assert engine == "dot"
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert layout_dot_string(GV_INPUT, cache=cache) == (laid_out_gv, "dot")
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Layouts from different GraphViz programs are cached separately
+    assert cache.get(GV_INPUT, "sfdp") is None
+    cache.close()
+    # The cache persists after being closed
+    cache = LayoutCache(cache_fn)
+    assert cache.get(GV_INPUT) == laid_out_gv
+    assert cache.stats_msg() == (
+        "Layout cache: 1 hits, 0 misses, 0 evictions."
+    )
+    cache.close()
+
+
+def count_committed_layouts(cache_fn):
+    """Returns the number of layouts in a cache file, as seen by another
+       connection (so only committed changes are counted).
+    """
+    connection = sqlite3.connect(cache_fn)
+    with contextlib.closing(connection):
+        return connection.execute("SELECT COUNT(*) FROM layouts").fetchone()[0]
+
+
+def test_cache_commits_periodically(tmp_path):
+    cache_fn = str(tmp_path / "layouts.db")
+    cache = LayoutCache(cache_fn, commit_every=3, commit_interval=3600)
+    cache.put("a", "dot", "x")
+    cache.put("b", "dot", "y")
+    assert count_committed_layouts(cache_fn) == 0
+    # Updating when a layout was last used counts as a change
+    assert cache.get("a") == "x"
+    assert count_committed_layouts(cache_fn) == 2
+    cache.put("c", "dot", "z")
+    assert count_committed_layouts(cache_fn) == 2
+    cache.close()
+    assert count_committed_layouts(cache_fn) == 3
+    # With an interval of 0 seconds, every change is committed right away
+    cache = LayoutCache(cache_fn, commit_interval=0)
+    cache.put("d", "dot", "w")
+    assert count_committed_layouts(cache_fn) == 4
+    cache.close()
+
+
+def test_cache_saved_if_collate_fails(tmp_path, monkeypatch):
+    cache_fn = str(tmp_path / "layouts.db")
+
+    def fail(node_lengths):
+        raise RuntimeError("failing after layout")
+
+    # n50() is called after all components have been laid out, and there
+    # are fewer layouts than LAYOUT_CACHE_COMMIT_EVERY, so the layouts are
+    # only saved if collate closes the cache
+    monkeypatch.setattr(collate, "n50", fail)
+    with pytest.raises(RuntimeError):
+        utils.create_and_open_db("longtest_LastGraph", ["-lc", cache_fn])
+    assert count_committed_layouts(cache_fn) > 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = LayoutCache(str(tmp_path / "layouts.db"), max_size=100)
+    # These don't compress to less than 50 bytes, so the cache can only hold
+    # one of them
+    layouts = [str(list(range(i, i + 30))) for i in range(3)]
+    cache.put("a", "dot", layouts[0])
+    cache.put("b", "dot", layouts[1])
+    assert cache.evictions == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == layouts[1]
+    cache.max_size = 1000
+    cache.put("c", "dot", layouts[2])
+    # b was used more recently than c was added, so c is evicted first
+    cache.get("b")
+    cache.max_size = 150
+    cache.put("a", "dot", layouts[0])
+    assert cache.get("c") is None
+    assert cache.get("b") == layouts[1]
+    assert cache.get("a") == layouts[0]
+    cache.close()
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_cached_layout_matches_uncached(tmp_path, capsys, jobs):
+    cache_fn = str(tmp_path / "layouts.db")
+    uncached_rows = get_all_rows("longtest_LastGraph")
+    for run in range(2):
+        capsys.readouterr()
+        cached_rows = get_all_rows(
+            "longtest_LastGraph", ["-lc", cache_fn, "-j", jobs]
+        )
+        for table in STD_TABLES:
+            assert cached_rows[table] == uncached_rows[table]
+        if run == 1:
+            # Everything should've been laid out using the cache
+            assert " 0 misses," in capsys.readouterr().out
+
+
+def test_cache_size_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        utils.create_and_open_db(
+            "loop.gfa", ["-lc", str(tmp_path / "l.db"), "-lcs", "0"]
+        )
@@ -0,0 +1,180 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests laying out each distinct shape of small component (or node group)
+# only once per run (see ShapeLayoutCache).
+
+import tracemalloc
+import pytest
+from metagenomescope import collate
+from metagenomescope.layout_utils import (
+    LayoutCache,
+    LayoutResult,
+    ShapeLayoutCache,
+    canonicalize_dot_string,
+    layout_dot_string,
+)
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+
+def make_gv(a, b, c, d):
+    """Returns a DOT string of a graph that GraphViz has to lay out, with
+       the given node IDs.
+    """
+    return (
+        'digraph asm {\n\tnode [shape=house,label=""];\n'
+        "\t%s [height=1,width=0.5];\n\t%s [height=0.5,width=1];\n"
+        '\t%s -> %s [comment="%s,%s"]\n\t%s -> %s [comment="%s,%s"]\n'
+        '\t%s -> %s [comment="%s,%s"]\n}'
+    ) % (a, b, a, c, a, c, b, c, b, c, c, d, c, d)
+
+
+def test_canonicalize_dot_string():
+    gv1 = make_gv("1", "2", "3", "4")
+    gv2 = make_gv("-5", "cluster_B6_7", "8", "9")
+    canonical_gv, to_canonical, from_canonical = canonicalize_dot_string(gv1)
+    assert canonicalize_dot_string(gv2)[0] == canonical_gv
+    assert canonical_gv == make_gv("n0", "n1", "n2", "n3").replace(
+        'comment="n0,n2"', 'comment="e0"'
+    ).replace('comment="n1,n2"', 'comment="e1"').replace(
+        'comment="n2,n3"', 'comment="e2"'
+    )
+    assert to_canonical[("node", "3")] == "n2"
+    assert from_canonical[("comment", "e1")] == "2,3"
+    # Node dimensions are part of the canonical DOT string
+    assert (
+        canonicalize_dot_string(gv1.replace("height=1,", "height=2,"))[0]
+        != canonical_gv
+    )
+
+
+def test_canonicalize_clusters():
+    gv = (
+        "digraph nodegroup {\nsubgraph cluster_B1_2 {\n\tmargin=0;\n"
+        "\t1 [height=1];\n\t2;\n}\n\t1 -> 2\n}"
+    )
+    canonical_gv = canonicalize_dot_string(gv)[0]
+    assert "digraph nodegroup {\nsubgraph cluster_0 {\n" in canonical_gv
+    assert "\tn0 -> n1\n" in canonical_gv
+
+
+def test_reused_layout_matches_graphviz(tmp_path):
+    gv1 = make_gv("1", "2", "3", "4")
+    gv2 = make_gv("-5", "cluster_B6_7", "8", "9")
+    persistent_cache = LayoutCache(str(tmp_path / "layouts.db"))
+    cache = ShapeLayoutCache(persistent_cache)
+    assert cache.get_key(gv1, "dot") == cache.get_key(gv2, "dot")
+    assert cache.get_key(gv1, "dot") != cache.get_key(gv1, "sfdp")
+    layout_dot_string(gv1, cache=cache)
+    reused_gv = layout_dot_string(gv2, cache=cache)[0]
+    assert cache.reuse_ct == 1
+    # The reused layout is just like the layout GraphViz would've produced
+    r = LayoutResult(reused_gv, gv2)
+    expected_r = LayoutResult(layout_dot_string(gv2)[0], gv2)
+    assert vars(r) == vars(expected_r)
+    assert r.node_names == ["-5", "cluster_B6_7", "8", "9"]
+    assert r.edge_comments == ["-5,8", "cluster_B6_7,8", "8,9"]
+    # The persistent cache only contains the canonical layout
+    assert (persistent_cache.hits, persistent_cache.misses) == (0, 1)
+    assert persistent_cache.get(gv1) is None
+    assert persistent_cache.get(canonicalize_dot_string(gv1)[0]) is not None
+    assert cache.stats_msg().startswith("Reused 1 layouts ")
+    assert "(saving 1 layout computations)" in cache.stats_msg()
+    assert ShapeLayoutCache().stats_msg() == ""
+    persistent_cache.close()
+
+
+def test_large_graphs_not_canonicalized():
+    gv1 = make_gv("1", "2", "3", "4")
+    gv2 = make_gv("5", "6", "7", "8")
+    cache = ShapeLayoutCache(max_size=len(gv1) - 1)
+    assert cache.get_key(gv1, "dot") != cache.get_key(gv2, "dot")
+    cache.put(gv1, "dot", layout_dot_string(gv1)[0])
+    assert cache.get(gv2) is None
+    assert cache.get(gv1) is None
+
+
+def make_distinct_gv(i):
+    """Returns a DOT string whose shape (including node dimensions) differs
+       for each i. We use these as stand-ins for laid-out DOT strings, too.
+    """
+    return make_gv("1", "2", "3", "4").replace("height=1,", "height=%d," % i)
+
+
+def test_layouts_in_memory_are_bounded():
+    gvs = [make_distinct_gv(i) for i in range(1, 4)]
+    cache = ShapeLayoutCache()
+    cache.put(gvs[0], "dot", gvs[0])
+    # (The canonical layouts stored have the same length for each i)
+    size = cache.total_size
+    cache.max_total_size = 2 * size
+    cache.put(gvs[1], "dot", gvs[1])
+    # Using the first layout makes the second one the least recently used
+    assert cache.get(gvs[0]) == gvs[0]
+    cache.put(gvs[2], "dot", gvs[2])
+    assert cache.evictions == 1
+    assert cache.get(gvs[1]) is None
+    assert cache.get(gvs[0]) == gvs[0]
+    assert cache.get(gvs[2]) == gvs[2]
+    assert cache.total_size == 2 * size
+    # Adding a layout again replaces it, rather than counting it twice
+    cache.put(gvs[2], "dot", gvs[2])
+    assert cache.total_size == 2 * size
+
+
+def test_memory_used_by_layouts_is_bounded():
+    # Many distinct shapes that are never reused, as in a graph with lots of
+    # small components with different node dimensions
+    max_total_size = 20 * 1024
+    cache = ShapeLayoutCache(max_total_size=max_total_size)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(1, 3001):
+            gv = make_distinct_gv(i)
+            cache.put(gv, "dot", gv)
+            assert cache.total_size <= max_total_size
+        used = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert cache.evictions > 0
+    # Each layout stored also has a key and some bookkeeping, but this
+    # shouldn't be more than a few times the size of the layouts themselves
+    # -- and it's a lot less than the ~500 KB of layouts we added.
+    assert used < 3 * max_total_size
+
+
+@pytest.mark.parametrize(
+    "extra_args", [[], ["-j", "2"], ["-lt", "600"], ["-j", "2", "-lt", "600"]]
+)
+def test_collate_reuses_layouts(monkeypatch, capsys, extra_args):
+    # isomorphic_components.gml contains four components with the same shape
+    # (and node dimensions), and one with the same shape but different node
+    # dimensions. These components aren't laid out by simple_layout.py.
+    rows = get_all_rows("isomorphic_components.gml", extra_args)
+    assert "Reused 3 layouts " in capsys.readouterr().out
+    monkeypatch.setattr(
+        collate,
+        "ShapeLayoutCache",
+        lambda cache: ShapeLayoutCache(cache, max_size=0),
+    )
+    unreused_rows = get_all_rows("isomorphic_components.gml", extra_args)
+    # The message about reused layouts is only printed if any were reused
+    assert "Reused " not in capsys.readouterr().out
+    for table in STD_TABLES:
+        assert rows[table] == unreused_rows[table]
@@ -0,0 +1,73 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests that laying out components in parallel (using -j) produces the same
+# .db file as laying them out serially.
+
+import multiprocessing
+import pytest
+from metagenomescope import collate
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+
+@pytest.mark.parametrize(
+    "graph_filename",
+    ["longtest_LastGraph", "sample1.gfa", "marygold_fig2a.gml", "loop.gfa"],
+)
+def test_parallel_layout_matches_serial(graph_filename):
+    serial_rows = get_all_rows(graph_filename)
+    parallel_rows = get_all_rows(graph_filename, ["-j", "2"])
+    for table in STD_TABLES:
+        assert serial_rows[table] == parallel_rows[table]
+
+
+@pytest.mark.parametrize(
+    "extra_args", [["-j", "2"], ["-j", "2", "-lt", "600"], ["-lt", "600"]]
+)
+def test_parallel_layout_row_sets_match_serial(extra_args):
+    # Compares the rows in each table regardless of their order, so that
+    # this fails on any change to the rows themselves (and not just on
+    # changes to the order of rows)
+    serial_rows = get_all_rows("longtest_LastGraph")
+    other_rows = get_all_rows("longtest_LastGraph", extra_args)
+    for table in STD_TABLES:
+        assert sorted(serial_rows[table], key=repr) == sorted(
+            other_rows[table], key=repr
+        )
+        assert len(serial_rows[table]) == len(other_rows[table])
+
+
+def test_jobs_must_be_positive():
+    with pytest.raises(ValueError):
+        utils.create_and_open_db("loop.gfa", ["-j", "0"])
+
+
+@pytest.mark.parametrize(
+    "extra_args", [["-j", "2"], ["-lt", "600"], ["-j", "2", "-lt", "600"]]
+)
+def test_layout_workers_shut_down_on_error(monkeypatch, extra_args):
+    def fail(*args, **kwargs):
+        raise RuntimeError("Reading a layout failed")
+
+    # This is called on every laid-out component (and node group) as we go
+    # through them, after the worker processes have been started
+    monkeypatch.setattr(collate, "LayoutResult", fail)
+    with pytest.raises(RuntimeError):
+        get_all_rows("sample1.gfa", extra_args)
+    assert multiprocessing.active_children() == []
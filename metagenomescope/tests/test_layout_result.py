@@ -0,0 +1,222 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests reading laid-out DOT strings using layout_utils.LayoutResult, by
+# comparing what it reads to what pygraphviz reads.
+
+import random
+import time
+import pytest
+import pygraphviz
+from metagenomescope import config
+from metagenomescope.layout_utils import (
+    layout_dot_string,
+    load_laid_out_graph,
+    LayoutResult,
+)
+
+
+def read_with_agraph(laid_out_gv):
+    """Reads the same information as LayoutResult from a laid-out DOT string
+       by loading it into a pygraphviz.AGraph, and returns a 4-tuple of
+       (graph bounding box, list of subgraph bounding boxes, list of node
+       info, list of edge info).
+    """
+    h = load_laid_out_graph(laid_out_gv)
+    bb = tuple(float(c) for c in h.graph_attr["bb"].split(","))
+    subgraph_bbs = [
+        (str(sg.name), tuple(float(c) for c in sg.graph_attr["bb"].split(",")))
+        for sg in h.subgraphs()
+    ]
+    nodes = [
+        (
+            str(n),
+            tuple(float(c) for c in n.attr["pos"].split(",")),
+            str(n.attr["shape"] or ""),
+        )
+        for n in h.nodes()
+    ]
+    edges = [
+        (str(e[0]), str(e[1]), e.attr["comment"] or "", e.attr["pos"] or "")
+        for e in h.edges()
+    ]
+    h.close()
+    return bb, subgraph_bbs, nodes, edges
+
+
+def read_with_layout_result(laid_out_gv):
+    """Like read_with_agraph(), but using LayoutResult."""
+    r = LayoutResult(laid_out_gv)
+    nodes = list(zip(r.node_names, r.node_positions, r.node_shapes))
+    edges = list(
+        zip(r.edge_tails, r.edge_heads, r.edge_comments, r.edge_positions)
+    )
+    return r.bb, r.subgraph_bbs, nodes, edges
+
+
+def quote(name):
+    return '"%s"' % (name.replace('"', '\\"'))
+
+
+@pytest.mark.parametrize("directed", [True, False])
+def test_layout_result_matches_agraph(directed):
+    # Node names that need to be quoted (or that look like DOT keywords),
+    # and a name long enough that GraphViz will split lines containing it
+    names = [
+        "a",
+        "-5",
+        'x"y',
+        "node",
+        "graph",
+        "c]d;",
+        "e f",
+        "1.5",
+        "long" * 40,
+        "a\\b",
+    ]
+    edge_op = "->" if directed else "--"
+    random.seed(333)
+    for trial in range(10):
+        lines = [
+            "%s g {" % ("digraph" if directed else "graph"),
+            "node [shape=box];",
+            "edge [headport=n,tailport=s];",
+            # Defaults set within a subgraph only apply to nodes created
+            # within it
+            "subgraph cluster_z { node [shape=circle]; %s; %s; }"
+            % (quote(names[1]), quote(names[2])),
+        ]
+        for i in range(20):
+            # This includes self-loops and duplicate edges
+            t, h = random.choice(names), random.choice(names)
+            lines.append(
+                "%s %s %s [comment=%s];"
+                % (quote(t), edge_op, quote(h), quote(t + "," + h))
+            )
+        lines.append("%s [shape=invhouse];" % (quote(random.choice(names))))
+        lines.append("}")
+        laid_out_gv = layout_dot_string("\n".join(lines))[0]
+        assert read_with_layout_result(laid_out_gv) == read_with_agraph(
+            laid_out_gv
+        )
+
+
+def test_layout_result_of_node_group():
+    laid_out_gv = layout_dot_string(
+        "digraph nodegroup {\n\tsubgraph cluster_B1_2 {\n\t\tmargin=0;\n"
+        "\t\t1 [shape=house];\n\t\t2 [shape=invhouse];\n\t}\n"
+        "\t1 -> 2;\n}"
+    )[0]
+    r = LayoutResult(laid_out_gv)
+    assert [name for name, bb in r.subgraph_bbs] == ["cluster_B1_2"]
+    assert r.node_shapes == ["house", "invhouse"]
+    assert r.edge_comments == [""]
+    assert read_with_layout_result(laid_out_gv) == read_with_agraph(
+        laid_out_gv
+    )
+
+
+def test_layout_result_of_layered_layout():
+    laid_out_gv = layout_dot_string(
+        'digraph g {\n\tnode [label=""];\n'
+        '\ta -> b [comment="a,b"];\n\tb -> c [comment="b,c"];\n'
+        '\tc -> a [comment="c,a"];\n\tc -> c [comment="c,c"];\n}',
+        prog=config.LAYERED_LAYOUT_PROG,
+    )[0]
+    assert read_with_layout_result(laid_out_gv) == read_with_agraph(
+        laid_out_gv
+    )
+
+
+def test_layout_result_in_gv_input_order():
+    # A component (from marygold_fig2a.gml) whose laid-out DOT string lists
+    # its nodes and edges in a different order than the DOT string that was
+    # laid out
+    gv_input = (
+        'digraph asm {\n\tnode [label=""];\n'
+        "\tedge [headport=n,tailport=s];\n"
+        "\t1 [shape=invhouse];\n\t4 [shape=invhouse];\n"
+        "\t3 [shape=invhouse];\n\t6 [shape=invhouse];\n"
+        "\t5 [shape=invhouse];\n\t2 [shape=invhouse];\n"
+        '\t1 -> 2 [comment="1,2"]\n\t1 -> 4 [comment="1,4"]\n'
+        '\t4 -> 5 [comment="4,5"]\n\t4 -> 3 [comment="4,3"]\n'
+        '\t3 -> 6 [comment="3,6"]\n\t5 -> 6 [comment="5,6"]\n'
+        '\t2 -> 3 [comment="2,3"]\n\t2 -> 5 [comment="2,5"]\n}'
+    )
+    # This is the order in which collate used to read layouts
+    g = pygraphviz.AGraph(gv_input)
+    g.layout(prog="dot")
+    in_process_nodes = [str(n) for n in g.nodes()]
+    in_process_edges = [(str(e[0]), str(e[1])) for e in g.edges()]
+    g.close()
+    laid_out_gv = layout_dot_string(gv_input)[0]
+    r = LayoutResult(laid_out_gv, gv_input)
+    assert r.node_names == in_process_nodes
+    assert list(zip(r.edge_tails, r.edge_heads)) == in_process_edges
+    # Make sure that this test is actually testing something
+    reparsed_info = read_with_agraph(laid_out_gv)
+    assert [n[0] for n in reparsed_info[2]] != in_process_nodes
+    # The positions are still matched up with the right nodes and edges
+    assert sorted(zip(r.node_names, r.node_positions, r.node_shapes)) == (
+        sorted(reparsed_info[2])
+    )
+    assert sorted(
+        zip(r.edge_tails, r.edge_heads, r.edge_comments, r.edge_positions)
+    ) == sorted(reparsed_info[3])
+
+
+def make_laid_out_graph(node_ct=20000, edges_per_node=2):
+    """Returns a DOT string of a generated graph, with random layout
+       attributes set (as if it had been laid out by GraphViz).
+    """
+    random.seed(333)
+    lines = ["digraph g {"]
+    for i in range(node_ct):
+        lines.append(
+            '\t%d [pos="%g,%g", shape=rectangle];'
+            % (i, random.random() * 1e4, random.random() * 1e4)
+        )
+    for i in range(node_ct * edges_per_node):
+        t, h = random.randrange(node_ct), random.randrange(node_ct)
+        lines.append(
+            '\t%d -> %d [comment="%d,%d", pos="e,1,2 3,4 5,6 7,8 9,10"];'
+            % (t, h, t, h)
+        )
+    lines.append("}")
+    # Pass this through pygraphviz, so that it's written like a laid-out
+    # graph would be
+    g = pygraphviz.AGraph("\n".join(lines))
+    g.graph_attr["bb"] = "0,0,10000,10000"
+    laid_out_gv = g.string()
+    g.close()
+    return laid_out_gv
+
+
+def test_layout_result_benchmark():
+    laid_out_gv = make_laid_out_graph()
+    t0 = time.time()
+    agraph_info = read_with_agraph(laid_out_gv)
+    t1 = time.time()
+    layout_result_info = read_with_layout_result(laid_out_gv)
+    t2 = time.time()
+    # Shown when running pytest with -s
+    print(
+        "\nAGraph: {:.3f} s; LayoutResult: {:.3f} s".format(t1 - t0, t2 - t1)
+    )
+    assert layout_result_info == agraph_info
+    assert len(layout_result_info[3]) == 40000
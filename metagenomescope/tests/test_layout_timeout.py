@@ -0,0 +1,130 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests limiting the time spent laying out each component (-lt).
+
+import multiprocessing
+import time
+import pytest
+from metagenomescope import config, layout_utils
+from metagenomescope.layout_utils import TimedLayout, layout_dot_string
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+# These tests make layouts hang by monkeypatching layout_dot_string(), which
+# only affects the worker processes if they're forked from this process
+needs_fork = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="worker processes must be forked",
+)
+
+
+def make_slow_layout(slow_progs):
+    """Returns a version of layout_dot_string() that hangs when asked to use
+       any of the programs in slow_progs.
+    """
+
+    def slow_layout_dot_string(gv_input, prog="dot", cache=None):
+        if prog in slow_progs:
+            time.sleep(60)
+        return layout_dot_string(gv_input, prog, cache)
+
+    return slow_layout_dot_string
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_generous_timeout_matches_no_timeout(jobs):
+    rows = get_all_rows("longtest_LastGraph")
+    timed_rows = get_all_rows("longtest_LastGraph", ["-lt", "600", "-j", jobs])
+    for table in STD_TABLES:
+        assert timed_rows[table] == rows[table]
+    # Every component in longtest_LastGraph has a simple shape, so none of
+    # them needed a fallback program (or GraphViz at all)
+    assert set(r[7] for r in rows["components"]) == {
+        config.SIMPLE_LAYOUT_ENGINE
+    }
+
+
+@needs_fork
+def test_timed_layout_falls_back(monkeypatch):
+    monkeypatch.setattr(
+        layout_utils, "layout_dot_string", make_slow_layout(("dot",))
+    )
+    # (Neither of these graphs has a shape that's laid out without GraphViz)
+    gv_inputs = [
+        "digraph g {\n\ta -> c;\n\tb -> c;\n}",
+        "digraph g {\n\tc -> d;\n\tc -> e;\n}",
+    ]
+    timed_layout = TimedLayout(2, 0.2)
+    t0 = time.monotonic()
+    results = list(timed_layout.imap(gv_inputs))
+    assert time.monotonic() - t0 < 30
+    timed_layout.close()
+    assert [prog for laid_out_gv, prog in results] == ["sfdp", "sfdp"]
+    for gv_input, result in zip(gv_inputs, results):
+        assert result == layout_dot_string(gv_input, "sfdp")
+    assert timed_layout.timeout_ct == 2
+
+
+@needs_fork
+def test_timed_layout_gives_up(monkeypatch):
+    monkeypatch.setattr(
+        layout_utils, "layout_dot_string", make_slow_layout(("dot", "sfdp"))
+    )
+    timed_layout = TimedLayout(1, 0.1)
+    assert list(
+        timed_layout.imap(["digraph g {\n\ta -> c;\n\tb -> c;\n}"])
+    ) == [(None, None)]
+    timed_layout.close()
+    assert timed_layout.timeout_ct == 2
+
+
+def test_timed_layout_raises_errors():
+    timed_layout = TimedLayout(1, 60, progs=("not_a_real_program",))
+    with pytest.raises(ValueError):
+        list(timed_layout.imap(["digraph g {\n\ta -> b;\n}"]))
+    timed_layout.close()
+
+
+@needs_fork
+@pytest.mark.parametrize("slow_progs", [("dot",), ("dot", "sfdp")])
+def test_collate_timeout(monkeypatch, capsys, slow_progs):
+    monkeypatch.setattr(
+        layout_utils, "layout_dot_string", make_slow_layout(slow_progs)
+    )
+    rows = get_all_rows("sample1.gfa", ["-lt", "0.2"])
+    # sample1.gfa has two components that need to be laid out, and two
+    # components that are just a single node
+    components = rows["components"]
+    if slow_progs == ("dot",):
+        assert [r[6] for r in components] == [0, 0, 0, 0]
+        assert [r[7] for r in components] == ["sfdp", "sfdp", None, None]
+        assert "2 were laid out using a faster program instead, and 0 " in (
+            capsys.readouterr().out
+        )
+        assert all(r[7] is not None for r in rows["nodes"])
+    else:
+        # The components that ran out of time are treated as too large
+        assert [r[6] for r in components] == [1, 1, 0, 0]
+        assert [r[0] for r in rows["nodes"]] == ["6", "-6"]
+        assert rows["assembly"][0][14] == 3
+
+
+def test_timeout_must_be_positive():
+    with pytest.raises(ValueError):
+        utils.create_and_open_db("loop.gfa", ["-lt", "0"])
@@ -0,0 +1,84 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the isolated layouts of node groups (NodeGroup.layout_isolated(),
+# etc.)
+
+from metagenomescope.graph_objects import Node, MiscPattern
+
+
+def make_chain(node_ct):
+    """Returns a list of node_ct Nodes, where each node has an edge to the
+       next node in the list.
+    """
+    nodes = [Node(str(i), 100, False) for i in range(node_ct)]
+    for n in nodes:
+        n.relative_length = 0.5
+        n.longside_proportion = 0.6
+    for i in range(node_ct - 1):
+        nodes[i].add_outgoing_edge(nodes[i + 1])
+    return nodes
+
+
+def test_interior_edges_exclude_edges_leaving_group():
+    nodes = make_chain(6)
+    # Add an edge from inside the group to outside of it, and an edge from
+    # outside the group to inside of it
+    nodes[2].add_outgoing_edge(nodes[5])
+    nodes[0].add_outgoing_edge(nodes[3])
+    group = MiscPattern("Misc", *nodes[1:5])
+    pairs = [(n.id_string, m.id_string) for n, m in group.interior_edges()]
+    assert pairs == [("1", "2"), ("2", "3"), ("3", "4")]
+    # The edge list is only computed once
+    assert group.interior_edges() is group.interior_edges()
+    gv = group.isolated_dot_input()
+    assert gv.count(" -> ") == 3
+    assert "\t2 -> 3\n" in gv
+    assert "2 -> 5" not in gv
+    assert "0 -> 3" not in gv
+
+
+def test_isolated_dot_input_of_large_group():
+    # Checking membership in a list of the group's nodes for each edge would
+    # take quadratic time here (so this would take minutes); using a set, it
+    # takes a fraction of a second.
+    node_ct = 30000
+    nodes = make_chain(node_ct + 1)
+    group = MiscPattern("Misc", *nodes[:node_ct])
+    gv = group.isolated_dot_input()
+    assert gv.count(" -> ") == node_ct - 1
+    assert "%d -> %d" % (node_ct - 1, node_ct) not in gv
+
+
+def test_layout_isolated_only_once():
+    nodes = make_chain(4)
+    nodes[3].add_outgoing_edge(nodes[1])
+    group = MiscPattern("Misc", *nodes)
+    group.layout_isolated()
+    assert group.has_isolated_layout
+    assert group.edge_count == 4
+    assert len(group.edges) == 4
+    width = group.xdot_c_width
+    assert width > 0
+    # Laying out the group again (or reading in another layout of it)
+    # shouldn't duplicate its edges
+    group.layout_isolated()
+    assert group.edge_count == 4
+    assert len(group.edges) == 4
+    assert group.xdot_c_width == width
+    assert all(e.group is group for e in group.edges)
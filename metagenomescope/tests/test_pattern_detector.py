@@ -0,0 +1,188 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the PatternDetector class in graph_objects/pattern_detector.py.
+
+import random
+import time
+import pytest
+from metagenomescope.graph_objects import (
+    Node,
+    Bubble,
+    Rope,
+    Chain,
+    Cycle,
+    MiscPattern,
+    PatternDetector,
+)
+
+
+def build_graph(node_ct, edges, used_groups=()):
+    """Returns a list of Nodes with the given edges.
+
+       Each group of node indices in used_groups is collapsed into a
+       MiscPattern beforehand, like how user-specified patterns are.
+    """
+    nodes = [Node(str(i), 100, False) for i in range(node_ct)]
+    for src, tgt in edges:
+        nodes[src].add_outgoing_edge(nodes[tgt])
+    for group in used_groups:
+        MiscPattern("Misc", *[nodes[i] for i in group])
+    return nodes
+
+
+VALIDATORS = {
+    "bubbles": (Bubble, Bubble.is_valid_bubble, lambda d: d > 1),
+    "ropes": (Rope, Rope.is_valid_rope, lambda d: d == 1),
+    "cycles": (Cycle, Cycle.is_valid_cycle, lambda d: True),
+    "chains": (Chain, Chain.is_valid_chain, lambda d: d == 1),
+}
+
+
+def find_patterns_per_start_node(nodes, pattern_types):
+    """Finds patterns the way collate.py did before PatternDetector existed:
+       by testing every node as the start of each type of pattern.
+    """
+    patterns = []
+    for pattern_type in pattern_types:
+        pattern_class, validator, outdeg_ok = VALIDATORS[pattern_type]
+        for n in nodes:
+            if n.used_in_collapsing or not outdeg_ok(len(n.outgoing_nodes)):
+                continue
+            validity, member_nodes = validator(n)
+            if validity:
+                patterns.append(pattern_class(*member_nodes))
+    return patterns
+
+
+def find_patterns_with_detector(nodes, pattern_types):
+    detector = PatternDetector(nodes)
+    patterns = []
+    for pattern_type in pattern_types:
+        patterns += getattr(detector, "find_" + pattern_type)()
+    return patterns
+
+
+def summarize(patterns):
+    return [(type(p).__name__, p.id_string) for p in patterns]
+
+
+def get_random_graph_args(rng):
+    node_ct = rng.randint(1, 30)
+    # Mostly sparse graphs, since those are the ones with lots of patterns.
+    # Half of the graphs are very sparse apart from the motifs added below.
+    motif_heavy = rng.random() < 0.5
+    edge_density = 0.25 if motif_heavy else rng.choice((1, 1.3, 2))
+    edge_ct = rng.randint(0, int(node_ct * edge_density))
+    edges = [
+        (rng.randrange(node_ct), rng.randrange(node_ct))
+        for _ in range(edge_ct)
+    ]
+    # Add some long paths and cycles
+    for _ in range(0 if motif_heavy else rng.randint(0, 3)):
+        path = rng.sample(range(node_ct), rng.randint(1, node_ct))
+        edges += list(zip(path, path[1:]))
+        if rng.random() < 0.5:
+            edges.append((path[-1], path[0]))
+    # Add some bubbles and frayed ropes, which rarely occur by chance
+    for _ in range(rng.randint(0, 3)):
+        if node_ct < 4:
+            break
+        motif = rng.sample(range(node_ct), rng.randint(4, min(node_ct, 10)))
+        if rng.random() < 0.5:
+            # Bubble: the first node points to every middle path, and every
+            # middle path points to the last node
+            cut = rng.randrange(2, len(motif) - 1)
+            for path in (motif[1:cut], motif[cut:-1]):
+                edges += [(motif[0], path[0]), (path[-1], motif[-1])]
+                edges += list(zip(path, path[1:]))
+        else:
+            # Frayed rope: two start nodes, a middle path, and two end nodes
+            middle = motif[2:-2] or motif[2:3]
+            edges += [(motif[0], middle[0]), (motif[1], middle[0])]
+            edges += [(middle[-1], motif[-1]), (middle[-1], motif[-2])]
+            edges += list(zip(middle, middle[1:]))
+    edges = list(dict.fromkeys(edges))
+    used_groups = []
+    if rng.random() < 0.3:
+        used = rng.sample(range(node_ct), rng.randint(1, min(node_ct, 4)))
+        used_groups = [[i] for i in used]
+    return node_ct, edges, used_groups
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize(
+    "pattern_types",
+    (
+        ("bubbles", "ropes", "cycles", "chains"),
+        # Also test each type of pattern on its own, since the precedence
+        # of the other patterns hides some of the ways in which patterns
+        # can be invalid
+        ("bubbles",),
+        ("ropes",),
+        ("cycles",),
+        ("chains",),
+    ),
+)
+def test_matches_per_start_node_search(seed, pattern_types):
+    rng = random.Random(seed)
+    for _ in range(50):
+        graph_args = get_random_graph_args(rng)
+        exp = find_patterns_per_start_node(
+            build_graph(*graph_args), pattern_types
+        )
+        obs = find_patterns_with_detector(
+            build_graph(*graph_args), pattern_types
+        )
+        assert summarize(obs) == summarize(exp), graph_args
+
+
+def test_simple_patterns():
+    # 0 -> {1, 2} -> 3 is a bubble; 3 -> 4 -> 5 -> 6 is a chain; 7 <-> 8 is
+    # a cyclic chain; {9, 10} -> 11 -> {12, 13} is a frayed rope
+    edges = [(0, 1), (0, 2), (1, 3), (2, 3), (3, 4), (4, 5), (5, 6)]
+    edges += [(7, 8), (8, 7), (9, 11), (10, 11), (11, 12), (11, 13)]
+    detector = PatternDetector(build_graph(14, edges))
+    assert summarize(detector.find_bubbles()) == [("Bubble", "B0_1_2_3")]
+    assert summarize(detector.find_ropes()) == [("Rope", "F9_10_11_12_13")]
+    assert summarize(detector.find_cycles()) == [("Cycle", "Y7_8")]
+    assert summarize(detector.find_chains()) == [("Chain", "C4_5_6")]
+
+
+def test_long_paths_scale_linearly():
+    # The old per-start-node search took quadratic time on graphs like this
+    # one, since it walked through the path once for every node in it when
+    # looking for cycles
+    def time_detection(path_len):
+        nodes = build_graph(
+            path_len, [(i, i + 1) for i in range(path_len - 1)]
+        )
+        # Test the nodes in reverse order so that every node is a candidate
+        # start node when looking for cycles and chains
+        nodes.reverse()
+        t0 = time.perf_counter()
+        patterns = PatternDetector(nodes).find_all()
+        elapsed = time.perf_counter() - t0
+        assert len(patterns) == 1 and len(patterns[0].nodes) == path_len
+        return elapsed
+
+    small = min(time_detection(2000) for _ in range(3))
+    large = min(time_detection(32000) for _ in range(3))
+    # Linear scaling would give a ratio of about 16; quadratic scaling would
+    # give a ratio of about 256
+    assert large / small < 64
@@ -0,0 +1,76 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the table of nodes in too-large components created by -stl.
+
+import contextlib
+import pytest
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import get_all_rows
+
+
+def get_search_rows(graph_filename, extra_args=[]):
+    connection, cursor = utils.create_and_open_db(
+        graph_filename, ["-stl"] + extra_args
+    )
+    with contextlib.closing(connection):
+        cursor.execute("SELECT * FROM searchnodes ORDER BY rowid")
+        search_rows = cursor.fetchall()
+        cursor.execute("SELECT size_rank, too_large FROM components")
+        rank2too_large = dict(cursor.fetchall())
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND "
+            + "tbl_name = 'searchnodes'"
+        )
+        index_names = set(r[0] for r in cursor.fetchall())
+    return search_rows, rank2too_large, index_names
+
+
+@pytest.mark.parametrize("extra_args", [[], ["-sc", "2"]])
+def test_search_table_contains_too_large_nodes(extra_args):
+    # Lay out everything, so we know which nodes are in which component
+    all_node_rows = get_all_rows("longtest_LastGraph")["nodes"]
+    search_rows, rank2too_large, index_names = get_search_rows(
+        "longtest_LastGraph", ["-maxn", "8"] + extra_args
+    )
+    too_large_ranks = set(r for r in rank2too_large if rank2too_large[r])
+    assert len(too_large_ranks) > 0
+    assert len(too_large_ranks) < len(rank2too_large)
+    # Exactly the nodes in too-large components are in the search table
+    assert sorted(search_rows) == sorted(
+        (r[0], r[1], r[2], r[6])
+        for r in all_node_rows
+        if r[6] in too_large_ranks
+    )
+    assert index_names == {"searchnodes_id_index", "searchnodes_label_index"}
+
+
+def test_search_table_not_created_by_default():
+    connection, cursor = utils.create_and_open_db("longtest_LastGraph")
+    with contextlib.closing(connection):
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND "
+            + "name = 'searchnodes'"
+        )
+        assert cursor.fetchall() == []
+
+
+def test_search_table_empty_if_nothing_too_large():
+    search_rows, rank2too_large, _ = get_search_rows("sample1.gfa")
+    assert not any(rank2too_large.values())
+    assert search_rows == []
@@ -0,0 +1,196 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the sequence store written by -ss (see sequence_store.py).
+
+import contextlib
+import os
+import sqlite3
+import pytest
+from metagenomescope import collate, config
+from metagenomescope.input_node_utils import reverse_complement
+from metagenomescope.sequence_store import (
+    SequenceStore,
+    SequenceStoreWriter,
+    pack_sequence,
+    unpack_sequence,
+)
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+SEQS = [
+    ("1", "ACGT"),
+    ("-1", "ACGTTGCA"),
+    ("2", "G"),
+    ("3", ""),
+    ("4", "CCCATTTGGGACGTACGTAC" * 5),
+    ("5", "NNACGTnnRYACGTNNNN"),
+    ("6", "acgtACGTgg"),
+]
+
+
+def write_store(filename, seqs=SEQS, block_size=7):
+    writer = SequenceStoreWriter(filename, block_size=block_size)
+    for node_id, seq in seqs:
+        writer.add(node_id, seq)
+    return writer, writer.finish()
+
+
+def test_pack_sequence():
+    assert pack_sequence("ACGT") == (bytes([0b00011011]), None)
+    # Sequences are padded to a whole number of bytes
+    assert pack_sequence("TG") == (bytes([0b11100000]), None)
+    packed, exceptions = pack_sequence("ANNcRR")
+    assert exceptions == '[[1,2,"N"],[4,2,"R"]]'
+    assert unpack_sequence(packed, 0, 6, exceptions) == "ANNCRR"
+    assert unpack_sequence(packed, 2, 5, exceptions) == "NCR"
+
+
+def test_writer_memory_is_bounded(tmp_path):
+    writer = SequenceStoreWriter(
+        str(tmp_path / "s.seq.db"), block_size=16, batch_size=2
+    )
+    for i in range(20):
+        writer.add(str(i), "ACGT" * 100)
+        assert len(writer.pending) < 16
+        assert len(writer.rows) < 2
+    assert writer.finish() == (20, 8000)
+
+
+def test_sequence_store_round_trip(tmp_path):
+    filename = str(tmp_path / "s.seq.db")
+    write_store(filename)
+    store = SequenceStore(filename)
+    assert len(store) == len(SEQS)
+    for node_id, seq in SEQS:
+        assert node_id in store
+        assert store.get(node_id) == seq.upper()
+        # Random access to every part of the sequence
+        for start in range(len(seq) + 1):
+            for end in range(start, len(seq) + 2):
+                assert store.get(node_id, start, end) == seq.upper()[start:end]
+    store.close()
+
+
+def test_sequence_store_reverse_complements(tmp_path):
+    filename = str(tmp_path / "s.seq.db")
+    write_store(filename)
+    store = SequenceStore(filename)
+    # "-1" is stored, so we don't use the reverse complement of "1"
+    assert store.get("-1") == "ACGTTGCA"
+    assert "-4" not in store
+    assert store.get("-4") == reverse_complement(SEQS[4][1])
+    assert store.get("-4", 3, 10) == reverse_complement(SEQS[4][1])[3:10]
+    assert store.get("-5") == "NNNNACGTYRNNACGTNN"
+    with pytest.raises(KeyError):
+        store.get("7")
+    store.close()
+
+
+def test_sequence_store_version_checked(tmp_path):
+    filename = str(tmp_path / "s.seq.db")
+    write_store(filename)
+    with contextlib.closing(sqlite3.connect(filename)) as connection:
+        connection.execute("UPDATE seqinfo SET version = -1")
+        connection.commit()
+    with pytest.raises(ValueError) as ei:
+        SequenceStore(filename)
+    assert config.SEQUENCE_STORE_VERSION_ERR in str(ei.value)
+
+
+def read_input_seqs(graph_filename):
+    """Returns a dict mapping node IDs to sequences in a GFA or LastGraph
+       file in utils.INDIR.
+    """
+    node_id2seq = {}
+    with open(os.path.join(utils.INDIR, graph_filename)) as f:
+        lines = f.read().splitlines()
+    if graph_filename.endswith(".gfa"):
+        for line in lines:
+            if line.startswith("S"):
+                node_id2seq[line.split()[1]] = line.split()[2]
+    else:
+        for i, line in enumerate(lines):
+            if line.startswith("NODE"):
+                node_id = line.split()[1]
+                node_id2seq[node_id] = lines[i + 1]
+                node_id2seq["-" + node_id] = lines[i + 2]
+    return node_id2seq
+
+
+@pytest.mark.parametrize(
+    "graph_filename", ["sample1.gfa", "cycletest_LastGraph"]
+)
+@pytest.mark.parametrize("extra_args", [[], ["-sc", "1"]])
+def test_collate_sequence_store(graph_filename, extra_args):
+    connection, cursor = utils.create_and_open_db(
+        graph_filename, ["-ss"] + extra_args
+    )
+    with contextlib.closing(connection):
+        cursor.execute("SELECT * FROM sequencestore")
+        seq_fn, seq_ct = cursor.fetchone()
+    node_id2seq = read_input_seqs(graph_filename)
+    assert seq_fn == graph_filename + config.SEQUENCE_STORE_SUFFIX
+    assert seq_ct == len(node_id2seq)
+    store = SequenceStore(os.path.join(utils.OUTDIR, seq_fn))
+    for node_id, seq in node_id2seq.items():
+        assert store.get(node_id) == seq
+        if graph_filename.endswith(".gfa"):
+            assert store.get("-" + node_id) == reverse_complement(seq)
+    store.close()
+
+
+def test_collate_sequence_store_doesnt_change_db():
+    rows = get_all_rows("sample1.gfa")
+    rows_with_store = get_all_rows("sample1.gfa", ["-ss"])
+    for table in STD_TABLES:
+        assert rows[table] == rows_with_store[table]
+
+
+def test_collate_sequence_store_not_created_by_default():
+    connection, cursor = utils.create_and_open_db("sample1.gfa")
+    with contextlib.closing(connection):
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND "
+            + "name = 'sequencestore'"
+        )
+        assert cursor.fetchall() == []
+
+
+def test_collate_sequence_store_gml():
+    with pytest.raises(ValueError) as ei:
+        utils.create_and_open_db("marygold_fig2a.gml", ["-ss"])
+    assert config.SEQUENCE_STORE_GML_ERR in str(ei.value)
+
+
+def test_collate_sequence_store_removed_on_error(tmp_path):
+    # An ARC line referring to a nonexistent node causes parsing to fail
+    # after some sequences have already been written to the sequence store
+    bad_fn = str(tmp_path / "bad_LastGraph")
+    with open(os.path.join(utils.INDIR, "cycletest_LastGraph")) as f:
+        lines = f.read().splitlines()
+    with open(bad_fn, "w") as f:
+        f.write("\n".join(lines + ["ARC\t1\t3\t5"]) + "\n")
+    args = ["-i", bad_fn, "-o", "bad", "-d", str(tmp_path), "-ss"]
+    seq_fn = str(tmp_path / ("bad" + config.SEQUENCE_STORE_SUFFIX))
+    for _ in range(2):
+        # Rerunning (without -w) fails in the same way, rather than because
+        # the sequence store from the first run already exists
+        with pytest.raises(KeyError):
+            collate.run_script(args)
+        assert not os.path.exists(seq_fn)
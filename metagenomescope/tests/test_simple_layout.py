@@ -0,0 +1,175 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the layouts of simply-shaped graphs that don't use GraphViz (see
+# simple_layout.py).
+
+import pygraphviz
+import pytest
+from metagenomescope import config
+from metagenomescope.layout_utils import (
+    LayoutResult,
+    layout_dot_string,
+    simple_layout_dot_string,
+)
+from metagenomescope.simple_layout import simple_layout
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+SIMPLE_GRAPHS = {
+    "single node": (1, []),
+    "chain": (4, [(0, 1), (1, 2), (2, 3)]),
+    "out-of-order chain": (3, [(2, 0), (1, 2)]),
+    "bubble": (4, [(0, 1), (0, 2), (1, 3), (2, 3)]),
+    "uneven bubble": (
+        6,
+        [(0, 1), (1, 2), (2, 5), (0, 3), (3, 5), (0, 4), (4, 5)],
+    ),
+    "bubble with an empty path": (3, [(0, 1), (1, 2), (0, 2)]),
+    "cycle": (3, [(0, 1), (1, 2), (2, 0)]),
+    "two-node cycle": (2, [(0, 1), (1, 0)]),
+    "loop": (1, [(0, 0)]),
+}
+
+OTHER_GRAPHS = {
+    "two sources": (3, [(0, 2), (1, 2)]),
+    "two sinks": (3, [(0, 1), (0, 2)]),
+    "duplicate edge": (2, [(0, 1), (0, 1)]),
+    "chain with a loop": (2, [(0, 1), (1, 1)]),
+    "two cycles": (4, [(0, 1), (1, 0), (2, 3), (3, 2)]),
+    "bubble with crossing paths": (
+        5,
+        [(0, 1), (0, 2), (1, 3), (2, 3), (1, 4), (3, 4), (2, 4)],
+    ),
+    "nested bubble": (
+        6,
+        [(0, 1), (0, 2), (1, 3), (2, 3), (3, 5), (0, 4), (4, 5)],
+    ),
+}
+
+
+@pytest.mark.parametrize("name", SIMPLE_GRAPHS)
+def test_simple_layout(name):
+    node_ct, edges = SIMPLE_GRAPHS[name]
+    widths = [30 + 10 * i for i in range(node_ct)]
+    heights = [50 - 5 * i for i in range(node_ct)]
+    sources = [e[0] for e in edges]
+    targets = [e[1] for e in edges]
+    x, y, edge_points, (right, top) = simple_layout(
+        widths, heights, sources, targets
+    )
+    lefts = [x[n] - widths[n] / 2 for n in range(node_ct)]
+    bottoms = [y[n] - heights[n] / 2 for n in range(node_ct)]
+    # Nodes don't overlap
+    for n in range(node_ct):
+        for m in range(n):
+            assert (
+                abs(x[n] - x[m]) >= (widths[n] + widths[m]) / 2
+                or abs(y[n] - y[m]) >= (heights[n] + heights[m]) / 2
+            )
+    # Edges leave the bottom of their source and enter the top of their
+    # target, and (other than edges closing cycles) point downwards
+    for s, t, points in zip(sources, targets, edge_points):
+        assert len(points) % 3 == 1 and len(points) >= 4
+        assert points[0] == pytest.approx((x[s], y[s] - heights[s] / 2))
+        assert points[-1] == pytest.approx((x[t], y[t] + heights[t] / 2))
+        if name not in ("cycle", "two-node cycle", "loop") or t != 0:
+            assert all(p[1] >= q[1] for p, q in zip(points, points[1:]))
+    # Everything is inside the bounding box, which starts at (0, 0)
+    all_points = [p for points in edge_points for p in points]
+    assert min(lefts + [p[0] for p in all_points]) == pytest.approx(0)
+    assert min(bottoms + [p[1] for p in all_points]) == pytest.approx(0)
+    assert max(x[n] + widths[n] / 2 for n in range(node_ct)) <= right
+    assert max(y[n] + heights[n] / 2 for n in range(node_ct)) <= top
+
+
+@pytest.mark.parametrize("name", OTHER_GRAPHS)
+def test_simple_layout_other_shapes(name):
+    node_ct, edges = OTHER_GRAPHS[name]
+    assert (
+        simple_layout(
+            [1] * node_ct,
+            [1] * node_ct,
+            [e[0] for e in edges],
+            [e[1] for e in edges],
+        )
+        is None
+    )
+
+
+def test_simple_layout_dot_string_matches_graphviz_conventions():
+    gv_input = (
+        "digraph g {\n\tnode [shape=house];\n\ta [height=1,width=2];\n"
+        '\ta -> b [comment="a,b"];\n\ta -> c;\n\tb -> d;\n\tc -> d;\n}'
+    )
+    laid_out_gv = simple_layout_dot_string(gv_input)
+    assert layout_dot_string(gv_input) == (
+        laid_out_gv,
+        config.SIMPLE_LAYOUT_ENGINE,
+    )
+    r = LayoutResult(laid_out_gv, gv_input)
+    assert r.bb[:2] == (0, 0)
+    assert r.node_names == ["a", "b", "c", "d"]
+    assert r.node_shapes == ["house"] * 4
+    # The source is at the top, the sink is at the bottom, and the two paths
+    # are side by side in between
+    a, b, c, d = r.node_positions
+    assert a[1] > b[1] == c[1] > d[1]
+    assert b[0] < a[0] == d[0] < c[0]
+    assert a[1] + config.POINTS_PER_INCH / 2 == pytest.approx(r.bb[3])
+    assert r.edge_comments == ["a,b", "", "", ""]
+    # The laid-out DOT string can be read by GraphViz, too
+    g = pygraphviz.AGraph(laid_out_gv)
+    assert g.get_node("d").attr["pos"] == "%.2f,%.2f" % d
+    assert g.get_node("a").attr["width"] == "2"
+
+
+def test_simple_layout_dot_string_node_group():
+    gv_input = (
+        "digraph nodegroup {\nsubgraph cluster_X {\n\tmargin=0;\n"
+        "\ta [height=1,width=1];\n\tb [height=1,width=1];\n}\n\ta -> b\n}"
+    )
+    r = LayoutResult(simple_layout_dot_string(gv_input), gv_input)
+    assert r.subgraph_bbs == [("cluster_X", r.bb)]
+    assert r.bb == (0, 0, 72, 180)
+    # Other subgraphs aren't handled
+    assert (
+        simple_layout_dot_string(
+            "digraph g {\nsubgraph cluster_X {\n\ta;\n}\n\ta -> b;\n}"
+        )
+        is None
+    )
+
+
+def test_collate_without_graphviz(monkeypatch):
+    # Every component (and node group) in loop.gfa has a simple shape
+    rows = get_all_rows("loop.gfa")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("GraphViz shouldn't be used")
+
+    monkeypatch.setattr(pygraphviz.AGraph, "layout", fail)
+    assert get_all_rows("loop.gfa") == rows
+    assert len(rows["components"]) > 1
+    for table in STD_TABLES:
+        assert len(rows[table]) > 0
+    # The components table records that these weren't laid out by dot
+    assert set(r[7] for r in rows["components"]) == {
+        config.SIMPLE_LAYOUT_ENGINE
+    }
+    for extra_args in (["-j", "2"], ["-lt", "600"]):
+        assert get_all_rows("loop.gfa", extra_args) == rows
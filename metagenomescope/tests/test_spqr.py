@@ -22,10 +22,15 @@ import pytest
 from metagenomescope.tests import utils
 
 
-@pytest.mark.spqrtest
-def test_spqr_tree_structure():
+@pytest.mark.parametrize(
+    "engine",
+    # The OGDF engine needs the compiled SPQR script, so only run it as part
+    # of the SPQR-specific tests
+    ("python", pytest.param("ogdf", marks=pytest.mark.spqrtest)),
+)
+def test_spqr_tree_structure(engine):
     connection, cursor = utils.create_and_open_db(
-        "marygold_fig2a.gml", ["-spqr"]
+        "marygold_fig2a.gml", ["-spqr", "-spqre", engine]
     )
     # We only identify 1 simple bubble in the MaryGold graph. However,
     # using SPQR tree decompositions, we can see that there's actually a sort
@@ -0,0 +1,296 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests the in-process SPQR tree decomposition code in spqr_utils.py.
+
+import random
+from collections import Counter
+import pytest
+from metagenomescope import spqr_utils
+from metagenomescope.graph_objects import Node
+
+
+def get_types(metanodes):
+    return sorted(m[0] for m in metanodes)
+
+
+def is_connected(edges, excluded_nodes=()):
+    """Returns True if the graph described by edges is connected, ignoring
+       the nodes in excluded_nodes and their incident edges.
+    """
+    adj = {}
+    for u, v in edges:
+        if u not in excluded_nodes and v not in excluded_nodes:
+            adj.setdefault(u, set()).add(v)
+            adj.setdefault(v, set()).add(u)
+    nodes = set(n for e in edges for n in e) - set(excluded_nodes)
+    if not nodes:
+        return True
+    start = next(iter(nodes))
+    seen = {start}
+    to_visit = [start]
+    while to_visit:
+        for w in adj.get(to_visit.pop(), ()):
+            if w not in seen:
+                seen.add(w)
+                to_visit.append(w)
+    return seen == nodes
+
+
+def check_spqr_tree(edges, metanodes, tree_edges):
+    """Checks that the output of spqr_decomposition() is the SPQR tree of
+       the biconnected graph described by edges.
+
+       Since the SPQR tree of a biconnected graph is unique, it's enough to
+       check that the tree covers all of the graph's edges, that each
+       metanode's skeleton is of the right type, and that no two adjacent
+       metanodes could be merged.
+    """
+    real_edges = Counter()
+    virtual_edge_ct = 0
+    for metanode_type, skeleton_edges in metanodes:
+        pairs = [frozenset(e[1:]) for e in skeleton_edges]
+        nodes = set(n for e in skeleton_edges for n in e[1:])
+        if metanode_type == "P":
+            assert len(nodes) == 2 and len(pairs) >= 3
+        elif metanode_type == "S":
+            degrees = Counter(n for e in skeleton_edges for n in e[1:])
+            assert len(nodes) >= 3 and set(degrees.values()) == {2}
+            assert is_connected([e[1:] for e in skeleton_edges])
+        else:
+            assert metanode_type == "R"
+            assert len(nodes) >= 4 and len(set(pairs)) == len(pairs)
+            nodes = sorted(nodes)
+            for i, a in enumerate(nodes):
+                for b in nodes[i + 1 :]:
+                    assert is_connected(
+                        [e[1:] for e in skeleton_edges], (a, b)
+                    )
+        for e in skeleton_edges:
+            if e[0] == "r":
+                real_edges[frozenset(e[1:])] += 1
+            else:
+                assert e[0] == "v"
+                virtual_edge_ct += 1
+    assert real_edges == Counter(frozenset(e) for e in edges)
+    # The tree edges form a tree, and each corresponds to a pair of virtual
+    # edges
+    assert len(tree_edges) == len(metanodes) - 1
+    assert virtual_edge_ct == 2 * len(tree_edges)
+    if tree_edges:
+        assert is_connected(tree_edges)
+    for i, j in tree_edges:
+        assert metanodes[i][0] != metanodes[j][0] or metanodes[i][0] == "R"
+
+
+def test_biconnected_components():
+    # Two triangles sharing node b, a pendant edge, and a self-loop
+    edges = [("a", "b"), ("b", "c"), ("c", "a"), ("b", "d"), ("d", "e")]
+    edges += [("e", "b"), ("e", "f"), ("f", "f")]
+    components = spqr_utils.biconnected_components(edges)
+    assert sorted(sorted(c) for c in components) == [
+        [0, 1, 2],
+        [3, 4, 5],
+        [6],
+    ]
+
+
+def test_biconnected_components_multi_edges():
+    edges = [("a", "b"), ("b", "a"), ("b", "c")]
+    components = spqr_utils.biconnected_components(edges)
+    assert sorted(sorted(c) for c in components) == [[0, 1], [2]]
+
+
+@pytest.mark.parametrize(
+    "edges, exp_types",
+    (
+        # A cycle is a single S-node
+        ([("a", "b"), ("b", "c"), ("c", "d"), ("d", "a")], ["S"]),
+        # Parallel edges are a single P-node
+        ([("a", "b"), ("b", "a"), ("a", "b")], ["P"]),
+        # K4 is a single R-node
+        (
+            [("a", "b"), ("a", "c"), ("a", "d")]
+            + [("b", "c"), ("b", "d"), ("c", "d")],
+            ["R"],
+        ),
+        # A triangle with a doubled edge is an S-node and a P-node
+        ([("a", "b"), ("b", "c"), ("c", "a"), ("a", "b")], ["P", "S"]),
+        # Two K4s sharing an edge: two R-nodes joined by a P-node
+        (
+            [("a", "b"), ("a", "c"), ("a", "d")]
+            + [("b", "c"), ("b", "d"), ("c", "d")]
+            + [("a", "e"), ("a", "f"), ("b", "e")]
+            + [("b", "f"), ("e", "f")],
+            ["P", "R", "R"],
+        ),
+    ),
+)
+def test_spqr_decomposition_simple(edges, exp_types):
+    metanodes, tree_edges = spqr_utils.spqr_decomposition(edges)
+    assert get_types(metanodes) == exp_types
+    check_spqr_tree(edges, metanodes, tree_edges)
+
+
+def get_random_edges(rng):
+    node_ct = rng.randint(2, 20)
+    if rng.random() < 0.5:
+        # Graphs with lots of degree-2 nodes and parallel edges
+        edge_ct = rng.randint(node_ct, int(1.6 * node_ct))
+    else:
+        edge_ct = rng.randint(2 * node_ct, 4 * node_ct)
+    return [
+        ("n%d" % rng.randrange(node_ct), "n%d" % rng.randrange(node_ct))
+        for _ in range(edge_ct)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_spqr_decomposition_random(seed):
+    rng = random.Random(seed)
+    for _ in range(30):
+        edges = get_random_edges(rng)
+        for component in spqr_utils.biconnected_components(edges):
+            if len(component) < 3:
+                continue
+            bicomponent_edges = [edges[i] for i in component]
+            check_spqr_tree(
+                bicomponent_edges,
+                *spqr_utils.spqr_decomposition(bicomponent_edges)
+            )
+
+
+def test_spqr_decomposition_large_graph():
+    # A long ladder is a chain of 4-cycles with lots of separation pairs, and
+    # has a DFS tree deep enough to hit Python's recursion limit if the
+    # decomposition used recursion
+    rung_ct = 20000
+    edges = [("a0", "b0")]
+    for i in range(1, rung_ct):
+        edges += [("a%d" % (i - 1), "a%d" % i), ("b%d" % (i - 1), "b%d" % i)]
+        edges.append(("a%d" % i, "b%d" % i))
+    metanodes, tree_edges = spqr_utils.spqr_decomposition(edges)
+    # Each rung other than the first and last is shared by two S-nodes
+    assert get_types(metanodes) == ["P"] * (rung_ct - 2) + ["S"] * (
+        rung_ct - 1
+    )
+    assert len(tree_edges) == len(metanodes) - 1
+
+
+def test_compute_bicomponents():
+    # A triangle with a doubled edge, plus a separate edge that isn't in any
+    # bicomponent with at least 3 edges
+    singlenodeid2obj = {}
+    for n in ("a", "b", "c", "d"):
+        singlenodeid2obj[n] = Node(n, 100, False, is_single=True)
+    for src, tgt in (("a", "b"), ("b", "c"), ("c", "a"), ("a", "b")):
+        singlenodeid2obj[src].add_outgoing_edge(singlenodeid2obj[tgt])
+    singlenodeid2obj["c"].add_outgoing_edge(singlenodeid2obj["d"])
+    bicomponentid2obj = spqr_utils.compute_bicomponents(singlenodeid2obj)
+    assert list(bicomponentid2obj.keys()) == ["1"]
+    bicmp = bicomponentid2obj["1"]
+    assert len(bicmp.metanode_list) == 2
+    # The S-node has 3 nodes and 3 edges; the P-node has 2 nodes and 3 edges
+    assert bicmp.root_metanode.metanode_type == "S"
+    assert len(bicmp.root_metanode.outgoing_nodes) == 1
+    child = bicmp.root_metanode.outgoing_nodes[0]
+    assert child.metanode_type == "P"
+    assert child.incoming_nodes == [bicmp.root_metanode]
+    assert set(bicmp.snid2obj.keys()) == {"a", "b", "c"}
+    assert singlenodeid2obj["d"].parent_bicomponents == set()
+
+
+def build_single_graph(edges):
+    singlenodeid2obj = {}
+    for src, tgt in edges:
+        for n in (src, tgt):
+            if n not in singlenodeid2obj:
+                singlenodeid2obj[n] = Node(n, 100, False, is_single=True)
+        singlenodeid2obj[src].add_outgoing_edge(singlenodeid2obj[tgt])
+    return singlenodeid2obj
+
+
+def summarize_bicomponents(bicomponentid2obj):
+    summary = {}
+    for bicmp_id, bicmp in bicomponentid2obj.items():
+        summary[bicmp_id] = (
+            bicmp.root_metanode.spqr_id,
+            [
+                (
+                    mn.spqr_id,
+                    mn.metanode_type,
+                    [n.id_string for n in mn.nodes],
+                    mn.internal_edges,
+                    [c.spqr_id for c in mn.outgoing_nodes],
+                )
+                for mn in bicmp.metanode_list
+            ],
+        )
+    return summary
+
+
+def test_compute_bicomponents_parallel():
+    # A chain of random biconnected graphs, joined by bridges
+    rng = random.Random(0)
+    edges = []
+    for b in range(50):
+        ids = ["%d_%d" % (b, i) for i in range(rng.randint(3, 12))]
+        edges += list(zip(ids, ids[1:] + ids[:1]))
+        edges += [(rng.choice(ids), rng.choice(ids)) for _ in ids]
+        edges.append((ids[0], "%d_0" % (b + 1)))
+    serial = spqr_utils.compute_bicomponents(build_single_graph(edges), 1)
+    parallel = spqr_utils.compute_bicomponents(build_single_graph(edges), 3)
+    assert len(serial) >= 50
+    assert summarize_bicomponents(parallel) == summarize_bicomponents(serial)
+
+
+def test_parse_spqr_script_output(tmp_path):
+    # Output of the SPQR script for a triangle with a doubled edge
+    info_fn = tmp_path / "component_1.info"
+    info_fn.write_text(
+        "0\nS\nr\ta\tb\nr\tb\tc\nv\tc\ta\n0\ta\n1\tb\n2\tc\n"
+        "1\nP\nr\tc\ta\nr\tc\ta\nv\tc\ta\n0\tc\n1\ta\n"
+    )
+    gml_fn = tmp_path / "spqr1.gml"
+    gml_fn.write_text(
+        'Creator "ogdf::GraphIO::writeGML"\ngraph [\n  directed 1\n'
+        "  node [\n    id 0\n  ]\n  node [\n    id 1\n  ]\n"
+        "  edge [\n    source 0\n    target 1\n  ]\n]\n"
+    )
+    metanodes, tree_edges = spqr_utils.parse_spqr_script_output(
+        str(info_fn), str(gml_fn)
+    )
+    assert metanodes == [
+        (
+            "0",
+            "S",
+            ["a", "b", "c"],
+            [["r", "a", "b"], ["r", "b", "c"], ["v", "c", "a"]],
+        ),
+        ("1", "P", ["c", "a"], [["r", "c", "a"]] * 2 + [["v", "c", "a"]]),
+    ]
+    assert tree_edges == [(0, 1)]
+    singlenodeid2obj = build_single_graph(
+        [("a", "b"), ("b", "c"), ("c", "a"), ("c", "a")]
+    )
+    bicmp = spqr_utils.build_bicomponent(
+        "1", metanodes, tree_edges, singlenodeid2obj
+    )
+    assert bicmp.root_metanode.metanode_type == "S"
+    assert [mn.metanode_type for mn in bicmp.metanode_list] == ["S", "P"]
+    assert bicmp.root_metanode.outgoing_nodes == [bicmp.metanode_list[1]]
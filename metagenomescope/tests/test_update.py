@@ -0,0 +1,120 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# Tests updating an earlier .db file using -u.
+
+import os
+import shutil
+import pytest
+from metagenomescope import collate
+from metagenomescope.tests import utils
+from metagenomescope.tests.utils import STD_TABLES, get_all_rows
+
+# A bubble (1 -> {2, 3} -> 4) and a chain (5 -> 6 -> 7)
+GFA_V1 = (
+    "H\tVN:Z:1.0\n"
+    "S\t1\tACGT\nS\t2\tACGTACGT\nS\t3\tAC\nS\t4\tACGTA\n"
+    "S\t5\tAAAA\nS\t6\tCCCCCC\nS\t7\tGG\n"
+    "L\t1\t+\t2\t+\t0M\nL\t1\t+\t3\t+\t0M\n"
+    "L\t2\t+\t4\t+\t0M\nL\t3\t+\t4\t+\t0M\n"
+    "L\t5\t+\t6\t+\t0M\nL\t6\t+\t7\t+\t0M\n"
+)
+# The chain is now longer than the bubble, so the components' ranks change
+GFA_V2 = GFA_V1 + (
+    "S\t8\tTTTTTTTT\nS\t9\tGATTACA\n"
+    + "L\t7\t+\t8\t+\t0M\nL\t8\t+\t9\t+\t0M\n"
+)
+
+
+def collate_gfa(tmp_path, gfa_text, name, extra_args=[]):
+    """Writes a GFA file to tmp_path, runs collate on it, and returns the
+       path to the resulting .db file.
+    """
+    gfa_fn = str(tmp_path / (name + ".gfa"))
+    with open(gfa_fn, "w") as gfa_file:
+        gfa_file.write(gfa_text)
+    collate.run_script(
+        ["-i", gfa_fn, "-o", name, "-d", str(tmp_path), "-w"] + extra_args
+    )
+    return str(tmp_path / (name + ".db"))
+
+
+@pytest.mark.parametrize(
+    "graph_filename", ["longtest_LastGraph", "sample1.gfa", "bubble_test.gml"]
+)
+def test_update_with_unchanged_graph(tmp_path, capsys, graph_filename):
+    rows = get_all_rows(graph_filename)
+    previous_db = str(tmp_path / "previous.db")
+    shutil.copy(
+        os.path.join(utils.OUTDIR, graph_filename + ".db"), previous_db
+    )
+    capsys.readouterr()
+    updated_rows = get_all_rows(graph_filename, ["-u", previous_db])
+    for table in STD_TABLES:
+        assert updated_rows[table] == rows[table]
+    component_ct = rows["assembly"][0][5]
+    assert "Copied {0} of {0} connected".format(component_ct) in (
+        capsys.readouterr().out
+    )
+
+
+def test_update_in_place(tmp_path):
+    db_fn = collate_gfa(tmp_path, GFA_V1, "g")
+    rows = utils.get_db_rows(db_fn)
+    updated_rows = utils.get_db_rows(
+        collate_gfa(tmp_path, GFA_V1, "g", ["-u", db_fn])
+    )
+    for table in STD_TABLES:
+        assert updated_rows[table] == rows[table]
+
+
+@pytest.mark.parametrize("shard", [False, True])
+def test_update_with_changed_graph(tmp_path, capsys, shard):
+    shard_args = ["-sc", "1"] if shard else []
+    v1_db_fn = collate_gfa(tmp_path, GFA_V1, "v1", shard_args)
+    capsys.readouterr()
+    updated_rows = utils.get_db_rows(
+        collate_gfa(tmp_path, GFA_V2, "v2", ["-u", v1_db_fn])
+    )
+    # Only the two orientations of the bubble component are copied forward
+    assert "Copied 2 of 4 connected" in capsys.readouterr().out
+    fresh_rows = utils.get_db_rows(collate_gfa(tmp_path, GFA_V2, "fresh"))
+    for table in STD_TABLES:
+        if table == "assembly":
+            # The filenames differ
+            assert updated_rows[table][0][1:] == fresh_rows[table][0][1:]
+        else:
+            assert updated_rows[table] == fresh_rows[table]
+    # The bubble components are now ranked 3 and 4
+    assert sorted(
+        r[2] for r in updated_rows["clusters"] if r[0].startswith("B")
+    ) == [3, 4]
+
+
+def test_update_requires_existing_db(tmp_path):
+    with pytest.raises(IOError):
+        utils.create_and_open_db(
+            "loop.gfa", ["-u", str(tmp_path / "nonexistent.db")]
+        )
+
+
+def test_update_cant_be_used_with_spqr(tmp_path):
+    with pytest.raises(ValueError):
+        utils.create_and_open_db(
+            "loop.gfa", ["-u", str(tmp_path / "l.db"), "-spqr"]
+        )
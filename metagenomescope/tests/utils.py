@@ -19,6 +19,7 @@
 # This file contains some utility functions that should help simplify the
 # process of creating tests for MetagenomeScope's preprocessing script.
 
+import contextlib
 import os
 import sqlite3
 import random
@@ -28,6 +29,9 @@ from metagenomescope import collate
 INDIR = os.path.join("metagenomescope", "tests", "input")
 OUTDIR = os.path.join("metagenomescope", "tests", "output")
 
+# The tables in a .db file that describe the standard mode graph
+STD_TABLES = ("nodes", "edges", "clusters", "components", "assembly")
+
 
 def gen_args(graph_filename):
     """Generates a list of arguments for collate.run_script().
@@ -91,6 +95,54 @@ def create_and_open_db(graph_filename, extra_args=[]):
     return connection, cursor
 
 
+def get_db_rows(db_fullfn, tables=STD_TABLES):
+    """Returns all of the rows in some of the tables of a .db file.
+
+    Parameters
+    ----------
+    db_fullfn : str
+        path to a .db file produced by the preprocessing script.
+    tables : iterable of str
+        names of the tables to get the rows of.
+
+    Returns
+    -------
+    dict
+        Maps each table name in tables to a list of all the rows in that
+        table, in the order in which they're stored.
+    """
+    connection = sqlite3.connect(db_fullfn)
+    with contextlib.closing(connection):
+        cursor = connection.cursor()
+        table2rows = {}
+        for table in tables:
+            cursor.execute("SELECT * FROM {}".format(table))
+            table2rows[table] = cursor.fetchall()
+    return table2rows
+
+
+def get_all_rows(graph_filename, extra_args=[]):
+    """Runs collate on a graph; returns all rows in the standard mode tables.
+
+    Parameters
+    ----------
+    graph_filename : str
+        filename of a graph in INDIR to use as input to the preprocessing
+        script.
+    extra_args : list
+        list of extra arguments to be added to the input for
+        collate.run_script().
+
+    Returns
+    -------
+    dict
+        Maps each table name in STD_TABLES to a list of all the rows in that
+        table of the .db file produced by the preprocessing script.
+    """
+    collate.run_script(gen_args(graph_filename) + extra_args)
+    return get_db_rows(os.path.join(OUTDIR, graph_filename + ".db"))
+
+
 def is_oriented_graph(cursor):
     """Determines if the graph is oriented or unoriented.
 
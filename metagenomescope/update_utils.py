@@ -0,0 +1,197 @@
+# Copyright (C) 2016-- Marcus Fedarko, Jay Ghurye, Todd Treangen, Mihai Pop
+# Authored by Marcus Fedarko
+#
+# This file is part of MetagenomeScope.
+#
+# MetagenomeScope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# MetagenomeScope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MetagenomeScope.  If not, see <http://www.gnu.org/licenses/>.
+####
+# This file contains utilities for "updating" a .db file produced by an
+# earlier run of collate (see the -u option): we figure out which connected
+# components of the new assembly graph are unchanged from the earlier .db
+# file, so that we can copy their rows forward instead of laying them out
+# again.
+
+import os
+import sqlite3
+
+from . import config
+from .db_utils import STD_TABLE2COLUMNS
+
+# The tables containing the rows for each laid-out connected component, and
+# the index of the component rank column in each of these tables
+COMPONENT_TABLES = ("nodes", "edges", "clusters", "components")
+TABLE2RANK_INDEX = {
+    "nodes": STD_TABLE2COLUMNS["nodes"].index("component_rank integer"),
+    "edges": STD_TABLE2COLUMNS["edges"].index("component_rank integer"),
+    "clusters": STD_TABLE2COLUMNS["clusters"].index("component_rank integer"),
+    "components": STD_TABLE2COLUMNS["components"].index("size_rank integer"),
+}
+
+# The columns of the nodes and edges tables that are taken directly from the
+# input assembly graph (rather than computed from the layout or from other
+# nodes/edges in the component). For nodes, we also include the pattern
+# containing each node: this determines the patterns containing each edge.
+NODE_INPUT_COLUMNS = (0, 1, 2, 3, 4, 5, 12)
+EDGE_INPUT_COLUMNS = (0, 1, 2, 5, 6, 7)
+
+
+def node_signature(n):
+    """Returns a tuple of the input information for a Node, matching the
+       NODE_INPUT_COLUMNS of its row in the nodes table.
+    """
+    return (
+        n.id_string,
+        n.label,
+        n.bp,
+        n.gc_content,
+        n.depth,
+        n.is_repeat,
+        n.group.cy_id_string if n.group is not None else None,
+    )
+
+
+def edge_signature(e):
+    """Returns a tuple of the input information for an Edge, matching the
+       EDGE_INPUT_COLUMNS of its row in the edges table.
+    """
+    return (
+        e.source_id,
+        e.target_id,
+        e.multiplicity,
+        e.orientation,
+        e.mean,
+        e.stdev,
+    )
+
+
+def component_signature(node_list):
+    """Returns a hashable signature of the connected component consisting of
+       the Nodes in node_list: the input information of all of its nodes
+       and edges, along with the patterns they're in. Two components have the
+       same signature iff their nodes, edges, and patterns are identical.
+
+       This should be called after pattern detection.
+    """
+    return (
+        frozenset(node_signature(n) for n in node_list),
+        frozenset(
+            edge_signature(e)
+            for n in node_list
+            for e in n.outgoing_edge_objects.values()
+        ),
+    )
+
+
+class PreviousCollation(object):
+    """The connected components stored in a .db file produced by an earlier
+       run of collate.
+
+       We read all of the rows for every laid-out component into memory up
+       front, so the earlier .db file can safely be overwritten by the new
+       one afterwards. Components that were too large to be laid out in the
+       earlier run have no nodes or edges stored, so they can't be reused.
+    """
+
+    def __init__(self, db_fullfn):
+        """Reads the components stored in db_fullfn. If db_fullfn is a
+           "manifest" .db file for sharded output (see -sc), the shard files
+           it lists are read as well; they should be in the same directory.
+        """
+        if not os.path.isfile(db_fullfn):
+            raise IOError(db_fullfn + config.UPDATE_NO_DB_ERR)
+        # Maps each component rank to a dict mapping each table name in
+        # COMPONENT_TABLES to a list of the component's rows in that table
+        self.rank2rows = {}
+        connection = sqlite3.connect(db_fullfn)
+        try:
+            self._read_rows(connection, ("components",))
+            table_names = set(
+                r[0]
+                for r in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            )
+            if "shards" in table_names:
+                shard_fns = [
+                    r[0]
+                    for r in connection.execute(
+                        "SELECT filename FROM shards ORDER BY shard_index"
+                    )
+                ]
+            else:
+                shard_fns = [None]
+        finally:
+            connection.close()
+        dir_fn = os.path.dirname(db_fullfn)
+        for shard_fn in shard_fns:
+            if shard_fn is None:
+                connection = sqlite3.connect(db_fullfn)
+            else:
+                connection = sqlite3.connect(os.path.join(dir_fn, shard_fn))
+            try:
+                self._read_rows(connection, ("nodes", "edges", "clusters"))
+            finally:
+                connection.close()
+        # Maps each laid-out component's signature to its rank
+        self.signature2rank = {}
+        for rank, table2rows in self.rank2rows.items():
+            if len(table2rows["nodes"]) == 0:
+                continue
+            signature = (
+                frozenset(
+                    tuple(row[i] for i in NODE_INPUT_COLUMNS)
+                    for row in table2rows["nodes"]
+                ),
+                frozenset(
+                    tuple(row[i] for i in EDGE_INPUT_COLUMNS)
+                    for row in table2rows["edges"]
+                ),
+            )
+            self.signature2rank[signature] = rank
+
+    def _read_rows(self, connection, tables):
+        for table in tables:
+            rank_index = TABLE2RANK_INDEX[table]
+            # .db files produced by older versions of MetagenomeScope might
+            # be missing some columns at the end of a table; we fill these in
+            # with NULLs
+            padding = (None,) * len(STD_TABLE2COLUMNS[table])
+            for row in connection.execute(
+                "SELECT * FROM {} ORDER BY rowid".format(table)
+            ):
+                row += padding[len(row) :]
+                rank = row[rank_index]
+                if rank not in self.rank2rows:
+                    self.rank2rows[rank] = {t: [] for t in COMPONENT_TABLES}
+                self.rank2rows[rank][table].append(row)
+
+    def match(self, node_list):
+        """Returns the rank of the previously laid-out component with the
+           same nodes and edges as the component consisting of the Nodes in
+           node_list, or None if there isn't such a component.
+        """
+        return self.signature2rank.get(component_signature(node_list))
+
+    def rows(self, rank, new_rank):
+        """Yields (table name, row) tuples for all of the rows of the
+           previous component with the given rank, in the order in which they
+           were originally inserted, with their component ranks changed to
+           new_rank.
+        """
+        for table in COMPONENT_TABLES:
+            rank_index = TABLE2RANK_INDEX[table]
+            for row in self.rank2rows[rank][table]:
+                yield table, (
+                    row[:rank_index] + (new_rank,) + row[rank_index + 1 :]
+                )
@@ -141,6 +141,37 @@ mgsc.REPEAT_INFO_AVAILABLE = undefined;
 mgsc.SPQR_INFO_AVAILABLE = undefined;
 // Filename of the currently loaded .db file
 mgsc.DB_FILENAME = undefined;
+// Directory (as a URL prefix, ending in "/" unless it's empty) containing the
+// currently loaded .db file. This is only known for .db files loaded from a
+// server; for local .db files, this is null.
+mgsc.DB_DIRECTORY = null;
+// If the currently loaded .db file is the "manifest" of sharded output from
+// the preprocessing script (i.e. it was generated using -sc), this is an array
+// of objects describing each shard: its first and last component size ranks
+// and its filename. Otherwise, this is an empty array.
+mgsc.SHARDS = [];
+// A reference to the SQL.Database object from which we obtain the nodes,
+// edges, and clusters of standard mode components. For non-sharded .db files
+// this is the same as mgsc.CURR_DB; for sharded .db files, this is the shard
+// containing the most recently drawn component.
+mgsc.COMPONENT_DB = null;
+// Filename of the shard stored in mgsc.COMPONENT_DB, if applicable
+mgsc.COMPONENT_DB_FILENAME = null;
+// Whether or not the currently loaded .db file contains a searchnodes table
+// (i.e. it was generated using -stl), listing the nodes in connected
+// components that were too large to lay out
+mgsc.SEARCH_TABLE_AVAILABLE = false;
+// If the currently loaded .db file has a "sequence store" file containing the
+// DNA sequences of its nodes (i.e. it was generated using -ss), this is the
+// filename of that file (relative to mgsc.DB_DIRECTORY). Otherwise, this is
+// null.
+mgsc.SEQUENCE_STORE_FILENAME = null;
+// A reference to the SQL.Database object of the sequence store, once it's
+// been loaded (we only load it when the user asks for some sequences)
+mgsc.SEQUENCE_DB = null;
+// Maps the index of each block of the sequence store that we've decompressed
+// to a Promise of the decompressed block (as a Uint8Array)
+mgsc.SEQUENCE_BLOCKS = {};
 // Total number of nodes and edges in the current asm graph
 mgsc.ASM_NODE_COUNT = 0;
 mgsc.ASM_EDGE_COUNT = 0;
@@ -1401,6 +1432,7 @@ function loadLocalDB() {
     }
     if (inputfile.name.toLowerCase().endsWith(".db")) {
         mgsc.DB_FILENAME = inputfile.name;
+        mgsc.DB_DIRECTORY = null;
         // Important -- remove old DB from memory if it exists
         closeDB();
         disableVolatileControls();
@@ -1522,6 +1554,56 @@ function parseDBcomponents() {
     spqrInfoStmt.free();
     mgsc.SPQR_INFO_AVAILABLE =
         spqrDataFlag || !$.isEmptyObject(spqrTableExistence);
+    // Check if this .db file is the manifest of a sharded .db file. If so,
+    // record information about all of the shards; we'll load individual
+    // shards as needed when drawing components.
+    var shardsTableStmt = mgsc.CURR_DB.prepare(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='shards';"
+    );
+    shardsTableStmt.step();
+    var shardsTableExistence = shardsTableStmt.getAsObject();
+    shardsTableStmt.free();
+    mgsc.SHARDS = [];
+    mgsc.COMPONENT_DB = mgsc.CURR_DB;
+    mgsc.COMPONENT_DB_FILENAME = null;
+    if (!$.isEmptyObject(shardsTableExistence)) {
+        var shardsStmt = mgsc.CURR_DB.prepare(
+            "SELECT * FROM shards ORDER BY shard_index;"
+        );
+        while (shardsStmt.step()) {
+            mgsc.SHARDS.push(shardsStmt.getAsObject());
+        }
+        shardsStmt.free();
+        mgsc.COMPONENT_DB = null;
+    }
+    var searchTableStmt = mgsc.CURR_DB.prepare(
+        "SELECT name FROM sqlite_master WHERE type='table' AND " +
+            "name='searchnodes';"
+    );
+    searchTableStmt.step();
+    mgsc.SEARCH_TABLE_AVAILABLE = !$.isEmptyObject(
+        searchTableStmt.getAsObject()
+    );
+    searchTableStmt.free();
+    var seqStoreTableStmt = mgsc.CURR_DB.prepare(
+        "SELECT name FROM sqlite_master WHERE type='table' AND " +
+            "name='sequencestore';"
+    );
+    seqStoreTableStmt.step();
+    var seqStoreTableExistence = seqStoreTableStmt.getAsObject();
+    seqStoreTableStmt.free();
+    mgsc.SEQUENCE_STORE_FILENAME = null;
+    if (!$.isEmptyObject(seqStoreTableExistence)) {
+        var seqStoreStmt = mgsc.CURR_DB.prepare(
+            "SELECT filename FROM sequencestore;"
+        );
+        seqStoreStmt.step();
+        mgsc.SEQUENCE_STORE_FILENAME = seqStoreStmt.getAsObject().filename;
+        seqStoreStmt.free();
+        $("#exportSequencesButton").removeClass("notviewable");
+    } else {
+        $("#exportSequencesButton").addClass("notviewable");
+    }
     if (mgsc.SPQR_INFO_AVAILABLE) {
         $("#spqrConnectedComponentControls").removeClass("notviewable");
         $("#sccCountTH").removeClass("notviewable");
@@ -1949,10 +2031,77 @@ function startDrawComponent(mode) {
     }
     // if compRankValidity === 0, then currRank must represent just an
     // integer: so parseInt is fine to run on it
+    if (mode !== "SPQR" && mgsc.SHARDS.length > 0) {
+        loadComponentShard(parseInt(currRank), function(cmpRank) {
+            updateTextStatus("Drawing clusters...", false);
+            window.setTimeout(drawFunc(cmpRank), 0);
+        });
+        return;
+    }
     updateTextStatus("Drawing clusters...", false);
     window.setTimeout(drawFunc(parseInt(currRank)), 0);
 }
 
+/* Ensures that mgsc.COMPONENT_DB contains the shard containing the standard
+ * mode component with the given size rank, then calls onLoad(cmpRank).
+ *
+ * If that shard is already loaded, this calls onLoad() immediately; otherwise,
+ * this fetches the shard from the server (from the same directory as the
+ * manifest .db file) using an XMLHttpRequest, as is done in loadHostedDB().
+ */
+function loadComponentShard(cmpRank, onLoad) {
+    "use strict";
+    var shard = null;
+    for (var s = 0; s < mgsc.SHARDS.length; s++) {
+        if (
+            mgsc.SHARDS[s].first_rank <= cmpRank &&
+            cmpRank <= mgsc.SHARDS[s].last_rank
+        ) {
+            shard = mgsc.SHARDS[s];
+            break;
+        }
+    }
+    if (shard === null) {
+        alert(
+            "No shard file contains the component with size rank " +
+                cmpRank +
+                "."
+        );
+        return;
+    }
+    if (mgsc.COMPONENT_DB_FILENAME === shard.filename) {
+        onLoad(cmpRank);
+        return;
+    }
+    if (mgsc.DB_DIRECTORY === null) {
+        alert(
+            "This .db file's components are stored in separate shard files " +
+                "(it was generated using the -sc option of the " +
+                "preprocessing script). Shards can only be loaded for .db " +
+                "files hosted on a server."
+        );
+        return;
+    }
+    updateTextStatus("Loading shard " + shard.filename + "...", false);
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", mgsc.DB_DIRECTORY + shard.filename, true);
+    xhr.responseType = "arraybuffer";
+    xhr.onload = function(eve) {
+        finishProgressBar();
+        if (this.status === 200) {
+            closeComponentDB();
+            mgsc.COMPONENT_DB = new SQL.Database(new Uint8Array(this.response));
+            mgsc.COMPONENT_DB_FILENAME = shard.filename;
+            onLoad(cmpRank);
+        } else {
+            updateTextStatus("&nbsp;", false);
+            alert("Unable to load shard " + shard.filename + ".");
+        }
+    };
+    startIndeterminateProgressBar();
+    xhr.send();
+}
+
 /* Draws the selected connected component of the SPQR view. */
 function drawSPQRComponent(cmpRank) {
     "use strict";
@@ -2281,7 +2430,7 @@ function drawComponent(cmpRank) {
     // enabling the button and keep it disabled because it'd be useless
     var clustersInComponent = false;
     cy.startBatch();
-    var clustersStmt = mgsc.CURR_DB.prepare(
+    var clustersStmt = mgsc.COMPONENT_DB.prepare(
         "SELECT * FROM clusters WHERE component_rank = ?",
         [cmpRank]
     );
@@ -2305,7 +2454,7 @@ function drawComponent(cmpRank) {
          * timeouts to update the progress bar).
          */
         cy.startBatch();
-        var nodesStmt = mgsc.CURR_DB.prepare(
+        var nodesStmt = mgsc.COMPONENT_DB.prepare(
             "SELECT * FROM nodes WHERE component_rank = ?",
             [cmpRank]
         );
@@ -2418,7 +2567,7 @@ function drawComponentNodes(
         var edgesStmt;
         var edgeType = "doubleedge";
         if (mode !== "SPQR") {
-            edgesStmt = mgsc.CURR_DB.prepare(
+            edgesStmt = mgsc.COMPONENT_DB.prepare(
                 "SELECT * FROM edges WHERE component_rank = ?",
                 [cmpRank]
             );
@@ -2760,11 +2909,29 @@ function finishDrawComponent(
 // to worry about in Javascript?????????
 function closeDB() {
     "use strict";
+    closeComponentDB();
+    if (mgsc.SEQUENCE_DB !== null) {
+        mgsc.SEQUENCE_DB.close();
+        mgsc.SEQUENCE_DB = null;
+    }
+    mgsc.SEQUENCE_BLOCKS = {};
     if (mgsc.CURR_DB !== null) {
         mgsc.CURR_DB.close();
     }
 }
 
+/* Closes the currently loaded shard .db file, if one is loaded (and if it's
+ * separate from mgsc.CURR_DB).
+ */
+function closeComponentDB() {
+    "use strict";
+    if (mgsc.COMPONENT_DB !== null && mgsc.COMPONENT_DB !== mgsc.CURR_DB) {
+        mgsc.COMPONENT_DB.close();
+    }
+    mgsc.COMPONENT_DB = null;
+    mgsc.COMPONENT_DB_FILENAME = null;
+}
+
 function changeDropdownVal(arrowHTML) {
     "use strict";
     $("#rotationDropdown").html(arrowHTML + " <span class='caret'></span>");
@@ -2811,6 +2978,7 @@ function loadHostedDB() {
     if (db_filename_prefix.length > 0 && !db_filename_prefix.endsWith("/")) {
         db_filename_prefix += "/";
     }
+    mgsc.DB_DIRECTORY = db_filename_prefix;
     mgsc.DB_FILENAME =
         db_filename_prefix + $("input[name=fs]:checked").attr("id");
     // jQuery doesn't support arraybuffer responses so we have to manually
@@ -3850,6 +4018,195 @@ function endFinishing() {
     disableButton("endFinishingButton");
 }
 
+/* Ensures that mgsc.SEQUENCE_DB contains the sequence store of the current
+ * .db file, then calls onLoad().
+ *
+ * As with shards (see loadComponentShard()), the sequence store is fetched
+ * from the server, from the same directory as the .db file.
+ */
+function loadSequenceStore(onLoad) {
+    "use strict";
+    if (mgsc.SEQUENCE_DB !== null) {
+        onLoad();
+        return;
+    }
+    if (mgsc.DB_DIRECTORY === null) {
+        alert(
+            "The sequences of this .db file's nodes are stored in a " +
+                "separate file (it was generated using the -ss option of " +
+                "the preprocessing script). This file can only be loaded " +
+                "for .db files hosted on a server."
+        );
+        return;
+    }
+    updateTextStatus(
+        "Loading sequences from " + mgsc.SEQUENCE_STORE_FILENAME + "...",
+        false
+    );
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", mgsc.DB_DIRECTORY + mgsc.SEQUENCE_STORE_FILENAME, true);
+    xhr.responseType = "arraybuffer";
+    xhr.onload = function(eve) {
+        finishProgressBar();
+        updateTextStatus("&nbsp;", false);
+        if (this.status === 200) {
+            mgsc.SEQUENCE_DB = new SQL.Database(new Uint8Array(this.response));
+            mgsc.SEQUENCE_BLOCKS = {};
+            onLoad();
+        } else {
+            alert("Unable to load " + mgsc.SEQUENCE_STORE_FILENAME + ".");
+        }
+    };
+    startIndeterminateProgressBar();
+    xhr.send();
+}
+
+/* Returns a Promise of the decompressed block of the sequence store with the
+ * given index, as a Uint8Array. Blocks are compressed using zlib, which the
+ * browser's DecompressionStream calls "deflate".
+ */
+function getSequenceBlock(blockIndex) {
+    "use strict";
+    if (!mgsc.SEQUENCE_BLOCKS.hasOwnProperty(blockIndex)) {
+        var stmt = mgsc.SEQUENCE_DB.prepare(
+            "SELECT data FROM seqblocks WHERE block_index = ?;",
+            [blockIndex]
+        );
+        stmt.step();
+        var data = stmt.get()[0];
+        stmt.free();
+        var stream = new Blob([data])
+            .stream()
+            .pipeThrough(new DecompressionStream("deflate"));
+        mgsc.SEQUENCE_BLOCKS[blockIndex] = new Response(stream)
+            .arrayBuffer()
+            .then(function(buffer) {
+                return new Uint8Array(buffer);
+            });
+    }
+    return mgsc.SEQUENCE_BLOCKS[blockIndex];
+}
+
+/* Returns a Promise of the DNA sequence of the node with the given ID, or of
+ * null if the sequence store doesn't contain this sequence.
+ *
+ * Sequences are packed into 2 bits per nucleotide, and characters other than
+ * A/C/G/T are stored as "exceptions" (see sequence_store.py in the
+ * preprocessing script). If only the sequence of the node's reverse
+ * complement is stored (as is the case for GFA files), we return the reverse
+ * complement of that sequence.
+ */
+function getSequence(nodeID) {
+    "use strict";
+    var stmt = mgsc.SEQUENCE_DB.prepare(
+        "SELECT * FROM sequences WHERE id = ?;"
+    );
+    var isRevComp = false;
+    stmt.bind([nodeID]);
+    if (!stmt.step()) {
+        isRevComp = true;
+        var rcID = nodeID[0] === "-" ? nodeID.substring(1) : "-" + nodeID;
+        stmt.bind([rcID]);
+        if (!stmt.step()) {
+            stmt.free();
+            return Promise.resolve(null);
+        }
+    }
+    var seqInfo = stmt.getAsObject();
+    stmt.free();
+    if (seqInfo.length === 0) {
+        return Promise.resolve("");
+    }
+    var blockSizeStmt = mgsc.SEQUENCE_DB.prepare(
+        "SELECT block_size FROM seqinfo;"
+    );
+    blockSizeStmt.step();
+    var blockSize = blockSizeStmt.get()[0];
+    blockSizeStmt.free();
+    var packedStart = seqInfo.start;
+    var packedEnd = seqInfo.start + Math.ceil(seqInfo.length / 4);
+    var blockPromises = [];
+    var firstBlock = Math.floor(packedStart / blockSize);
+    var lastBlock = Math.floor((packedEnd - 1) / blockSize);
+    for (var b = firstBlock; b <= lastBlock; b++) {
+        blockPromises.push(getSequenceBlock(b));
+    }
+    return Promise.all(blockPromises).then(function(blocks) {
+        var nucleotides = "ACGT";
+        var seq = new Array(seqInfo.length);
+        for (var i = 0; i < seqInfo.length; i++) {
+            var p = packedStart + Math.floor(i / 4);
+            var block = blocks[Math.floor(p / blockSize) - firstBlock];
+            var packedByte = block[p % blockSize];
+            seq[i] = nucleotides[(packedByte >> (6 - 2 * (i % 4))) & 3];
+        }
+        if (seqInfo.exceptions !== null) {
+            var exceptions = JSON.parse(seqInfo.exceptions);
+            for (var e = 0; e < exceptions.length; e++) {
+                for (var j = 0; j < exceptions[e][1]; j++) {
+                    seq[exceptions[e][0] + j] = exceptions[e][2];
+                }
+            }
+        }
+        if (isRevComp) {
+            var complement = { A: "T", C: "G", G: "C", T: "A" };
+            seq.reverse();
+            for (var k = 0; k < seq.length; k++) {
+                if (complement.hasOwnProperty(seq[k])) {
+                    seq[k] = complement[seq[k]];
+                }
+            }
+        }
+        return seq.join("");
+    });
+}
+
+/* Downloads a FASTA file containing the DNA sequences of all selected nodes
+ * (loading the sequence store first, if needed).
+ */
+function exportSelectedSequences() {
+    "use strict";
+    if (mgsc.SELECTED_NODES === null || mgsc.SELECTED_NODES.empty()) {
+        alert("No nodes are selected.");
+        return;
+    }
+    var nodeIDs = [];
+    mgsc.SELECTED_NODES.filter("node.noncluster").each(function(node) {
+        // As in addSelectedNodeInfo(), SPQR mode nodes' IDs are suffixed
+        // with the name of their parent metanode
+        if (mgsc.CURR_VIEWTYPE === "SPQR") {
+            nodeIDs.push(node.id().split("_")[0]);
+        } else {
+            nodeIDs.push(node.id());
+        }
+    });
+    loadSequenceStore(function() {
+        Promise.all(nodeIDs.map(getSequence)).then(function(seqs) {
+            var fasta = "";
+            var missingIDs = [];
+            for (var i = 0; i < nodeIDs.length; i++) {
+                if (seqs[i] === null) {
+                    missingIDs.push(nodeIDs[i]);
+                    continue;
+                }
+                fasta += ">" + nodeIDs[i] + "\n";
+                for (var p = 0; p < seqs[i].length; p += 80) {
+                    fasta += seqs[i].substring(p, p + 80) + "\n";
+                }
+            }
+            if (missingIDs.length > 0) {
+                alert(
+                    "No sequences are available for these nodes: " +
+                        missingIDs.join(", ")
+                );
+            }
+            if (fasta.length > 0) {
+                downloadDataURI("sequences.fasta", fasta, true);
+            }
+        });
+    });
+}
+
 function exportPath() {
     "use strict";
     var exportFileType = $("#pathExportButtonGroup .btn.active").attr("value");
@@ -4157,6 +4514,7 @@ function searchForEles() {
     var newEle;
     var parentID;
     var queriedName;
+    var tooLargeRank;
     for (var c = 0; c < names.length; c++) {
         queriedName = names[c].trim();
         if (mgsc.CURR_SEARCH_TYPE === "Label")
@@ -4172,14 +4530,30 @@ function searchForEles() {
                 // its parent instead
                 eles = eles.union(cy.getElementById(parentID));
             } else {
-                // It's a bogus element
-                alert(
-                    "Error -- element with " +
-                        mgsc.SEARCH_TYPE_HREADABLE[mgsc.CURR_SEARCH_TYPE] +
-                        " " +
-                        queriedName +
-                        " is not in this component."
-                );
+                // It's not in this component -- but if it's in a component
+                // that was too large to lay out, we can at least say which
+                // component that is
+                tooLargeRank = findTooLargeComponentRank(queriedName);
+                if (tooLargeRank !== null) {
+                    alert(
+                        "Error -- element with " +
+                            mgsc.SEARCH_TYPE_HREADABLE[mgsc.CURR_SEARCH_TYPE] +
+                            " " +
+                            queriedName +
+                            " is in connected component " +
+                            tooLargeRank +
+                            ", which was too large to lay out."
+                    );
+                } else {
+                    // It's a bogus element
+                    alert(
+                        "Error -- element with " +
+                            mgsc.SEARCH_TYPE_HREADABLE[mgsc.CURR_SEARCH_TYPE] +
+                            " " +
+                            queriedName +
+                            " is not in this component."
+                    );
+                }
                 return;
             }
         } else {
@@ -4199,6 +4573,32 @@ function searchForEles() {
     eles.select();
 }
 
+/* Returns the size rank of the connected component containing the node with
+ * the given ID (or label, depending on mgsc.CURR_SEARCH_TYPE) if that
+ * component was too large to lay out, using the searchnodes table. Returns
+ * null if there isn't such a node, or if the current .db file doesn't have a
+ * searchnodes table.
+ */
+function findTooLargeComponentRank(queriedName) {
+    "use strict";
+    if (!mgsc.SEARCH_TABLE_AVAILABLE) {
+        return null;
+    }
+    var column = mgsc.CURR_SEARCH_TYPE === "Label" ? "label" : "id";
+    var stmt = mgsc.CURR_DB.prepare(
+        "SELECT component_rank FROM searchnodes WHERE " +
+            column +
+            " = ? LIMIT 1;",
+        [queriedName]
+    );
+    var rank = null;
+    if (stmt.step()) {
+        rank = stmt.getAsObject().component_rank;
+    }
+    stmt.free();
+    return rank;
+}
+
 /* In explicit mode, reveals the descendant metanodes (and their skeletons) of
  * the passed metanode.
  *